@@ -0,0 +1,39 @@
+"""Activate users of active organizations (legacy data repair)
+
+Revision ID: 008_sync_active_org_users
+Revises: 007_add_contact_fields
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_sync_active_org_users'
+down_revision: Union[str, None] = '007_add_contact_fields'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Set users.status = ACTIVE for every user owning an ACTIVE organization.
+
+    This repair used to run on every GET /admin/organizations; read
+    endpoints now use read-only sessions, so it is applied once here.
+    """
+    op.execute(
+        """
+        UPDATE users SET status = 'ACTIVE'
+        FROM organizations
+        WHERE organizations.user_id = users.id
+          AND organizations.status = 'ACTIVE'
+          AND users.status <> 'ACTIVE'
+        """
+    )
+
+
+def downgrade() -> None:
+    """Data-only migration: nothing to revert."""
+    pass
@@ -0,0 +1,32 @@
+"""Give updated_at columns a now() server default
+
+Revision ID: 009_updated_at_default
+Revises: 008_sync_active_org_users
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_updated_at_default'
+down_revision: Union[str, None] = '008_sync_active_org_users'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('users', 'organizations', 'requests', 'assignments')
+
+
+def upgrade() -> None:
+    """Default updated_at to now() so INSERT ... RETURNING covers it (no follow-up SELECT)."""
+    for table in TABLES:
+        op.alter_column(table, 'updated_at', server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    """Drop the server defaults."""
+    for table in TABLES:
+        op.alter_column(table, 'updated_at', server_default=None)
@@ -0,0 +1,47 @@
+"""Add notifications outbox table
+
+Revision ID: 011_add_notifications
+Revises: 010_add_refresh_tokens
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_add_notifications'
+down_revision: Union[str, None] = '010_add_refresh_tokens'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the notifications outbox, indexed for the pending-batch scan."""
+    op.create_table(
+        'notifications',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('request_id', postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('requests.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('event', sa.String(50), nullable=False),
+        sa.Column('channel', sa.String(10), nullable=False),
+        sa.Column('recipient', sa.String(255), nullable=False),
+        sa.Column('subject', sa.String(200), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_notifications_status_next_attempt', 'notifications', ['status', 'next_attempt_at'])
+
+
+def downgrade() -> None:
+    """Drop the notifications outbox."""
+    op.drop_index('ix_notifications_status_next_attempt', table_name='notifications')
+    op.drop_table('notifications')
@@ -0,0 +1,30 @@
+"""Add priority_pinned to requests
+
+Revision ID: 012_add_priority_pinned
+Revises: 011_add_notifications
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012_add_priority_pinned'
+down_revision: Union[str, None] = '011_add_notifications'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Scores set by an admin are excluded from the periodic re-score."""
+    op.add_column(
+        'requests',
+        sa.Column('priority_pinned', sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('requests', 'priority_pinned')
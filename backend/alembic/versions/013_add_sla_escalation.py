@@ -0,0 +1,47 @@
+"""Add SLA escalation columns and (status, created_at) indexes
+
+Revision ID: 013_add_sla_escalation
+Revises: 012_add_priority_pinned
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013_add_sla_escalation'
+down_revision: Union[str, None] = '012_add_priority_pinned'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Escalation markers plus the indexes the SLA sweep scans by."""
+    op.add_column('requests', sa.Column(
+        'escalated_status', postgresql.ENUM(name='requeststatus', create_type=False), nullable=True,
+    ))
+    op.add_column('requests', sa.Column('escalated_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('assignments', sa.Column('escalated_at', sa.DateTime(timezone=True), nullable=True))
+
+    # CONCURRENTLY: no write lock on large live tables while the indexes build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_requests_status_created_at', 'requests', ['status', 'created_at'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_assignments_status_created_at', 'assignments', ['status', 'created_at'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_assignments_status_created_at', table_name='assignments')
+    op.drop_index('ix_requests_status_created_at', table_name='requests')
+    op.drop_column('assignments', 'escalated_at')
+    op.drop_column('requests', 'escalated_at')
+    op.drop_column('requests', 'escalated_status')
@@ -0,0 +1,58 @@
+"""Add geohash to requests for radius/bbox search
+
+Revision ID: 014_add_request_geohash
+Revises: 013_add_sla_escalation
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014_add_request_geohash'
+down_revision: Union[str, None] = '013_add_sla_escalation'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+
+def upgrade() -> None:
+    """Add the column, backfill it from existing coordinates, then index it."""
+    op.add_column('requests', sa.Column('geohash', sa.String(12), nullable=True))
+
+    conn = op.get_bind()
+    requests = sa.table(
+        'requests',
+        sa.column('id'), sa.column('latitude'), sa.column('longitude'), sa.column('geohash'),
+    )
+    # keyset pagination over rows still missing a geohash
+    while True:
+        rows = conn.execute(
+            sa.select(requests.c.id, requests.c.latitude, requests.c.longitude)
+            .where(
+                requests.c.geohash.is_(None),
+                requests.c.latitude.is_not(None),
+                requests.c.longitude.is_not(None),
+            )
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            requests.update().where(requests.c.id == sa.bindparam('_id')).values(geohash=sa.bindparam('_geohash')),
+            [{'_id': row.id, '_geohash': encode_geohash(row.latitude, row.longitude)} for row in rows],
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_requests_geohash', 'requests', ['geohash'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_geohash', table_name='requests')
+    op.drop_column('requests', 'geohash')
@@ -0,0 +1,62 @@
+"""Add normalized name key and duplicate flag to requests
+
+Revision ID: 015_add_request_dedup
+Revises: 014_add_request_geohash
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.text import NAME_KEY_LENGTH, normalize_name
+
+
+# revision identifiers, used by Alembic.
+revision: str = '015_add_request_dedup'
+down_revision: Union[str, None] = '014_add_request_geohash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+
+def upgrade() -> None:
+    """Add the columns, backfill name_key from requester_name, then index it."""
+    op.add_column('requests', sa.Column('name_key', sa.String(NAME_KEY_LENGTH), nullable=True))
+    op.add_column('requests', sa.Column('duplicate_of_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('requests', sa.Column('duplicate_score', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_requests_duplicate_of_id', 'requests', 'requests',
+        ['duplicate_of_id'], ['id'], ondelete='SET NULL',
+    )
+
+    conn = op.get_bind()
+    requests = sa.table('requests', sa.column('id'), sa.column('requester_name'), sa.column('name_key'))
+    # keyset pagination by id: names that normalize to '' stay NULL and must not be re-read
+    last_id = None
+    while True:
+        query = sa.select(requests.c.id, requests.c.requester_name).order_by(requests.c.id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(requests.c.id > last_id)
+        rows = conn.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        conn.execute(
+            requests.update().where(requests.c.id == sa.bindparam('_id')).values(name_key=sa.bindparam('_name_key')),
+            [{'_id': row.id, '_name_key': normalize_name(row.requester_name) or None} for row in rows],
+        )
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_requests_name_key', 'requests', ['name_key'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_name_key', table_name='requests')
+    op.drop_constraint('fk_requests_duplicate_of_id', 'requests', type_='foreignkey')
+    op.drop_column('requests', 'duplicate_score')
+    op.drop_column('requests', 'duplicate_of_id')
+    op.drop_column('requests', 'name_key')
@@ -0,0 +1,64 @@
+"""Add denormalized assignment counters to requests and organizations
+
+Revision ID: 016_add_assignment_counters
+Revises: 015_add_request_dedup
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '016_add_assignment_counters'
+down_revision: Union[str, None] = '015_add_request_dedup'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add the counters (constant default: no table rewrite), then backfill from assignments.
+
+    Only requests with a pending pledge get a non-zero pledge_count, so the
+    request backfill touches that small set. total_completed is recomputed
+    too: it used to be maintained by hand in a single code path.
+    """
+    op.add_column('requests', sa.Column('pledge_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('organizations', sa.Column('active_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('organizations', sa.Column('failed_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        """
+        UPDATE requests SET pledge_count = pledged.count
+        FROM (
+            SELECT request_id, COUNT(*) AS count FROM assignments
+            WHERE status = 'PLEDGED' GROUP BY request_id
+        ) AS pledged
+        WHERE pledged.request_id = requests.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE organizations SET
+            active_count = COALESCE(counts.active, 0),
+            total_completed = COALESCE(counts.completed, 0),
+            failed_count = COALESCE(counts.failed, 0)
+        FROM organizations AS o
+        LEFT JOIN (
+            SELECT org_id,
+                   COUNT(*) FILTER (WHERE status IN ('PLEDGED', 'IN_PROGRESS')) AS active,
+                   COUNT(*) FILTER (WHERE status = 'COMPLETED') AS completed,
+                   COUNT(*) FILTER (WHERE status = 'FAILED') AS failed
+            FROM assignments GROUP BY org_id
+        ) AS counts ON counts.org_id = o.id
+        WHERE o.id = organizations.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('organizations', 'failed_count')
+    op.drop_column('organizations', 'active_count')
+    op.drop_column('requests', 'pledge_count')
@@ -0,0 +1,50 @@
+"""Add the append-only request_events status history
+
+Revision ID: 017_add_request_events
+Revises: 016_add_assignment_counters
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '017_add_request_events'
+down_revision: Union[str, None] = '016_add_assignment_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the event log, kept cheap to append to.
+
+    Bigint identity key and no foreign key: inserts touch only the table, the
+    request_id btree (timelines) and a BRIN on created_at (rows arrive in time
+    order, so the range index stays a few pages for analytics windows).
+    Existing requests get no backfilled history: the first event after the
+    upgrade falls back to the request creation time when it leaves PENDING.
+    """
+    op.create_table(
+        'request_events',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('request_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('from_status', postgresql.ENUM(name='requeststatus', create_type=False), nullable=True),
+        sa.Column('to_status', postgresql.ENUM(name='requeststatus', create_type=False), nullable=False),
+        sa.Column('region', sa.String(100), nullable=True),
+        sa.Column('category', postgresql.ENUM(name='requestcategory', create_type=False), nullable=False),
+        sa.Column('entered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_request_events_request_id', 'request_events', ['request_id'])
+    op.create_index('ix_request_events_created_at', 'request_events', ['created_at'], postgresql_using='brin')
+
+
+def downgrade() -> None:
+    """Drop the event log."""
+    op.drop_index('ix_request_events_created_at', table_name='request_events')
+    op.drop_index('ix_request_events_request_id', table_name='request_events')
+    op.drop_table('request_events')
@@ -1,114 +1,162 @@
 """
 التبعيات المشتركة للـ API
+
+- Principal: الهوية والدور والمؤسسة من التوكن الموقّع، مع فحص الإبطال - بلا استعلام
+- get_geo_filter: فلاتر near/radius_km/bbox المشتركة لقوائم الطلبات
 """
+import uuid
+from dataclasses import dataclass
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy import select
+from sqlalchemy import and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.models.request import Request
 from app.models.user import User
+from app.core.geo import bbox_condition, parse_bbox, parse_near, radius_condition
 from app.core.security import decode_token
 from app.core.constants import UserRole
+from app.core.revocation import revocation_store
 
 security = HTTPBearer()
 
 
-async def get_current_user(
+@dataclass(frozen=True)
+class Principal:
+    """صاحب الطلب كما يصفه التوكن"""
+    user_id: uuid.UUID
+    role: UserRole
+    org_id: Optional[uuid.UUID] = None
+    token_id: Optional[str] = None      # jti - لإبطال هذا التوكن وحده (تسجيل الخروج)
+    expires_at: Optional[int] = None
+
+    async def load_user(self, db: AsyncSession) -> User:
+        """تحميل المستخدم الكامل عند الحاجة لبيانات الملف الشخصي"""
+        user = await db.get(User, self.user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="المستخدم غير موجود",
+            )
+        return user
+
+
+async def get_principal(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    """الحصول على المستخدم الحالي من التوكن"""
+) -> Principal:
+    """الهوية من التوكن (توقيع + صلاحية + إبطال)"""
     payload = decode_token(credentials.credentials)
-    
-    if not payload:
+
+    if not payload or payload.get("type", "access") != "access":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="رمز غير صالح أو منتهي الصلاحية",
         )
-    
-    user_id = payload.get("sub")
-    if not user_id:
+
+    try:
+        principal = Principal(
+            user_id=uuid.UUID(payload.get("sub") or ""),
+            role=UserRole(payload.get("role")),
+            org_id=uuid.UUID(payload["org_id"]) if payload.get("org_id") else None,
+            token_id=payload.get("jti"),
+            expires_at=payload.get("exp"),
+        )
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="رمز غير صالح",
         )
-    
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="المستخدم غير موجود",
-        )
-    
-    if user.status.value == "suspended":
+
+    if await revocation_store.is_revoked(payload):
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="الحساب معطل",
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="انتهت الجلسة، يرجى تسجيل الدخول من جديد",
         )
-    
-    return user
 
+    return principal
 
-async def get_current_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+
+async def get_admin_principal(
+    principal: Principal = Depends(get_principal),
+) -> Principal:
     """التحقق من صلاحيات الإدارة (admin أو superadmin)"""
-    if current_user.role not in (UserRole.ADMIN, UserRole.SUPERADMIN):
+    if principal.role not in (UserRole.ADMIN, UserRole.SUPERADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="هذه العملية تتطلب صلاحيات الإدارة",
         )
-    return current_user
+    return principal
 
 
-async def get_current_superadmin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_superadmin_principal(
+    principal: Principal = Depends(get_principal),
+) -> Principal:
     """التحقق من صلاحيات المدير العام (superadmin فقط)"""
-    if current_user.role != UserRole.SUPERADMIN:
+    if principal.role != UserRole.SUPERADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="هذه العملية متاحة للمدير العام فقط",
         )
-    return current_user
+    return principal
 
 
-async def get_current_organization(
-    current_user: User = Depends(get_current_user),
-) -> User:
-    """التحقق من صلاحيات المؤسسة"""
-    if current_user.role != UserRole.ORGANIZATION:
+async def get_organization_principal(
+    principal: Principal = Depends(get_principal),
+) -> Principal:
+    """التحقق من صلاحيات المؤسسة (ووجود المؤسسة في التوكن)"""
+    if principal.role != UserRole.ORGANIZATION:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="هذه العملية متاحة للمؤسسات فقط",
         )
-    return current_user
+    if principal.org_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="لم يتم العثور على بيانات المؤسسة",
+        )
+    return principal
 
 
-async def get_current_citizen(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_citizen_principal(
+    principal: Principal = Depends(get_principal),
+) -> Principal:
     """التحقق من صلاحيات المواطن"""
-    if current_user.role != UserRole.CITIZEN:
+    if principal.role != UserRole.CITIZEN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="هذه العملية متاحة للمواطنين فقط",
         )
-    return current_user
+    return principal
 
 
-async def get_current_inspector(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_inspector_principal(
+    principal: Principal = Depends(get_principal),
+) -> Principal:
     """التحقق من صلاحيات المراقب"""
-    if current_user.role != UserRole.INSPECTOR:
+    if principal.role != UserRole.INSPECTOR:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="هذه العملية متاحة للمراقبين فقط",
         )
-    return current_user
+    return principal
+
+
+def get_geo_filter(
+    near: Optional[str] = Query(default=None, description="lat,lon - مع radius_km"),
+    radius_km: float = Query(default=10, gt=0, le=200, description="نصف القطر بالكيلومتر"),
+    bbox: Optional[str] = Query(default=None, description="min_lon,min_lat,max_lon,max_lat"),
+):
+    """شرط جغرافي على الطلبات (أو None) - الطلبات بلا إحداثيات تُستبعد عند استعماله"""
+    conditions = []
+    if near:
+        latitude, longitude = parse_near(near)
+        conditions.append(radius_condition(
+            Request.geohash, Request.latitude, Request.longitude, latitude, longitude, radius_km,
+        ))
+    if bbox:
+        conditions.append(bbox_condition(Request.geohash, Request.latitude, Request.longitude, parse_bbox(bbox)))
+    if not conditions:
+        return None
+    return and_(*conditions)
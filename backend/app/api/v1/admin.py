@@ -7,16 +7,17 @@ from uuid import UUID
 from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from sqlalchemy import select, func, case, and_
+from sqlalchemy import select, func, case, and_, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
 from app.database import get_db
-from app.api.deps import get_current_admin, get_current_superadmin
+from app.api.deps import Principal, get_admin_principal, get_superadmin_principal
 from app.models.request import Request
 from app.models.assignment import Assignment
 from app.models.organization import Organization
 from app.models.user import User
+from app.models.request_event import RequestEvent
 from app.schemas.request import (
     RequestResponse,
     RequestDetailResponse,
@@ -24,8 +25,15 @@ from app.schemas.request import (
     PaginatedRequests,
 )
 from app.schemas.assignment import AssignmentBriefResponse
-from app.core.constants import RequestStatus, RequestCategory, AssignmentStatus, UserRole, UserStatus, OrganizationStatus
-from app.core.security import hash_password, generate_strong_code
+from app.core.constants import RequestStatus, RequestCategory, AssignmentStatus, UserRole, UserStatus, OrganizationStatus, SLAStage
+from app.core.geo import parse_bbox
+from app.core.security import hash_password_async, generate_strong_code
+from app.core.revocation import revocation_store
+from app.services.assignment_service import delete_assignments
+from app.services.map_clusters import MAX_ZOOM, get_clusters, mark_changed
+from app.services.request_events import request_timeline, stage_funnel
+from app.services.token_service import revoke_user_tokens
+from app.services.workflow import set_request_status
 from app.schemas.inspector import (
     InspectorCreateRequest,
     InspectorResponse,
@@ -44,6 +52,15 @@ from app.schemas.organization import (
 router = APIRouter(prefix="/admin", tags=["الإدارة - Admin"])
 
 
+async def _sync_token_access(db: AsyncSession, user_id: UUID, user_status: UserStatus) -> None:
+    """الحساب المعطل يفقد توكناته ورموز التحديث فوراً، وإعادة التفعيل ترفع الإبطال"""
+    if user_status == UserStatus.SUSPENDED:
+        await revoke_user_tokens(db, user_id)
+        await revocation_store.revoke_user(user_id)
+    else:
+        await revocation_store.restore_user(user_id)
+
+
 # === الطلبات ===
 
 @router.get("/requests", response_model=PaginatedRequests)
@@ -55,7 +72,7 @@ async def get_all_requests(
     search: Optional[str] = Query(default=None, description="بحث بالاسم أو الهاتف"),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """عرض جميع الطلبات مع الفلترة"""
@@ -99,7 +116,7 @@ async def get_all_requests(
 @router.get("/requests/{request_id}", response_model=RequestDetailResponse)
 async def get_request_detail(
     request_id: UUID,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تفاصيل طلب محدد"""
@@ -130,42 +147,58 @@ async def get_request_detail(
 async def update_request(
     request_id: UUID,
     body: RequestAdminUpdate,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث طلب من الإدارة"""
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    request = result.scalar_one_or_none()
-    
-    if not request:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    if body.status is not None:
-        request.status = body.status
-        if body.status == RequestStatus.COMPLETED:
-            request.completed_at = datetime.now(timezone.utc)
-    
+    values = {}
     if body.priority_score is not None:
-        request.priority_score = body.priority_score
+        values["priority_score"] = body.priority_score
+        values["priority_pinned"] = True
     
     if body.is_urgent is not None:
-        request.is_urgent = 1 if body.is_urgent else 0
+        values["is_urgent"] = 1 if body.is_urgent else 0
     
     if body.admin_notes is not None:
-        request.admin_notes = body.admin_notes
+        values["admin_notes"] = body.admin_notes
+    
+    if body.status is not None:
+        request = await set_request_status(db, request_id, body.status, **values)
+    else:
+        result = await db.execute(
+            select(Request).where(Request.id == request_id)
+        )
+        request = result.scalar_one_or_none()
+        
+        if not request:
+            raise HTTPException(status_code=404, detail="الطلب غير موجود")
+        
+        for field, value in values.items():
+            setattr(request, field, value)
     
     await db.commit()
-    await db.refresh(request)
     
     return {"message": "تم تحديث الطلب", "data": RequestResponse.model_validate(request)}
 
 
+@router.get("/requests/{request_id}/timeline")
+async def get_request_timeline(
+    request_id: UUID,
+    principal: Principal = Depends(get_admin_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """الخط الزمني للطلب - كل انتقال ومدة المرحلة التي انتهت به"""
+    events = await request_timeline(db, request_id)
+    if events is None:
+        raise HTTPException(status_code=404, detail="الطلب غير موجود")
+    
+    return {"data": {"request_id": str(request_id), "events": events}}
+
+
 @router.delete("/requests/{request_id}")
 async def delete_request(
     request_id: UUID,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف طلب"""
@@ -187,7 +220,7 @@ async def delete_request(
 
 @router.get("/stats/overview")
 async def get_overview_stats(
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات عامة"""
@@ -243,7 +276,7 @@ async def get_overview_stats(
 @router.get("/stats/daily")
 async def get_daily_stats(
     days: int = Query(default=7, ge=1, le=90),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات يومية"""
@@ -267,7 +300,7 @@ async def get_daily_stats(
 
 @router.get("/stats/by-region")
 async def get_regional_stats(
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات حسب المنطقة"""
@@ -298,7 +331,7 @@ async def get_regional_stats(
 
 @router.get("/stats/organizations")
 async def get_organization_stats(
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات المؤسسات"""
@@ -327,6 +360,76 @@ async def get_organization_stats(
     return {"data": orgs}
 
 
+@router.get("/stats/sla")
+async def get_sla_stats(
+    principal: Principal = Depends(get_admin_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """تصعيدات SLA القائمة - ما تجاوز مهلته ولم يتغير بعد (تحدثها مهمة sla_sweep)"""
+    result = await db.execute(
+        select(Request.status, func.count(Request.id))
+        .where(Request.escalated_status == Request.status)
+        .group_by(Request.status)
+    )
+    escalated = dict(result.all())
+    
+    # التعهدات المصعّدة (طلب ASSIGNED) والتكفلات المصعّدة في التنفيذ
+    result = await db.execute(
+        select(Assignment.status, func.count(Assignment.id))
+        .where(
+            Assignment.status.in_([AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS]),
+            Assignment.escalated_at.is_not(None),
+        )
+        .group_by(Assignment.status)
+    )
+    assignments = dict(result.all())
+    
+    return {
+        "data": {
+            SLAStage.REVIEW.value: escalated.get(RequestStatus.PENDING, 0),
+            SLAStage.UNASSIGNED.value: escalated.get(RequestStatus.NEW, 0),
+            SLAStage.ASSIGNED.value: assignments.get(AssignmentStatus.PLEDGED, 0),
+            SLAStage.DELIVERY.value: assignments.get(AssignmentStatus.IN_PROGRESS, 0),
+        }
+    }
+
+
+@router.get("/stats/funnel")
+async def get_funnel_stats(
+    group_by: str = Query(default="region", pattern="^(region|category)$"),
+    days: int = Query(default=30, ge=1, le=365),
+    category: Optional[RequestCategory] = Query(default=None),
+    region: Optional[str] = Query(default=None),
+    principal: Principal = Depends(get_admin_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """مدة بقاء الطلبات في كل مرحلة (p50/p90/p99 بالساعات) حسب المنطقة أو التصنيف"""
+    conditions = []
+    if category:
+        conditions.append(RequestEvent.category == category)
+    if region:
+        conditions.append(RequestEvent.region == region)
+    
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    stages = await stage_funnel(db, group_by, since, *conditions)
+    
+    return {"data": {"group_by": group_by, "days": days, "stages": stages}}
+
+
+# === الخريطة ===
+
+@router.get("/map/clusters")
+async def get_map_clusters(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    principal: Principal = Depends(get_admin_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """تجميع الطلبات في خلايا للنافذة المعروضة (العدد حسب الحالة والتصنيف والمستعجل)"""
+    precision, clusters = await get_clusters(db, parse_bbox(bbox), zoom)
+    return {"data": {"zoom": zoom, "precision": precision, "clusters": clusters}}
+
+
 # === إدارة المؤسسات ===
 
 @router.get("/organizations")
@@ -334,7 +437,7 @@ async def get_organizations(
     status: Optional[str] = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة المؤسسات"""
@@ -356,14 +459,6 @@ async def get_organizations(
     result = await db.execute(query)
     rows = result.all()
     
-    # مزامنة حالة المستخدم مع حالة المؤسسة للمؤسسات النشطة (معالجة بيانات قديمة)
-    for o, _ in rows:
-        if o.status == OrganizationStatus.ACTIVE:
-            u = (await db.execute(select(User).where(User.id == o.user_id))).scalar_one_or_none()
-            if u and u.status != UserStatus.ACTIVE:
-                u.status = UserStatus.ACTIVE
-    await db.commit()
-    
     return {
         "items": [
             {
@@ -387,7 +482,7 @@ async def get_organizations(
 @router.post("/organizations", response_model=OrganizationCreatedResponse, status_code=201)
 async def create_organization(
     body: OrganizationCreateRequest,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إنشاء مؤسسة جديدة (نفس نمط إنشاء المراقب - توليد كود دخول)"""
@@ -428,7 +523,7 @@ async def create_organization(
     # إنشاء المستخدم
     user = User(
         email=email,
-        password_hash=hash_password(access_code),
+        password_hash=await hash_password_async(access_code),
         access_code=access_code,
         full_name=body.name,
         phone=phone,
@@ -453,7 +548,6 @@ async def create_organization(
     
     db.add(org)
     await db.commit()
-    await db.refresh(org)
     
     return OrganizationCreatedResponse(
         message="تم إنشاء المؤسسة بنجاح",
@@ -476,7 +570,7 @@ async def create_organization(
 async def regenerate_organization_code(
     org_id: UUID,
     custom_code: Optional[str] = Body(None, embed=True),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إعادة توليد كود دخول المؤسسة أو تعيين كود مخصص"""
@@ -510,7 +604,7 @@ async def regenerate_organization_code(
     else:
         access_code = generate_strong_code()
     
-    user.password_hash = hash_password(access_code)
+    user.password_hash = await hash_password_async(access_code)
     user.access_code = access_code
     
     await db.commit()
@@ -524,7 +618,7 @@ async def regenerate_organization_code(
 @router.delete("/organizations/{org_id}")
 async def delete_organization(
     org_id: UUID,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف مؤسسة"""
@@ -536,15 +630,8 @@ async def delete_organization(
     if not org:
         raise HTTPException(status_code=404, detail="المؤسسة غير موجودة")
     
-    # حذف التكفلات المرتبطة
-    await db.execute(
-        select(Assignment).where(Assignment.org_id == org_id)
-    )
-    assignments_result = await db.execute(
-        select(Assignment).where(Assignment.org_id == org_id)
-    )
-    for assignment in assignments_result.scalars().all():
-        await db.delete(assignment)
+    # حذف التكفلات المرتبطة (حذف جماعي يُطرح من عدادات الطلبات)
+    await delete_assignments(db, Assignment.org_id == org_id)
     
     # حذف المستخدم المرتبط
     user_result = await db.execute(
@@ -555,6 +642,7 @@ async def delete_organization(
     await db.delete(org)
     if user:
         await db.delete(user)
+        await revocation_store.revoke_user(user.id)
     
     await db.commit()
     
@@ -565,7 +653,7 @@ async def delete_organization(
 async def update_organization_status(
     org_id: UUID,
     status: str,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث حالة المؤسسة وحساب المستخدم معاً (ليتطابق الدخول مع لوحة الإدارة)"""
@@ -589,6 +677,7 @@ async def update_organization_status(
             user.status = UserStatus.ACTIVE
         elif status == "suspended":
             user.status = UserStatus.SUSPENDED
+        await _sync_token_access(db, user.id, user.status)
     
     await db.commit()
     
@@ -600,7 +689,7 @@ async def update_organization_status(
 @router.post("/inspectors", response_model=InspectorCreatedResponse, status_code=201)
 async def create_inspector(
     body: InspectorCreateRequest,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إنشاء حساب مراقب جديد"""
@@ -628,7 +717,7 @@ async def create_inspector(
     # إنشاء المستخدم
     user = User(
         email=temp_email,
-        password_hash=hash_password(access_code),
+        password_hash=await hash_password_async(access_code),
         access_code=access_code,
         full_name=body.full_name,
         phone=phone,
@@ -638,7 +727,6 @@ async def create_inspector(
     
     db.add(user)
     await db.commit()
-    await db.refresh(user)
     
     return InspectorCreatedResponse(
         message="تم إنشاء حساب المراقب بنجاح",
@@ -660,7 +748,7 @@ async def get_inspectors(
     status: Optional[str] = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة المراقبين"""
@@ -701,7 +789,7 @@ async def get_inspectors(
 async def update_inspector_status(
     inspector_id: UUID,
     status: str,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تعطيل/تفعيل مراقب"""
@@ -714,6 +802,7 @@ async def update_inspector_status(
         raise HTTPException(status_code=404, detail="المراقب غير موجود")
     
     inspector.status = UserStatus(status)
+    await _sync_token_access(db, inspector.id, inspector.status)
     await db.commit()
     
     return {"message": "تم تحديث حالة المراقب"}
@@ -723,7 +812,7 @@ async def update_inspector_status(
 async def regenerate_inspector_code(
     inspector_id: UUID,
     custom_code: Optional[str] = Body(None, embed=True),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إعادة توليد كود دخول المراقب أو تعيين كود مخصص"""
@@ -748,7 +837,7 @@ async def regenerate_inspector_code(
     else:
         access_code = generate_strong_code()
     
-    inspector.password_hash = hash_password(access_code)
+    inspector.password_hash = await hash_password_async(access_code)
     inspector.access_code = access_code
     
     await db.commit()
@@ -762,7 +851,7 @@ async def regenerate_inspector_code(
 @router.delete("/inspectors/{inspector_id}")
 async def delete_inspector(
     inspector_id: UUID,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف مراقب"""
@@ -775,6 +864,7 @@ async def delete_inspector(
         raise HTTPException(status_code=404, detail="المراقب غير موجود")
     
     await db.delete(inspector)
+    await revocation_store.revoke_user(inspector.id)
     await db.commit()
     
     return {"message": "تم حذف المراقب"}
@@ -788,7 +878,7 @@ async def get_citizens(
     search: Optional[str] = Query(default=None, description="بحث بالاسم أو الهاتف"),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة المواطنين مع عدد الطلبات والمراقب المسؤول"""
@@ -814,33 +904,46 @@ async def get_citizens(
     result = await db.execute(query)
     citizens = result.scalars().all()
     
-    # بناء الاستجابة مع البيانات الإضافية
-    items = []
-    for citizen in citizens:
-        # عدد الطلبات
-        req_count_result = await db.execute(
-            select(func.count(Request.id)).where(Request.user_id == citizen.id)
+    citizen_ids = [c.id for c in citizens]
+    request_counts = {}
+    supervisors = {}
+    if citizen_ids:
+        # عدد الطلبات لكل مواطن
+        counts_result = await db.execute(
+            select(Request.user_id, func.count(Request.id))
+            .where(Request.user_id.in_(citizen_ids))
+            .group_by(Request.user_id)
         )
-        total_requests = req_count_result.scalar() or 0
+        request_counts = dict(counts_result.all())
         
-        # المراقب المسؤول (أول من فعّل طلباً لهذا المواطن)
-        supervisor_result = await db.execute(
-            select(Request.inspector_id)
+        # المراقب المسؤول (أول من فعّل طلباً لكل مواطن) مع اسمه
+        ranked = (
+            select(
+                Request.user_id,
+                Request.inspector_id,
+                func.row_number().over(
+                    partition_by=Request.user_id,
+                    order_by=Request.created_at,
+                ).label("rn"),
+            )
             .where(
-                Request.user_id == citizen.id,
+                Request.user_id.in_(citizen_ids),
                 Request.inspector_id.is_not(None),
             )
-            .order_by(Request.created_at)
-            .limit(1)
+            .subquery()
         )
-        supervisor_id_val = supervisor_result.scalar_one_or_none()
-        
-        supervisor_name = None
-        if supervisor_id_val:
-            sup_user_result = await db.execute(
-                select(User.full_name).where(User.id == supervisor_id_val)
-            )
-            supervisor_name = sup_user_result.scalar_one_or_none()
+        supervisor_result = await db.execute(
+            select(ranked.c.user_id, ranked.c.inspector_id, User.full_name)
+            .outerjoin(User, User.id == ranked.c.inspector_id)
+            .where(ranked.c.rn == 1)
+        )
+        supervisors = {row[0]: (row[1], row[2]) for row in supervisor_result.all()}
+    
+    # بناء الاستجابة مع البيانات الإضافية
+    items = []
+    for citizen in citizens:
+        total_requests = request_counts.get(citizen.id, 0)
+        supervisor_id_val, supervisor_name = supervisors.get(citizen.id, (None, None))
         
         items.append(CitizenResponse(
             id=str(citizen.id),
@@ -869,7 +972,7 @@ async def get_citizens(
 async def update_citizen_status(
     citizen_id: UUID,
     status: str = Query(..., description="الحالة الجديدة (active/suspended)"),
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تغيير حالة مواطن"""
@@ -882,6 +985,7 @@ async def update_citizen_status(
         raise HTTPException(status_code=404, detail="المواطن غير موجود")
     
     citizen.status = UserStatus(status)
+    await _sync_token_access(db, citizen.id, citizen.status)
     await db.commit()
     
     return {"message": f"تم تحديث حالة المواطن إلى {status}"}
@@ -890,7 +994,7 @@ async def update_citizen_status(
 @router.delete("/citizens/{citizen_id}")
 async def delete_citizen(
     citizen_id: UUID,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف مواطن"""
@@ -902,20 +1006,14 @@ async def delete_citizen(
     if not citizen:
         raise HTTPException(status_code=404, detail="المواطن غير موجود")
     
-    # حذف الطلبات المرتبطة بالمواطن
-    requests_result = await db.execute(
-        select(Request).where(Request.user_id == citizen_id)
-    )
-    for req in requests_result.scalars().all():
-        # حذف التكفلات المرتبطة بالطلب
-        assignments_result = await db.execute(
-            select(Assignment).where(Assignment.request_id == req.id)
-        )
-        for assignment in assignments_result.scalars().all():
-            await db.delete(assignment)
-        await db.delete(req)
+    # حذف التكفلات ثم الطلبات المرتبطة بالمواطن (حذف جماعي)
+    citizen_requests = select(Request.id).where(Request.user_id == citizen_id)
+    await delete_assignments(db, Assignment.request_id.in_(citizen_requests))
+    deleted = await db.execute(delete(Request).where(Request.user_id == citizen_id).returning(Request.geohash))
+    mark_changed(db, deleted.scalars().all())
     
     await db.delete(citizen)
+    await revocation_store.revoke_user(citizen.id)
     await db.commit()
     
     return {"message": "تم حذف المواطن"}
@@ -928,7 +1026,7 @@ async def get_admins(
     status: Optional[str] = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_superadmin),
+    principal: Principal = Depends(get_superadmin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة المشرفين (متاح للمدير العام فقط)"""
@@ -971,7 +1069,7 @@ async def create_admin(
     email: str = Query(..., description="البريد الإلكتروني"),
     password: str = Query(..., description="كلمة المرور"),
     phone: Optional[str] = Query(default=None, description="رقم الهاتف"),
-    current_user: User = Depends(get_current_superadmin),
+    principal: Principal = Depends(get_superadmin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إنشاء حساب مشرف جديد (متاح للمدير العام فقط)"""
@@ -1001,7 +1099,7 @@ async def create_admin(
     # إنشاء المشرف
     user = User(
         email=email_lower,
-        password_hash=hash_password(password),
+        password_hash=await hash_password_async(password),
         full_name=full_name.strip(),
         phone=phone,
         role=UserRole.ADMIN,
@@ -1010,7 +1108,6 @@ async def create_admin(
     
     db.add(user)
     await db.commit()
-    await db.refresh(user)
     
     return {
         "message": "تم إنشاء حساب المشرف بنجاح",
@@ -1030,7 +1127,7 @@ async def create_admin(
 async def update_admin_status(
     admin_id: UUID,
     status: str = Query(..., description="الحالة الجديدة (active/suspended)"),
-    current_user: User = Depends(get_current_superadmin),
+    principal: Principal = Depends(get_superadmin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تعطيل/تفعيل مشرف (متاح للمدير العام فقط)"""
@@ -1043,6 +1140,7 @@ async def update_admin_status(
         raise HTTPException(status_code=404, detail="المشرف غير موجود")
     
     admin.status = UserStatus(status)
+    await _sync_token_access(db, admin.id, admin.status)
     await db.commit()
     
     return {"message": f"تم تحديث حالة المشرف إلى {status}"}
@@ -1051,7 +1149,7 @@ async def update_admin_status(
 @router.delete("/admins/{admin_id}")
 async def delete_admin(
     admin_id: UUID,
-    current_user: User = Depends(get_current_superadmin),
+    principal: Principal = Depends(get_superadmin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف مشرف (متاح للمدير العام فقط)"""
@@ -1064,10 +1162,11 @@ async def delete_admin(
         raise HTTPException(status_code=404, detail="المشرف غير موجود")
     
     # لا يمكن حذف نفسك
-    if admin.id == current_user.id:
+    if admin.id == principal.user_id:
         raise HTTPException(status_code=400, detail="لا يمكنك حذف حسابك الخاص")
     
     await db.delete(admin)
+    await revocation_store.revoke_user(admin.id)
     await db.commit()
     
     return {"message": "تم حذف المشرف"}
@@ -1078,7 +1177,7 @@ async def delete_admin(
 @router.post("/org-access")
 async def manage_org_phone_access(
     body: OrgAccessRequest,
-    current_user: User = Depends(get_current_admin),
+    principal: Principal = Depends(get_admin_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """السماح/منع جمعية من رؤية رقم الهاتف"""
@@ -4,23 +4,28 @@
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request as HTTPRequest
 
+from app.config import settings
 from app.database import get_db
+from app.api.deps import Principal, get_principal
 from app.models.user import User
-from app.models.organization import Organization
 from app.schemas.auth import (
     LoginRequest,
     LoginResponse,
     RegisterRequest,
     RegisterResponse,
+    TokenRefreshRequest,
     TokenRefreshResponse,
+    LogoutRequest,
     UserResponse,
     UserProfileResponse,
     UpdateProfileRequest,
     ChangePasswordRequest,
+    OTPSendRequest,
+    OTPSendResponse,
     PhoneRegisterRequest,
     PhoneRegisterResponse,
     InspectorLoginResponse,
@@ -29,20 +34,23 @@ from app.schemas.auth import (
 from app.schemas.inspector import InspectorLoginRequest
 from app.schemas.organization import OrgLoginRequest
 from app.core.security import (
-    verify_password,
-    hash_password,
-    create_access_token,
-    decode_token,
+    verify_password_async,
+    hash_password_async,
 )
 from app.core.constants import UserRole, UserStatus
+from app.core.rate_limit import enforce_rate_limit
+from app.core.revocation import revocation_store
+from app.services.org_directory import get_org, get_user_org
+from app.services.otp_service import otp_service
+from app.services.token_service import issue_tokens, revoke_session, rotate_refresh_token
 
 router = APIRouter(prefix="/auth", tags=["المصادقة - Authentication"])
-security = HTTPBearer()
 
 
 @router.post("/register", response_model=RegisterResponse, status_code=201)
 async def register(
     body: RegisterRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -51,6 +59,8 @@ async def register(
     - متاح للجميع
     - يُنشئ حساب بدور "مواطن"
     """
+    await enforce_rate_limit("register", request, phone=body.phone, email=body.email)
+    
     # التحقق من عدم وجود البريد مسبقاً
     result = await db.execute(
         select(User).where(User.email == body.email.lower())
@@ -78,7 +88,7 @@ async def register(
     # إنشاء المستخدم
     user = User(
         email=body.email.lower(),
-        password_hash=hash_password(body.password),
+        password_hash=await hash_password_async(body.password),
         full_name=body.full_name,
         phone=body.phone,
         address=body.address,
@@ -89,19 +99,13 @@ async def register(
     )
     
     db.add(user)
+    
+    # إنشاء التوكنات (مع الحساب في نفس المعاملة)
+    tokens = await issue_tokens(db, user)
     await db.commit()
-    await db.refresh(user)
-    
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": None,
-        }
-    )
     
     return RegisterResponse(
+        **tokens.model_dump(),
         message="تم إنشاء الحساب بنجاح. يمكنك الآن تقديم طلباتك.",
         user=UserResponse(
             id=str(user.id),
@@ -110,13 +114,13 @@ async def register(
             phone=user.phone,
             role=user.role,
         ),
-        access_token=access_token,
     )
 
 
 @router.post("/unified-login", response_model=LoginResponse)
 async def unified_login(
     body: UnifiedLoginRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -127,6 +131,7 @@ async def unified_login(
     - يوجه المستخدم حسب دوره
     """
     if body.is_email():
+        await enforce_rate_limit("login", request, email=body.identifier)
         # البحث بالبريد الإلكتروني
         result = await db.execute(
             select(User).where(User.email == body.identifier.lower())
@@ -135,12 +140,13 @@ async def unified_login(
     else:
         # البحث برقم الهاتف (تنظيف الرقم أولاً)
         phone = body.get_clean_phone()
+        await enforce_rate_limit("login", request, phone=phone)
         result = await db.execute(
             select(User).where(User.phone == phone)
         )
         user = result.scalar_one_or_none()
     
-    if not user or not verify_password(body.password, user.password_hash):
+    if not user or not await verify_password_async(body.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="بيانات الدخول غير صحيحة",
@@ -152,33 +158,22 @@ async def unified_login(
             detail="الحساب معطل",
         )
     
-    # تحديث وقت آخر دخول
-    user.last_login = datetime.now(timezone.utc)
-    await db.commit()
-    
     # الحصول على بيانات المؤسسة إن وجدت
     org_id = None
     org_name = None
     if user.role.value == "organization":
-        org_result = await db.execute(
-            select(Organization).where(Organization.user_id == user.id)
-        )
-        org = org_result.scalar_one_or_none()
+        org = await get_user_org(user.id)
         if org:
             org_id = str(org.id)
             org_name = org.name
     
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": org_id,
-        }
-    )
+    # تحديث وقت آخر دخول وإنشاء التوكنات
+    user.last_login = datetime.now(timezone.utc)
+    tokens = await issue_tokens(db, user, org_id)
+    await db.commit()
     
     return LoginResponse(
-        access_token=access_token,
+        **tokens.model_dump(),
         user=UserResponse(
             id=str(user.id),
             email=user.email,
@@ -194,16 +189,19 @@ async def unified_login(
 @router.post("/login", response_model=LoginResponse)
 async def login(
     body: LoginRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """تسجيل الدخول لجميع المستخدمين"""
+    await enforce_rate_limit("login", request, email=body.email)
+    
     # البحث عن المستخدم
     result = await db.execute(
         select(User).where(User.email == body.email.lower())
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(body.password, user.password_hash):
+    if not user or not await verify_password_async(body.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="البريد الإلكتروني أو كلمة المرور غير صحيحة",
@@ -215,33 +213,22 @@ async def login(
             detail="الحساب معطل",
         )
     
-    # تحديث وقت آخر دخول
-    user.last_login = datetime.now(timezone.utc)
-    await db.commit()
-    
     # الحصول على بيانات المؤسسة إن وجدت
     org_id = None
     org_name = None
     if user.role.value == "organization":
-        org_result = await db.execute(
-            select(Organization).where(Organization.user_id == user.id)
-        )
-        org = org_result.scalar_one_or_none()
+        org = await get_user_org(user.id)
         if org:
             org_id = str(org.id)
             org_name = org.name
     
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": org_id,
-        }
-    )
+    # تحديث وقت آخر دخول وإنشاء التوكنات
+    user.last_login = datetime.now(timezone.utc)
+    tokens = await issue_tokens(db, user, org_id)
+    await db.commit()
     
     return LoginResponse(
-        access_token=access_token,
+        **tokens.model_dump(),
         user=UserResponse(
             id=str(user.id),
             email=user.email,
@@ -254,14 +241,37 @@ async def login(
     )
 
 
+@router.post("/otp/send", response_model=OTPSendResponse)
+async def send_otp(
+    body: OTPSendRequest,
+    request: HTTPRequest,
+):
+    """
+    إرسال رمز التحقق إلى الهاتف
+    
+    - رسالة واحدة كل OTP_COOLDOWN_SECONDS لنفس الرقم
+    - لا يلمس قاعدة البيانات (Redis فقط)
+    """
+    await enforce_rate_limit("otp_send", request, phone=body.phone)
+    
+    expires_in = await otp_service.send(body.phone)
+    
+    return OTPSendResponse(
+        expires_in=expires_in,
+        retry_after=settings.OTP_COOLDOWN_SECONDS,
+    )
+
+
 @router.post("/phone-register", response_model=PhoneRegisterResponse, status_code=201)
 async def phone_register(
     body: PhoneRegisterRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
-    تسجيل مواطن برقم الهاتف فقط (مؤقت - بدون OTP)
+    تسجيل مواطن برقم الهاتف بعد التحقق برمز OTP (انظر /auth/otp/send)
     
+    - الرمز يُتحقق منه في Redis قبل أي استعلام لقاعدة البيانات
     - إذا كان رقم الهاتف موجوداً، يتم تسجيل الدخول مباشرة
     - إذا كان جديداً، يتم إنشاء حساب جديد
     """
@@ -270,6 +280,9 @@ async def phone_register(
     # تنظيف رقم الهاتف
     phone = body.phone.replace(' ', '').replace('-', '')
     
+    await enforce_rate_limit("phone_register", request, phone=phone)
+    await otp_service.verify(phone, body.code)
+    
     # البحث عن مستخدم بنفس رقم الهاتف
     result = await db.execute(
         select(User).where(User.phone == phone)
@@ -287,7 +300,6 @@ async def phone_register(
             )
         # تحديث وقت آخر دخول
         user.last_login = datetime.now(timezone.utc)
-        await db.commit()
     else:
         # إنشاء مستخدم جديد
         is_new = True
@@ -297,7 +309,7 @@ async def phone_register(
         
         user = User(
             email=temp_email,
-            password_hash=hash_password(secrets.token_urlsafe(32)),  # كلمة مرور عشوائية
+            password_hash=await hash_password_async(secrets.token_urlsafe(32)),  # كلمة مرور عشوائية
             full_name=body.full_name or f"مواطن {phone[-4:]}",
             phone=phone,
             role=UserRole.CITIZEN,
@@ -305,19 +317,13 @@ async def phone_register(
         )
         
         db.add(user)
-        await db.commit()
-        await db.refresh(user)
-    
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": None,
-        }
-    )
+    
+    # إنشاء التوكنات
+    tokens = await issue_tokens(db, user)
+    await db.commit()
     
     return PhoneRegisterResponse(
+        **tokens.model_dump(),
         message="تم التسجيل بنجاح" if is_new else "تم تسجيل الدخول بنجاح",
         user=UserResponse(
             id=str(user.id),
@@ -326,81 +332,60 @@ async def phone_register(
             phone=user.phone,
             role=user.role,
         ),
-        access_token=access_token,
         is_new_user=is_new,
     )
 
 
 @router.post("/refresh", response_model=TokenRefreshResponse)
 async def refresh_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    body: TokenRefreshRequest,
     db: AsyncSession = Depends(get_db),
 ):
-    """تحديث رمز الوصول"""
-    payload = decode_token(credentials.credentials)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="رمز غير صالح",
-        )
+    """
+    تحديث رمز الوصول برمز التحديث
     
-    # التحقق من المستخدم
-    result = await db.execute(
-        select(User).where(User.id == payload.get("sub"))
-    )
-    user = result.scalar_one_or_none()
+    - يُرجع رمز تحديث جديداً ويُبطل المستعمل (تدوير)
+    - إعادة استعمال رمز قديم تُبطل جميع رموز الجلسة
+    """
+    tokens = await rotate_refresh_token(db, body.refresh_token)
+    await db.commit()
     
-    if not user or user.status.value != "active":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="المستخدم غير موجود أو معطل",
-        )
+    return TokenRefreshResponse(**tokens.model_dump())
+
+
+@router.post("/logout")
+async def logout(
+    body: LogoutRequest,
+    principal: Principal = Depends(get_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    تسجيل الخروج
     
-    # إنشاء توكن جديد
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": payload.get("org_id"),
-        }
-    )
+    - يُبطل توكن الوصول الحالي فوراً
+    - مع رمز التحديث تُبطل الجلسة كلها (لا تجديد بعدها)
+    """
+    if body.refresh_token:
+        await revoke_session(db, body.refresh_token, principal.user_id)
+    await revocation_store.revoke_token(principal.token_id, principal.expires_at)
+    await db.commit()
     
-    return TokenRefreshResponse(access_token=access_token)
+    return {"message": "تم تسجيل الخروج"}
 
 
 @router.get("/me", response_model=UserProfileResponse)
 async def get_me(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    principal: Principal = Depends(get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """الحصول على بيانات المستخدم الحالي"""
-    payload = decode_token(credentials.credentials)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="رمز غير صالح",
-        )
+    user = await principal.load_user(db)
     
-    result = await db.execute(
-        select(User).where(User.id == payload.get("sub"))
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="المستخدم غير موجود",
-        )
-    
-    org_id = payload.get("org_id")
+    org_id = str(principal.org_id) if principal.org_id else None
     org_name = None
-    if org_id:
-        org_result = await db.execute(
-            select(Organization).where(Organization.id == org_id)
-        )
-        org = org_result.scalar_one_or_none()
-        if org:
-            org_name = org.name
+    if principal.org_id:
+        org = await get_org(principal.org_id)
+        org_name = org.name if org else None
     
     return UserProfileResponse(
         id=str(user.id),
@@ -419,27 +404,11 @@ async def get_me(
 @router.patch("/me", response_model=UserProfileResponse)
 async def update_profile(
     body: UpdateProfileRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    principal: Principal = Depends(get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث الملف الشخصي"""
-    payload = decode_token(credentials.credentials)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="رمز غير صالح",
-        )
-    
-    result = await db.execute(
-        select(User).where(User.id == payload.get("sub"))
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="المستخدم غير موجود",
-        )
+    user = await principal.load_user(db)
     
     # تحديث الحقول المُرسلة فقط
     if body.full_name is not None:
@@ -463,17 +432,12 @@ async def update_profile(
         user.region = body.region
     
     await db.commit()
-    await db.refresh(user)
     
-    org_id = payload.get("org_id")
+    org_id = str(principal.org_id) if principal.org_id else None
     org_name = None
-    if org_id:
-        org_result = await db.execute(
-            select(Organization).where(Organization.id == org_id)
-        )
-        org = org_result.scalar_one_or_none()
-        if org:
-            org_name = org.name
+    if principal.org_id:
+        org = await get_org(principal.org_id)
+        org_name = org.name if org else None
     
     return UserProfileResponse(
         id=str(user.id),
@@ -492,6 +456,7 @@ async def update_profile(
 @router.post("/inspector-login", response_model=InspectorLoginResponse)
 async def inspector_login(
     body: InspectorLoginRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -502,13 +467,15 @@ async def inspector_login(
     # تنظيف رقم الهاتف
     phone = body.phone.replace(' ', '').replace('-', '')
     
+    await enforce_rate_limit("login", request, phone=phone)
+    
     # البحث عن المراقب بالهاتف
     result = await db.execute(
         select(User).where(User.phone == phone, User.role == UserRole.INSPECTOR)
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(body.code, user.password_hash):
+    if not user or not await verify_password_async(body.code, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="رقم الهاتف أو كود الدخول غير صحيح",
@@ -520,21 +487,13 @@ async def inspector_login(
             detail="الحساب معطل",
         )
     
-    # تحديث وقت آخر دخول
+    # تحديث وقت آخر دخول وإنشاء التوكنات
     user.last_login = datetime.now(timezone.utc)
+    tokens = await issue_tokens(db, user)
     await db.commit()
     
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": None,
-        }
-    )
-    
     return InspectorLoginResponse(
-        access_token=access_token,
+        **tokens.model_dump(),
         user=UserResponse(
             id=str(user.id),
             email=user.email,
@@ -548,6 +507,7 @@ async def inspector_login(
 @router.post("/org-login", response_model=LoginResponse)
 async def org_login(
     body: OrgLoginRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -558,13 +518,15 @@ async def org_login(
     # تنظيف رقم الهاتف
     phone = body.phone.replace(' ', '').replace('-', '')
     
+    await enforce_rate_limit("login", request, phone=phone)
+    
     # البحث عن المؤسسة بالهاتف
     result = await db.execute(
         select(User).where(User.phone == phone, User.role == UserRole.ORGANIZATION)
     )
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(body.code, user.password_hash):
+    if not user or not await verify_password_async(body.code, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="رقم الهاتف أو كود الدخول غير صحيح",
@@ -576,32 +538,21 @@ async def org_login(
             detail="الحساب معطل",
         )
     
-    # تحديث وقت آخر دخول
-    user.last_login = datetime.now(timezone.utc)
-    await db.commit()
-    
     # الحصول على بيانات المؤسسة
     org_id = None
     org_name = None
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == user.id)
-    )
-    org = org_result.scalar_one_or_none()
+    org = await get_user_org(user.id)
     if org:
         org_id = str(org.id)
         org_name = org.name
     
-    # إنشاء التوكن
-    access_token = create_access_token(
-        data={
-            "sub": str(user.id),
-            "role": user.role.value,
-            "org_id": org_id,
-        }
-    )
+    # تحديث وقت آخر دخول وإنشاء التوكنات
+    user.last_login = datetime.now(timezone.utc)
+    tokens = await issue_tokens(db, user, org_id)
+    await db.commit()
     
     return LoginResponse(
-        access_token=access_token,
+        **tokens.model_dump(),
         user=UserResponse(
             id=str(user.id),
             email=user.email,
@@ -617,35 +568,19 @@ async def org_login(
 @router.post("/change-password")
 async def change_password(
     body: ChangePasswordRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    principal: Principal = Depends(get_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تغيير كلمة المرور"""
-    payload = decode_token(credentials.credentials)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="رمز غير صالح",
-        )
-    
-    result = await db.execute(
-        select(User).where(User.id == payload.get("sub"))
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="المستخدم غير موجود",
-        )
+    user = await principal.load_user(db)
     
-    if not verify_password(body.current_password, user.password_hash):
+    if not await verify_password_async(body.current_password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="كلمة المرور الحالية غير صحيحة",
         )
     
-    user.password_hash = hash_password(body.new_password)
+    user.password_hash = await hash_password_async(body.new_password)
     await db.commit()
     
     return {"message": "تم تغيير كلمة المرور بنجاح"}
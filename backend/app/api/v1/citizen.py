@@ -1,7 +1,6 @@
 """
 واجهة المواطنين - إدارة الطلبات الشخصية
 """
-import hashlib
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
@@ -9,47 +8,27 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request as HTTPRequest
 
 from app.database import get_db
-from app.api.deps import get_current_citizen
+from app.api.deps import Principal, get_citizen_principal
 from app.models.request import Request
-from app.models.assignment import Assignment
-from app.models.organization import Organization
-from app.models.user import User
 from app.schemas.request import (
     RequestResponse,
     PaginatedRequests,
 )
-from app.core.constants import RequestStatus, RequestCategory, CATEGORY_WEIGHTS, AssignmentStatus
+from app.core.constants import RequestStatus, RequestCategory
+from app.core.rate_limit import enforce_rate_limit
+from app.core.security import generate_tracking_code
+from app.services.dedup import flag_duplicate
+from app.services.org_directory import get_organization_names
+from app.services.priority_service import calculate_priority
+from app.services.workflow import add_request, transition_request
 
 
 router = APIRouter(prefix="/citizen", tags=["المواطنون - Citizens"])
 
 
-def generate_tracking_code(request_id: UUID) -> str:
-    """توليد رمز متابعة قصير"""
-    hash_obj = hashlib.sha256(str(request_id).encode())
-    return hash_obj.hexdigest()[:8].upper()
-
-
-def calculate_priority(category: RequestCategory, family_members: int, is_urgent: bool) -> int:
-    """حساب نقاط الأولوية"""
-    score = 50
-    score += CATEGORY_WEIGHTS.get(category, 0)
-    
-    if family_members >= 6:
-        score += 15
-    elif family_members >= 4:
-        score += 10
-    elif family_members >= 2:
-        score += 5
-    
-    if is_urgent:
-        score += 20
-    
-    return min(score, 100)
-
-
 def parse_images(images_json: Optional[str]) -> Optional[list[str]]:
     """تحويل الصور من JSON إلى قائمة"""
     import json
@@ -158,7 +137,8 @@ class CitizenRequestStats(BaseModel):
 @router.post("/requests", response_model=CitizenRequestCreatedResponse, status_code=201)
 async def create_request(
     body: CitizenRequestCreate,
-    current_user: User = Depends(get_current_citizen),
+    http_request: HTTPRequest,
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -169,20 +149,22 @@ async def create_request(
     """
     import json
     
+    await enforce_rate_limit("requests_create", http_request, user_id=str(principal.user_id), by_ip=False)
+    
+    # بيانات الملف الشخصي (الاسم والهاتف والعنوان) - تحميل المستخدم هنا فقط
+    current_user = await principal.load_user(db)
+    
     # استخدام عنوان المستخدم إذا لم يُحدد (العنوان اختياري الآن)
     address = body.address or current_user.address
     city = body.city or current_user.city
     region = body.region or current_user.region
     
-    # حساب الأولوية
-    priority = calculate_priority(body.category, body.family_members, body.is_urgent)
-    
     # تحويل قائمة الصور إلى JSON string للتخزين
     images_json = json.dumps(body.images) if body.images else None
     
     # إنشاء الطلب
     request = Request(
-        user_id=current_user.id,
+        user_id=principal.user_id,
         requester_name=current_user.full_name,
         requester_phone=current_user.phone,
         category=body.category,
@@ -196,14 +178,15 @@ async def create_request(
         longitude=body.longitude,
         audio_url=body.audio_url,
         images=images_json,
-        priority_score=priority,
         is_urgent=1 if body.is_urgent else 0,
         status=RequestStatus.PENDING,
     )
+    request.priority_score = calculate_priority(request)
+    # قبل db.add: وإلا يجد الاستعلامُ الطلبَ نفسه بعد autoflush
+    await flag_duplicate(db, request)
     
-    db.add(request)
+    await add_request(db, request)
     await db.commit()
-    await db.refresh(request)
     
     tracking_code = generate_tracking_code(request.id)
     
@@ -217,13 +200,13 @@ async def create_request(
 @router.get("/requests", response_model=List[CitizenRequestResponse])
 async def get_my_requests(
     status: Optional[RequestStatus] = Query(default=None, description="تصفية حسب الحالة"),
-    current_user: User = Depends(get_current_citizen),
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
     عرض جميع طلباتي
     """
-    query = select(Request).where(Request.user_id == current_user.id)
+    query = select(Request).where(Request.user_id == principal.user_id)
     
     if status:
         query = query.where(Request.status == status)
@@ -234,25 +217,10 @@ async def get_my_requests(
     requests = result.scalars().all()
     
     # تجهيز الاستجابة مع أسماء المؤسسات
+    org_names = await get_organization_names(db, [req.id for req in requests])
+    
     responses = []
     for req in requests:
-        # الحصول على المؤسسة المتكفلة
-        org_name = None
-        assignment_result = await db.execute(
-            select(Assignment).where(
-                Assignment.request_id == req.id,
-                Assignment.status != AssignmentStatus.FAILED
-            )
-        )
-        assignment = assignment_result.scalar_one_or_none()
-        if assignment:
-            org_result = await db.execute(
-                select(Organization).where(Organization.id == assignment.org_id)
-            )
-            org = org_result.scalar_one_or_none()
-            if org:
-                org_name = org.name
-        
         responses.append(CitizenRequestResponse(
             id=req.id,
             tracking_code=generate_tracking_code(req.id),
@@ -273,7 +241,7 @@ async def get_my_requests(
             created_at=req.created_at,
             updated_at=req.updated_at,
             completed_at=req.completed_at,
-            organization_name=org_name,
+            organization_name=org_names.get(req.id),
         ))
     
     return responses
@@ -282,7 +250,7 @@ async def get_my_requests(
 @router.get("/requests/{request_id}", response_model=CitizenRequestResponse)
 async def get_request_detail(
     request_id: UUID,
-    current_user: User = Depends(get_current_citizen),
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -291,7 +259,7 @@ async def get_request_detail(
     result = await db.execute(
         select(Request).where(
             Request.id == request_id,
-            Request.user_id == current_user.id
+            Request.user_id == principal.user_id
         )
     )
     request = result.scalar_one_or_none()
@@ -303,21 +271,7 @@ async def get_request_detail(
         )
     
     # الحصول على المؤسسة المتكفلة
-    org_name = None
-    assignment_result = await db.execute(
-        select(Assignment).where(
-            Assignment.request_id == request.id,
-            Assignment.status != AssignmentStatus.FAILED
-        )
-    )
-    assignment = assignment_result.scalar_one_or_none()
-    if assignment:
-        org_result = await db.execute(
-            select(Organization).where(Organization.id == assignment.org_id)
-        )
-        org = org_result.scalar_one_or_none()
-        if org:
-            org_name = org.name
+    org_name = (await get_organization_names(db, [request.id])).get(request.id)
     
     return CitizenRequestResponse(
         id=request.id,
@@ -347,7 +301,7 @@ async def get_request_detail(
 async def update_request(
     request_id: UUID,
     body: CitizenRequestUpdate,
-    current_user: User = Depends(get_current_citizen),
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -356,7 +310,7 @@ async def update_request(
     result = await db.execute(
         select(Request).where(
             Request.id == request_id,
-            Request.user_id == current_user.id
+            Request.user_id == principal.user_id
         )
     )
     request = result.scalar_one_or_none()
@@ -393,15 +347,11 @@ async def update_request(
         request.images = json.dumps(body.images)
     if body.is_urgent is not None:
         request.is_urgent = 1 if body.is_urgent else 0
-        # إعادة حساب الأولوية
-        request.priority_score = calculate_priority(
-            request.category,
-            request.family_members,
-            body.is_urgent
-        )
+        # إعادة حساب الأولوية (إلا إن ضبطها المدير يدوياً)
+        if not request.priority_pinned:
+            request.priority_score = calculate_priority(request)
     
     await db.commit()
-    await db.refresh(request)
     
     return CitizenRequestResponse(
         id=request.id,
@@ -430,33 +380,16 @@ async def update_request(
 @router.delete("/requests/{request_id}")
 async def cancel_request(
     request_id: UUID,
-    current_user: User = Depends(get_current_citizen),
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
     إلغاء طلب (فقط إذا كان في حالة 'جديد')
     """
-    result = await db.execute(
-        select(Request).where(
-            Request.id == request_id,
-            Request.user_id == current_user.id
-        )
+    await transition_request(
+        db, request_id, RequestStatus.CANCELLED, Request.user_id == principal.user_id,
+        sources=[RequestStatus.PENDING, RequestStatus.NEW], detail="لا يمكن إلغاء الطلب بعد التكفل به",
     )
-    request = result.scalar_one_or_none()
-    
-    if not request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="الطلب غير موجود",
-        )
-    
-    if request.status not in (RequestStatus.PENDING, RequestStatus.NEW):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="لا يمكن إلغاء الطلب بعد التكفل به",
-        )
-    
-    request.status = RequestStatus.CANCELLED
     await db.commit()
     
     return {"message": "تم إلغاء الطلب بنجاح"}
@@ -464,30 +397,20 @@ async def cancel_request(
 
 @router.get("/stats", response_model=CitizenRequestStats)
 async def get_my_stats(
-    current_user: User = Depends(get_current_citizen),
+    principal: Principal = Depends(get_citizen_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """
     إحصائيات طلباتي
     """
-    # العدد الإجمالي
-    total_result = await db.execute(
-        select(func.count(Request.id)).where(Request.user_id == current_user.id)
+    # حسب الحالة (استعلام واحد) - الإجمالي مجموعها
+    status_result = await db.execute(
+        select(Request.status, func.count(Request.id))
+        .where(Request.user_id == principal.user_id)
+        .group_by(Request.status)
     )
-    total = total_result.scalar() or 0
-    
-    # حسب الحالة
-    status_counts = {}
-    for s in RequestStatus:
-        count_result = await db.execute(
-            select(func.count(Request.id)).where(
-                Request.user_id == current_user.id,
-                Request.status == s
-            )
-        )
-        count = count_result.scalar() or 0
-        if count > 0:
-            status_counts[s.value] = count
+    status_counts = {row[0].value: row[1] for row in status_result.all()}
+    total = sum(status_counts.values())
     
     return CitizenRequestStats(
         total_requests=total,
@@ -10,11 +10,10 @@ from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.api.deps import get_current_inspector
+from app.api.deps import Principal, get_geo_filter, get_inspector_principal
 from app.models.request import Request
 from app.models.assignment import Assignment
 from app.models.organization import Organization
-from app.models.user import User
 from app.schemas.request import RequestResponse, PaginatedRequests
 from app.schemas.inspector import (
     InspectorRequestUpdate,
@@ -24,9 +23,19 @@ from app.schemas.inspector import (
     InspectorRejectRequest,
     InspectorRequestResponse,
     InspectorStatsResponse,
+    AssignmentPlanRequest,
+    AssignmentPlanCommit,
 )
 from app.schemas.organization import InspectorAssignOrgRequest, PhoneCountResponse
-from app.core.constants import RequestStatus, RequestCategory, AssignmentStatus, OrganizationStatus
+from app.core.constants import RequestStatus, RequestCategory, AssignmentStatus
+from app.core.geo import bbox_condition, parse_bbox
+from app.services.assignment_optimizer import apply_plan, plan_assignments
+from app.services.map_clusters import MAX_ZOOM, get_clusters
+from app.services.matching import MATCHABLE_STATUSES, match_queue, match_request
+from app.services.notifications import notify_request
+from app.services.org_directory import active_orgs, get_org
+from app.services.request_events import request_timeline
+from app.services.workflow import add_assignment, approve_pledge, set_request_status, transition_request
 
 router = APIRouter(prefix="/inspector", tags=["المراقب - Inspector"])
 
@@ -41,12 +50,15 @@ async def get_requests(
     is_urgent: Optional[bool] = Query(default=None),
     search: Optional[str] = Query(default=None, description="بحث بالاسم أو الهاتف"),
     mine_only: Optional[bool] = Query(default=None, description="عرض الطلبات المسندة لي فقط"),
+    escalated: Optional[bool] = Query(default=None, description="الطلبات التي تجاوزت مهلة SLA"),
+    suspected_duplicate: Optional[bool] = Query(default=None, description="الطلبات المشتبه بتكرارها"),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
-    current_user: User = Depends(get_current_inspector),
+    geo=Depends(get_geo_filter),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    """عرض الطلبات مع الفلترة وعدد التعهدات"""
+    """عرض الطلبات مع الفلترة (بما فيها الموقع: near/bbox) وعدد التعهدات"""
     query = select(Request)
     
     # الفلاتر
@@ -64,7 +76,16 @@ async def get_requests(
             (Request.requester_phone.ilike(f"%{search}%"))
         )
     if mine_only:
-        query = query.where(Request.inspector_id == current_user.id)
+        query = query.where(Request.inspector_id == principal.user_id)
+    if escalated is not None:
+        is_escalated = Request.escalated_status == Request.status
+        query = query.where(is_escalated if escalated else Request.escalated_status.is_distinct_from(Request.status))
+    if suspected_duplicate is not None:
+        query = query.where(
+            Request.duplicate_of_id.is_not(None) if suspected_duplicate else Request.duplicate_of_id.is_(None)
+        )
+    if geo is not None:
+        query = query.where(geo)
     
     # العدد الإجمالي
     count_query = select(func.count()).select_from(query.subquery())
@@ -85,19 +106,13 @@ async def get_requests(
     result = await db.execute(query)
     requests = result.scalars().all()
     
-    # إضافة عدد التعهدات لكل طلب
     items = []
     for r in requests:
-        pledge_count_result = await db.execute(
-            select(func.count(Assignment.id)).where(
-                Assignment.request_id == r.id,
-                Assignment.status == AssignmentStatus.PLEDGED,
-            )
-        )
-        pledge_count = pledge_count_result.scalar() or 0
-        
         req_data = RequestResponse.model_validate(r).model_dump()
-        req_data["pledge_count"] = pledge_count
+        req_data["pledge_count"] = r.pledge_count
+        # اشتباه التكرار للمراقب فقط (لا يظهر للجمعيات)
+        req_data["duplicate_of_id"] = r.duplicate_of_id
+        req_data["duplicate_score"] = r.duplicate_score
         items.append(req_data)
     
     return {
@@ -112,7 +127,7 @@ async def get_requests(
 @router.get("/requests/{request_id}", response_model=InspectorRequestResponse)
 async def get_request_detail(
     request_id: UUID,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تفاصيل طلب محدد"""
@@ -127,36 +142,37 @@ async def get_request_detail(
     return InspectorRequestResponse.model_validate(req)
 
 
+@router.get("/requests/{request_id}/timeline")
+async def get_request_timeline(
+    request_id: UUID,
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """الخط الزمني للطلب - كل انتقال ومدة المرحلة التي انتهت به"""
+    events = await request_timeline(db, request_id)
+    if events is None:
+        raise HTTPException(status_code=404, detail="الطلب غير موجود")
+    
+    return {"data": {"request_id": str(request_id), "events": events}}
+
+
 @router.patch("/requests/{request_id}/activate")
 async def activate_request(
     request_id: UUID,
     body: Optional[InspectorRequestUpdate] = None,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تفعيل طلب (معلق → جديد)"""
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    req = result.scalar_one_or_none()
-    
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    if req.status != RequestStatus.PENDING:
-        raise HTTPException(
-            status_code=400,
-            detail="يمكن تفعيل الطلبات المعلقة فقط"
-        )
-    
-    req.status = RequestStatus.NEW
-    req.inspector_id = current_user.id
-    
+    values = {"inspector_id": principal.user_id}
     if body and body.inspector_notes is not None:
-        req.inspector_notes = body.inspector_notes
+        values["inspector_notes"] = body.inspector_notes
     
+    req = await transition_request(
+        db, request_id, RequestStatus.NEW,
+        sources=[RequestStatus.PENDING], detail="يمكن تفعيل الطلبات المعلقة فقط", **values,
+    )
     await db.commit()
-    await db.refresh(req)
     
     return {"message": "تم تفعيل الطلب بنجاح", "data": RequestResponse.model_validate(req)}
 
@@ -165,32 +181,19 @@ async def activate_request(
 async def reject_request(
     request_id: UUID,
     body: Optional[InspectorRejectRequest] = None,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """رفض طلب (معلق → مرفوض)"""
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    req = result.scalar_one_or_none()
-    
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    if req.status != RequestStatus.PENDING:
-        raise HTTPException(
-            status_code=400,
-            detail="يمكن رفض الطلبات المعلقة فقط"
-        )
-    
-    req.status = RequestStatus.REJECTED
-    req.inspector_id = current_user.id
-    
+    values = {"inspector_id": principal.user_id}
     if body and body.reason:
-        req.inspector_notes = body.reason
+        values["inspector_notes"] = body.reason
     
+    req = await transition_request(
+        db, request_id, RequestStatus.REJECTED,
+        sources=[RequestStatus.PENDING], detail="يمكن رفض الطلبات المعلقة فقط", **values,
+    )
     await db.commit()
-    await db.refresh(req)
     
     return {"message": "تم رفض الطلب", "data": RequestResponse.model_validate(req)}
 
@@ -199,36 +202,17 @@ async def reject_request(
 async def assign_request_to_org(
     request_id: UUID,
     body: InspectorAssignRequest,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """ربط طلب بجمعية"""
-    # التحقق من وجود الطلب
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    req = result.scalar_one_or_none()
-    
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    # يمكن الربط من حالة pending أو new
-    if req.status not in (RequestStatus.PENDING, RequestStatus.NEW):
-        raise HTTPException(
-            status_code=400,
-            detail="يمكن ربط الطلبات المعلقة أو الجديدة فقط بجمعية"
-        )
-    
     # التحقق من وجود الجمعية
-    org_result = await db.execute(
-        select(Organization).where(Organization.id == body.organization_id)
-    )
-    org = org_result.scalar_one_or_none()
+    org = await get_org(body.organization_id)
     
     if not org:
         raise HTTPException(status_code=404, detail="الجمعية غير موجودة")
     
-    if org.status != OrganizationStatus.ACTIVE:
+    if not org.is_active:
         raise HTTPException(status_code=400, detail="الجمعية غير نشطة")
     
     # التحقق من عدم وجود تكفل نشط
@@ -241,19 +225,13 @@ async def assign_request_to_org(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="هذا الطلب مرتبط بجمعية بالفعل")
     
-    # إنشاء التكفل
-    assignment = Assignment(
-        request_id=request_id,
-        org_id=org.id,
-        status=AssignmentStatus.PLEDGED,
-        notes=body.notes,
+    # تحديث حالة الطلب (يمكن الربط من حالة pending أو new) ثم إنشاء التكفل
+    await transition_request(
+        db, request_id, RequestStatus.ASSIGNED,
+        sources=MATCHABLE_STATUSES, detail="يمكن ربط الطلبات المعلقة أو الجديدة فقط بجمعية",
+        context={"org": org.name}, inspector_id=principal.user_id,
     )
-    db.add(assignment)
-    
-    # تحديث حالة الطلب
-    req.status = RequestStatus.ASSIGNED
-    req.inspector_id = current_user.id
-    
+    await add_assignment(db, request_id, org.id, notes=body.notes)
     await db.commit()
     
     return {"message": f"تم ربط الطلب بجمعية {org.name} بنجاح"}
@@ -263,7 +241,7 @@ async def assign_request_to_org(
 async def update_request_notes(
     request_id: UUID,
     body: InspectorRequestUpdate,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث ملاحظات المراقب على الطلب"""
@@ -280,10 +258,9 @@ async def update_request_notes(
     
     # ربط المراقب بالطلب إن لم يكن مربوطاً
     if not req.inspector_id:
-        req.inspector_id = current_user.id
+        req.inspector_id = principal.user_id
     
     await db.commit()
-    await db.refresh(req)
     
     return {"message": "تم تحديث الملاحظات", "data": RequestResponse.model_validate(req)}
 
@@ -292,7 +269,7 @@ async def update_request_notes(
 async def edit_request_data(
     request_id: UUID,
     body: InspectorRequestDataUpdate,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحرير بيانات الطلب من طرف المراقب"""
@@ -314,12 +291,11 @@ async def edit_request_data(
     
     # ربط المراقب بالطلب إن لم يكن مربوطاً
     if not req.inspector_id:
-        req.inspector_id = current_user.id
+        req.inspector_id = principal.user_id
     
     req.updated_at = datetime.now(timezone.utc)
     
     await db.commit()
-    await db.refresh(req)
     
     return {"message": "تم تحديث بيانات الطلب بنجاح", "data": RequestResponse.model_validate(req)}
 
@@ -328,31 +304,33 @@ async def edit_request_data(
 async def update_request_status(
     request_id: UUID,
     body: InspectorRequestStatusUpdate,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث حالة الطلب وأهميته"""
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    req = result.scalar_one_or_none()
-    
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
+    values = {}
+    if body.is_urgent is not None:
+        values["is_urgent"] = body.is_urgent
     
     if body.status is not None:
-        req.status = body.status
-        # ربط المراقب بالطلب عند تغيير الحالة
-        if not req.inspector_id:
-            req.inspector_id = current_user.id
-        if body.status == RequestStatus.COMPLETED:
-            req.completed_at = datetime.now(timezone.utc)
-    
-    if body.is_urgent is not None:
-        req.is_urgent = body.is_urgent
+        # ربط المراقب بالطلب عند تغيير الحالة (إن لم يكن مربوطاً)
+        req = await set_request_status(
+            db, request_id, body.status,
+            inspector_id=func.coalesce(Request.inspector_id, principal.user_id), **values,
+        )
+    else:
+        result = await db.execute(
+            select(Request).where(Request.id == request_id)
+        )
+        req = result.scalar_one_or_none()
+        
+        if not req:
+            raise HTTPException(status_code=404, detail="الطلب غير موجود")
+        
+        for field, value in values.items():
+            setattr(req, field, value)
     
     await db.commit()
-    await db.refresh(req)
     
     return {"message": "تم تحديث الطلب بنجاح", "data": RequestResponse.model_validate(req)}
 
@@ -360,7 +338,7 @@ async def update_request_status(
 @router.delete("/requests/{request_id}")
 async def delete_request(
     request_id: UUID,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """حذف طلب"""
@@ -391,36 +369,17 @@ async def delete_request(
 async def assign_request_to_org_with_access(
     request_id: UUID,
     body: InspectorAssignOrgRequest,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إضافة مواطن لجمعية مع التحكم بخصوصية الهاتف"""
-    # التحقق من وجود الطلب
-    result = await db.execute(
-        select(Request).where(Request.id == request_id)
-    )
-    req = result.scalar_one_or_none()
-    
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    # يمكن الربط من حالة pending أو new
-    if req.status not in (RequestStatus.PENDING, RequestStatus.NEW):
-        raise HTTPException(
-            status_code=400,
-            detail="يمكن ربط الطلبات المعلقة أو الجديدة فقط بجمعية"
-        )
-    
     # التحقق من وجود الجمعية
-    org_result = await db.execute(
-        select(Organization).where(Organization.id == body.organization_id)
-    )
-    org = org_result.scalar_one_or_none()
+    org = await get_org(body.organization_id)
     
     if not org:
         raise HTTPException(status_code=404, detail="الجمعية غير موجودة")
     
-    if org.status != OrganizationStatus.ACTIVE:
+    if not org.is_active:
         raise HTTPException(status_code=400, detail="الجمعية غير نشطة")
     
     # التحقق من عدم وجود تكفل نشط
@@ -433,22 +392,17 @@ async def assign_request_to_org_with_access(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="هذا الطلب مرتبط بجمعية بالفعل")
     
-    # إنشاء التكفل مع خصوصية الهاتف
-    assignment = Assignment(
-        request_id=request_id,
-        org_id=org.id,
-        status=AssignmentStatus.PLEDGED,
+    # تحديث حالة الطلب (يمكن الربط من حالة pending أو new) ثم إنشاء التكفل مع خصوصية الهاتف
+    await transition_request(
+        db, request_id, RequestStatus.ASSIGNED,
+        sources=MATCHABLE_STATUSES, detail="يمكن ربط الطلبات المعلقة أو الجديدة فقط بجمعية",
+        context={"org": org.name}, inspector_id=principal.user_id,
+    )
+    await add_assignment(
+        db, request_id, org.id,
         notes=body.notes,
         allow_phone_access=body.allow_phone_access or False,
     )
-    db.add(assignment)
-    
-    # تحديث حالة الطلب
-    if req.status == RequestStatus.PENDING:
-        req.status = RequestStatus.NEW
-    req.status = RequestStatus.ASSIGNED
-    req.inspector_id = current_user.id
-    
     await db.commit()
     
     return {"message": f"تم ربط الطلب بجمعية {org.name} بنجاح"}
@@ -457,7 +411,7 @@ async def assign_request_to_org_with_access(
 @router.get("/phone-count", response_model=PhoneCountResponse)
 async def get_phone_request_count(
     phone: str = Query(..., description="رقم الهاتف للبحث"),
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """عدد الطلبات لرقم هاتف معين"""
@@ -476,7 +430,7 @@ async def get_phone_request_count(
 
 @router.get("/stats", response_model=InspectorStatsResponse)
 async def get_stats(
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات المراقب"""
@@ -488,7 +442,7 @@ async def get_stats(
     # الطلبات التي راجعها هذا المراقب
     my_reviewed = await db.execute(
         select(Request.status, func.count(Request.id))
-        .where(Request.inspector_id == current_user.id)
+        .where(Request.inspector_id == principal.user_id)
         .group_by(Request.status)
     )
     reviewed_by_status = {row[0].value: row[1] for row in my_reviewed.all()}
@@ -507,12 +461,26 @@ async def get_stats(
     )
 
 
+# === الخريطة ===
+
+@router.get("/map/clusters")
+async def get_map_clusters(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """تجميع الطلبات في خلايا للنافذة المعروضة (نفس بيانات خريطة الإدارة)"""
+    precision, clusters = await get_clusters(db, parse_bbox(bbox), zoom)
+    return {"data": {"zoom": zoom, "precision": precision, "clusters": clusters}}
+
+
 # === التعهدات والموافقة ===
 
 @router.get("/requests/{request_id}/pledges")
 async def get_request_pledges(
     request_id: UUID,
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة المؤسسات المتعهدة بطلب معين"""
@@ -580,61 +548,32 @@ async def approve_organization_for_request(
     show_citizen_phone: bool = Query(default=False, description="إظهار رقم المواطن للمؤسسة"),
     contact_name: Optional[str] = Query(default=None, description="اسم التواصل البديل"),
     contact_phone: Optional[str] = Query(default=None, description="رقم التواصل البديل"),
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """الموافقة على مؤسسة لطلب معين"""
-    # التحقق من الطلب
-    req_result = await db.execute(
-        select(Request).where(Request.id == request_id)
+    inspector = await principal.load_user(db)
+    
+    # الموافقة على هذا التعهد ورفض جميع التعهدات الأخرى لنفس الطلب
+    assignment = await approve_pledge(
+        db, assignment_id, request_id, "تمت الموافقة على مؤسسة أخرى",
+        allow_phone_access=show_citizen_phone,
+        contact_name=contact_name.strip() if contact_name else None,
+        contact_phone=contact_phone.strip() if contact_phone else None,
+        inspector_phone=inspector.phone,  # رقم المراقب
     )
-    req = req_result.scalar_one_or_none()
-    if not req:
-        raise HTTPException(status_code=404, detail="الطلب غير موجود")
-    
-    if req.status != RequestStatus.NEW:
-        raise HTTPException(status_code=400, detail="الطلب ليس في حالة تسمح بالموافقة (يجب أن يكون مفعّلاً)")
-    
-    # التحقق من التعهد
-    assignment_result = await db.execute(
-        select(Assignment).where(
-            Assignment.id == assignment_id,
-            Assignment.request_id == request_id,
-            Assignment.status == AssignmentStatus.PLEDGED,
-        )
-    )
-    assignment = assignment_result.scalar_one_or_none()
-    if not assignment:
-        raise HTTPException(status_code=404, detail="التعهد غير موجود أو تم معالجته مسبقاً")
-    
-    # الموافقة على هذا التعهد
-    assignment.status = AssignmentStatus.IN_PROGRESS
-    assignment.allow_phone_access = show_citizen_phone
-    assignment.contact_name = contact_name.strip() if contact_name else None
-    assignment.contact_phone = contact_phone.strip() if contact_phone else None
-    assignment.inspector_phone = current_user.phone  # رقم المراقب
-    
-    # رفض جميع التعهدات الأخرى لنفس الطلب
-    other_pledges = await db.execute(
-        select(Assignment).where(
-            Assignment.request_id == request_id,
-            Assignment.id != assignment_id,
-            Assignment.status == AssignmentStatus.PLEDGED,
-        )
-    )
-    for other in other_pledges.scalars().all():
-        other.status = AssignmentStatus.FAILED
-        other.failure_reason = "تمت الموافقة على مؤسسة أخرى"
-    
-    # تحديث حالة الطلب
-    req.status = RequestStatus.ASSIGNED
-    req.inspector_id = current_user.id
     
     # اسم المؤسسة المعتمدة
-    org_result = await db.execute(
-        select(Organization).where(Organization.id == assignment.org_id)
+    org = await get_org(assignment.org_id)
+    
+    # تحديث حالة الطلب (وإشعار المواطن) - في نفس المعاملة
+    req = await transition_request(
+        db, request_id, RequestStatus.ASSIGNED,
+        sources=[RequestStatus.NEW], detail="الطلب ليس في حالة تسمح بالموافقة (يجب أن يكون مفعّلاً)",
+        context={"org": org.name}, inspector_id=principal.user_id,
     )
-    org = org_result.scalar_one_or_none()
+    if org.contact_phone:
+        notify_request(db, req, "assignment_approved", recipient=org.contact_phone)
     
     await db.commit()
     
@@ -644,20 +583,67 @@ async def approve_organization_for_request(
     }
 
 
+# === توزيع دفعات الطلبات ===
+
+@router.post("/assignments/plan")
+async def plan_bulk_assignments(
+    body: AssignmentPlanRequest,
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """خطة مقترحة لتوزيع الطلبات المفتوحة على الجمعيات حسب سعتها (لا تُنفذ شيئاً)"""
+    conditions = []
+    if body.categories:
+        conditions.append(Request.category.in_(body.categories))
+    if body.city:
+        conditions.append(Request.city == body.city)
+    if body.region:
+        conditions.append(Request.region == body.region)
+    if body.urgent_only:
+        conditions.append(Request.is_urgent == 1)
+    if body.bbox:
+        conditions.append(bbox_condition(Request.geohash, Request.latitude, Request.longitude, parse_bbox(body.bbox)))
+
+    return {"data": await plan_assignments(db, conditions, body.limit, body.capacities)}
+
+
+@router.post("/assignments/plan/commit")
+async def commit_bulk_assignments(
+    body: AssignmentPlanCommit,
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """اعتماد خطة توزيع: تعهد لكل طلب ما زال مفتوحاً، والباقي يُعاد في skipped"""
+    assigned, skipped = await apply_plan(
+        db,
+        [(item.request_id, item.organization_id) for item in body.assignments],
+        principal.user_id,
+        body.notes,
+    )
+    await db.commit()
+
+    return {
+        "message": f"تم ربط {assigned} طلب بالجمعيات",
+        "assigned": assigned,
+        "skipped": [str(request_id) for request_id in skipped],
+    }
+
+
 # === الجمعيات المتاحة ===
 
 @router.get("/organizations")
 async def get_available_organizations(
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة الجمعيات النشطة"""
-    result = await db.execute(
-        select(Organization)
-        .where(Organization.status == OrganizationStatus.ACTIVE)
-        .order_by(Organization.name)
+    orgs = await active_orgs()
+    # العدادات تتغير مع كل إتمام - تُقرأ من الجدول لا من الدليل (استعلام واحد)
+    completed_result = await db.execute(
+        select(Organization.id, Organization.total_completed)
+        .where(Organization.id.in_([o.id for o in orgs]))
     )
-    orgs = result.scalars().all()
+    completed = dict(completed_result.all())
     
     return {
         "items": [
@@ -666,59 +652,85 @@ async def get_available_organizations(
                 "name": o.name,
                 "contact_phone": o.contact_phone,
                 "contact_email": o.contact_email,
-                "service_types": o.service_types,
-                "coverage_areas": o.coverage_areas,
-                "total_completed": o.total_completed,
+                "service_types": list(o.service_types),
+                "coverage_areas": list(o.coverage_areas),
+                "total_completed": completed.get(o.id) or 0,
             }
             for o in orgs
         ]
     }
 
 
+@router.get("/requests/{request_id}/matches")
+async def get_request_matches(
+    request_id: UUID,
+    limit: int = Query(default=5, ge=1, le=50),
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """الجمعيات الأنسب لطلب (التصنيف، التغطية، المسافة، العبء، نسبة الإتمام)"""
+    result = await db.execute(select(Request).where(Request.id == request_id))
+    req = result.scalar_one_or_none()
+    if not req:
+        raise HTTPException(status_code=404, detail="الطلب غير موجود")
+    if req.status not in MATCHABLE_STATUSES:
+        raise HTTPException(status_code=400, detail="يمكن مطابقة الطلبات المعلقة أو الجديدة فقط")
+
+    return {"data": {"request_id": str(req.id), "matches": await match_request(db, req, limit)}}
+
+
+@router.get("/matches")
+async def get_queue_matches(
+    limit: int = Query(default=50, ge=1, le=200, description="عدد الطلبات من الطابور"),
+    top: int = Query(default=3, ge=1, le=20, description="عدد الجمعيات لكل طلب"),
+    principal: Principal = Depends(get_inspector_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """مطابقة دفعة: أفضل الجمعيات لكل طلب معلق أو جديد، الأعلى أولوية أولاً"""
+    return {"items": await match_queue(db, limit, top)}
+
+
 @router.get("/organizations/details")
 async def get_organizations_with_assignments(
-    current_user: User = Depends(get_current_inspector),
+    principal: Principal = Depends(get_inspector_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة الجمعيات مع تكفلاتها النشطة"""
-    # جلب جميع المؤسسات النشطة
-    orgs_result = await db.execute(
-        select(Organization)
-        .where(Organization.status == OrganizationStatus.ACTIVE)
-        .order_by(Organization.name)
-    )
-    orgs = orgs_result.scalars().all()
-    
-    items = []
-    for org in orgs:
-        # جلب التكفلات النشطة (pledged + in_progress) مع تفاصيل الطلب
+    # جميع المؤسسات النشطة (من دليل الجمعيات)
+    orgs = await active_orgs()
+    org_ids = [org.id for org in orgs]
+    
+    # التكفلات النشطة (pledged + in_progress) مع تفاصيل الطلب - لجميع المؤسسات دفعة واحدة
+    active_by_org = {org_id: [] for org_id in org_ids}
+    completed_by_org = {}
+    failed_by_org = {}
+    if org_ids:
         assignments_result = await db.execute(
             select(Assignment, Request)
             .join(Request, Assignment.request_id == Request.id)
             .where(
-                Assignment.org_id == org.id,
+                Assignment.org_id.in_(org_ids),
                 Assignment.status.in_([AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS])
             )
             .order_by(Assignment.created_at.desc())
         )
-        active_assignments = assignments_result.all()
+        for a, r in assignments_result.all():
+            active_by_org[a.org_id].append((a, r))
         
-        # جلب عدد التكفلات المكتملة والفاشلة
-        completed_count_result = await db.execute(
-            select(func.count(Assignment.id)).where(
-                Assignment.org_id == org.id,
-                Assignment.status == AssignmentStatus.COMPLETED
-            )
+        # عدد التكفلات المكتملة والفاشلة لكل مؤسسة - من عدادات المؤسسة
+        counts_result = await db.execute(
+            select(Organization.id, Organization.total_completed, Organization.failed_count)
+            .where(Organization.id.in_(org_ids))
         )
-        completed_count = completed_count_result.scalar() or 0
-        
-        failed_count_result = await db.execute(
-            select(func.count(Assignment.id)).where(
-                Assignment.org_id == org.id,
-                Assignment.status == AssignmentStatus.FAILED
-            )
-        )
-        failed_count = failed_count_result.scalar() or 0
+        for org_id, completed, failed in counts_result.all():
+            completed_by_org[org_id] = completed or 0
+            failed_by_org[org_id] = failed
+    
+    items = []
+    for org in orgs:
+        active_assignments = active_by_org[org.id]
+        completed_count = completed_by_org.get(org.id, 0)
+        failed_count = failed_by_org.get(org.id, 0)
         
         items.append({
             "id": str(org.id),
@@ -726,8 +738,8 @@ async def get_organizations_with_assignments(
             "description": org.description,
             "contact_phone": org.contact_phone,
             "contact_email": org.contact_email,
-            "service_types": org.service_types or [],
-            "coverage_areas": org.coverage_areas or [],
+            "service_types": list(org.service_types),
+            "coverage_areas": list(org.coverage_areas),
             "total_completed": completed_count,
             "total_failed": failed_count,
             "active_assignments": [
@@ -3,18 +3,17 @@
 """
 from typing import Optional
 from uuid import UUID
-from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.database import get_db
-from app.api.deps import get_current_organization
+from app.api.deps import Principal, get_geo_filter, get_organization_principal
 from app.models.request import Request
 from app.models.assignment import Assignment
 from app.models.organization import Organization
-from app.models.user import User
 from app.schemas.request import RequestResponse, PaginatedRequests
 from app.schemas.assignment import (
     AssignmentCreate,
@@ -24,6 +23,9 @@ from app.schemas.assignment import (
     PaginatedAssignments,
 )
 from app.core.constants import RequestStatus, RequestCategory, AssignmentStatus
+from app.core.geo import parse_near
+from app.services.delivery_routes import plan_batches, route_distance
+from app.services.workflow import add_assignment, transition_assignment, transition_request, transition_requests
 
 router = APIRouter(prefix="/org", tags=["المؤسسات - Organizations"])
 
@@ -34,24 +36,24 @@ router = APIRouter(prefix="/org", tags=["المؤسسات - Organizations"])
 async def get_available_requests(
     category: Optional[RequestCategory] = Query(default=None),
     region: Optional[str] = Query(default=None),
+    is_urgent: Optional[bool] = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=50),
-    current_user: User = Depends(get_current_organization),
+    geo=Depends(get_geo_filter),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
-    """عرض الطلبات المتاحة للتكفل (حالة NEW) مع عدد التعهدات"""
-    # الحصول على المؤسسة الحالية
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
+    """عرض الطلبات المتاحة للتكفل (حالة NEW) مع عدد التعهدات - مع فلترة بالموقع (near/bbox)"""
     query = select(Request).where(Request.status == RequestStatus.NEW)
     
     if category:
         query = query.where(Request.category == category)
     if region:
         query = query.where(Request.region == region)
+    if is_urgent is not None:
+        query = query.where(Request.is_urgent == (1 if is_urgent else 0))
+    if geo is not None:
+        query = query.where(geo)
     
     # العدد الإجمالي
     count_query = select(func.count()).select_from(query.subquery())
@@ -64,33 +66,25 @@ async def get_available_requests(
     result = await db.execute(query)
     requests = result.scalars().all()
     
-    # لكل طلب، جلب عدد التعهدات + هل هذه المؤسسة تعهدت
-    items = []
-    for r in requests:
-        pledge_count_result = await db.execute(
-            select(func.count(Assignment.id)).where(
-                Assignment.request_id == r.id,
+    # هل هذه المؤسسة تعهدت - استعلام واحد لكل الصفحة (عدد التعهدات عداد في الطلب)
+    request_ids = [r.id for r in requests]
+    my_pledged = set()
+    if request_ids:
+        my_pledges = await db.execute(
+            select(Assignment.request_id).where(
+                Assignment.request_id.in_(request_ids),
+                Assignment.org_id == principal.org_id,
                 Assignment.status == AssignmentStatus.PLEDGED,
             )
         )
-        pledge_count = pledge_count_result.scalar() or 0
-        
-        # هل هذه المؤسسة تعهدت بالفعل
-        already_pledged = False
-        if org:
-            my_pledge = await db.execute(
-                select(Assignment.id).where(
-                    Assignment.request_id == r.id,
-                    Assignment.org_id == org.id,
-                    Assignment.status == AssignmentStatus.PLEDGED,
-                )
-            )
-            already_pledged = my_pledge.scalar_one_or_none() is not None
-        
+        my_pledged = set(my_pledges.scalars().all())
+    
+    items = []
+    for r in requests:
         req_data = RequestResponse.model_validate(r).model_dump()
         req_data["requester_phone"] = None  # إخفاء الهاتف عن المؤسسات
-        req_data["pledge_count"] = pledge_count
-        req_data["already_pledged"] = already_pledged
+        req_data["pledge_count"] = r.pledge_count
+        req_data["already_pledged"] = r.id in my_pledged
         items.append(req_data)
     
     return {
@@ -105,7 +99,7 @@ async def get_available_requests(
 @router.get("/requests/{request_id}")
 async def get_request_detail(
     request_id: UUID,
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تفاصيل طلب للتكفل به"""
@@ -125,19 +119,10 @@ async def get_request_detail(
 @router.post("/assignments", response_model=AssignmentResponse, status_code=201)
 async def create_assignment(
     body: AssignmentCreate,
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """التعهد بطلب - ينتظر موافقة المراقب"""
-    # الحصول على المؤسسة
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
-    if not org:
-        raise HTTPException(status_code=403, detail="لم يتم العثور على بيانات المؤسسة")
-    
     # التحقق من الطلب
     request_result = await db.execute(
         select(Request).where(Request.id == body.request_id)
@@ -154,7 +139,7 @@ async def create_assignment(
     existing = await db.execute(
         select(Assignment).where(
             Assignment.request_id == body.request_id,
-            Assignment.org_id == org.id,
+            Assignment.org_id == principal.org_id,
             Assignment.status == AssignmentStatus.PLEDGED,
         )
     )
@@ -162,16 +147,9 @@ async def create_assignment(
         raise HTTPException(status_code=400, detail="لديك تعهد سابق بهذا الطلب")
     
     # إنشاء التعهد (الطلب يبقى NEW - لا يتغير حتى موافقة المراقب)
-    assignment = Assignment(
-        request_id=body.request_id,
-        org_id=org.id,
-        status=AssignmentStatus.PLEDGED,
-        notes=body.notes,
-    )
-    db.add(assignment)
+    assignment = await add_assignment(db, body.request_id, principal.org_id, notes=body.notes)
     
     await db.commit()
-    await db.refresh(assignment)
     
     return AssignmentResponse.model_validate(assignment)
 
@@ -181,20 +159,11 @@ async def get_my_assignments(
     status: Optional[AssignmentStatus] = Query(default=None),
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=50),
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """قائمة تكفلاتي"""
-    # الحصول على المؤسسة
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
-    if not org:
-        raise HTTPException(status_code=403, detail="لم يتم العثور على بيانات المؤسسة")
-    
-    query = select(Assignment).where(Assignment.org_id == org.id)
+    query = select(Assignment).where(Assignment.org_id == principal.org_id)
     
     if status:
         query = query.where(Assignment.status == status)
@@ -217,26 +186,79 @@ async def get_my_assignments(
     )
 
 
+@router.get("/assignments/routes")
+async def get_delivery_routes(
+    max_stops: Optional[int] = Query(default=None, ge=1, le=50, description="أقصى عدد محطات في الدفعة"),
+    start: Optional[str] = Query(default=None, description="نقطة الانطلاق lat,lon"),
+    principal: Principal = Depends(get_organization_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    """تكفلاتي قيد التنفيذ مقسمة إلى دفعات توصيل مرتبة (بدل طلب التفاصيل لكل تكفل)"""
+    origin = parse_near(start) if start else None
+    result = await db.execute(
+        select(Assignment, Request)
+        .join(Request, Assignment.request_id == Request.id)
+        .where(
+            Assignment.org_id == principal.org_id,
+            Assignment.status == AssignmentStatus.IN_PROGRESS,
+        )
+        .order_by(Assignment.created_at)
+        .limit(settings.ROUTE_MAX_ASSIGNMENTS)
+    )
+    rows = result.all()
+
+    def stop(assignment: Assignment, request: Request) -> dict:
+        # نفس خصوصية الهاتف في تفاصيل التكفل
+        citizen_phone = request.requester_phone if assignment.allow_phone_access else None
+        return {
+            "assignment_id": str(assignment.id),
+            "request_id": str(request.id),
+            "category": request.category.value,
+            "quantity": request.quantity,
+            "family_members": request.family_members,
+            "is_urgent": request.is_urgent,
+            "address": request.address,
+            "city": request.city,
+            "latitude": request.latitude,
+            "longitude": request.longitude,
+            "contact": {
+                "name": assignment.contact_name or request.requester_name,
+                "phone": assignment.contact_phone or citizen_phone,
+            },
+        }
+
+    located = [(a, r) for a, r in rows if r.latitude is not None]
+    coordinates = [(r.latitude, r.longitude) for _, r in located]
+    batches = []
+    for indexes in plan_batches(coordinates, max_stops or settings.ROUTE_MAX_STOPS, origin):
+        stops = [stop(*located[i]) for i in indexes]
+        batches.append({
+            "stops": stops,
+            "urgent": sum(1 for s in stops if s["is_urgent"]),
+            "distance_km": round(route_distance([coordinates[i] for i in indexes], origin), 2),
+        })
+    # الدفعات ذات الطلبات المستعجلة أولاً، ثم الأقصر
+    batches.sort(key=lambda batch: (-batch["urgent"], batch["distance_km"]))
+
+    return {
+        "data": {
+            "batches": batches,
+            "unlocated": [stop(a, r) for a, r in rows if r.latitude is None],
+        }
+    }
+
+
 @router.get("/assignments/{assignment_id}")
 async def get_assignment_detail(
     assignment_id: UUID,
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تفاصيل تكفل مع بيانات الطلب"""
-    # الحصول على المؤسسة
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
-    if not org:
-        raise HTTPException(status_code=403, detail="لم يتم العثور على بيانات المؤسسة")
-    
     result = await db.execute(
         select(Assignment).where(
             Assignment.id == assignment_id,
-            Assignment.org_id == org.id,
+            Assignment.org_id == principal.org_id,
         )
     )
     assignment = result.scalar_one_or_none()
@@ -289,67 +311,41 @@ async def get_assignment_detail(
 async def update_assignment(
     assignment_id: UUID,
     body: AssignmentUpdate,
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """تحديث حالة التكفل"""
-    # الحصول على المؤسسة
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
-    if not org:
-        raise HTTPException(status_code=403, detail="لم يتم العثور على بيانات المؤسسة")
-    
-    result = await db.execute(
-        select(Assignment).where(
-            Assignment.id == assignment_id,
-            Assignment.org_id == org.id,
-        )
-    )
-    assignment = result.scalar_one_or_none()
-    
-    if not assignment:
-        raise HTTPException(status_code=404, detail="التكفل غير موجود")
-    
     # المؤسسة لا يمكنها تحويل تعهد إلى IN_PROGRESS (يفعلها المراقب فقط عبر الموافقة)
-    if body.status == AssignmentStatus.IN_PROGRESS and assignment.status == AssignmentStatus.PLEDGED:
+    if body.status == AssignmentStatus.IN_PROGRESS:
         raise HTTPException(status_code=400, detail="لا يمكنك بدء التنفيذ مباشرة - يجب انتظار موافقة المراقب")
     
-    # المؤسسة يمكنها فقط: COMPLETED أو FAILED من IN_PROGRESS
-    if assignment.status == AssignmentStatus.IN_PROGRESS:
-        if body.status not in (AssignmentStatus.COMPLETED, AssignmentStatus.FAILED):
-            raise HTTPException(status_code=400, detail="يمكنك فقط إتمام أو إلغاء التكفل")
-    
-    # تحديث الحالة
-    assignment.status = body.status
-    
+    values = {}
     if body.completion_notes:
-        assignment.completion_notes = body.completion_notes
+        values["completion_notes"] = body.completion_notes
     
     if body.failure_reason:
-        assignment.failure_reason = body.failure_reason
+        values["failure_reason"] = body.failure_reason
     
-    # تحديث حالة الطلب
-    request_result = await db.execute(
-        select(Request).where(Request.id == assignment.request_id)
+    # المؤسسة يمكنها فقط: COMPLETED أو FAILED لتكفل لم ينتهِ (وعدادات الطلب والمؤسسة)
+    assignment = await transition_assignment(
+        db, assignment_id, body.status, Assignment.org_id == principal.org_id,
+        detail="يمكنك فقط إتمام أو إلغاء التكفل", **values,
     )
-    request = request_result.scalar_one_or_none()
     
+    # تحديث حالة الطلب
     if body.status == AssignmentStatus.COMPLETED:
-        assignment.completed_at = datetime.now(timezone.utc)
-        request.status = RequestStatus.COMPLETED
-        request.completed_at = datetime.now(timezone.utc)
-        # تحديث إحصائيات المؤسسة
-        org.total_completed = (org.total_completed or 0) + 1
-        
+        await transition_request(
+            db, assignment.request_id, RequestStatus.COMPLETED,
+            detail="لا يمكن إتمام تعهد لم يعتمده المراقب",
+        )
     elif body.status == AssignmentStatus.FAILED:
-        # إعادة الطلب للحالة الجديدة
-        request.status = RequestStatus.NEW
+        # إعادة الطلب المرتبط للحالة الجديدة (التعهد المنتظر لا يغيره)
+        await transition_requests(
+            db, RequestStatus.NEW, Request.id == assignment.request_id,
+            sources=[RequestStatus.ASSIGNED, RequestStatus.IN_PROGRESS],
+        )
     
     await db.commit()
-    await db.refresh(assignment)
     
     return AssignmentResponse.model_validate(assignment)
 
@@ -358,35 +354,27 @@ async def update_assignment(
 
 @router.get("/stats")
 async def get_my_stats(
-    current_user: User = Depends(get_current_organization),
+    principal: Principal = Depends(get_organization_principal),
     db: AsyncSession = Depends(get_db),
 ):
     """إحصائيات المؤسسة"""
-    org_result = await db.execute(
-        select(Organization).where(Organization.user_id == current_user.id)
-    )
-    org = org_result.scalar_one_or_none()
-    
-    if not org:
-        raise HTTPException(status_code=403, detail="لم يتم العثور على بيانات المؤسسة")
-    
-    # إجمالي التكفلات
-    total = (await db.execute(
-        select(func.count(Assignment.id)).where(Assignment.org_id == org.id)
+    # العداد يتغير مع كل إتمام - يُقرأ من عمود الجمعية لا من الدليل
+    total_completed = (await db.execute(
+        select(Organization.total_completed).where(Organization.id == principal.org_id)
     )).scalar()
     
-    # حسب الحالة
+    # حسب الحالة (والإجمالي مجموعها)
     status_result = await db.execute(
         select(Assignment.status, func.count(Assignment.id))
-        .where(Assignment.org_id == org.id)
+        .where(Assignment.org_id == principal.org_id)
         .group_by(Assignment.status)
     )
     by_status = {row[0].value: row[1] for row in status_result.all()}
     
     return {
         "data": {
-            "total_assignments": total or 0,
+            "total_assignments": sum(by_status.values()),
             "by_status": by_status,
-            "total_completed": org.total_completed or 0,
+            "total_completed": total_completed or 0,
         }
     }
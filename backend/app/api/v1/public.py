@@ -9,16 +9,18 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request as HTTPRequest
 
 from app.database import get_db
 from app.models.request import Request
-from app.models.assignment import Assignment
 from app.models.organization import Organization
 from app.models.user import User
 from app.schemas.request import RequestTrackResponse
 from app.schemas.organization import OrgRegisterRequest
-from app.core.constants import RequestStatus, UserRole, UserStatus, OrganizationStatus, AssignmentStatus
-from app.core.security import hash_password, generate_strong_code
+from app.core.constants import RequestStatus, UserRole, UserStatus, OrganizationStatus
+from app.core.security import hash_password_async, generate_strong_code
+from app.core.rate_limit import enforce_rate_limit
+from app.services.org_directory import get_organization_names
 
 router = APIRouter(prefix="/public", tags=["عام - Public"])
 
@@ -47,6 +49,7 @@ def get_status_arabic(status: RequestStatus) -> str:
 async def track_request(
     tracking_code: str,
     phone: str,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -54,6 +57,8 @@ async def track_request(
     
     - يتطلب رمز المتابعة + رقم الهاتف للتحقق
     """
+    await enforce_rate_limit("track_request", request, phone=phone)
+    
     # البحث عن الطلبات بالهاتف
     result = await db.execute(
         select(Request).where(Request.requester_phone == phone)
@@ -64,23 +69,7 @@ async def track_request(
     for req in requests:
         if generate_tracking_code(req.id) == tracking_code.upper():
             # الحصول على اسم المؤسسة المتكفلة
-            org_name = None
-            
-            assignment_result = await db.execute(
-                select(Assignment).where(
-                    Assignment.request_id == req.id,
-                    Assignment.status != AssignmentStatus.FAILED
-                )
-            )
-            assignment = assignment_result.scalar_one_or_none()
-            
-            if assignment:
-                org_result = await db.execute(
-                    select(Organization).where(Organization.id == assignment.org_id)
-                )
-                org = org_result.scalar_one_or_none()
-                if org:
-                    org_name = org.name
+            org_name = (await get_organization_names(db, [req.id])).get(req.id)
             
             return RequestTrackResponse(
                 id=req.id,
@@ -116,6 +105,7 @@ async def get_categories():
 @router.post("/org-register")
 async def register_organization(
     body: OrgRegisterRequest,
+    request: HTTPRequest,
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -126,6 +116,8 @@ async def register_organization(
     # تنظيف رقم الهاتف
     phone = body.phone.replace(' ', '').replace('-', '')
     
+    await enforce_rate_limit("org_register", request, phone=phone)
+    
     # التحقق من عدم وجود الهاتف مسبقاً
     phone_result = await db.execute(
         select(User).where(User.phone == phone)
@@ -166,7 +158,7 @@ async def register_organization(
     # إنشاء المستخدم بحالة معلقة
     user = User(
         email=email,
-        password_hash=hash_password(access_code),
+        password_hash=await hash_password_async(access_code),
         access_code=access_code,
         full_name=body.responsible_name or body.name,
         phone=phone,
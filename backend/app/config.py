@@ -10,23 +10,47 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "postgresql+asyncpg://igatha:igatha_pass@db:5432/igatha"
+    # نسخة قراءة متماثلة (اختياري) - للمسارات في app/core/constants.py::REPLICA_READ_ROUTES
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DATABASE_REPLICA_STICKY_SECONDS: int = 5  # بعد كتابة المستخدم تُقرأ بياناته من الرئيسية
+
+    # قياس استعلامات SQL لكل طلب
+    SQL_INSTRUMENTATION_ENABLED: bool = False
+    SQL_TIMING_HEADERS: bool = False      # إضافة Server-Timing و X-DB-Queries للاستجابة
+    SQL_SLOW_REQUEST_QUERIES: int = 30    # تسجيل تحذير إن تجاوز الطلب هذا العدد من الاستعلامات
+    SQL_SLOW_REQUEST_MS: float = 500.0    # أو هذا الزمن الإجمالي في قاعدة البيانات
 
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_SOCKET_TIMEOUT: float = 0.5  # ثوانٍ - لا نعلق الطلب إن تعطل Redis
 
     # JWT
     JWT_SECRET_KEY: str = "change-this-to-a-secure-random-string"
     JWT_ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # يوم واحد
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15  # قصير - رمز التحديث يجدده والإبطال يقطعه فوراً
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30    # رمز التحديث يُستبدل عند كل استعمال (app/services/token_service.py)
+
+    # مرشح Bloom محلي أمام قائمة الإبطال في Redis (app/core/revocation.py)
+    # يوفر استدعاء Redis لأغلب الطلبات، مقابل تأخر انتشار الإبطال حتى SYNC_SECONDS
+    TOKEN_REVOCATION_BLOOM: bool = False
+    TOKEN_REVOCATION_BLOOM_BITS: int = 262144     # 32KB - قرابة 27 ألف إبطال بنسبة خطأ 1%
+    TOKEN_REVOCATION_BLOOM_SYNC_SECONDS: float = 1.0
+
+    # مجمع خيوط bcrypt (عدد عمليات التشفير المتزامنة لكل عامل)
+    BCRYPT_POOL_SIZE: int = 4
+
+    # مقاييس Prometheus على /metrics
+    # مع عدة عمال: اضبط متغير البيئة PROMETHEUS_MULTIPROC_DIR على مجلد فارغ
+    METRICS_ENABLED: bool = True
 
-    # OTP Settings
+    # OTP Settings (app/services/otp_service.py - Redis فقط)
     OTP_LENGTH: int = 6
     OTP_EXPIRE_MINUTES: int = 5
     OTP_MAX_ATTEMPTS: int = 3
     OTP_COOLDOWN_SECONDS: int = 60
 
-    # SMS Provider (twilio, console)
-    SMS_PROVIDER: str = "console"
+    # SMS Provider (twilio, console) - إلزامي، وconsole للتطوير فقط (يكتب الرموز في السجل)
+    SMS_PROVIDER: Optional[str] = None
     TWILIO_ACCOUNT_SID: Optional[str] = None
     TWILIO_AUTH_TOKEN: Optional[str] = None
     TWILIO_PHONE_NUMBER: Optional[str] = None
@@ -48,6 +72,68 @@ class Settings(BaseSettings):
     BREVO_FROM_EMAIL: Optional[str] = None
     BREVO_FROM_NAME: str = "KSAR"
 
+    # عمال الإشعارات (app/services/notifications.py) - يعملون داخل كل عامل uvicorn
+    NOTIFICATION_WORKER_ENABLED: bool = True
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_POLL_SECONDS: float = 2.0
+    NOTIFICATION_LEASE_SECONDS: int = 120        # مهلة حجز الدفعة قبل أن يعيدها عامل آخر
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: int = 30    # تأخير أُسّي: 30، 60، 120...
+    NOTIFICATION_SMS_CONCURRENCY: int = 5        # رسائل متزامنة لكل عامل حسب المزود
+    NOTIFICATION_EMAIL_CONCURRENCY: int = 5
+    NOTIFICATION_RETENTION_DAYS: int = 30        # حذف الإشعارات المرسلة الأقدم (مهمة مجدولة)
+
+    # نقاط الأولوية (app/services/priority_service.py) - الأوزان في constants.py
+    PRIORITY_CATEGORY_WEIGHTS: Optional[str] = None  # JSON يتجاوز CATEGORY_WEIGHTS: {"medicine": 30}
+    PRIORITY_URGENT_BONUS: int = 20
+    PRIORITY_AGING_POINTS_PER_DAY: int = 2           # نقاط لكل يوم انتظار كامل
+    PRIORITY_AGING_MAX_POINTS: int = 30
+    PRIORITY_RESCORE_INTERVAL_SECONDS: float = 3600  # إعادة حساب الطلبات المفتوحة (مهمة مجدولة)
+
+    # مهل SLA (app/services/sla_service.py) - المهل حسب التصنيف في constants.py
+    SLA_CHECK_INTERVAL_SECONDS: float = 300
+    SLA_BATCH_SIZE: int = 1000                       # صفوف لكل تحديث (معاملة قصيرة لكل دفعة)
+
+    # خريطة الطلبات (app/services/map_clusters.py) - ملخص لكل خلية geohash
+    MAP_CLUSTER_CACHE_SECONDS: int = 300             # حد أعلى فقط - التغييرات تحذف خلاياها فوراً
+    MAP_MAX_CELLS: int = 512                         # أقصى خلايا للنافذة (تُخفض الدقة إن زادت)
+
+    # مطابقة الجمعيات (app/services/matching.py) - الأوزان في constants.py
+    MATCHING_INDEX_REFRESH_SECONDS: float = 300    # إعادة بناء كاملة (تغييرات العمال الآخرين والتحديثات الجماعية)
+    MATCHING_MAX_DISTANCE_KM: float = 50           # المسافة التي تنعدم عندها نقاط القرب
+    MATCHING_WORKLOAD_HALF: int = 5                # عدد التكفلات النشطة الذي ينصّف نقاط العبء
+
+    # توزيع دفعات الطلبات (app/services/assignment_optimizer.py)
+    OPTIMIZER_DEFAULT_CAPACITY: int = 20           # تكفلات نشطة لكل جمعية إن لم تُحدد سعتها
+    OPTIMIZER_MAX_REQUESTS: int = 10000            # أقصى طلبات في خطة واحدة
+    OPTIMIZER_MAX_PASSES: int = 50                 # جولات التحسين المحلي
+
+    # دفعات التوصيل للمؤسسات (app/services/delivery_routes.py)
+    ROUTE_MAX_STOPS: int = 15                      # محطات الدفعة الافتراضية
+    ROUTE_MAX_ASSIGNMENTS: int = 500               # أقصى تكفلات تُقسم في استجابة واحدة
+    ROUTE_KMEANS_ITERATIONS: int = 25
+
+    # كشف الطلبات المكررة عند التقديم (app/services/dedup.py) - الأوزان في constants.py
+    DEDUP_THRESHOLD: int = 50                      # درجة (0-100) يُعلَّم عندها الطلب مكرراً محتملاً
+    DEDUP_RADIUS_M: float = 300                    # نطاق البحث بالموقع
+    DEDUP_MAX_CANDIDATES: int = 50                 # أقصى طلبات مفتوحة تُقارن بالطلب الجديد
+
+    # عدادات التكفلات (app/services/assignment_service.py)
+    COUNTER_RECONCILE_INTERVAL_SECONDS: float = 3600  # كشف الانحراف وإصلاحه (مهمة مجدولة)
+
+    # دليل الجمعيات في الذاكرة (app/services/org_directory.py)
+    ORG_DIRECTORY_POLL_SECONDS: float = 5          # فحص رقم الإصدار في Redis (تغييرات العمال الآخرين)
+    ORG_DIRECTORY_REFRESH_SECONDS: float = 300     # إعادة تحميل كاملة مهما كان الإصدار
+
+    # المجدول (app/core/scheduler.py) - عامل واحد فقط ينفذ المهام عبر قفل استشاري
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LEADER_RETRY_SECONDS: float = 15.0  # محاولة تولي القيادة وفحص اتصال القفل
+    SCHEDULER_SHUTDOWN_TIMEOUT: float = 10.0      # انتظار المهام الجارية عند الإيقاف
+
+    # Rate limiting (القواعد في app/core/constants.py::RATE_LIMITS)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_TRUST_FORWARDED: bool = True  # قراءة IP العميل من X-Forwarded-For (خلف Traefik)
+
     @property
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
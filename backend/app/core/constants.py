@@ -56,6 +56,28 @@ class OrganizationStatus(str, enum.Enum):
     SUSPENDED = "suspended"
 
 
+class NotificationChannel(str, enum.Enum):
+    """قناة الإشعار"""
+    SMS = "sms"
+    EMAIL = "email"
+
+
+class NotificationStatus(str, enum.Enum):
+    """حالة الإشعار في صندوق الصادر"""
+    PENDING = "pending"           # في انتظار الإرسال (أو إعادة المحاولة)
+    SENT = "sent"                 # أُرسل
+    FAILED = "failed"             # استُنفدت المحاولات
+
+
+# نصوص الإشعارات حسب الحدث - {code} رمز المتابعة، {org} اسم المؤسسة
+NOTIFICATION_TEMPLATES = {
+    "request_activated": "قصر: تمت مراجعة طلبك {code} وتفعيله، وسيتم توجيهه إلى الجمعيات.",
+    "request_rejected": "قصر: نعتذر، تم رفض طلبك {code}. يمكنك تقديم طلب جديد عند الحاجة.",
+    "request_approved": "قصر: تكفلت {org} بطلبك {code} وستتواصل معك قريباً.",
+    "request_completed": "قصر: تم إتمام طلبك {code}. نتمنى لك دوام العافية.",
+    "assignment_approved": "قصر: تمت الموافقة على تكفلكم بالطلب {code}. يمكنكم البدء في التنفيذ.",
+}
+
 # أوزان الأولوية حسب التصنيف
 CATEGORY_WEIGHTS = {
     RequestCategory.MEDICINE: 25,
@@ -70,8 +92,101 @@ CATEGORY_WEIGHTS = {
     RequestCategory.OTHER: 0,
 }
 
-# Rate limiting
+# نقاط حجم الأسرة: (أدنى عدد للأفراد، النقاط) - من الأكبر إلى الأصغر
+FAMILY_SIZE_BANDS = (
+    (5, 10),
+    (3, 5),
+)
+
+# نقاط الحالات الخاصة في الأسرة
+SPECIAL_CASE_WEIGHTS = {
+    "pregnant": 10,
+    "disabled": 10,
+    "chronic_illness": 10,
+    "elderly": 5,
+    "children": 5,
+}
+
+class SLAStage(str, enum.Enum):
+    """مراحل مهل الخدمة (SLA)"""
+    REVIEW = "review"             # طلب PENDING ينتظر مراجعة المراقب - تصعيد
+    UNASSIGNED = "unassigned"     # طلب NEW بلا تكفل معتمد - تصعيد
+    PLEDGE = "pledge"             # تعهد PLEDGED على طلب NEW لم يُعتمد - ينتهي (FAILED)
+    ASSIGNED = "assigned"         # تعهد PLEDGED على طلب ASSIGNED (ربطه المراقب) لم يُعتمد - تصعيد
+    DELIVERY = "delivery"         # تكفل IN_PROGRESS لم يُتمم - تصعيد
+
+
+# مهل SLA بالساعات لكل مرحلة (من created_at)، مع استثناءات حسب التصنيف
+SLA_DEADLINE_HOURS = {
+    SLAStage.REVIEW: 24,
+    SLAStage.UNASSIGNED: 72,
+    SLAStage.PLEDGE: 48,
+    SLAStage.ASSIGNED: 48,
+    SLAStage.DELIVERY: 168,
+}
+SLA_CATEGORY_DEADLINE_HOURS = {
+    RequestCategory.MEDICINE: {
+        SLAStage.REVIEW: 6, SLAStage.UNASSIGNED: 24, SLAStage.PLEDGE: 12, SLAStage.ASSIGNED: 12, SLAStage.DELIVERY: 48,
+    },
+    RequestCategory.WATER: {
+        SLAStage.REVIEW: 12, SLAStage.UNASSIGNED: 36, SLAStage.PLEDGE: 24, SLAStage.ASSIGNED: 24, SLAStage.DELIVERY: 72,
+    },
+    RequestCategory.BABY_SUPPLIES: {
+        SLAStage.REVIEW: 12, SLAStage.UNASSIGNED: 36, SLAStage.PLEDGE: 24, SLAStage.ASSIGNED: 24, SLAStage.DELIVERY: 72,
+    },
+}
+
+# أوزان ترتيب الجمعيات لطلب (app/services/matching.py) - كل عامل بين 0 و 1، المجموع 100
+MATCH_WEIGHTS = {
+    "category": 35,      # الطلب ضمن أنواع خدمات الجمعية
+    "coverage": 25,      # المنطقة أو المدينة ضمن مناطق التغطية
+    "distance": 15,      # قرب الطلب من مركز طلبات الجمعية السابقة
+    "workload": 10,      # عدد التكفلات النشطة حالياً
+    "reliability": 15,   # نسبة الإتمام إلى الفشل
+}
+
+# أوزان درجة التكرار بين طلبين (app/services/dedup.py) - المجموع 100
+DEDUP_WEIGHTS = {
+    "phone": 35,         # الهاتف نفسه
+    "location": 35,      # الموقع نفسه تقريباً (يتناقص حتى DEDUP_RADIUS_M)
+    "name": 20,          # تشابه الاسم الموحد
+    "category": 10,      # التصنيف نفسه
+}
+
+# Rate limiting - "العدد/الفترة" (second, minute, hour, day)
+# كل قاعدة تُطبق بشكل مستقل على كل مفتاح (IP، الهاتف، المستخدم)
 RATE_LIMITS = {
     "requests_create": "20/hour",
     "default": "100/minute",
+    "login": "10/minute",
+    "register": "5/minute",
+    "phone_register": "5/minute",
+    "otp_send": "5/hour",
+    "org_register": "5/hour",
+    "track_request": "30/minute",
 }
+
+# مسارات GET التي تُقرأ من النسخة المتماثلة (إن ضُبط DATABASE_REPLICA_URL)
+# قوائم وإحصائيات تتحمل تأخراً بسيطاً - التفاصيل و/auth/me تبقى على الرئيسية
+REPLICA_READ_ROUTES = frozenset({
+    "/api/v1/public/requests/track/{tracking_code}",
+    "/api/v1/citizen/requests",
+    "/api/v1/citizen/stats",
+    "/api/v1/org/requests/available",
+    "/api/v1/org/assignments",
+    "/api/v1/org/stats",
+    "/api/v1/inspector/requests",
+    "/api/v1/inspector/stats",
+    "/api/v1/inspector/organizations",
+    "/api/v1/inspector/organizations/details",
+    "/api/v1/admin/requests",
+    "/api/v1/admin/stats/overview",
+    "/api/v1/admin/stats/daily",
+    "/api/v1/admin/stats/by-region",
+    "/api/v1/admin/stats/organizations",
+    "/api/v1/admin/stats/sla",
+    "/api/v1/admin/organizations",
+    "/api/v1/admin/inspectors",
+    "/api/v1/admin/citizens",
+    "/api/v1/admin/admins",
+})
@@ -0,0 +1,101 @@
+"""
+توجيه القراءة إلى النسخة المتماثلة (read replica)
+
+- مسارات GET المدرجة في REPLICA_READ_ROUTES تُقرأ من DATABASE_REPLICA_URL إن ضُبط
+- read-your-writes: بعد أي كتابة ملتزمة يُعلَّم صاحب الطلب لمدة DATABASE_REPLICA_STICKY_SECONDS
+  فتُقرأ طلباته من القاعدة الرئيسية حتى يلحق بها النسخ
+- العلامة في Redis (مشتركة بين العمال) أو في الذاكرة عند غيابه
+"""
+import logging
+import time
+from typing import Dict
+
+from starlette.requests import Request as HTTPRequest
+
+from app.config import settings
+from app.core.constants import REPLICA_READ_ROUTES
+from app.core.rate_limit import client_ip
+from app.core.redis import get_redis
+from app.core.security import decode_token
+
+logger = logging.getLogger(__name__)
+
+
+def request_subject(request: HTTPRequest) -> str:
+    """
+    هوية صاحب الطلب لربط كتاباته بقراءاته
+
+    - المستخدم من التوكن إن وُجد وكان صالحاً، وإلا عنوان IP
+    """
+    cached = getattr(request.state, "db_subject", None)
+    if cached:
+        return cached
+    subject = f"ip:{client_ip(request)}"
+    auth = request.headers.get("authorization", "")
+    if auth[:7].lower() == "bearer ":
+        payload = decode_token(auth[7:])
+        if payload and payload.get("sub"):
+            subject = f"user:{payload['sub']}"
+    request.state.db_subject = subject
+    return subject
+
+
+def route_template(request: HTTPRequest) -> str:
+    """قالب المسار المطابق (مثل /api/v1/citizen/requests/{request_id})"""
+    route = request.scope.get("route")
+    return getattr(route, "path", request.url.path)
+
+
+class RecentWrites:
+    """علامات "كتب مؤخراً" - Redis أو الذاكرة حسب الإعدادات"""
+
+    _MAX_KEYS = 100_000
+
+    def __init__(self) -> None:
+        self._memory: Dict[str, float] = {}
+
+    async def mark(self, subject: str) -> None:
+        ttl = settings.DATABASE_REPLICA_STICKY_SECONDS
+        if ttl <= 0:
+            return
+        redis = get_redis()
+        if redis is None:
+            if len(self._memory) > self._MAX_KEYS:
+                self._memory.clear()
+            self._memory[subject] = time.monotonic() + ttl
+            return
+        try:
+            await redis.set(f"rw:{subject}", 1, ex=ttl)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Recent-write marker unavailable (%s)", exc)
+
+    async def seen(self, subject: str) -> bool:
+        redis = get_redis()
+        if redis is None:
+            expires = self._memory.get(subject)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                self._memory.pop(subject, None)
+                return False
+            return True
+        try:
+            return bool(await redis.exists(f"rw:{subject}"))
+        except Exception as exc:  # noqa: BLE001
+            # لا نعرف إن كتب المستخدم مؤخراً - القراءة من الرئيسية أسلم
+            logger.warning("Recent-write marker unavailable (%s), reading primary", exc)
+            return True
+
+    def reset(self) -> None:
+        """تفريغ العلامات المحلية (للاختبارات)"""
+        self._memory.clear()
+
+
+recent_writes = RecentWrites()
+
+
+async def should_read_replica(request: HTTPRequest) -> bool:
+    """هل يُقرأ هذا الطلب (GET) من النسخة المتماثلة؟"""
+    if route_template(request) not in REPLICA_READ_ROUTES:
+        return False
+    return not await recent_writes.seen(request_subject(request))
@@ -0,0 +1,180 @@
+"""
+البحث الجغرافي على إحداثيات الطلبات - geohash مفهرس بدون PostGIS
+
+- كل طلب بإحداثيات يحمل geohash (الدقة GEOHASH_PRECISION ≈ 5 م) بفهرس B-tree
+- المنطقة المطلوبة (دائرة أو مستطيل) تُغطى ببضع خلايا geohash؛ كل خلية مدى
+  geohash >= 'abc' AND geohash < 'abd' على الفهرس (لا يعتمد على LIKE ولا على الترتيب اللغوي
+  للقاعدة: أحرف geohash مرتبة بنفس ترتيب ASCII)
+- ثم الشرط الدقيق بالإحداثيات: المستطيل مباشرة، والدائرة بتقريب مستوٍ (equirectangular)
+  حسابي فقط - يعمل على PostgreSQL و SQLite، وخطؤه مهمل لأنصاف أقطار المدن
+"""
+import math
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+GEOHASH_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# أقصى عدد خلايا لتغطية منطقة (= أقصى عدد مديات في الاستعلام)
+_MAX_COVER_CELLS = 12
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lon, max_lat, max_lon)
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """ترميز نقطة إلى geohash"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """(ارتفاع، عرض) خلية geohash بالدرجات"""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def _grid(bbox: BBox, precision: int) -> Tuple[int, int, int, int]:
+    """(أول صف، أول عمود، عدد الصفوف، عدد الأعمدة) لخلايا الدقة precision داخل المستطيل"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    height, width = _cell_size(precision)
+    # الحد الأعلى (90 أو 180) ينتمي للخلية الأخيرة
+    last_row = min(math.floor((max_lat + 90) / height), 2 ** (5 * precision // 2) - 1)
+    last_col = min(math.floor((max_lon + 180) / width), 2 ** ((5 * precision + 1) // 2) - 1)
+    row = math.floor((min_lat + 90) / height)
+    col = math.floor((min_lon + 180) / width)
+    return row, col, last_row - row + 1, last_col - col + 1
+
+
+def bbox_cell_count(bbox: BBox, precision: int) -> int:
+    _, _, rows, cols = _grid(bbox, precision)
+    return rows * cols
+
+
+def bbox_cells(bbox: BBox, precision: int) -> List[str]:
+    """جميع خلايا geohash بدقة precision التي تتقاطع مع المستطيل"""
+    first_row, first_col, rows, cols = _grid(bbox, precision)
+    height, width = _cell_size(precision)
+    return sorted({
+        encode_geohash((first_row + r + 0.5) * height - 90, (first_col + c + 0.5) * width - 180, precision)
+        for r in range(rows)
+        for c in range(cols)
+    })
+
+
+def cover_bbox(bbox: BBox) -> List[str]:
+    """
+    خلايا geohash تغطي المستطيل - أدق دقة لا يتجاوز فيها العدد _MAX_COVER_CELLS
+    """
+    for precision in range(GEOHASH_PRECISION, 1, -1):
+        if bbox_cell_count(bbox, precision) <= _MAX_COVER_CELLS:
+            break
+    else:
+        precision = 1
+    return bbox_cells(bbox, precision)
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """أصغر نص أكبر من كل ما يبدأ بالبادئة (None إن كانت كلها 'z')"""
+    stripped = prefix.rstrip(_BASE32[-1])
+    if not stripped:
+        return None
+    return stripped[:-1] + _BASE32[_BASE32.index(stripped[-1]) + 1]
+
+
+def radius_bbox(latitude: float, longitude: float, radius_km: float) -> BBox:
+    """المستطيل المحيط بدائرة"""
+    d_lat = radius_km / _KM_PER_DEGREE
+    d_lon = radius_km / (_KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return (
+        max(latitude - d_lat, -90.0),
+        max(longitude - d_lon, -180.0),
+        min(latitude + d_lat, 90.0),
+        min(longitude + d_lon, 180.0),
+    )
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """المسافة على سطح الأرض (haversine)"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def prefix_condition(geohash_col, prefixes: List[str]):
+    """شرط SQL: geohash يبدأ بإحدى البادئات (مدى على الفهرس لكل بادئة)"""
+    ranges = []
+    for prefix in prefixes:
+        upper = _prefix_upper_bound(prefix)
+        ranges.append(and_(geohash_col >= prefix, geohash_col < upper) if upper else geohash_col >= prefix)
+    return or_(*ranges)
+
+
+def bbox_condition(geohash_col, lat_col, lon_col, bbox: BBox):
+    """شرط SQL: النقطة داخل المستطيل (مديات geohash على الفهرس ثم الإحداثيات)"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return and_(
+        prefix_condition(geohash_col, cover_bbox(bbox)),
+        lat_col.between(min_lat, max_lat),
+        lon_col.between(min_lon, max_lon),
+    )
+
+
+def radius_condition(geohash_col, lat_col, lon_col, latitude: float, longitude: float, radius_km: float):
+    """شرط SQL: النقطة ضمن radius_km من (latitude, longitude)"""
+    scale = math.cos(math.radians(latitude))
+    dy = (lat_col - latitude) * _KM_PER_DEGREE
+    dx = (lon_col - longitude) * (_KM_PER_DEGREE * scale)
+    return and_(
+        bbox_condition(geohash_col, lat_col, lon_col, radius_bbox(latitude, longitude, radius_km)),
+        dx * dx + dy * dy <= radius_km * radius_km,
+    )
+
+
+def _parse_floats(value: str, count: int, name: str) -> List[float]:
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        raise HTTPException(status_code=400, detail=f"قيمة {name} غير صالحة")
+    return numbers
+
+
+def parse_near(value: str) -> Tuple[float, float]:
+    """near=lat,lon"""
+    latitude, longitude = _parse_floats(value, 2, "near")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail="الإحداثيات خارج النطاق")
+    return latitude, longitude
+
+
+def parse_bbox(value: str) -> BBox:
+    """bbox=min_lon,min_lat,max_lon,max_lat (ترتيب GeoJSON)"""
+    min_lon, min_lat, max_lon, max_lat = _parse_floats(value, 4, "bbox")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="حدود المستطيل غير صالحة")
+    return min_lat, min_lon, max_lat, max_lon
@@ -0,0 +1,33 @@
+"""
+عميل HTTP المشترك (httpx) - اتصالات محفوظة لمزودي الرسائل والبريد
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """عميل httpx مشترك (يُنشأ عند أول استخدام) - لا نفتح اتصال TLS جديداً لكل رسالة"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """إغلاق الاتصالات عند إيقاف التطبيق"""
+    global _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("HTTP client close failed: %s", exc)
+        _client = None
@@ -0,0 +1,171 @@
+"""
+مقاييس Prometheus - زمن الاستجابة لكل مسار، مجمع الاتصالات، تأخر حلقة الأحداث، ومجمع bcrypt
+
+- آمن مع عدة عمال uvicorn: عند ضبط PROMETHEUS_MULTIPROC_DIR تُكتب القيم في ملفات mmap
+  ويُجمعها /metrics من جميع العمليات
+- الوسيط يسجل قيمة واحدة في histogram لكل طلب (بدون أي I/O)
+- المقاييس الدورية (المجمع، التأخر، bcrypt) تُحدَّث في مهمة خلفية وليس عند كل طلب
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from starlette.responses import Response
+
+from app.core.security import bcrypt_queue_depth
+
+logger = logging.getLogger(__name__)
+
+_MULTIPROC = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# حدود مناسبة لـ API: من 5ms حتى 10s
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_LATENCY = Histogram(
+    "ksar_http_request_duration_seconds",
+    "زمن معالجة الطلب حسب المسار والطريقة والحالة",
+    ["method", "route", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "ksar_db_pool_checked_out",
+    "اتصالات قاعدة البيانات المستخدمة حالياً",
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "ksar_db_pool_overflow",
+    "اتصالات تتجاوز pool_size (overflow)",
+    multiprocess_mode="livesum",
+)
+EVENT_LOOP_LAG = Gauge(
+    "ksar_event_loop_lag_seconds",
+    "تأخر حلقة الأحداث عن الموعد المتوقع",
+    multiprocess_mode="livemax",
+)
+BCRYPT_QUEUE_DEPTH = Gauge(
+    "ksar_bcrypt_queue_depth",
+    "عمليات bcrypt الجارية أو المنتظرة",
+    multiprocess_mode="livesum",
+)
+NOTIFICATIONS_DELIVERED = Counter(
+    "ksar_notifications_total",
+    "محاولات إرسال الإشعارات حسب القناة والنتيجة (sent/pending=إعادة/failed)",
+    ["channel", "result"],
+)
+JOB_RUNS = Counter(
+    "ksar_job_runs_total",
+    "تشغيلات المهام المجدولة حسب النتيجة (success/error/skipped/cancelled)",
+    ["job", "result"],
+)
+JOB_DURATION = Histogram(
+    "ksar_job_duration_seconds",
+    "مدة تنفيذ المهام المجدولة",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+)
+JOB_LAST_SUCCESS = Gauge(
+    "ksar_job_last_success_timestamp_seconds",
+    "وقت آخر نجاح لكل مهمة مجدولة (unix)",
+    ["job"],
+    multiprocess_mode="max",
+)
+SCHEDULER_LEADER = Gauge(
+    "ksar_scheduler_leader",
+    "1 إن كان هذا العامل قائد المجدول",
+    multiprocess_mode="livesum",
+)
+SLA_ACTIONS = Counter(
+    "ksar_sla_actions_total",
+    "طلبات وتكفلات تجاوزت مهلتها حسب المرحلة (تصعيد أو انتهاء تعهد)",
+    ["stage"],
+)
+
+# المسارات غير المعروفة (404) تُجمع في تسمية واحدة لتفادي انفجار عدد السلاسل
+_UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    وسيط ASGI يقيس زمن كل طلب حسب قالب المسار (/org/assignments/{assignment_id})
+
+    - يخزن السلاسل الفرعية للـ histogram محلياً لتفادي كلفة labels() عند كل طلب
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children: Dict[Tuple[str, str, str], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            key = (
+                scope["method"],
+                route.path if route is not None else _UNMATCHED_ROUTE,
+                str(status_code),
+            )
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = HTTP_LATENCY.labels(*key)
+            child.observe(time.perf_counter() - started)
+
+
+async def run_runtime_sampler(engine, interval: float = 1.0) -> None:
+    """
+    مهمة خلفية لكل عامل - تقيس تأخر حلقة الأحداث وتحدث مقاييس المجمع و bcrypt
+    """
+    pool = engine.sync_engine.pool
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(0.0, time.perf_counter() - expected))
+        try:
+            DB_POOL_CHECKED_OUT.set(pool.checkedout())
+            DB_POOL_OVERFLOW.set(max(0, pool.overflow()))
+        except AttributeError:
+            # مجمعات بدون هذه الواجهة (NullPool/StaticPool في الاختبارات)
+            pass
+        BCRYPT_QUEUE_DEPTH.set(bcrypt_queue_depth())
+
+
+def mark_process_dead() -> None:
+    """تنظيف ملفات mmap الخاصة بالعامل عند إيقافه"""
+    if _MULTIPROC:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_response() -> Response:
+    """نص المقاييس بصيغة Prometheus (مجمعة من جميع العمال عند تفعيل الوضع المتعدد)"""
+    if _MULTIPROC:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,136 @@
+"""
+قياس استعلامات SQL لكل طلب HTTP - العدد، زمن قاعدة البيانات، وأبطأ استعلام
+
+- خطافات before/after_cursor_execute تُربط بالمحرك في app/database.py
+- الإحصائيات تُجمع في contextvar خاص بكل طلب
+- الوسيط يضيف رؤوس Server-Timing و X-DB-Queries ويسجل الطلبات التي تتجاوز الحدود
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """إحصائيات الاستعلامات لطلب واحد"""
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_sql: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """إحصائيات الطلب الحالي (None خارج نطاق القياس)"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    قياس الاستعلامات داخل كتلة (للاختبارات والسكريبتات)
+
+        with track_queries() as stats:
+            await db.execute(...)
+        assert stats.count == 1
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._ksar_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    start = getattr(context, "_ksar_query_start", None)
+    if start is not None:
+        stats.record(statement, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """ربط خطافات القياس بالمحرك (مرة واحدة لكل محرك)"""
+    target = engine.sync_engine
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """
+    وسيط ASGI خفيف - يفتح نطاق قياس لكل طلب HTTP
+
+    - مكتوب كـ ASGI خام (وليس BaseHTTPMiddleware) لتفادي كلفة المهمة الإضافية لكل طلب
+    """
+
+    def __init__(self, app, add_headers: bool = False):
+        self.app = app
+        self.add_headers = add_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.add_headers:
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", '
+                    f"app;dur={total_ms:.1f}".encode(),
+                ))
+                headers.append((b"x-db-queries", str(stats.count).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            if (
+                stats.count > settings.SQL_SLOW_REQUEST_QUERIES
+                or stats.total_ms > settings.SQL_SLOW_REQUEST_MS
+            ):
+                logger.warning(
+                    "Heavy DB usage on %s %s: %d queries, %.1f ms in DB (slowest %.1f ms: %s)",
+                    scope.get("method"),
+                    scope.get("path"),
+                    stats.count,
+                    stats.total_ms,
+                    stats.slowest_ms,
+                    (stats.slowest_sql or "")[:300],
+                )
@@ -0,0 +1,195 @@
+"""
+تحديد معدل الطلبات - نوافذ منزلقة (sliding window) مشتركة بين جميع العمال عبر Redis
+
+- القواعد مأخوذة من RATE_LIMITS في app/core/constants.py
+- كل طلب يُفحص بمفاتيح متعددة (IP، الهاتف، المستخدم) في استدعاء Redis واحد
+- عند غياب REDIS_URL نستخدم نافذة في الذاكرة (عامل واحد - للتطوير والاختبارات)
+- المسارات غير المحددة لا تمر بأي منطق إضافي
+"""
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from starlette.requests import Request as HTTPRequest
+
+from app.config import settings
+from app.core.constants import RATE_LIMITS
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# فحص جميع المفاتيح أولاً، ثم التسجيل في الكل - الطلب المرفوض لا يستهلك من الحصة
+# KEYS: المفاتيح | ARGV: الآن (ms)، النافذة (ms)، الحد، معرف فريد
+_SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local retry = 0
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        local wait = tonumber(oldest[2]) + window - now
+        if wait > retry then
+            retry = wait
+        end
+    end
+end
+if retry > 0 then
+    return retry
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """تحويل "20/hour" إلى (20, 3600)"""
+    count, _, period = rate.partition("/")
+    period = period.strip().lower().rstrip("s")
+    if period not in _PERIODS:
+        raise ValueError(f"فترة غير معروفة في قاعدة التحديد: {rate}")
+    return int(count), _PERIODS[period]
+
+
+# تحليل القواعد مرة واحدة عند الاستيراد
+_RULES: Dict[str, Tuple[int, int]] = {name: parse_rate(rate) for name, rate in RATE_LIMITS.items()}
+
+
+def client_ip(request: HTTPRequest) -> str:
+    """
+    عنوان IP العميل
+
+    - خلف Traefik نأخذ آخر عنوان في X-Forwarded-For (الذي أضافه الوكيل نفسه، غير قابل للتزوير)
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class _MemoryWindow:
+    """نافذة منزلقة في الذاكرة - بديل محلي عند غياب Redis"""
+
+    _MAX_KEYS = 100_000
+
+    def __init__(self) -> None:
+        self._hits: Dict[str, Deque[float]] = {}
+
+    def hit(self, keys: List[str], limit: int, window: int, now: float) -> float:
+        if len(self._hits) > self._MAX_KEYS:
+            self._hits.clear()
+
+        retry = 0.0
+        buckets = []
+        for key in keys:
+            bucket = self._hits.setdefault(key, deque())
+            while bucket and bucket[0] <= now - window:
+                bucket.popleft()
+            if len(bucket) >= limit:
+                retry = max(retry, bucket[0] + window - now)
+            buckets.append(bucket)
+
+        if retry > 0:
+            return retry
+        for bucket in buckets:
+            bucket.append(now)
+        return 0.0
+
+    def reset(self) -> None:
+        self._hits.clear()
+
+
+class RateLimiter:
+    """محدد المعدل - يختار Redis أو الذاكرة حسب الإعدادات"""
+
+    def __init__(self) -> None:
+        self._memory = _MemoryWindow()
+        self._script = None
+        self._script_client = None
+
+    async def hit(self, rule: str, keys: List[str]) -> float:
+        """
+        تسجيل محاولة على جميع المفاتيح
+
+        - يعيد 0 إن كانت مسموحة، وإلا عدد الثواني قبل إعادة المحاولة
+        """
+        limit, window = _RULES.get(rule, _RULES["default"])
+        full_keys = [f"rl:{rule}:{key}" for key in keys]
+
+        redis = get_redis()
+        if redis is None:
+            return self._memory.hit(full_keys, limit, window, time.monotonic())
+
+        if self._script is None or self._script_client is not redis:
+            self._script = redis.register_script(_SLIDING_WINDOW_LUA)
+            self._script_client = redis
+        try:
+            retry_ms = await self._script(
+                keys=full_keys,
+                args=[int(time.time() * 1000), window * 1000, limit, uuid.uuid4().hex],
+            )
+        except Exception as exc:  # noqa: BLE001
+            # لا نحجب الخدمة إن تعطل Redis - نسمح بالطلب ونسجل تحذيراً
+            logger.warning("Rate limiter unavailable (%s), allowing request", exc)
+            return 0.0
+        return int(retry_ms) / 1000.0
+
+    def reset(self) -> None:
+        """تفريغ النافذة المحلية (للاختبارات)"""
+        self._memory.reset()
+
+
+rate_limiter = RateLimiter()
+
+
+async def enforce_rate_limit(
+    rule: str,
+    request: HTTPRequest,
+    *,
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    user_id: Optional[str] = None,
+    by_ip: bool = True,
+) -> None:
+    """
+    تطبيق قاعدة من RATE_LIMITS على الطلب الحالي
+
+    - المفاتيح: IP (ما لم يُعطَّل by_ip) + الهاتف/البريد و/أو المستخدم إن وُجدت
+    - للمسارات المصادق عليها نفضل by_ip=False (شبكات الجوال تشارك نفس IP بين آلاف المستخدمين)
+    - يرفع 429 مع رأس Retry-After عند تجاوز الحد
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+
+    keys = [f"ip:{client_ip(request)}"] if by_ip else []
+    if phone:
+        keys.append(f"phone:{phone}")
+    if email:
+        keys.append(f"email:{email.lower()}")
+    if user_id:
+        keys.append(f"user:{user_id}")
+    if not keys:
+        return
+
+    retry_after = await rate_limiter.hit(rule, keys)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="عدد كبير من المحاولات. يرجى المحاولة لاحقاً.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
@@ -0,0 +1,66 @@
+"""
+اتصال Redis المشترك بين جميع الوحدات
+"""
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[aioredis.Redis] = None
+_raw_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """
+    عميل Redis مشترك (يُنشأ عند أول استخدام)
+
+    - يعيد None إن كان REDIS_URL فارغاً (التطوير المحلي والاختبارات)
+    """
+    global _client
+    if not settings.REDIS_URL:
+        return None
+    if _client is None:
+        _client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _client
+
+
+def get_redis_raw() -> Optional[aioredis.Redis]:
+    """
+    عميل Redis يعيد القيم كبايتات دون فك ترميز
+
+    - للقيم الثنائية (خرائط البتات من SETBIT) التي يفشل فك ترميزها كنص UTF-8
+    """
+    global _raw_client
+    if not settings.REDIS_URL:
+        return None
+    if _raw_client is None:
+        _raw_client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+    return _raw_client
+
+
+async def close_redis() -> None:
+    """إغلاق الاتصال عند إيقاف التطبيق"""
+    global _client, _raw_client
+    for client in (_client, _raw_client):
+        if client is None:
+            continue
+        try:
+            await client.aclose()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Redis close failed: %s", exc)
+    _client = None
+    _raw_client = None
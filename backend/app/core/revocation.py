@@ -0,0 +1,207 @@
+"""
+إبطال التوكنات - فحص O(1) لكل طلب بدل قراءة حالة المستخدم من قاعدة البيانات
+
+- revoke_user يسجل لحظة الإبطال: كل توكن صدر (iat) قبلها أو في نفس الثانية يُرفض
+- revoke_token يبطل توكناً واحداً بمعرفه (jti) حتى انتهاء صلاحيته (تسجيل الخروج)
+- العلامات تعيش مدة صلاحية توكن الوصول فقط (بعدها تنتهي التوكنات القديمة وحدها)
+- إعادة التفعيل ترفع العلامة (restore_user) حتى لا يُرفض دخول جديد في نفس الثانية
+- Redis مشترك بين العمال (MGET واحد لكل طلب)، والذاكرة بديل محلي عند غيابه
+- TOKEN_REVOCATION_BLOOM: مرشح Bloom محلي أمام Redis - أغلب الطلبات (غير المبطلة)
+  لا تستدعي Redis إطلاقاً، مقابل تأخر انتشار الإبطال بين العمال حتى
+  TOKEN_REVOCATION_BLOOM_SYNC_SECONDS
+"""
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.redis import get_redis, get_redis_raw
+
+logger = logging.getLogger(__name__)
+
+_BLOOM_HASHES = 7
+
+
+def _ttl() -> int:
+    return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def _user_key(user_id: Any) -> str:
+    return f"rv:user:{user_id}"
+
+
+def _jti_key(jti: str) -> str:
+    return f"rv:jti:{jti}"
+
+
+class RevocationBloom:
+    """
+    مرشح Bloom لمفاتيح الإبطال
+
+    - النسخة المرجعية في Redis (SETBIT) بأجيال مدة كل منها صلاحية توكن الوصول،
+      فيكفي فحص الجيل الحالي والسابق ولا يتضخم المرشح مع الزمن
+    - كل عامل يحتفظ بنسخة محلية ويعيد تحميلها كل TOKEN_REVOCATION_BLOOM_SYNC_SECONDS
+    - "ربما" تعني التحقق من Redis، و"لا" قطعية (لا سلبيات كاذبة ضمن نافذة المزامنة)
+    """
+
+    def __init__(self, bits: int) -> None:
+        self._bits = bits
+        self._local: Dict[int, bytearray] = {}
+        self._synced_at = 0.0
+
+    def positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self._bits for i in range(_BLOOM_HASHES)]
+
+    @staticmethod
+    def _generation(now: float) -> int:
+        return int(now // max(_ttl(), 1))
+
+    @staticmethod
+    def _has(bitmap: bytearray, pos: int) -> bool:
+        # نفس ترتيب البتات في Redis SETBIT (البت الأعلى أولاً)
+        byte = pos >> 3
+        return byte < len(bitmap) and bool(bitmap[byte] & (0x80 >> (pos & 7)))
+
+    def _set_local(self, generation: int, positions: List[int]) -> None:
+        bitmap = self._local.setdefault(generation, bytearray(self._bits // 8 + 1))
+        for pos in positions:
+            bitmap[pos >> 3] |= 0x80 >> (pos & 7)
+
+    async def add(self, redis, item: str) -> None:
+        generation = self._generation(time.time())
+        positions = self.positions(item)
+        key = f"rv:bloom:{generation}"
+        async with redis.pipeline(transaction=False) as pipe:
+            for pos in positions:
+                pipe.setbit(key, pos, 1)
+            pipe.expire(key, 2 * _ttl() + 60)
+            await pipe.execute()
+        self._set_local(generation, positions)
+
+    async def _sync(self, raw_redis) -> None:
+        # خرائط البتات ثنائية: تُقرأ بعميل لا يفك الترميز (get_redis_raw)
+        generation = self._generation(time.time())
+        current, previous = await raw_redis.mget(f"rv:bloom:{generation}", f"rv:bloom:{generation - 1}")
+        self._local = {
+            generation: bytearray(current or b""),
+            generation - 1: bytearray(previous or b""),
+        }
+        self._synced_at = time.monotonic()
+
+    async def might_contain(self, raw_redis, items: List[str]) -> bool:
+        if time.monotonic() - self._synced_at >= settings.TOKEN_REVOCATION_BLOOM_SYNC_SECONDS:
+            await self._sync(raw_redis)
+        for item in items:
+            positions = self.positions(item)
+            for bitmap in self._local.values():
+                if all(self._has(bitmap, pos) for pos in positions):
+                    return True
+        return False
+
+    def reset(self) -> None:
+        self._local.clear()
+        self._synced_at = 0.0
+
+
+class RevocationStore:
+    """قائمة الإبطال (مستخدمون ومعرفات توكنات) - Redis أو الذاكرة حسب الإعدادات"""
+
+    _MAX_KEYS = 100_000
+
+    def __init__(self) -> None:
+        self._memory: Dict[str, Tuple[int, float]] = {}
+        self._bloom: Optional[RevocationBloom] = None
+
+    def _bloom_filter(self) -> Optional[RevocationBloom]:
+        if not settings.TOKEN_REVOCATION_BLOOM:
+            return None
+        if self._bloom is None:
+            self._bloom = RevocationBloom(settings.TOKEN_REVOCATION_BLOOM_BITS)
+        return self._bloom
+
+    async def _mark(self, key: str, value: int, ttl: int) -> None:
+        if ttl <= 0:
+            return
+        redis = get_redis()
+        if redis is None:
+            if len(self._memory) > self._MAX_KEYS:
+                self._memory.clear()
+            self._memory[key] = (value, time.monotonic() + ttl)
+            return
+        try:
+            await redis.set(key, value, ex=ttl)
+            bloom = self._bloom_filter()
+            if bloom is not None:
+                await bloom.add(redis, key)
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Token revocation (%s) failed: %s", key, exc)
+            raise
+
+    async def revoke_user(self, user_id: Any) -> None:
+        """إبطال جميع توكنات المستخدم الصادرة حتى الآن"""
+        await self._mark(_user_key(user_id), int(time.time()), _ttl())
+
+    async def revoke_token(self, jti: Optional[str], expires_at: Optional[int]) -> None:
+        """إبطال توكن وصول واحد حتى انتهاء صلاحيته"""
+        if not jti:
+            return
+        await self._mark(_jti_key(jti), 1, int(expires_at or 0) - int(time.time()))
+
+    async def restore_user(self, user_id: Any) -> None:
+        """رفع الإبطال (عند إعادة تفعيل الحساب)"""
+        key = _user_key(user_id)
+        redis = get_redis()
+        if redis is None:
+            self._memory.pop(key, None)
+            return
+        try:
+            await redis.delete(key)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Token revocation lift for user %s failed: %s", user_id, exc)
+
+    def _memory_get(self, key: str) -> Optional[int]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._memory.pop(key, None)
+            return None
+        return entry[0]
+
+    async def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """هل أُبطل هذا التوكن (بحمولته المتحقق منها)؟"""
+        keys = [_user_key(payload.get("sub"))]
+        if payload.get("jti"):
+            keys.append(_jti_key(payload["jti"]))
+
+        redis = get_redis()
+        if redis is None:
+            values = [self._memory_get(key) for key in keys]
+        else:
+            try:
+                bloom = self._bloom_filter()
+                if bloom is not None and not await bloom.might_contain(get_redis_raw(), keys):
+                    return False
+                values = [int(v) if v is not None else None for v in await redis.mget(keys)]
+            except Exception as exc:  # noqa: BLE001
+                # لا نحجب جميع المستخدمين إن تعطل Redis - نسمح ونسجل تحذيراً
+                logger.warning("Revocation store unavailable (%s), allowing token", exc)
+                return False
+
+        revoked_at = values[0]
+        if revoked_at is not None and int(payload.get("iat") or 0) <= revoked_at:
+            return True
+        return len(values) > 1 and values[1] is not None
+
+    def reset(self) -> None:
+        """تفريغ العلامات المحلية (للاختبارات)"""
+        self._memory.clear()
+        if self._bloom is not None:
+            self._bloom.reset()
+
+
+revocation_store = RevocationStore()
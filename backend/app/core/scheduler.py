@@ -0,0 +1,294 @@
+"""
+مجدول المهام الدورية داخل التطبيق - عامل واحد فقط ينفذها عبر جميع الخوادم
+
+- انتخاب القائد: pg_try_advisory_lock على اتصال مخصص (AUTOCOMMIT) يبقى مفتوحاً طوال
+  القيادة؛ توقف العامل أو انقطاع اتصاله يحرر القفل فيتولى غيره خلال
+  SCHEDULER_LEADER_RETRY_SECONDS
+- الجداول: every(ثوانٍ) أو cron("*/5 * * * *") بتوقيت UTC
+- المهمة لا تتداخل مع نفسها: إن لم تنتهِ قبل موعدها التالي يُتخطى الموعد
+- المقاييس: عدد التشغيلات ونتيجتها، المدة، آخر نجاح، والعامل القائد
+- الإيقاف: ننتظر المهام الجارية حتى SCHEDULER_SHUTDOWN_TIMEOUT ثم نلغيها ونحرر القفل
+- على غير PostgreSQL (التطوير والاختبارات) لا يوجد قفل: العامل قائد دائماً
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional, Set
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.metrics import JOB_DURATION, JOB_LAST_SUCCESS, JOB_RUNS, SCHEDULER_LEADER
+
+logger = logging.getLogger(__name__)
+
+# مفتاح القفل الاستشاري (64 بت) - ثابت لجميع العمال
+SCHEDULER_LOCK_KEY = int.from_bytes(hashlib.blake2b(b"ksar:scheduler", digest_size=8).digest(), "big", signed=True)
+
+
+class IntervalSchedule:
+    """تشغيل كل عدد ثابت من الثواني"""
+
+    def __init__(self, seconds: float) -> None:
+        if seconds <= 0:
+            raise ValueError("الفترة يجب أن تكون موجبة")
+        self.seconds = seconds
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+    def __repr__(self) -> str:
+        return f"every({self.seconds:g}s)"
+
+
+# (أدنى، أعلى) لكل حقل: الدقيقة، الساعة، يوم الشهر، الشهر، يوم الأسبوع (0 أو 7 = الأحد)
+_CRON_BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(expr: str, low: int, high: int) -> FrozenSet[int]:
+    values: Set[int] = set()
+    for part in expr.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-", 1))
+        else:
+            start = int(base)
+            end = high if step_text else start
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"حقل cron غير صالح: {expr}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """تعبير cron بخمسة حقول (دقيقة ساعة يوم شهر يوم_أسبوع) بتوقيت UTC"""
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"تعبير cron يحتاج خمسة حقول: {expression}")
+        self.expression = expression
+        parsed = [_parse_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_BOUNDS)]
+        self.minutes, self.hours, self.days, self.months = parsed[:4]
+        self.weekdays = frozenset(v % 7 for v in parsed[4])
+        # كما في cron: إن قُيّد اليوم ويوم الأسبوع معاً يكفي تطابق أحدهما
+        self._day_or_weekday = fields[2] != "*" and fields[4] != "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._day_or_weekday:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # قفزات بالشهر ثم اليوم ثم الساعة ثم الدقيقة - بضع مئات من الخطوات كحد أقصى
+        for _ in range(100_000):
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"تعبير cron لا يتحقق أبداً: {self.expression}")
+
+    def __repr__(self) -> str:
+        return f"cron({self.expression!r})"
+
+
+def every(seconds: float) -> IntervalSchedule:
+    return IntervalSchedule(seconds)
+
+
+def cron(expression: str) -> CronSchedule:
+    return CronSchedule(expression)
+
+
+@dataclass
+class Job:
+    """مهمة مسجلة في المجدول"""
+    name: str
+    schedule: object
+    func: Callable[[], Awaitable[None]]
+    next_run: Optional[datetime] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+
+class Scheduler:
+    """مجدول بقائد واحد عبر جميع العمال"""
+
+    def __init__(self, engine=None) -> None:
+        self._engine = engine
+        self._jobs: Dict[str, Job] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._lock_conn = None
+        self._last_heartbeat = 0.0
+        self.is_leader = False
+
+    @property
+    def jobs(self) -> Dict[str, Job]:
+        return self._jobs
+
+    def add(self, name: str, schedule, func: Callable[[], Awaitable[None]]) -> None:
+        """تسجيل مهمة (قبل start)"""
+        if name in self._jobs:
+            raise ValueError(f"المهمة {name} مسجلة مسبقاً")
+        self._jobs[name] = Job(name=name, schedule=schedule, func=func)
+
+    def job(self, name: str, schedule):
+        """مُزخرف لتسجيل مهمة"""
+        def decorator(func):
+            self.add(name, schedule, func)
+            return func
+        return decorator
+
+    def _get_engine(self):
+        if self._engine is None:
+            from app.database import engine
+            self._engine = engine
+        return self._engine
+
+    # === القيادة ===
+
+    async def _try_acquire(self) -> None:
+        engine = self._get_engine()
+        if engine.dialect.name != "postgresql":
+            self._become_leader()
+            return
+        conn = None
+        try:
+            conn = await engine.execution_options(isolation_level="AUTOCOMMIT").connect()
+            acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Scheduler leader election failed: %s", exc)
+            acquired = False
+        if acquired:
+            self._lock_conn = conn
+            self._become_leader()
+        elif conn is not None:
+            await conn.close()
+
+    def _become_leader(self) -> None:
+        self.is_leader = True
+        self._last_heartbeat = time.monotonic()
+        SCHEDULER_LEADER.set(1)
+        now = datetime.now(timezone.utc)
+        for job in self._jobs.values():
+            job.next_run = job.schedule.next_after(now)
+        logger.info("Scheduler leadership acquired (%d jobs)", len(self._jobs))
+
+    async def _heartbeat(self) -> None:
+        """التأكد من أن اتصال القفل ما زال حياً - وإلا نتنحى (القفل سقط مع الاتصال)"""
+        if self._lock_conn is None or time.monotonic() - self._last_heartbeat < settings.SCHEDULER_LEADER_RETRY_SECONDS:
+            return
+        try:
+            await self._lock_conn.execute(text("SELECT 1"))
+            self._last_heartbeat = time.monotonic()
+        except Exception as exc:  # noqa: BLE001
+            logger.error("Scheduler lock connection lost, stepping down: %s", exc)
+            await self._release()
+
+    async def _release(self) -> None:
+        self.is_leader = False
+        SCHEDULER_LEADER.set(0)
+        conn, self._lock_conn = self._lock_conn, None
+        if conn is None:
+            return
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Scheduler unlock failed: %s", exc)
+        try:
+            await conn.close()
+        except Exception:  # noqa: BLE001
+            await conn.invalidate()
+
+    # === التنفيذ ===
+
+    async def _execute(self, job: Job) -> None:
+        started = time.perf_counter()
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            JOB_RUNS.labels(job.name, "cancelled").inc()
+            raise
+        except Exception as exc:  # noqa: BLE001
+            JOB_RUNS.labels(job.name, "error").inc()
+            logger.exception("Scheduled job %s failed: %s", job.name, exc)
+        else:
+            JOB_RUNS.labels(job.name, "success").inc()
+            JOB_LAST_SUCCESS.labels(job.name).set(time.time())
+        finally:
+            JOB_DURATION.labels(job.name).observe(time.perf_counter() - started)
+
+    def _dispatch_due(self, now: datetime) -> None:
+        for job in self._jobs.values():
+            if job.next_run is None or job.next_run > now:
+                continue
+            if job.task is not None and not job.task.done():
+                JOB_RUNS.labels(job.name, "skipped").inc()
+            else:
+                job.task = asyncio.create_task(self._execute(job), name=f"job:{job.name}")
+            job.next_run = job.schedule.next_after(now)
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        wait = settings.SCHEDULER_LEADER_RETRY_SECONDS
+        if self.is_leader:
+            for job in self._jobs.values():
+                if job.next_run is not None:
+                    wait = min(wait, (job.next_run - now).total_seconds())
+        return max(wait, 0.0)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            if not self.is_leader:
+                await self._try_acquire()
+            else:
+                await self._heartbeat()
+            now = datetime.now(timezone.utc)
+            if self.is_leader:
+                self._dispatch_due(now)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self._seconds_until_next(now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """بدء حلقة المجدول (من lifespan)"""
+        if self._loop_task is not None:
+            return
+        self._stopping = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._run(), name="scheduler")
+
+    async def stop(self) -> None:
+        """إيقاف لطيف: لا مهام جديدة، انتظار الجارية، ثم تحرير القيادة"""
+        if self._loop_task is None:
+            return
+        self._stopping.set()
+        await self._loop_task
+        self._loop_task = None
+
+        running = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        if running:
+            _, pending = await asyncio.wait(running, timeout=settings.SCHEDULER_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        await self._release()
+
+
+scheduler = Scheduler()
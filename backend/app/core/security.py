@@ -1,7 +1,10 @@
 """
 وحدة الأمان - تشفير كلمات المرور وإدارة التوكنات
 """
+import asyncio
+import hashlib
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
@@ -18,6 +21,12 @@ _SYMBOLS = '@#$%&*!?'
 _ALL_CHARS = _UPPER + _LOWER + _DIGITS + _SYMBOLS
 
 
+def generate_tracking_code(request_id) -> str:
+    """توليد رمز متابعة قصير"""
+    hash_obj = hashlib.sha256(str(request_id).encode())
+    return hash_obj.hexdigest()[:8].upper()
+
+
 def generate_strong_code(length: int = 10) -> str:
     """
     توليد كود دخول قوي يحتوي إجباريا على:
@@ -62,16 +71,59 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# مجمع خيوط مخصص لـ bcrypt - يمنع حجب حلقة الأحداث (~250ms لكل عملية)
+# ويحد من عدد العمليات المتزامنة حتى لا تستهلك كل المعالج أثناء موجات التسجيل
+_bcrypt_executor = ThreadPoolExecutor(
+    max_workers=settings.BCRYPT_POOL_SIZE,
+    thread_name_prefix="bcrypt",
+)
+_bcrypt_pending = 0
+
+
+def bcrypt_queue_depth() -> int:
+    """عدد عمليات bcrypt الجارية أو المنتظرة في المجمع"""
+    return _bcrypt_pending
+
+
+async def _run_bcrypt(func, *args):
+    global _bcrypt_pending
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, func, *args)
+    finally:
+        _bcrypt_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """تشفير كلمة المرور خارج حلقة الأحداث"""
+    return await _run_bcrypt(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """التحقق من كلمة المرور خارج حلقة الأحداث"""
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
-    """إنشاء رمز الوصول JWT"""
+    """
+    إنشاء رمز الوصول JWT
+
+    - iat و jti يُستعملان لفحص الإبطال (app/core/revocation.py)
+    """
     to_encode = data.copy()
+    now = datetime.now(timezone.utc)
     
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({
+        "exp": expire,
+        "iat": int(now.timestamp()),
+        "jti": secrets.token_hex(16),
+        "type": "access",
+    })
     
     encoded_jwt = jwt.encode(
         to_encode, 
@@ -0,0 +1,46 @@
+"""
+توحيد النصوص العربية للمقارنة (كشف الطلبات المكررة)
+
+- حذف التشكيل والتطويل، وتوحيد الهمزات (أ إ آ ٱ -> ا، ؤ -> و، ئ -> ي)، ى -> ي، ة -> ه
+- الأرقام العربية والفارسية -> أرقام لاتينية، وأي رمز آخر -> مسافة
+- "عبد ال..." كلمة واحدة: "عبد الله" و"عبدالله" الاسم نفسه
+"""
+import difflib
+import re
+from typing import FrozenSet, Optional
+
+_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_TRANSLATION = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ؤ": "و", "ئ": "ي", "ى": "ي", "ة": "ه",
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+_SEPARATORS = re.compile(r"[^\w]+|_")
+_ABD = re.compile(r"\bعبد (?=ال)")
+
+NAME_KEY_LENGTH = 100
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """الاسم بصيغة موحدة: كلمات مفصولة بمسافة واحدة"""
+    if not value:
+        return ""
+    text = _DIACRITICS.sub("", value).translate(_TRANSLATION).casefold()
+    text = " ".join(_SEPARATORS.sub(" ", text).split())
+    return _ABD.sub("عبد", text)[:NAME_KEY_LENGTH]
+
+
+def _tokens(name: str) -> FrozenSet[str]:
+    return frozenset(name.split())
+
+
+def name_similarity(a: str, b: str) -> float:
+    """تشابه اسمين موحدين (0-1): الأعلى بين تطابق الحروف وتداخل الكلمات"""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    tokens_a, tokens_b = _tokens(a), _tokens(b)
+    overlap = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    return max(overlap, difflib.SequenceMatcher(None, a, b).ratio())
@@ -1,7 +1,13 @@
+from typing import AsyncGenerator
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
+from starlette.requests import Request as HTTPRequest
 
 from app.config import settings
+from app.core.db_routing import recent_writes, request_subject, should_read_replica
+from app.core.query_stats import instrument_engine
 
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -11,24 +17,134 @@ engine = create_async_engine(
     pool_pre_ping=True,
 )
 
+# نسخة القراءة المتماثلة (اختيارية - انظر app/core/db_routing.py)
+replica_engine = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        echo=settings.DEBUG,
+        pool_size=20,
+        max_overflow=10,
+        pool_pre_ping=True,
+    )
+
+# قياس عدد الاستعلامات وزمنها لكل طلب (انظر app/core/query_stats.py)
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    instrument_engine(engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine)
+
+# طرق HTTP للقراءة فقط - جلستها بلا BEGIN/COMMIT
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class WriteSession(Session):
+    """جلسة كتابة تتتبع وجود تعديلات لم تُلتزم بعد"""
+
+
+class ReadOnlySession(Session):
+    """جلسة قراءة فقط - ترفض أي INSERT/UPDATE/DELETE"""
+
+
+@event.listens_for(WriteSession, "after_flush")
+def _mark_flushed(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(WriteSession, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _commit_writes(session):
+    if session.info.pop("has_writes", None):
+        session.info["committed_writes"] = True
+
+
+@event.listens_for(WriteSession, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+
+@event.listens_for(ReadOnlySession, "before_flush")
+def _reject_flush(session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise RuntimeError("محاولة كتابة داخل جلسة قراءة فقط")
+
+
+@event.listens_for(ReadOnlySession, "do_orm_execute")
+def _reject_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        raise RuntimeError("محاولة كتابة داخل جلسة قراءة فقط")
+
+
+def has_pending_writes(session: AsyncSession) -> bool:
+    """هل في الجلسة تعديلات (معلقة أو مُرسلة) تحتاج COMMIT؟"""
+    return bool(
+        session.new or session.dirty or session.deleted
+        or session.sync_session.info.get("has_writes")
+    )
+
+
 async_session = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=WriteSession,
     expire_on_commit=False,
 )
 
 
+def read_sessionmaker(bind) -> async_sessionmaker:
+    """
+    جلسات القراءة فقط لمحرك معين
+
+    - AUTOCOMMIT: كل استعلام يُرسل وحده دون BEGIN ولا COMMIT/ROLLBACK عند الإغلاق
+    """
+    return async_sessionmaker(
+        bind.execution_options(isolation_level="AUTOCOMMIT"),
+        class_=AsyncSession,
+        sync_session_class=ReadOnlySession,
+        expire_on_commit=False,
+        autoflush=False,
+    )
+
+
+read_session = read_sessionmaker(engine)
+replica_session = read_sessionmaker(replica_engine) if replica_engine is not None else None
+
+
 class Base(DeclarativeBase):
-    pass
+    # قيم الخادم (created_at/updated_at) تُجلب عبر INSERT/UPDATE ... RETURNING
+    # فلا حاجة لـ db.refresh() بعد الحفظ
+    __mapper_args__ = {"eager_defaults": True}
 
 
-async def get_db() -> AsyncSession:
+async def get_db(request: HTTPRequest) -> AsyncGenerator[AsyncSession, None]:
+    """
+    جلسة قاعدة البيانات للطلب الحالي
+
+    - GET/HEAD/OPTIONS: جلسة قراءة فقط بوضع AUTOCOMMIT، بلا COMMIT نهائي
+      (من النسخة المتماثلة لمسارات REPLICA_READ_ROUTES ما لم يكتب المستخدم مؤخراً)
+    - باقي الطرق: COMMIT واحد فقط إذا بقيت تعديلات لم يلتزمها المعالج
+    """
+    if request.method in READ_ONLY_METHODS:
+        factory = read_session
+        if replica_session is not None and await should_read_replica(request):
+            factory = replica_session
+        async with factory() as session:
+            yield session
+        return
+
     async with async_session() as session:
         try:
             yield session
-            await session.commit()
+            if has_pending_writes(session):
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
         finally:
-            await session.close()
+            if replica_session is not None and session.sync_session.info.get("committed_writes"):
+                await recent_writes.mark(request_subject(request))
@@ -1,6 +1,7 @@
 """
 تطبيق KSAR - منصة تنسيق المساعدات الإنسانية
 """
+import asyncio
 import logging
 import traceback
 from contextlib import asynccontextmanager
@@ -16,17 +17,52 @@ from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.api.router import api_router
+from app.core.http import close_http_client
+from app.core.redis import close_redis
+from app.core.scheduler import scheduler
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.metrics import MetricsMiddleware, run_runtime_sampler, mark_process_dead, metrics_response
+from app.database import engine
+from app.services.jobs import register_jobs
+from app.services.notifications import notification_dispatcher
+from app.services.org_directory import org_directory
+from app.services.sms import get_sms_provider
 
 logger = logging.getLogger(__name__)
 
+register_jobs(scheduler)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """إدارة دورة حياة التطبيق"""
     # Startup
     print("🚀 KSAR Backend is starting...")
+    # SMS_PROVIDER خاطئ أو غائب يوقف التشغيل بدل الرجوع بصمت إلى console
+    get_sms_provider()
+    sampler = None
+    if settings.METRICS_ENABLED:
+        sampler = asyncio.create_task(run_runtime_sampler(engine))
+    notifier = None
+    if settings.NOTIFICATION_WORKER_ENABLED:
+        notifier = asyncio.create_task(notification_dispatcher.run())
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start()
+    # دليل الجمعيات: إن تعذر التحميل الآن يُحمَّل عند أول طلب يحتاجه
+    try:
+        await org_directory.load()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Organization directory preload failed: %s", exc)
     yield
     # Shutdown
+    await scheduler.stop()
+    if notifier is not None:
+        notifier.cancel()
+    if sampler is not None:
+        sampler.cancel()
+        mark_process_dead()
+    await close_http_client()
+    await close_redis()
     print("👋 KSAR Backend is shutting down...")
 
 
@@ -111,6 +147,14 @@ app.add_middleware(
 )
 app.add_middleware(PreflightCORSMiddleware)
 
+# قياس استعلامات SQL لكل طلب - يُضاف أخيراً ليغلف كل ما سبق
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    app.add_middleware(QueryStatsMiddleware, add_headers=settings.SQL_TIMING_HEADERS)
+
+# مقاييس Prometheus - الأبعد ليقيس الزمن الكامل للطلب
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 # معالج أخطاء التحقق (422) - تسجيل البيانات المرسلة لتسهيل التشخيص
 @app.exception_handler(RequestValidationError)
@@ -156,6 +200,14 @@ async def health_check():
     return {"status": "healthy", "service": "ksar-backend", "version": "2.0.0"}
 
 
+# Prometheus metrics
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """مقاييس Prometheus (زمن المسارات، مجمع الاتصالات، تأخر الحلقة، bcrypt)"""
+        return metrics_response()
+
+
 # Include API routes
 app.include_router(api_router)
 
@@ -2,10 +2,16 @@ from app.models.user import User
 from app.models.organization import Organization
 from app.models.request import Request
 from app.models.assignment import Assignment
+from app.models.refresh_token import RefreshToken
+from app.models.notification import Notification
+from app.models.request_event import RequestEvent
 
 __all__ = [
     "User",
     "Organization", 
     "Request",
     "Assignment",
+    "RefreshToken",
+    "Notification",
+    "RequestEvent",
 ]
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, Boolean, Text, DateTime, Enum, ForeignKey, func
+from sqlalchemy import Column, String, Boolean, Text, DateTime, Enum, ForeignKey, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,10 @@ from app.core.constants import AssignmentStatus
 class Assignment(Base):
     """نموذج التكفل بالطلب"""
     __tablename__ = "assignments"
+    __table_args__ = (
+        # فحوص SLA: التعهدات والتكفلات المتأخرة
+        Index("ix_assignments_status_created_at", "status", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     request_id = Column(UUID(as_uuid=True), ForeignKey("requests.id"), nullable=False)
@@ -34,8 +38,9 @@ class Assignment(Base):
     
     # التواريخ
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    escalated_at = Column(DateTime(timezone=True), nullable=True)  # تصعيد SLA (تنفيذ متأخر)
 
     # Relationships
     request = relationship("Request", back_populates="assignments")
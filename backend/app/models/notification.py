@@ -0,0 +1,40 @@
+import uuid
+
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+from app.core.constants import NotificationChannel, NotificationStatus
+
+
+class Notification(Base):
+    """
+    صندوق صادر الإشعارات (outbox)
+
+    - يُكتب في نفس معاملة تغيير الحالة: لا إشعار لتغيير تراجع، ولا تغيير بلا إشعار
+    - عمال الإرسال يسحبونه على دفعات (app/services/notifications.py)
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    request_id = Column(UUID(as_uuid=True), ForeignKey("requests.id", ondelete="SET NULL"), nullable=True)
+
+    # الرسالة
+    event = Column(String(50), nullable=False)                    # request_activated ...
+    channel = Column(String(10), nullable=False, default=NotificationChannel.SMS.value)
+    recipient = Column(String(255), nullable=False)               # رقم الهاتف أو البريد
+    subject = Column(String(200), nullable=True)                  # للبريد فقط
+    body = Column(Text, nullable=False)
+
+    # حالة الإرسال
+    status = Column(String(10), nullable=False, default=NotificationStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    # التواريخ
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
@@ -32,12 +32,14 @@ class Organization(Base):
     # الحالة
     status = Column(Enum(OrganizationStatus), default=OrganizationStatus.ACTIVE)
     
-    # إحصائيات
+    # إحصائيات - عدادات مشتقة من التكفلات (app/services/assignment_service.py)
     total_completed = Column(Integer, default=0)              # إجمالي الطلبات المكتملة
+    active_count = Column(Integer, default=0, server_default="0", nullable=False)  # تعهدات وتكفلات قيد التنفيذ
+    failed_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     # التواريخ
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="organization")
@@ -0,0 +1,27 @@
+import uuid
+
+from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+
+
+class RefreshToken(Base):
+    """
+    رمز التحديث - يُخزن مُجزّأً (SHA-256) ويُستبدل عند كل استعمال
+
+    - family_id يجمع سلسلة التدوير لجلسة واحدة: إعادة استعمال رمز مُستبدل
+      تعني تسريبه فتُبطل السلسلة كلها
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False, index=True)
+
+    # التواريخ
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    replaced_by = Column(UUID(as_uuid=True), nullable=True)
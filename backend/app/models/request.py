@@ -1,16 +1,22 @@
 import uuid
 
-from sqlalchemy import Column, String, Integer, Float, Text, DateTime, Enum, ForeignKey, func
+from sqlalchemy import Column, String, Integer, Float, Text, DateTime, Enum, ForeignKey, Boolean, Index, false, func
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 
 from app.database import Base
 from app.core.constants import RequestCategory, RequestStatus
+from app.core.geo import encode_geohash
+from app.core.text import NAME_KEY_LENGTH, normalize_name
 
 
 class Request(Base):
     """نموذج طلب المساعدة"""
     __tablename__ = "requests"
+    __table_args__ = (
+        # فحوص SLA: الطلبات المتأخرة في حالة معينة
+        Index("ix_requests_status_created_at", "status", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -20,6 +26,7 @@ class Request(Base):
     # بيانات صاحب الطلب (تُملأ من المستخدم أو يُدخلها)
     requester_name = Column(String(100), nullable=False)      # اسم صاحب الطلب
     requester_phone = Column(String(20), nullable=False, index=True)  # رقم الهاتف
+    name_key = Column(String(NAME_KEY_LENGTH), nullable=True, index=True)  # الاسم الموحد تلقائياً (كشف التكرار)
     
     # تفاصيل الطلب
     category = Column(Enum(RequestCategory), nullable=False)
@@ -33,6 +40,7 @@ class Request(Base):
     region = Column(String(100), nullable=True, index=True)   # المنطقة/الحي
     latitude = Column(Float, nullable=True)                   # خط العرض
     longitude = Column(Float, nullable=True)                  # خط الطول
+    geohash = Column(String(12), nullable=True, index=True)   # من الإحداثيات تلقائياً (البحث الجغرافي)
     
     # المرفقات - الصوت والصور
     audio_url = Column(String(500), nullable=True)            # رابط الملف الصوتي (تخزين خارجي)
@@ -46,16 +54,44 @@ class Request(Base):
     status = Column(Enum(RequestStatus), default=RequestStatus.PENDING)
     priority_score = Column(Integer, default=50)              # نقاط الأولوية (0-100)
     is_urgent = Column(Integer, default=0)                    # علامة استعجال (0 أو 1)
+    priority_pinned = Column(Boolean, default=False, server_default=false(), nullable=False)  # نقاط ضبطها المدير - لا يعاد حسابها
+    
+    # تصعيد SLA - الحالة التي صُعّد فيها الطلب (مُصعَّد حالياً إن طابقت status)
+    escalated_status = Column(Enum(RequestStatus), nullable=True)
+    escalated_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # اشتباه تكرار عند التقديم (app/services/dedup.py) - أقرب طلب مفتوح ودرجة التشابه
+    duplicate_of_id = Column(UUID(as_uuid=True), ForeignKey("requests.id", ondelete="SET NULL"), nullable=True)
+    duplicate_score = Column(Integer, nullable=True)
+    
+    # عداد مشتق (app/services/assignment_service.py) - التعهدات المنتظرة (PLEDGED)
+    pledge_count = Column(Integer, default=0, server_default="0", nullable=False)
     
     # ملاحظات الإدارة
     admin_notes = Column(Text, nullable=True)                 # ملاحظات داخلية
     
     # التواريخ
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="requests", foreign_keys=[user_id])
     inspector = relationship("User", back_populates="inspected_requests", foreign_keys=[inspector_id])
     assignments = relationship("Assignment", back_populates="request")
+
+    @validates("requester_name")
+    def _sync_name_key(self, key, value):
+        self.name_key = normalize_name(value) or None
+        return value
+
+    @validates("latitude", "longitude")
+    def _sync_geohash(self, key, value):
+        """geohash يتبع الإحداثيات دائماً"""
+        latitude = value if key == "latitude" else self.latitude
+        longitude = value if key == "longitude" else self.longitude
+        if latitude is None or longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(latitude, longitude)
+        return value
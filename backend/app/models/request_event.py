@@ -0,0 +1,37 @@
+from sqlalchemy import BigInteger, Column, String, Integer, DateTime, Enum, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import Base
+from app.core.constants import RequestCategory, RequestStatus
+
+
+class RequestEvent(Base):
+    """
+    سجل انتقالات الطلب (إضافة فقط - لا تعديل ولا حذف)
+
+    - صف لكل انتقال يكتبه خطاف في workflow.py بنفس معاملة التغيير
+    - entered_at: بداية المرحلة المنتهية (from_status)، فمدتها created_at - entered_at
+      بلا دالة نافذة عند التحليل
+    - المنطقة والتصنيف منسوخان من الطلب: التحليل لا يحتاج ربطاً بجدول الطلبات
+    - بلا مفتاح خارجي: الإدراج أرخص، والسجل يبقى بعد حذف الطلب
+    - BRIN على created_at (الصفوف تُضاف بترتيب الوقت): فهرس صغير جداً لمسح المدد الزمنية
+    """
+    __tablename__ = "request_events"
+    __table_args__ = (
+        Index("ix_request_events_created_at", "created_at", postgresql_using="brin"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    request_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+
+    # الانتقال (from_status فارغ عند الإنشاء)
+    from_status = Column(Enum(RequestStatus), nullable=True)
+    to_status = Column(Enum(RequestStatus), nullable=False)
+
+    # أبعاد التحليل
+    region = Column(String(100), nullable=True)
+    category = Column(Enum(RequestCategory), nullable=False)
+
+    # التواريخ
+    entered_at = Column(DateTime(timezone=True), nullable=True)   # فارغ إن لم تُعرف بداية المرحلة
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -19,6 +19,8 @@ from app.schemas.assignment import (
 from app.schemas.auth import (
     LoginRequest,
     LoginResponse,
+    TokenPair,
+    TokenRefreshRequest,
     TokenRefreshResponse,
     UserResponse,
     ChangePasswordRequest,
@@ -44,6 +46,8 @@ __all__ = [
     # Auth
     "LoginRequest",
     "LoginResponse",
+    "TokenPair",
+    "TokenRefreshRequest",
     "TokenRefreshResponse",
     "UserResponse",
     "ChangePasswordRequest",
@@ -44,25 +44,37 @@ class RegisterRequest(BaseModel):
         return phone
 
 
-class RegisterResponse(BaseModel):
+class TokenPair(BaseModel):
+    """توكن الوصول (قصير) ورمز التحديث (يُستبدل عند كل استعمال)"""
+    access_token: str
+    refresh_token: Optional[str] = None
+    token_type: str = "bearer"
+    expires_in: Optional[int] = Field(default=None, description="صلاحية توكن الوصول بالثواني")
+
+
+class RegisterResponse(TokenPair):
     """استجابة التسجيل"""
     message: str = "تم إنشاء الحساب بنجاح"
     user: "UserResponse"
-    access_token: str
-    token_type: str = "bearer"
 
 
-class LoginResponse(BaseModel):
+class LoginResponse(TokenPair):
     """استجابة تسجيل الدخول"""
-    access_token: str
-    token_type: str = "bearer"
     user: "UserResponse"
 
 
-class TokenRefreshResponse(BaseModel):
+class TokenRefreshRequest(BaseModel):
+    """طلب تحديث التوكن"""
+    refresh_token: str = Field(..., min_length=20)
+
+
+class TokenRefreshResponse(TokenPair):
     """استجابة تحديث التوكن"""
-    access_token: str
-    token_type: str = "bearer"
+
+
+class LogoutRequest(BaseModel):
+    """تسجيل الخروج - مع رمز التحديث تُبطل الجلسة كلها"""
+    refresh_token: Optional[str] = None
 
 
 class UserResponse(BaseModel):
@@ -119,9 +131,30 @@ class ChangePasswordRequest(BaseModel):
     new_password: str = Field(..., min_length=6)
 
 
+class OTPSendRequest(BaseModel):
+    """طلب إرسال رمز التحقق إلى الهاتف"""
+    phone: str = Field(..., min_length=10, max_length=20, description="رقم الهاتف")
+
+    @field_validator('phone')
+    @classmethod
+    def validate_phone(cls, v: str) -> str:
+        phone = re.sub(r'[\s\-]', '', v)
+        if not re.match(r'^(\+?[0-9]{10,15})$', phone):
+            raise ValueError('رقم الهاتف غير صالح')
+        return phone
+
+
+class OTPSendResponse(BaseModel):
+    """استجابة إرسال رمز التحقق"""
+    message: str = "تم إرسال رمز التحقق"
+    expires_in: int = Field(..., description="صلاحية الرمز بالثواني")
+    retry_after: int = Field(..., description="الثواني قبل إمكانية طلب رمز جديد")
+
+
 class PhoneRegisterRequest(BaseModel):
-    """طلب تسجيل مواطن برقم الهاتف فقط (مؤقت - بدون OTP)"""
+    """طلب تسجيل مواطن برقم الهاتف ورمز التحقق المرسل إليه"""
     phone: str = Field(..., min_length=10, max_length=20, description="رقم الهاتف")
+    code: str = Field(..., min_length=4, max_length=10, description="رمز التحقق (OTP)")
     full_name: Optional[str] = Field(default=None, min_length=2, max_length=100, description="الاسم (اختياري)")
     
     @field_validator('phone')
@@ -133,19 +166,15 @@ class PhoneRegisterRequest(BaseModel):
         return phone
 
 
-class PhoneRegisterResponse(BaseModel):
+class PhoneRegisterResponse(TokenPair):
     """استجابة التسجيل برقم الهاتف"""
     message: str = "تم التسجيل بنجاح"
     user: "UserResponse"
-    access_token: str
-    token_type: str = "bearer"
     is_new_user: bool = True
 
 
-class InspectorLoginResponse(BaseModel):
+class InspectorLoginResponse(TokenPair):
     """استجابة تسجيل دخول المراقب"""
-    access_token: str
-    token_type: str = "bearer"
     user: "UserResponse"
 
 
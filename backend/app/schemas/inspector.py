@@ -1,13 +1,14 @@
 """
 Schemas خاصة بالمراقبين
 """
-from typing import Optional, List
+from typing import Annotated, Dict, Optional, List
 from datetime import datetime
 from uuid import UUID
 import re
 
 from pydantic import BaseModel, Field, field_validator
 
+from app.config import settings
 from app.core.constants import RequestCategory, RequestStatus
 
 
@@ -109,7 +110,31 @@ class InspectorRequestStatusUpdate(BaseModel):
 
 class InspectorAssignRequest(BaseModel):
     """ربط طلب بجمعية"""
-    organization_id: str = Field(..., description="معرف الجمعية")
+    organization_id: UUID = Field(..., description="معرف الجمعية")
+    notes: Optional[str] = Field(default=None, max_length=2000, description="ملاحظات")
+
+
+class AssignmentPlanRequest(BaseModel):
+    """خطة توزيع الطلبات المفتوحة على الجمعيات"""
+    categories: Optional[List[RequestCategory]] = Field(default=None, description="التصنيفات (الكل إن لم تُحدد)")
+    city: Optional[str] = Field(default=None, max_length=100)
+    region: Optional[str] = Field(default=None, max_length=100)
+    bbox: Optional[str] = Field(default=None, description="min_lon,min_lat,max_lon,max_lat")
+    urgent_only: bool = False
+    limit: int = Field(default=1000, ge=1, le=settings.OPTIMIZER_MAX_REQUESTS, description="أقصى عدد طلبات (الأعلى أولوية)")
+    capacities: Dict[UUID, Annotated[int, Field(ge=0)]] = Field(
+        default_factory=dict, description="سعة كل جمعية (افتراضياً حسب تكفلاتها النشطة)",
+    )
+
+
+class PlannedAssignment(BaseModel):
+    request_id: UUID
+    organization_id: UUID
+
+
+class AssignmentPlanCommit(BaseModel):
+    """اعتماد خطة توزيع (كما اقترحت أو بعد تعديلها)"""
+    assignments: List[PlannedAssignment] = Field(..., min_length=1, max_length=settings.OPTIMIZER_MAX_REQUESTS)
     notes: Optional[str] = Field(default=None, max_length=2000, description="ملاحظات")
 
 
@@ -137,6 +162,8 @@ class InspectorRequestResponse(BaseModel):
     status: RequestStatus
     priority_score: int
     is_urgent: int
+    duplicate_of_id: Optional[UUID] = None
+    duplicate_score: Optional[int] = None
     inspector_id: Optional[UUID]
     inspector_notes: Optional[str]
     admin_notes: Optional[str]
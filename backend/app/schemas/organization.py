@@ -129,8 +129,8 @@ class CitizenListResponse(BaseModel):
 
 class OrgAccessRequest(BaseModel):
     """السماح/منع جمعية من رؤية رقم الهاتف"""
-    request_id: str = Field(..., description="معرف الطلب")
-    organization_id: str = Field(..., description="معرف المؤسسة")
+    request_id: UUID = Field(..., description="معرف الطلب")
+    organization_id: UUID = Field(..., description="معرف المؤسسة")
     allow_phone_access: bool = Field(..., description="السماح برؤية رقم الهاتف")
 
 
@@ -138,7 +138,7 @@ class OrgAccessRequest(BaseModel):
 
 class InspectorAssignOrgRequest(BaseModel):
     """إضافة مواطن لجمعية من المراقب"""
-    organization_id: str = Field(..., description="معرف الجمعية")
+    organization_id: UUID = Field(..., description="معرف الجمعية")
     allow_phone_access: Optional[bool] = Field(default=False, description="السماح برؤية رقم الهاتف")
     notes: Optional[str] = Field(default=None, max_length=2000, description="ملاحظات")
 
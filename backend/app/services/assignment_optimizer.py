@@ -0,0 +1,260 @@
+"""
+توزيع دفعة من الطلبات المفتوحة على الجمعيات النشطة حسب سعتها - خطة يعتمدها المراقب
+
+- مصفوفة ملاءمة (طلبات × جمعيات) بين 0 و 1 محسوبة بـ NumPy دفعة واحدة: عوامل المطابقة
+  نفسها (matching.py) عدا العبء الذي تحل محله السعة
+- غير الملائم = -inf: تصنيف خارج خدمات الجمعية، أو جمعية سبق أن فشلت في الطلب
+- الحل جشع بترتيب الأولوية (عند نقص السعة تُخدم الطلبات الأهم أولاً) ثم تحسين محلي:
+  نقل طلب إلى جمعية لديها سعة، أو تبادل طلبين بين جمعيتين. كل جولة تحسب أفضل مكسب لكل
+  زوج جمعيات (np.maximum.reduceat) وتطبق التحسينات على أزواج منفصلة
+- الهدف: مجموع الملاءمة موزوناً بالأولوية (1 + priority_score / 100)
+- السعة الافتراضية: OPTIMIZER_DEFAULT_CAPACITY ناقص التكفلات النشطة للجمعية
+"""
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import MATCH_WEIGHTS, AssignmentStatus, OrganizationStatus, RequestCategory, RequestStatus
+from app.core.geo import EARTH_RADIUS_KM
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+from app.services.matching import (
+    MATCHABLE_STATUSES,
+    OrgProfile,
+    load_exclusions,
+    normalize_label,
+    org_index,
+)
+from app.services.workflow import add_assignments, transition_requests
+
+# أصغر مكسب يُعتبر تحسيناً (يمنع الدوران على فروق التقريب)
+_MIN_GAIN = 1e-9
+_CATEGORY_INDEX = {category.value: index for index, category in enumerate(RequestCategory)}
+
+
+def _distance_matrix(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """haversine لكل زوج (صفوف × أعمدة) - NaN حيث تغيب الإحداثيات"""
+    p1, p2 = np.radians(lat1)[:, None], np.radians(lat2)[None, :]
+    dl = np.radians(lon2)[None, :] - np.radians(lon1)[:, None]
+    a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _coordinates(values: Sequence[Optional[float]]) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def fit_matrix(requests: Sequence, profiles: Sequence[OrgProfile]) -> np.ndarray:
+    """
+    ملاءمة كل طلب لكل جمعية (n × m)
+
+    requests: صفوف فيها category, region, city, latitude, longitude
+    """
+    services = np.zeros((len(profiles), len(_CATEGORY_INDEX)))
+    areas: Dict[str, int] = {}
+    for profile in profiles:
+        for area in profile.areas:
+            areas.setdefault(area, len(areas))
+    # عمود أخير لا تغطيه أي جمعية: المناطق غير المعروفة
+    covers = np.zeros((len(profiles), len(areas) + 1), dtype=bool)
+    for j, profile in enumerate(profiles):
+        # بلا أنواع خدمات = تقبل كل التصنيفات بملاءمة أقل
+        services[j] = 0.5 if not profile.services else 0.0
+        for service in profile.services:
+            if service in _CATEGORY_INDEX:
+                services[j, _CATEGORY_INDEX[service]] = 1.0
+        for area in profile.areas:
+            covers[j, areas[area]] = True
+
+    def area_index(value: Optional[str]) -> int:
+        return areas.get(normalize_label(value), len(areas)) if value else len(areas)
+
+    category = services[:, [_CATEGORY_INDEX[r.category.value] for r in requests]].T
+    by_region = covers[:, [area_index(r.region) for r in requests]].T
+    by_city = covers[:, [area_index(r.city) for r in requests]].T
+    coverage = np.where(by_region, 1.0, np.where(by_city, 0.8, 0.0))
+    coverage[:, [not profile.areas for profile in profiles]] = 0.5
+
+    distance = _distance_matrix(
+        _coordinates([r.latitude for r in requests]), _coordinates([r.longitude for r in requests]),
+        _coordinates([p.latitude for p in profiles]), _coordinates([p.longitude for p in profiles]),
+    )
+    proximity = np.where(np.isnan(distance), 0.5, np.clip(1 - distance / settings.MATCHING_MAX_DISTANCE_KM, 0, 1))
+    reliability = np.array([(p.completed + 1) / (p.completed + p.failed + 2) for p in profiles])
+
+    weights = {name: weight for name, weight in MATCH_WEIGHTS.items() if name != "workload"}
+    fit = (
+        weights["category"] * category
+        + weights["coverage"] * coverage
+        + weights["distance"] * proximity
+        + weights["reliability"] * reliability[None, :]
+    ) / sum(weights.values())
+    fit[category == 0] = -np.inf
+    return fit
+
+
+def _improve(benefit: np.ndarray, assigned: np.ndarray, remaining: np.ndarray) -> None:
+    """تحسين محلي في المكان: نقل إلى سعة فارغة أو تبادل بين جمعيتين حتى لا يبقى مكسب"""
+    m = benefit.shape[1]
+    for _ in range(settings.OPTIMIZER_MAX_PASSES):
+        rows = np.flatnonzero(assigned >= 0)
+        if rows.size == 0:
+            return
+        order = rows[np.argsort(assigned[rows], kind="stable")]
+        orgs = assigned[order]
+        # مكسب نقل كل طلب مُسند إلى كل جمعية
+        delta = benefit[order] - benefit[order, orgs][:, None]
+        starts = np.flatnonzero(np.r_[True, orgs[1:] != orgs[:-1]])
+        ends = np.r_[starts[1:], orgs.size]
+        groups = orgs[starts]
+        bounds = {int(org): (int(s), int(e)) for org, s, e in zip(groups, starts, ends)}
+
+        # best[a, b]: أفضل مكسب لنقل طلب واحد من a إلى b
+        best = np.full((m, m), -np.inf)
+        best[groups] = np.maximum.reduceat(delta, starts, axis=0)
+        np.fill_diagonal(best, -np.inf)
+        move = np.where(remaining[None, :] > 0, best, -np.inf)
+        swap = best + best.T
+        gain = np.maximum(move, swap)
+
+        touched = np.zeros(m, dtype=bool)
+        improved = False
+        for flat in np.argsort(gain, axis=None)[::-1]:
+            if gain.flat[flat] <= _MIN_GAIN:
+                break
+            a, b = divmod(int(flat), m)
+            if touched[a] or touched[b]:
+                continue
+            touched[a] = touched[b] = True
+            improved = True
+            start, end = bounds[a]
+            i = order[start + int(delta[start:end, b].argmax())]
+            if move[a, b] >= swap[a, b]:
+                assigned[i] = b
+                remaining[a] += 1
+                remaining[b] -= 1
+            else:
+                start, end = bounds[b]
+                j = order[start + int(delta[start:end, a].argmax())]
+                assigned[i], assigned[j] = b, a
+        if not improved:
+            return
+
+
+def solve(fit: np.ndarray, priority: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """رقم الجمعية لكل طلب (-1 = بلا جمعية)"""
+    benefit = fit * (1 + priority / 100)[:, None]
+    assigned = np.full(fit.shape[0], -1)
+    remaining = capacity.astype(np.int64)
+    closed = np.where(remaining > 0, 0.0, -np.inf)
+    for i in np.argsort(-priority, kind="stable"):
+        row = benefit[i] + closed
+        j = int(row.argmax())
+        if row[j] == -np.inf:
+            continue
+        assigned[i] = j
+        remaining[j] -= 1
+        if remaining[j] == 0:
+            closed[j] = -np.inf
+    _improve(benefit, assigned, remaining)
+    return assigned
+
+
+def _has_active_assignment():
+    return (
+        select(Assignment.id)
+        .where(
+            Assignment.request_id == Request.id,
+            Assignment.status.in_([AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS]),
+        )
+        .exists()
+    )
+
+
+async def plan_assignments(db: AsyncSession, conditions: list, limit: int, capacities: Dict[UUID, int]) -> dict:
+    """خطة مقترحة لتوزيع الطلبات المفتوحة (بلا تكفل نشط) المطابقة للشروط - لا تكتب شيئاً"""
+    started = time.perf_counter()
+    await org_index.ensure_fresh(db)
+    profiles = org_index.profiles()
+    result = await db.execute(
+        select(
+            Request.id, Request.category, Request.region, Request.city,
+            Request.latitude, Request.longitude, Request.priority_score,
+        )
+        .where(Request.status.in_(MATCHABLE_STATUSES), ~_has_active_assignment(), *conditions)
+        .order_by(Request.priority_score.desc(), Request.created_at)
+        .limit(limit)
+    )
+    requests = result.all()
+
+    capacity = np.array([
+        capacities.get(p.id, max(0, settings.OPTIMIZER_DEFAULT_CAPACITY - p.active)) for p in profiles
+    ], dtype=np.int64)
+    assigned = np.full(len(requests), -1)
+    fit = np.zeros((len(requests), len(profiles)))
+    if requests and profiles:
+        fit = fit_matrix(requests, profiles)
+        column = {p.id: j for j, p in enumerate(profiles)}
+        excluded = await load_exclusions(db, [r.id for r in requests])
+        for i, r in enumerate(requests):
+            for org_id in excluded.get(r.id, ()):
+                if org_id in column:
+                    fit[i, column[org_id]] = -np.inf
+        priority = np.array([r.priority_score or 0 for r in requests], dtype=float)
+        assigned = solve(fit, priority, capacity)
+
+    loads = np.bincount(assigned[assigned >= 0], minlength=len(profiles))
+    return {
+        "assignments": [
+            {"request_id": str(r.id), "organization_id": str(profiles[j].id), "fit": round(float(fit[i, j]), 3)}
+            for i, (r, j) in enumerate(zip(requests, assigned.tolist()))
+            if j >= 0
+        ],
+        "unassigned": [str(r.id) for r, j in zip(requests, assigned.tolist()) if j < 0],
+        "organizations": [
+            {"id": str(p.id), "name": p.name, "capacity": int(capacity[j]), "assigned": int(loads[j])}
+            for j, p in enumerate(profiles)
+            if capacity[j] or loads[j]
+        ],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def apply_plan(
+    db: AsyncSession,
+    pairs: List[Tuple[UUID, UUID]],
+    inspector_id: UUID,
+    notes: Optional[str] = None,
+) -> Tuple[int, List[UUID]]:
+    """
+    اعتماد خطة (طلب، جمعية) دفعة واحدة - يعيد (عدد المعتمد، الطلبات المتخطاة)
+
+    - يُتخطى ما تغير منذ الخطة: طلب لم يعد مفتوحاً أو صار له تكفل، أو جمعية غير نشطة
+    - الانتقال المحروس (workflow) يقفل الطلبات ويعيد ما انتقل فقط: مراقبان يعتمدان
+      الطلب نفسه لا ينجحان معاً
+    - لا COMMIT هنا - المسار يلتزم مرة واحدة
+    """
+    names = dict((await db.execute(
+        select(Organization.id, Organization.name)
+        .where(Organization.id.in_({org_id for _, org_id in pairs}), Organization.status == OrganizationStatus.ACTIVE)
+    )).all())
+    wanted = {request_id: org_id for request_id, org_id in pairs if org_id in names}
+    requests = []
+    if wanted:
+        requests = await transition_requests(
+            db, RequestStatus.ASSIGNED, Request.id.in_(wanted), ~_has_active_assignment(),
+            sources=MATCHABLE_STATUSES,
+            context=lambda req: {"org": names[wanted[req.id]]},
+            inspector_id=inspector_id,
+        )
+        # التعهدات وعداداتها - إدراج واحد وتحديث واحد لكل جدول للدفعة كلها
+        await add_assignments(db, [(req.id, wanted[req.id]) for req in requests], notes=notes)
+
+    applied = {req.id for req in requests}
+    return len(applied), [request_id for request_id, _ in pairs if request_id not in applied]
@@ -0,0 +1,137 @@
+"""
+العدادات المشتقة من التكفلات - إنشاء التكفل وتغيير حالته يطبّقانها من خطاف في workflow.py،
+والحذف يمر من هنا
+
+- requests.pledge_count: التعهدات المنتظرة (PLEDGED) للطلب
+- organizations.active_count (PLEDGED + IN_PROGRESS)، total_completed، failed_count
+- العدادات تُحدَّث بزيادة ذرية (col = col + n) في معاملة التغيير نفسه، فالقوائم تقرأ
+  الأعمدة بدل COUNT ... GROUP BY؛ UPDATE واحد لكل جدول مهما تعددت التكفلات
+- الانتقالات والحذف الجماعي تعيد (RETURNING) الصفوف المتغيرة لتُطرح من العدادات
+- reconcile_counters (مهمة دورية) تكشف الانحراف وتصلحه: حذف طلب مع تكفلاته خارج هذه
+  الوحدة، أو تعديل يدوي في القاعدة
+- لا COMMIT هنا - المسار أو المهمة يلتزم
+"""
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+
+logger = logging.getLogger(__name__)
+
+# حالة التكفل -> عداد الجمعية الذي تُحسب فيه
+ORG_COUNTERS = {
+    AssignmentStatus.PLEDGED: "active_count",
+    AssignmentStatus.IN_PROGRESS: "active_count",
+    AssignmentStatus.COMPLETED: "total_completed",
+    AssignmentStatus.FAILED: "failed_count",
+}
+
+# (الطلب، الجمعية، الحالة السابقة، الحالة الجديدة) - None للإنشاء أو الحذف
+Change = Tuple[UUID, UUID, Optional[AssignmentStatus], Optional[AssignmentStatus]]
+
+
+async def _bump(db: AsyncSession, model, deltas: Dict[UUID, Counter]) -> None:
+    """زيادة العدادات بتحديث واحد للجدول مهما تعددت الصفوف (CASE عند اختلاف الفرق)"""
+    deltas = {row_id: counter for row_id, counter in deltas.items() if any(counter.values())}
+    if not deltas:
+        return
+    values = {}
+    for column in sorted({column for counter in deltas.values() for column, delta in counter.items() if delta}):
+        by_row = {row_id: counter[column] for row_id, counter in deltas.items() if counter[column]}
+        if len(by_row) == len(deltas) and len(set(by_row.values())) == 1:
+            delta = next(iter(by_row.values()))
+        else:
+            delta = case(by_row, value=model.id, else_=0)
+        values[column] = getattr(model, column) + delta
+    # العدادات ليست تعديلاً على الصف - updated_at يبقى كما هو
+    await db.execute(
+        update(model)
+        .where(model.id.in_(deltas))
+        .values(**values, updated_at=model.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_changes(db: AsyncSession, changes: Iterable[Change]) -> None:
+    """تطبيق أثر تغييرات التكفلات على عدادات الطلبات والجمعيات"""
+    pledges: Dict[UUID, Counter] = defaultdict(Counter)
+    orgs: Dict[UUID, Counter] = defaultdict(Counter)
+    for request_id, org_id, old, new in changes:
+        if old == new:
+            continue
+        for assignment_status, sign in ((old, -1), (new, 1)):
+            if assignment_status is None:
+                continue
+            if assignment_status == AssignmentStatus.PLEDGED:
+                pledges[request_id]["pledge_count"] += sign
+            orgs[org_id][ORG_COUNTERS[assignment_status]] += sign
+    await _bump(db, Request, pledges)
+    await _bump(db, Organization, orgs)
+
+
+async def delete_assignments(db: AsyncSession, *conditions) -> int:
+    """حذف جماعي للتكفلات المطابقة مع طرحها من العدادات - يعيد عددها"""
+    result = await db.execute(
+        delete(Assignment)
+        .where(*conditions)
+        .returning(Assignment.request_id, Assignment.org_id, Assignment.status)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await apply_changes(db, [(request_id, org_id, old, None) for request_id, org_id, old in rows])
+    return len(rows)
+
+
+def _count(*conditions):
+    """عدد التكفلات المطابقة - استعلام فرعي مرتبط بالصف المحدَّث"""
+    return select(func.count(Assignment.id)).where(*conditions).scalar_subquery()
+
+
+async def reconcile_counters(db: AsyncSession) -> Dict[str, int]:
+    """
+    إعادة حساب العدادات وإصلاح المنحرف منها فقط - يعيد عدد الصفوف المصلحة
+
+    - الطلبات: فقط ما له تعهدات منتظرة أو عداد غير صفري (لا مرور على كل الطلبات)
+    - الجمعيات: كلها (جدول صغير)، بتحديث واحد للأعمدة الثلاثة
+    """
+    pledged = _count(Assignment.request_id == Request.id, Assignment.status == AssignmentStatus.PLEDGED)
+    requests = await db.execute(
+        update(Request)
+        .where(
+            or_(
+                Request.pledge_count != 0,
+                Request.id.in_(select(Assignment.request_id).where(Assignment.status == AssignmentStatus.PLEDGED)),
+            ),
+            Request.pledge_count != pledged,
+        )
+        .values(pledge_count=pledged, updated_at=Request.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+    actual = {
+        column: _count(Assignment.org_id == Organization.id, Assignment.status.in_(statuses))
+        for column, statuses in (
+            ("active_count", (AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS)),
+            ("total_completed", (AssignmentStatus.COMPLETED,)),
+            ("failed_count", (AssignmentStatus.FAILED,)),
+        )
+    }
+    orgs = await db.execute(
+        update(Organization)
+        .where(or_(*(func.coalesce(getattr(Organization, column), -1) != count for column, count in actual.items())))
+        .values(**actual, updated_at=Organization.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+    repaired = {"requests": requests.rowcount, "organizations": orgs.rowcount}
+    if any(repaired.values()):
+        logger.warning("Counter drift repaired: %s", repaired)
+    return repaired
@@ -0,0 +1,77 @@
+"""
+كشف الطلبات المكررة عند التقديم - نفس الأسرة بهاتف فرد آخر أو باسم مكتوب بشكل مختلف
+
+- المرشحون من ثلاث كتل مفهرسة في استعلام واحد (OR): الهاتف نفسه، الاسم الموحد نفسه
+  (name_key)، أو الموقع ضمن DEDUP_RADIUS_M (مديات geohash) - لا مرور على كل الطلبات
+- المقارنة على الطلبات المفتوحة فقط (المكتمل والملغي والمرفوض لا يُعد تكراراً)
+- طلبات الحساب نفسه بتصنيف آخر ليست مرشحة: الاسم والهاتف منسوخان من الحساب فيتطابقان دائماً
+- الدرجة (0-100) بأوزان DEDUP_WEIGHTS، والطلب يُعلَّم (duplicate_of_id) بأقرب مرشح
+  إن بلغت DEDUP_THRESHOLD - العلامة للمراقب فقط ولا تمنع التقديم
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import DEDUP_WEIGHTS
+from app.core.geo import bbox_condition, distance_km, radius_bbox
+from app.core.text import name_similarity
+from app.models.request import Request
+from app.services.priority_service import OPEN_STATUSES
+
+
+def duplicate_score(request: Request, other: Request) -> int:
+    """درجة التشابه بين طلبين (0-100)"""
+    location = 0.0
+    if request.latitude is not None and other.latitude is not None:
+        meters = distance_km(request.latitude, request.longitude, other.latitude, other.longitude) * 1000
+        location = max(0.0, 1 - meters / settings.DEDUP_RADIUS_M)
+    components = {
+        "phone": 1.0 if request.requester_phone == other.requester_phone else 0.0,
+        "location": location,
+        "name": name_similarity(request.name_key or "", other.name_key or ""),
+        "category": 1.0 if request.category == other.category else 0.0,
+    }
+    return round(sum(DEDUP_WEIGHTS[name] * value for name, value in components.items()))
+
+
+def _blocks(request: Request) -> list:
+    blocks = [Request.requester_phone == request.requester_phone]
+    if request.name_key:
+        blocks.append(Request.name_key == request.name_key)
+    if request.latitude is not None and request.longitude is not None:
+        bbox = radius_bbox(request.latitude, request.longitude, settings.DEDUP_RADIUS_M / 1000)
+        blocks.append(bbox_condition(Request.geohash, Request.latitude, Request.longitude, bbox))
+    return blocks
+
+
+async def find_duplicate(db: AsyncSession, request: Request) -> Optional[Tuple[Request, int]]:
+    """أقرب طلب مفتوح يشبه الطلب (قبل حفظه أو بعده) - أو None تحت العتبة"""
+    query = (
+        select(Request)
+        .where(
+            Request.status.in_(OPEN_STATUSES),
+            or_(*_blocks(request)),
+            ~and_(Request.user_id == request.user_id, Request.category != request.category),
+        )
+        .order_by(Request.created_at.desc())
+        .limit(settings.DEDUP_MAX_CANDIDATES)
+    )
+    if request.id is not None:
+        query = query.where(Request.id != request.id)
+    candidates: List[Request] = (await db.execute(query)).scalars().all()
+
+    best = max(((other, duplicate_score(request, other)) for other in candidates), key=lambda c: c[1], default=None)
+    if best is None or best[1] < settings.DEDUP_THRESHOLD:
+        return None
+    return best
+
+
+async def flag_duplicate(db: AsyncSession, request: Request) -> None:
+    """تعليم الطلب الجديد إن كان مكرراً محتملاً (بلا COMMIT)"""
+    match = await find_duplicate(db, request)
+    if match is not None:
+        other, score = match
+        request.duplicate_of_id = other.id
+        request.duplicate_score = score
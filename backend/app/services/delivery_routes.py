@@ -0,0 +1,122 @@
+"""
+تقسيم تكفلات المؤسسة قيد التنفيذ إلى دفعات توصيل مرتبة
+
+- الإحداثيات تُسقط على مستوٍ بالكيلومتر (equirectangular حول متوسط العرض) - كافٍ لمدينة أو إقليم
+- k-means (NumPy) بعدد دفعات = ceil(عدد النقاط / max_stops)، بداية k-means++ ببذرة ثابتة
+  حتى تعطي البيانات نفسها الدفعات نفسها
+- الإسناد النهائي يحترم max_stops: أزواج (نقطة، مركز) من الأقرب إلى الأبعد
+- ترتيب كل دفعة بالجار الأقرب: من نقطة الانطلاق إن وُجدت، وإلا من أبعد نقطة عن مركز الدفعة
+- المسافة تقديرية بخط مستقيم (haversine) بين المحطات المتتالية
+"""
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.core.geo import EARTH_RADIUS_KM, distance_km
+
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+_SEED = 7
+
+
+def _project(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    scale = math.cos(math.radians(float(latitudes.mean())))
+    return np.column_stack((longitudes * _KM_PER_DEGREE * scale, latitudes * _KM_PER_DEGREE))
+
+
+def _init_centroids(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++: كل مركز جديد باحتمال يتناسب مع مربع بعده عن أقرب مركز"""
+    centroids = [points[rng.integers(len(points))]]
+    nearest = ((points - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        index = rng.choice(len(points), p=nearest / total) if total > 0 else rng.integers(len(points))
+        centroids.append(points[index])
+        nearest = np.minimum(nearest, ((points - points[index]) ** 2).sum(axis=1))
+    return np.array(centroids)
+
+
+def _squared_distances(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+
+
+def kmeans(points: np.ndarray, k: int) -> np.ndarray:
+    """مراكز k-means (k × 2)"""
+    rng = np.random.default_rng(_SEED)
+    centroids = _init_centroids(points, k, rng)
+    for _ in range(settings.ROUTE_KMEANS_ITERATIONS):
+        labels = _squared_distances(points, centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, points)
+        # مركز بلا نقاط يبقى مكانه
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids
+
+
+def balanced_labels(points: np.ndarray, centroids: np.ndarray, max_stops: int) -> np.ndarray:
+    """إسناد كل نقطة لأقرب مركز ما زالت فيه سعة (الأزواج من الأقرب إلى الأبعد)"""
+    distances = _squared_distances(points, centroids)
+    labels = np.full(len(points), -1)
+    remaining = np.full(len(centroids), max_stops)
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        point, cluster = divmod(int(flat), len(centroids))
+        if labels[point] < 0 and remaining[cluster] > 0:
+            labels[point] = cluster
+            remaining[cluster] -= 1
+    return labels
+
+
+def nearest_neighbour_order(points: np.ndarray, start: Optional[np.ndarray] = None) -> List[int]:
+    """ترتيب المحطات بالجار الأقرب"""
+    unvisited = np.ones(len(points), dtype=bool)
+    if start is None:
+        # بداية من طرف الدفعة لا من وسطها
+        current = int(((points - points.mean(axis=0)) ** 2).sum(axis=1).argmax())
+    else:
+        current = int(((points - start) ** 2).sum(axis=1).argmin())
+    order = [current]
+    unvisited[current] = False
+    while unvisited.any():
+        distances = np.where(unvisited, ((points - points[current]) ** 2).sum(axis=1), np.inf)
+        current = int(distances.argmin())
+        order.append(current)
+        unvisited[current] = False
+    return order
+
+
+def route_distance(coordinates: Sequence[Tuple[float, float]], start: Optional[Tuple[float, float]] = None) -> float:
+    """مجموع المسافات بين المحطات المتتالية (من نقطة الانطلاق إن وُجدت)"""
+    path = ([start] if start else []) + list(coordinates)
+    return sum(distance_km(*a, *b) for a, b in zip(path, path[1:]))
+
+
+def plan_batches(
+    coordinates: Sequence[Tuple[float, float]],
+    max_stops: int,
+    start: Optional[Tuple[float, float]] = None,
+) -> List[List[int]]:
+    """دفعات التوصيل: قائمة لكل دفعة بأرقام النقاط مرتبة"""
+    if not coordinates:
+        return []
+    # نقطة الانطلاق (إن وُجدت) آخر صف - تُسقط مع المحطات بالمقياس نفسه
+    located = list(coordinates) + ([start] if start else [])
+    projected = _project(
+        np.array([lat for lat, _ in located], dtype=float),
+        np.array([lon for _, lon in located], dtype=float),
+    )
+    points = projected[:len(coordinates)]
+    origin = projected[-1] if start else None
+
+    k = math.ceil(len(points) / max_stops)
+    labels = balanced_labels(points, kmeans(points, k), max_stops) if k > 1 else np.zeros(len(points), dtype=int)
+    batches = []
+    for cluster in range(k):
+        members = np.flatnonzero(labels == cluster)
+        if members.size:
+            batches.append([int(members[i]) for i in nearest_neighbour_order(points[members], origin)])
+    return batches
@@ -0,0 +1,99 @@
+"""
+مزودو البريد الإلكتروني (EMAIL_PROVIDER)
+
+- console: يطبع الرسالة في السجل ويحتفظ بآخر الرسائل في الذاكرة (التطوير والاختبارات)
+- brevo: واجهة Brevo REST عبر عميل httpx المشترك
+- smtp: smtplib في خيط منفصل (لا يحجب حلقة الأحداث)
+"""
+import asyncio
+import logging
+import smtplib
+from collections import deque
+from email.message import EmailMessage
+from typing import Deque, Tuple
+
+import httpx
+
+from app.config import settings
+from app.core.http import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class EmailError(Exception):
+    """تعذر إرسال البريد"""
+
+
+class ConsoleEmailProvider:
+    """مزود وهمي - الرسائل في السجل فقط"""
+
+    _MAX_MESSAGES = 100
+
+    def __init__(self) -> None:
+        self.sent: Deque[Tuple[str, str, str]] = deque(maxlen=self._MAX_MESSAGES)
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        self.sent.append((to, subject, body))
+        logger.info("Email to %s: %s\n%s", to, subject, body)
+
+
+class BrevoEmailProvider:
+    """الإرسال عبر Brevo (Sendinblue)"""
+
+    _URL = "https://api.brevo.com/v3/smtp/email"
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        try:
+            response = await get_http_client().post(
+                self._URL,
+                headers={"api-key": settings.BREVO_API_KEY or ""},
+                json={
+                    "sender": {"email": settings.BREVO_FROM_EMAIL, "name": settings.BREVO_FROM_NAME},
+                    "to": [{"email": to}],
+                    "subject": subject,
+                    "textContent": body,
+                },
+            )
+        except httpx.HTTPError as exc:
+            raise EmailError(str(exc)) from exc
+        if response.status_code >= 400:
+            raise EmailError(f"Brevo {response.status_code}: {response.text[:200]}")
+
+
+class SMTPEmailProvider:
+    """الإرسال عبر SMTP"""
+
+    def _send_sync(self, to: str, subject: str, body: str) -> None:
+        message = EmailMessage()
+        message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
+        message["To"] = to
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=10) as server:
+            if settings.SMTP_USE_TLS:
+                server.starttls()
+            if settings.SMTP_USERNAME:
+                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD or "")
+            server.send_message(message)
+
+    async def send(self, to: str, subject: str, body: str) -> None:
+        try:
+            await asyncio.to_thread(self._send_sync, to, subject, body)
+        except (smtplib.SMTPException, OSError) as exc:
+            raise EmailError(str(exc)) from exc
+
+
+_providers = {
+    "console": ConsoleEmailProvider,
+    "brevo": BrevoEmailProvider,
+    "smtp": SMTPEmailProvider,
+}
+_provider = None
+
+
+def get_email_provider():
+    """مزود البريد حسب EMAIL_PROVIDER (يُنشأ عند أول استخدام)"""
+    global _provider
+    if _provider is None:
+        _provider = _providers.get(settings.EMAIL_PROVIDER, ConsoleEmailProvider)()
+    return _provider
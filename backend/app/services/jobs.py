@@ -0,0 +1,85 @@
+"""
+المهام الدورية - تُسجَّل في المجدول من lifespan (register_jobs)
+
+- كل مهمة تفتح جلستها الخاصة وتلتزم بنفسها
+- تنفَّذ على عامل واحد فقط (قائد المجدول)
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+
+from app import database
+from app.config import settings
+from app.core.constants import NotificationStatus
+from app.core.scheduler import Scheduler, cron, every
+from app.models.notification import Notification
+from app.models.refresh_token import RefreshToken
+from app.services.assignment_service import reconcile_counters
+from app.services.priority_service import rescore_open_requests
+from app.services.sla_service import run_sla_checks
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_refresh_tokens() -> int:
+    """حذف رموز التحديث المنتهية (لم تعد صالحة ولا لازمة لكشف إعادة الاستعمال)"""
+    async with database.async_session() as session:
+        result = await session.execute(
+            delete(RefreshToken).where(RefreshToken.expires_at < datetime.now(timezone.utc))
+        )
+        await session.commit()
+    logger.info("Purged %d expired refresh tokens", result.rowcount)
+    return result.rowcount
+
+
+async def purge_sent_notifications() -> int:
+    """حذف الإشعارات المرسلة الأقدم من NOTIFICATION_RETENTION_DAYS"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    async with database.async_session() as session:
+        result = await session.execute(
+            delete(Notification).where(
+                Notification.status == NotificationStatus.SENT.value,
+                Notification.sent_at < cutoff,
+            )
+        )
+        await session.commit()
+    logger.info("Purged %d sent notifications", result.rowcount)
+    return result.rowcount
+
+
+async def rescore_priorities() -> int:
+    """إعادة حساب أولوية الطلبات المفتوحة (نقاط الانتظار)"""
+    async with database.async_session() as session:
+        changed = await rescore_open_requests(session)
+        await session.commit()
+    logger.info("Re-scored %d open requests", changed)
+    return changed
+
+
+async def sla_sweep() -> dict:
+    """تصعيد المتأخر وإنهاء التعهدات المعلقة"""
+    async with database.async_session() as session:
+        counts = await run_sla_checks(session)
+    if any(counts.values()):
+        logger.info("SLA sweep: %s", counts)
+    return counts
+
+
+async def reconcile_assignment_counters() -> dict:
+    """إصلاح انحراف عدادات التعهدات والتكفلات عن جدول التكفلات"""
+    async with database.async_session() as session:
+        repaired = await reconcile_counters(session)
+        await session.commit()
+    return repaired
+
+
+def register_jobs(scheduler: Scheduler) -> None:
+    """تسجيل جميع المهام الدورية"""
+    scheduler.add("purge_expired_refresh_tokens", cron("15 3 * * *"), purge_expired_refresh_tokens)
+    scheduler.add("purge_sent_notifications", cron("30 3 * * *"), purge_sent_notifications)
+    scheduler.add("sla_sweep", every(settings.SLA_CHECK_INTERVAL_SECONDS), sla_sweep)
+    scheduler.add("rescore_priorities", every(settings.PRIORITY_RESCORE_INTERVAL_SECONDS), rescore_priorities)
+    scheduler.add(
+        "reconcile_assignment_counters", every(settings.COUNTER_RECONCILE_INTERVAL_SECONDS), reconcile_assignment_counters,
+    )
@@ -0,0 +1,241 @@
+"""
+تجميع الطلبات على الخريطة - خلايا geohash بدقة تتبع مستوى التكبير
+
+- الاستجابة بعدد خلايا النافذة (حد أقصى MAP_MAX_CELLS) لا بعدد الطلبات
+- كل خلية (الدقة، البادئة) تُخزن في Redis (أو الذاكرة) لمدة MAP_CLUSTER_CACHE_SECONDS،
+  والخلايا الناقصة فقط تُحسب باستعلام GROUP BY واحد على مديات فهرس geohash
+- أي تغيير على طلب (إنشاء، حالة، تصنيف، استعجال، موقع، حذف) يحذف خلاياه بكل الدقات
+  بعد COMMIT (الموقع القديم والجديد) - مدة الصلاحية حد أعلى فقط لقراءة سبقت COMMIT
+- لا يُقرأ من النسخة المتماثلة: قراءة متأخرة بعد الحذف تعيد تخزين بيانات قديمة
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.geo import BBox, bbox_cell_count, bbox_cells, prefix_condition
+from app.core.redis import get_redis
+from app.database import WriteSession
+from app.models.request import Request
+
+logger = logging.getLogger(__name__)
+
+# مستوى التكبير (0-20) -> دقة geohash: بضع عشرات من الخلايا على عرض الشاشة
+_ZOOM_PRECISION = (1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 8, 8, 8, 8)
+MAX_ZOOM = len(_ZOOM_PRECISION) - 1
+MAX_PRECISION = max(_ZOOM_PRECISION)
+# أقصى عدد مديات في استعلام حساب الخلايا الناقصة
+_MAX_QUERY_PREFIXES = 12
+# الأعمدة التي تغير ملخص الخلية
+_TRACKED_ATTRIBUTES = ("status", "category", "is_urgent", "geohash")
+
+
+def _key(cell: str) -> str:
+    return f"map:{len(cell)}:{cell}"
+
+
+def _cell_keys(geohash: str) -> List[str]:
+    """مفاتيح جميع الخلايا (بكل الدقات) التي تحتوي النقطة"""
+    return [_key(geohash[:precision]) for precision in range(1, MAX_PRECISION + 1)]
+
+
+class _MemoryMapCache:
+    """تخزين الخلايا في الذاكرة - بديل محلي عند غياب Redis"""
+
+    _MAX_KEYS = 50_000
+
+    def __init__(self) -> None:
+        self._cells: Dict[str, Tuple[str, float]] = {}
+
+    def get_many(self, keys: List[str], now: float) -> List[Optional[str]]:
+        values = []
+        for key in keys:
+            entry = self._cells.get(key)
+            values.append(entry[0] if entry is not None and entry[1] > now else None)
+        return values
+
+    def set_many(self, items: Dict[str, str], ttl: int, now: float) -> None:
+        if len(self._cells) + len(items) > self._MAX_KEYS:
+            self._cells.clear()
+        for key, value in items.items():
+            self._cells[key] = (value, now + ttl)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._cells.pop(key, None)
+
+    def reset(self) -> None:
+        self._cells.clear()
+
+
+class MapClusterCache:
+    """ملخصات الخلايا - Redis مع بديل في الذاكرة؛ تعطل Redis يعني الحساب من القاعدة"""
+
+    def __init__(self) -> None:
+        self._memory = _MemoryMapCache()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        redis = get_redis()
+        if redis is None:
+            return self._memory.get_many(keys, time.monotonic())
+        try:
+            return await redis.mget(keys)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Map cache read failed: %s", exc)
+            return [None] * len(keys)
+
+    async def set_many(self, items: Dict[str, str]) -> None:
+        ttl = settings.MAP_CLUSTER_CACHE_SECONDS
+        redis = get_redis()
+        if redis is None:
+            self._memory.set_many(items, ttl, time.monotonic())
+            return
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, value, ex=ttl)
+                await pipe.execute()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Map cache write failed: %s", exc)
+
+    async def _delete(self, redis, keys: List[str]) -> None:
+        try:
+            await redis.delete(*keys)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Map cache invalidation failed: %s", exc)
+
+    def invalidate(self, geohashes: Iterable[str]) -> None:
+        """حذف خلايا النقاط المتغيرة (يُستدعى بعد COMMIT - بلا انتظار)"""
+        keys = sorted({key for geohash in geohashes if geohash for key in _cell_keys(geohash)})
+        if not keys:
+            return
+        redis = get_redis()
+        if redis is None:
+            self._memory.delete(keys)
+            return
+        task = asyncio.get_running_loop().create_task(self._delete(redis, keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def reset(self) -> None:
+        self._memory.reset()
+
+
+map_cache = MapClusterCache()
+
+
+def mark_changed(session: AsyncSession, geohashes: Iterable[Optional[str]]) -> None:
+    """تسجيل مواقع تغيرت عبر تحديث/حذف جماعي (لا يراه after_flush)"""
+    session.sync_session.info.setdefault("map_geohashes", set()).update(g for g in geohashes if g)
+
+
+@event.listens_for(WriteSession, "after_flush")
+def _collect_changed_cells(session, flush_context):
+    changed = session.info.setdefault("map_geohashes", set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Request) and obj.geohash:
+            changed.add(obj.geohash)
+    for obj in session.dirty:
+        if not isinstance(obj, Request):
+            continue
+        attrs = inspect(obj).attrs
+        if any(attrs[name].history.has_changes() for name in _TRACKED_ATTRIBUTES):
+            changed.update(g for g in (obj.geohash, *attrs.geohash.history.deleted) if g)
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _invalidate_after_commit(session):
+    changed = session.info.pop("map_geohashes", None)
+    if changed:
+        map_cache.invalidate(changed)
+
+
+@event.listens_for(WriteSession, "after_rollback")
+def _discard_changed_cells(session):
+    session.info.pop("map_geohashes", None)
+
+
+def precision_for(zoom: int, bbox: BBox) -> int:
+    """دقة الخلايا لمستوى التكبير - تُخفض إن تجاوزت النافذة MAP_MAX_CELLS"""
+    precision = _ZOOM_PRECISION[zoom]
+    while precision > 1 and bbox_cell_count(bbox, precision) > settings.MAP_MAX_CELLS:
+        precision -= 1
+    return precision
+
+
+def _query_prefixes(cells: List[str]) -> List[str]:
+    """أدق بادئات مشتركة تغطي الخلايا بعدد لا يتجاوز _MAX_QUERY_PREFIXES"""
+    for precision in range(len(cells[0]), 0, -1):
+        prefixes = sorted({cell[:precision] for cell in cells})
+        if len(prefixes) <= _MAX_QUERY_PREFIXES:
+            return prefixes
+    return sorted({cell[:1] for cell in cells})
+
+
+async def _compute(db: AsyncSession, cells: List[str]) -> Dict[str, dict]:
+    precision = len(cells[0])
+    cell = func.substr(Request.geohash, 1, precision).label("cell")
+    result = await db.execute(
+        select(
+            cell,
+            Request.status,
+            Request.category,
+            func.count(Request.id),
+            func.sum(Request.is_urgent),
+            func.sum(Request.latitude),
+            func.sum(Request.longitude),
+        )
+        .where(prefix_condition(Request.geohash, _query_prefixes(cells)))
+        .group_by(cell, Request.status, Request.category)
+    )
+
+    wanted = set(cells)
+    clusters: Dict[str, dict] = {}
+    for prefix, status, category, count, urgent, lat_sum, lon_sum in result.all():
+        if prefix not in wanted:
+            continue
+        entry = clusters.setdefault(prefix, {
+            "count": 0, "urgent": 0, "lat_sum": 0.0, "lon_sum": 0.0, "by_status": {}, "by_category": {},
+        })
+        entry["count"] += count
+        entry["urgent"] += urgent or 0
+        entry["lat_sum"] += lat_sum
+        entry["lon_sum"] += lon_sum
+        entry["by_status"][status.value] = entry["by_status"].get(status.value, 0) + count
+        entry["by_category"][category.value] = entry["by_category"].get(category.value, 0) + count
+
+    for entry in clusters.values():
+        # مركز الثقل لرسم الدبوس حيث تتركز الطلبات لا في وسط الخلية
+        entry["latitude"] = round(entry.pop("lat_sum") / entry["count"], 6)
+        entry["longitude"] = round(entry.pop("lon_sum") / entry["count"], 6)
+    return clusters
+
+
+async def get_clusters(db: AsyncSession, bbox: BBox, zoom: int) -> Tuple[int, List[dict]]:
+    """خلايا النافذة غير الفارغة - يعيد (الدقة، الخلايا)"""
+    precision = precision_for(zoom, bbox)
+    cells = bbox_cells(bbox, precision)
+
+    found: Dict[str, dict] = {}
+    missing = []
+    for cell, value in zip(cells, await map_cache.get_many([_key(cell) for cell in cells])):
+        if value is None:
+            missing.append(cell)
+        elif value:
+            found[cell] = json.loads(value)
+
+    if missing:
+        computed = await _compute(db, missing)
+        found.update(computed)
+        # الخلايا الفارغة تُخزن أيضاً (نص فارغ) حتى لا تُحسب مع كل تحريك للخريطة
+        await map_cache.set_many({
+            _key(cell): json.dumps(computed[cell]) if cell in computed else "" for cell in missing
+        })
+
+    return precision, [{"cell": cell, **found[cell]} for cell in cells if cell in found]
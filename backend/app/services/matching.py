@@ -0,0 +1,307 @@
+"""
+مطابقة الجمعيات بالطلبات - ترتيب الجمعيات النشطة لطلب أو لطابور الطلبات المفتوحة
+
+- فهرس في الذاكرة لكل عامل: ملف لكل جمعية نشطة (الخدمات، المناطق، العبء الحالي،
+  الإتمام والفشل، ومركز مواقع طلباتها السابقة) مع فهرس حسب نوع الخدمة
+- أي تغيير على جمعية أو تكفل يعلّم الجمعية بعد COMMIT، وتُعاد قراءة المعلَّمة فقط
+  (استعلامان) عند الطلب التالي؛ إعادة بناء كاملة كل MATCHING_INDEX_REFRESH_SECONDS
+  لتغييرات العمال الآخرين والتحديثات الجماعية (SLA)
+- الترتيب نفسه بلا قاعدة بيانات: المرشحون من فهرس الخدمة ثم أفضل k (heapq)
+- الأوزان في constants.py::MATCH_WEIGHTS
+"""
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import MATCH_WEIGHTS, AssignmentStatus, OrganizationStatus, RequestStatus
+from app.core.geo import distance_km
+from app.database import WriteSession
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+
+# الطلبات التي تنتظر جمعية (نفس شرط الربط من المراقب)
+MATCHABLE_STATUSES = (RequestStatus.PENDING, RequestStatus.NEW)
+_ACTIVE_ASSIGNMENTS = (AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS)
+
+
+def normalize_label(value) -> str:
+    """توحيد أسماء الخدمات والمناطق للمقارنة (المسافات وحالة الأحرف)"""
+    return " ".join(str(value).split()).casefold()
+
+
+@dataclass
+class OrgProfile:
+    """ما يلزم لترتيب جمعية - يُبنى من الجمعية وتجميع تكفلاتها"""
+    id: UUID
+    name: str
+    services: FrozenSet[str]
+    areas: FrozenSet[str]
+    active: int = 0
+    completed: int = 0
+    failed: int = 0
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+class _Target(NamedTuple):
+    """حقول الطلب المستعملة في الترتيب - تُطبَّع مرة واحدة لكل طلب لا لكل جمعية"""
+    category: str
+    region: Optional[str]
+    city: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+
+def _target(request: Request) -> _Target:
+    return _Target(
+        request.category.value,
+        normalize_label(request.region) if request.region else None,
+        normalize_label(request.city) if request.city else None,
+        request.latitude,
+        request.longitude,
+    )
+
+
+def _coverage(profile: OrgProfile, target: _Target) -> float:
+    if not profile.areas:
+        return 0.5  # بلا مناطق محددة = تعمل في كل مكان بدرجة أقل من التغطية المصرح بها
+    if target.region in profile.areas:
+        return 1.0
+    if target.city in profile.areas:
+        return 0.8
+    return 0.0
+
+
+def _components(profile: OrgProfile, target: _Target) -> Tuple[Dict[str, float], Optional[float]]:
+    distance = None
+    if target.latitude is not None and profile.latitude is not None:
+        distance = distance_km(target.latitude, target.longitude, profile.latitude, profile.longitude)
+    workload_half = settings.MATCHING_WORKLOAD_HALF
+    components = {
+        "category": 1.0 if target.category in profile.services else 0.5,
+        "coverage": _coverage(profile, target),
+        # بلا إحداثيات: قيمة محايدة لا تفضل أحداً
+        "distance": 0.5 if distance is None else max(0.0, 1 - distance / settings.MATCHING_MAX_DISTANCE_KM),
+        "workload": workload_half / (workload_half + profile.active),
+        # تنعيم لابلاس: جمعية جديدة تبدأ من 0.5
+        "reliability": (profile.completed + 1) / (profile.completed + profile.failed + 2),
+    }
+    return components, distance
+
+
+def _score(profile: OrgProfile, target: _Target) -> float:
+    components, _ = _components(profile, target)
+    return sum(MATCH_WEIGHTS[name] * value for name, value in components.items())
+
+
+def _describe(profile: OrgProfile, target: _Target) -> dict:
+    components, distance = _components(profile, target)
+    return {
+        "organization_id": str(profile.id),
+        "name": profile.name,
+        "score": round(sum(MATCH_WEIGHTS[name] * value for name, value in components.items()), 2),
+        "components": {name: round(value, 3) for name, value in components.items()},
+        "distance_km": None if distance is None else round(distance, 2),
+        "active_assignments": profile.active,
+    }
+
+
+async def _load_profiles(db: AsyncSession, org_ids: Optional[Set[UUID]] = None) -> Dict[UUID, OrgProfile]:
+    """ملفات الجمعيات النشطة (كلها أو المحددة فقط) - استعلامان"""
+    query = select(
+        Organization.id, Organization.name, Organization.service_types, Organization.coverage_areas,
+    ).where(Organization.status == OrganizationStatus.ACTIVE)
+    stats = (
+        select(
+            Assignment.org_id,
+            Assignment.status,
+            func.count(Assignment.id),
+            func.count(Request.latitude),
+            func.sum(Request.latitude),
+            func.sum(Request.longitude),
+        )
+        .join(Request, Request.id == Assignment.request_id)
+        .group_by(Assignment.org_id, Assignment.status)
+    )
+    if org_ids is not None:
+        query = query.where(Organization.id.in_(org_ids))
+        stats = stats.where(Assignment.org_id.in_(org_ids))
+
+    profiles = {
+        org_id: OrgProfile(
+            id=org_id,
+            name=name,
+            services=frozenset(normalize_label(s) for s in service_types or []),
+            areas=frozenset(normalize_label(a) for a in coverage_areas or []),
+        )
+        for org_id, name, service_types, coverage_areas in (await db.execute(query)).all()
+    }
+
+    located: Dict[UUID, List[float]] = {}
+    for org_id, status, count, with_location, lat_sum, lon_sum in (await db.execute(stats)).all():
+        profile = profiles.get(org_id)
+        if profile is None:
+            continue
+        if status in _ACTIVE_ASSIGNMENTS:
+            profile.active += count
+        elif status == AssignmentStatus.COMPLETED:
+            profile.completed += count
+        elif status == AssignmentStatus.FAILED:
+            profile.failed += count
+        if with_location and status != AssignmentStatus.FAILED:
+            totals = located.setdefault(org_id, [0, 0.0, 0.0])
+            totals[0] += with_location
+            totals[1] += lat_sum
+            totals[2] += lon_sum
+    for org_id, (count, lat_sum, lon_sum) in located.items():
+        profiles[org_id].latitude = lat_sum / count
+        profiles[org_id].longitude = lon_sum / count
+    return profiles
+
+
+class OrgIndex:
+    """فهرس الجمعيات النشطة في الذاكرة"""
+
+    def __init__(self) -> None:
+        self._orgs: Dict[UUID, OrgProfile] = {}
+        self._by_service: Dict[str, Set[UUID]] = {}
+        self._general: Set[UUID] = set()  # بلا أنواع خدمات = مرشحة لكل التصنيفات
+        self._stale: Set[UUID] = set()
+        self._built_at: Optional[float] = None
+
+    def mark_stale(self, org_ids: Iterable[UUID]) -> None:
+        self._stale.update(org_ids)
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def profiles(self) -> List[OrgProfile]:
+        return list(self._orgs.values())
+
+    def _add(self, profile: OrgProfile) -> None:
+        self._orgs[profile.id] = profile
+        if not profile.services:
+            self._general.add(profile.id)
+        for service in profile.services:
+            self._by_service.setdefault(service, set()).add(profile.id)
+
+    def _remove(self, org_id: UUID) -> None:
+        profile = self._orgs.pop(org_id, None)
+        if profile is None:
+            return
+        self._general.discard(org_id)
+        for service in profile.services:
+            self._by_service.get(service, set()).discard(org_id)
+
+    async def ensure_fresh(self, db: AsyncSession) -> None:
+        """إعادة قراءة الجمعيات المعلَّمة، أو بناء كامل إن انتهت المدة"""
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at >= settings.MATCHING_INDEX_REFRESH_SECONDS:
+            # التعليمات تُفرغ قبل القراءة: ما يُعلَّم أثناءها يُقرأ في المرة التالية
+            self._stale.clear()
+            profiles = await _load_profiles(db)
+            self._orgs, self._by_service, self._general = {}, {}, set()
+            for profile in profiles.values():
+                self._add(profile)
+            self._built_at = now
+        elif self._stale:
+            stale, self._stale = self._stale, set()
+            profiles = await _load_profiles(db, stale)
+            for org_id in stale:
+                self._remove(org_id)
+                if org_id in profiles:
+                    self._add(profiles[org_id])
+
+    def top(self, request: Request, limit: int, exclude: FrozenSet[UUID] = frozenset()) -> List[dict]:
+        """أفضل limit جمعية لطلب - بلا قاعدة بيانات"""
+        target = _target(request)
+        candidates = self._by_service.get(target.category, set()) | self._general
+        # النقاط فقط للمرشحين، والتفصيل لأفضل limit
+        best = heapq.nlargest(
+            limit,
+            (self._orgs[org_id] for org_id in candidates if org_id not in exclude),
+            key=lambda profile: _score(profile, target),
+        )
+        return [_describe(profile, target) for profile in best]
+
+
+org_index = OrgIndex()
+
+
+async def load_exclusions(db: AsyncSession, request_ids: List[UUID]) -> Dict[UUID, Set[UUID]]:
+    """الجمعيات التي سبق لها تكفل بالطلب (نشط أو فاشل) - لا تُقترح مجدداً"""
+    result = await db.execute(
+        select(Assignment.request_id, Assignment.org_id)
+        .where(Assignment.request_id.in_(request_ids), Assignment.status != AssignmentStatus.COMPLETED)
+    )
+    excluded: Dict[UUID, Set[UUID]] = {}
+    for request_id, org_id in result.all():
+        excluded.setdefault(request_id, set()).add(org_id)
+    return excluded
+
+
+async def match_request(db: AsyncSession, request: Request, limit: int) -> List[dict]:
+    """أفضل الجمعيات لطلب واحد"""
+    await org_index.ensure_fresh(db)
+    excluded = await load_exclusions(db, [request.id])
+    return org_index.top(request, limit, frozenset(excluded.get(request.id, ())))
+
+
+async def match_queue(db: AsyncSession, queue_limit: int, limit: int) -> List[dict]:
+    """أفضل الجمعيات لكل طلب في الطابور (الأعلى أولوية أولاً) - عدد استعلامات ثابت"""
+    result = await db.execute(
+        select(Request)
+        .where(Request.status.in_(MATCHABLE_STATUSES))
+        .order_by(Request.priority_score.desc(), Request.created_at)
+        .limit(queue_limit)
+    )
+    requests = result.scalars().all()
+    if not requests:
+        return []
+    await org_index.ensure_fresh(db)
+    excluded = await load_exclusions(db, [r.id for r in requests])
+    return [
+        {
+            "request_id": str(r.id),
+            "category": r.category.value,
+            "priority_score": r.priority_score,
+            "matches": org_index.top(r, limit, frozenset(excluded.get(r.id, ()))),
+        }
+        for r in requests
+    ]
+
+
+def mark_changed(session: AsyncSession, org_ids: Iterable[UUID]) -> None:
+    """تسجيل جمعيات تغيرت تكفلاتها عبر تحديث جماعي (لا يراه after_flush)"""
+    session.sync_session.info.setdefault("matching_org_ids", set()).update(org_ids)
+
+
+@event.listens_for(WriteSession, "after_flush")
+def _collect_changed_orgs(session, flush_context):
+    changed = session.info.setdefault("matching_org_ids", set())
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if isinstance(obj, Organization):
+            changed.add(obj.id)
+        elif isinstance(obj, Assignment):
+            # تكفل جديد أو تغيرت حالته/جمعيته: العبء والإحصائيات تتغير
+            changed.update(org_id for org_id in (obj.org_id, *inspect(obj).attrs.org_id.history.deleted) if org_id)
+    changed.discard(None)
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _mark_after_commit(session):
+    changed = session.info.pop("matching_org_ids", None)
+    if changed:
+        org_index.mark_stale(changed)
+
+
+@event.listens_for(WriteSession, "after_rollback")
+def _discard_changed_orgs(session):
+    session.info.pop("matching_org_ids", None)
@@ -0,0 +1,189 @@
+"""
+الإشعارات - صندوق صادر (outbox) في قاعدة البيانات وعمال إرسال في الخلفية
+
+- المعالجات تضيف الإشعار للجلسة فقط (notify_request): يُحفظ مع تغيير الحالة في
+  نفس المعاملة، ولا يضيف أي انتظار لشبكة خارجية إلى زمن الطلب
+- العامل يحجز دفعة (FOR UPDATE SKIP LOCKED + مهلة حجز) فيعمل عدة عمال بأمان معاً،
+  ويرسلها بالتوازي بحد أقصى لكل مزود، ثم يحفظ النتائج بتحديث واحد
+- الفشل يعاد بتأخير أُسّي حتى NOTIFICATION_MAX_ATTEMPTS ثم يُعلَّم failed
+- العامل الذي يتوقف أثناء الإرسال تعود دفعته تلقائياً بعد انتهاء مهلة الحجز
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+from app.core.constants import NOTIFICATION_TEMPLATES, NotificationChannel, NotificationStatus
+from app.core.metrics import NOTIFICATIONS_DELIVERED
+from app.core.security import generate_tracking_code
+from app.models.notification import Notification
+from app.models.request import Request
+from app.services.email import get_email_provider
+from app.services.sms import get_sms_provider
+
+logger = logging.getLogger(__name__)
+
+
+def notify(
+    db: AsyncSession,
+    event: str,
+    recipient: str,
+    body: str,
+    channel: NotificationChannel = NotificationChannel.SMS,
+    subject: Optional[str] = None,
+    request_id=None,
+) -> None:
+    """إضافة إشعار إلى صندوق الصادر (يُحفظ مع معاملة المستدعي)"""
+    db.add(Notification(
+        event=event,
+        channel=channel.value,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        request_id=request_id,
+    ))
+
+
+def notify_request(
+    db: AsyncSession,
+    request: Request,
+    event: str,
+    recipient: Optional[str] = None,
+    **context,
+) -> None:
+    """
+    إشعار بتغيير حالة طلب (نص الرسالة من NOTIFICATION_TEMPLATES)
+
+    - المستلم افتراضياً صاحب الطلب
+    """
+    recipient = recipient or request.requester_phone
+    if not recipient:
+        return
+    body = NOTIFICATION_TEMPLATES[event].format(code=generate_tracking_code(request.id), **context)
+    notify(db, event, recipient, body, request_id=request.id)
+
+
+class NotificationDispatcher:
+    """سحب صندوق الصادر وإرساله على دفعات"""
+
+    def __init__(self, session_factory=None) -> None:
+        self._session_factory = session_factory
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _sessions(self):
+        return (self._session_factory or database.async_session)()
+
+    def _limit(self, channel: str) -> asyncio.Semaphore:
+        # حد التوازي لكل مزود - تُنشأ داخل الحلقة الجارية
+        if channel not in self._limits:
+            size = (
+                settings.NOTIFICATION_EMAIL_CONCURRENCY
+                if channel == NotificationChannel.EMAIL.value
+                else settings.NOTIFICATION_SMS_CONCURRENCY
+            )
+            self._limits[channel] = asyncio.Semaphore(size)
+        return self._limits[channel]
+
+    async def _claim(self, session: AsyncSession, now: datetime) -> List:
+        """حجز دفعة مستحقة - الحجز يؤجل next_attempt_at بمهلة NOTIFICATION_LEASE_SECONDS"""
+        due = (
+            select(Notification.id)
+            .where(
+                Notification.status == NotificationStatus.PENDING.value,
+                Notification.next_attempt_at <= now,
+            )
+            .order_by(Notification.next_attempt_at)
+            .limit(settings.NOTIFICATION_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.id.in_(due))
+            .values(
+                attempts=Notification.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS),
+            )
+            .returning(
+                Notification.id,
+                Notification.channel,
+                Notification.recipient,
+                Notification.subject,
+                Notification.body,
+                Notification.attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        await session.commit()
+        return rows
+
+    async def _deliver(self, row) -> Optional[str]:
+        """إرسال إشعار واحد - يعيد نص الخطأ أو None عند النجاح"""
+        async with self._limit(row.channel):
+            try:
+                if row.channel == NotificationChannel.EMAIL.value:
+                    await get_email_provider().send(row.recipient, row.subject or "KSAR", row.body)
+                else:
+                    await get_sms_provider().send(row.recipient, row.body)
+            except Exception as exc:  # noqa: BLE001
+                return str(exc)[:500] or exc.__class__.__name__
+        return None
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> timedelta:
+        return timedelta(seconds=settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+    async def drain_once(self) -> int:
+        """دفعة واحدة: حجز ثم إرسال ثم حفظ النتائج - يعيد عدد الإشعارات المعالجة"""
+        async with self._sessions() as session:
+            now = datetime.now(timezone.utc)
+            rows = await self._claim(session, now)
+            if not rows:
+                return 0
+
+            errors = await asyncio.gather(*(self._deliver(row) for row in rows))
+
+            now = datetime.now(timezone.utc)
+            changes = []
+            for row, error in zip(rows, errors):
+                if error is None:
+                    result = NotificationStatus.SENT
+                    changes.append({"id": row.id, "status": result.value, "sent_at": now, "last_error": None})
+                elif row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                    result = NotificationStatus.FAILED
+                    changes.append({"id": row.id, "status": result.value, "last_error": error})
+                    logger.error("Notification %s failed permanently: %s", row.id, error)
+                else:
+                    result = NotificationStatus.PENDING
+                    changes.append({
+                        "id": row.id,
+                        "last_error": error,
+                        "next_attempt_at": now + self._retry_delay(row.attempts),
+                    })
+                NOTIFICATIONS_DELIVERED.labels(row.channel, result.value).inc()
+
+            # تحديث بالمفتاح الأساسي - دفعات executemany حسب الأعمدة المتغيرة
+            await session.execute(update(Notification), changes)
+            await session.commit()
+            return len(rows)
+
+    async def run(self) -> None:
+        """حلقة العامل - تفرغ الصندوق بلا توقف ما دامت الدفعات ممتلئة"""
+        while True:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.error("Notification dispatcher error: %s", exc)
+                processed = 0
+            if processed < settings.NOTIFICATION_BATCH_SIZE:
+                await asyncio.sleep(settings.NOTIFICATION_POLL_SECONDS)
+
+
+notification_dispatcher = NotificationDispatcher()
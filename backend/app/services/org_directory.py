@@ -0,0 +1,235 @@
+"""
+دليل الجمعيات في الذاكرة - لقطة لكل عامل بدل استعلام الجمعية في كل طلب
+
+- كل الجمعيات (الدخول يحتاج المعلقة والموقوفة أيضاً) حسب id وحسب user_id،
+  وactive() للجمعيات النشطة مرتبة بالاسم
+- يُحمَّل عند بدء التشغيل، ثم يُعاد تحميله كاملاً (استعلام واحد) عند أول قراءة بعد أي تغيير:
+  - تغييرات العامل نفسه: أي جمعية في after_flush تعلّم اللقطة بعد COMMIT
+  - تغييرات العمال الآخرين: رقم إصدار في Redis (INCR بعد COMMIT) يُفحص كل
+    ORG_DIRECTORY_POLL_SECONDS
+  - إعادة تحميل كاملة كل ORG_DIRECTORY_REFRESH_SECONDS لما فات (Redis معطل أو غائب)
+- التحديثات الجماعية (update(Organization)) لا يراها after_flush: mark_changed
+- التحميل دائماً من القاعدة الأساسية بجلسته الخاصة، لا بجلسة المعالج: لقطة من نسخة
+  متماثلة متأخرة بعد التغيير تبقى معتمدة حتى ORG_DIRECTORY_REFRESH_SECONDS
+- المداخل للقراءة فقط (frozen) - للتعديل تُقرأ الجمعية من القاعدة
+- get_organization_names: أسماء الجمعيات المتكفلة لقوائم المواطن والتتبع العام من الدليل
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import AssignmentStatus, OrganizationStatus
+from app.core.redis import get_redis
+from app import database
+from app.database import WriteSession
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "orgs:version"
+
+
+@dataclass(frozen=True)
+class OrgEntry:
+    """بيانات الجمعية التي تقرأها المعالجات"""
+    id: UUID
+    user_id: UUID
+    name: str
+    description: Optional[str]
+    status: OrganizationStatus
+    contact_phone: Optional[str]
+    contact_email: Optional[str]
+    service_types: Tuple[str, ...]
+    coverage_areas: Tuple[str, ...]
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == OrganizationStatus.ACTIVE
+
+    @classmethod
+    def from_model(cls, org: Organization) -> "OrgEntry":
+        return cls(
+            id=org.id,
+            user_id=org.user_id,
+            name=org.name,
+            description=org.description,
+            status=org.status,
+            contact_phone=org.contact_phone,
+            contact_email=org.contact_email,
+            service_types=tuple(org.service_types or ()),
+            coverage_areas=tuple(org.coverage_areas or ()),
+        )
+
+
+class OrgDirectory:
+    """لقطة الجمعيات في الذاكرة"""
+
+    def __init__(self) -> None:
+        self._by_id: Dict[UUID, OrgEntry] = {}
+        self._by_user: Dict[UUID, OrgEntry] = {}
+        self._active: List[OrgEntry] = []
+        self._stale = True
+        self._version: Optional[str] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._loading: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def reset(self) -> None:
+        self.__init__()
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    async def _read_version(self) -> Optional[str]:
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            return await redis.get(_VERSION_KEY)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Organization directory version read failed: %s", exc)
+            return self._version
+
+    async def load(self) -> None:
+        """تحميل كامل - من يطلبه أثناء تحميل جارٍ ينتظر التحميل نفسه بدل استعلام آخر"""
+        if self._loading is not None:
+            await asyncio.shield(self._loading)
+            return
+        self._loading = asyncio.get_running_loop().create_task(self._load())
+        try:
+            await asyncio.shield(self._loading)
+        finally:
+            self._loading = None
+
+    async def _load(self) -> None:
+        # الإصدار و_stale قبل الاستعلام: تغيير أثناءه يُلتقط في الفحص التالي،
+        # وفشل التحميل يعيد _stale فيُعاد المحاولة عند القراءة التالية
+        self._stale = False
+        try:
+            version = await self._read_version()
+            async with database.read_session() as db:
+                result = await db.execute(select(Organization))
+                entries = [OrgEntry.from_model(org) for org in result.scalars().all()]
+        except Exception:
+            self._stale = True
+            raise
+        self._by_id = {entry.id: entry for entry in entries}
+        self._by_user = {entry.user_id: entry for entry in entries}
+        self._active = sorted((entry for entry in entries if entry.is_active), key=lambda entry: entry.name)
+        self._version = version
+        self._loaded_at = self._checked_at = time.monotonic()
+
+    async def ensure_fresh(self) -> None:
+        """إعادة التحميل إن تغيرت الجمعيات - بلا استعلام في الحالة العادية"""
+        now = time.monotonic()
+        if self._stale or now - self._loaded_at >= settings.ORG_DIRECTORY_REFRESH_SECONDS:
+            await self.load()
+        elif now - self._checked_at >= settings.ORG_DIRECTORY_POLL_SECONDS:
+            self._checked_at = now
+            if await self._read_version() != self._version:
+                await self.load()
+
+    def get(self, org_id: UUID) -> Optional[OrgEntry]:
+        return self._by_id.get(org_id)
+
+    def for_user(self, user_id: UUID) -> Optional[OrgEntry]:
+        return self._by_user.get(user_id)
+
+    def active(self) -> List[OrgEntry]:
+        return list(self._active)
+
+    async def _bump(self, redis) -> None:
+        try:
+            await redis.incr(_VERSION_KEY)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Organization directory version bump failed: %s", exc)
+
+    def invalidate(self) -> None:
+        """تعليم اللقطة وإبلاغ العمال الآخرين (يُستدعى بعد COMMIT - بلا انتظار)"""
+        self._stale = True
+        redis = get_redis()
+        if redis is None:
+            return
+        task = asyncio.get_running_loop().create_task(self._bump(redis))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+org_directory = OrgDirectory()
+
+
+async def get_org(org_id: UUID) -> Optional[OrgEntry]:
+    await org_directory.ensure_fresh()
+    return org_directory.get(org_id)
+
+
+async def get_user_org(user_id: UUID) -> Optional[OrgEntry]:
+    await org_directory.ensure_fresh()
+    return org_directory.for_user(user_id)
+
+
+async def active_orgs() -> List[OrgEntry]:
+    await org_directory.ensure_fresh()
+    return org_directory.active()
+
+
+async def get_organization_names(db: AsyncSession, request_ids: List[UUID]) -> Dict[UUID, str]:
+    """
+    اسم الجمعية المتكفلة بكل طلب - التكفلات باستعلام واحد والأسماء من الدليل
+
+    - التكفل المعتمد (قيد التنفيذ/مكتمل) له الأولوية على التعهدات المنتظرة
+    """
+    if not request_ids:
+        return {}
+    result = await db.execute(
+        select(Assignment.request_id, Assignment.org_id)
+        .where(
+            Assignment.request_id.in_(request_ids),
+            Assignment.status != AssignmentStatus.FAILED,
+        )
+        .order_by(
+            case(
+                (Assignment.status.in_([AssignmentStatus.IN_PROGRESS, AssignmentStatus.COMPLETED]), 0),
+                else_=1,
+            ),
+            Assignment.created_at.asc(),
+        )
+    )
+    await org_directory.ensure_fresh()
+    names: Dict[UUID, str] = {}
+    for request_id, org_id in result.all():
+        org = org_directory.get(org_id)
+        if org is not None:
+            names.setdefault(request_id, org.name)
+    return names
+
+
+def mark_changed(session: AsyncSession) -> None:
+    """تسجيل تغيير جمعية عبر تحديث جماعي (لا يراه after_flush)"""
+    session.sync_session.info["orgs_changed"] = True
+
+
+@event.listens_for(WriteSession, "after_flush")
+def _collect_changed_orgs(session, flush_context):
+    if any(isinstance(obj, Organization) for obj in (*session.new, *session.deleted, *session.dirty)):
+        session.info["orgs_changed"] = True
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("orgs_changed", False):
+        org_directory.invalidate()
+
+
+@event.listens_for(WriteSession, "after_rollback")
+def _discard_changed_orgs(session):
+    session.info.pop("orgs_changed", None)
@@ -0,0 +1,238 @@
+"""
+رموز التحقق (OTP) للهاتف - في Redis فقط، بلا أي استعلام لقاعدة البيانات
+
+- الرمز يُخزن مُجزّأً (HMAC-SHA256 بمفتاح JWT) مع TTL = OTP_EXPIRE_MINUTES
+- فترة الانتظار بين رسالتين (OTP_COOLDOWN_SECONDS) وعداد المحاولات (OTP_MAX_ATTEMPTS)
+  يُطبقان ذرياً بسكربت Lua واحد لكل عملية - لا سباق بين العمال
+- بلوغ الحد الأقصى للمحاولات يحذف الرمز ويتطلب طلب رمز جديد
+- عند غياب REDIS_URL نستخدم الذاكرة (عامل واحد - للتطوير والاختبارات)
+- على عكس تحديد المعدل: تعطل Redis يرفض التحقق (503) ولا يتجاوزه
+"""
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.core.redis import get_redis
+from app.services.sms import SMSError, get_sms_provider
+
+logger = logging.getLogger(__name__)
+
+# KEYS: الرمز، المحاولات، فترة الانتظار | ARGV: البصمة، TTL الرمز، فترة الانتظار
+# يعيد 0 عند الحفظ، وإلا الثواني المتبقية من فترة الانتظار
+_SEND_LUA = """
+if not redis.call('SET', KEYS[3], 1, 'NX', 'EX', ARGV[3]) then
+    return math.max(redis.call('TTL', KEYS[3]), 1)
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('DEL', KEYS[2])
+return 0
+"""
+
+# KEYS: الرمز، المحاولات | ARGV: البصمة، الحد الأقصى، TTL الرمز
+# يعيد {الحالة، المحاولات المتبقية}: 1 صحيح، 0 خطأ، -1 لا يوجد رمز، -2 استُنفدت المحاولات
+_VERIFY_LUA = """
+local stored = redis.call('GET', KEYS[1])
+if not stored then
+    return {-1, 0}
+end
+local attempts = redis.call('INCR', KEYS[2])
+if attempts == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {1, 0}
+end
+local remaining = tonumber(ARGV[2]) - attempts
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return {-2, 0}
+end
+return {0, remaining}
+"""
+
+OTP_OK = 1
+OTP_WRONG = 0
+OTP_MISSING = -1
+OTP_EXHAUSTED = -2
+
+
+def _keys(phone: str) -> Tuple[str, str, str]:
+    return f"otp:code:{phone}", f"otp:attempts:{phone}", f"otp:cooldown:{phone}"
+
+
+def _digest(phone: str, code: str) -> str:
+    return hmac.new(
+        settings.JWT_SECRET_KEY.encode(), f"{phone}:{code}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="خدمة التحقق غير متاحة حالياً، يرجى المحاولة لاحقاً",
+    )
+
+
+class _MemoryOTPStore:
+    """نفس منطق السكربتين في الذاكرة - بديل محلي عند غياب Redis"""
+
+    _MAX_KEYS = 100_000
+
+    def __init__(self) -> None:
+        self._codes: Dict[str, Tuple[str, float, int]] = {}
+        self._cooldowns: Dict[str, float] = {}
+
+    def send(self, phone: str, digest: str, ttl: int, cooldown: int, now: float) -> int:
+        if len(self._codes) > self._MAX_KEYS or len(self._cooldowns) > self._MAX_KEYS:
+            self._codes.clear()
+            self._cooldowns.clear()
+        until = self._cooldowns.get(phone, 0.0)
+        if until > now:
+            return max(int(until - now), 1)
+        self._cooldowns[phone] = now + cooldown
+        self._codes[phone] = (digest, now + ttl, 0)
+        return 0
+
+    def verify(self, phone: str, digest: str, max_attempts: int, now: float) -> Tuple[int, int]:
+        entry = self._codes.get(phone)
+        if entry is None or entry[1] <= now:
+            self._codes.pop(phone, None)
+            return OTP_MISSING, 0
+        stored, expires, attempts = entry
+        attempts += 1
+        if hmac.compare_digest(stored, digest):
+            del self._codes[phone]
+            return OTP_OK, 0
+        remaining = max_attempts - attempts
+        if remaining <= 0:
+            del self._codes[phone]
+            return OTP_EXHAUSTED, 0
+        self._codes[phone] = (stored, expires, attempts)
+        return OTP_WRONG, remaining
+
+    def discard(self, phone: str) -> None:
+        self._codes.pop(phone, None)
+        self._cooldowns.pop(phone, None)
+
+    def reset(self) -> None:
+        self._codes.clear()
+        self._cooldowns.clear()
+
+
+class OTPService:
+    """إرسال رموز التحقق والتحقق منها"""
+
+    def __init__(self) -> None:
+        self._memory = _MemoryOTPStore()
+        self._scripts = None
+        self._script_client = None
+
+    def _load_scripts(self, redis):
+        if self._scripts is None or self._script_client is not redis:
+            self._scripts = (redis.register_script(_SEND_LUA), redis.register_script(_VERIFY_LUA))
+            self._script_client = redis
+        return self._scripts
+
+    @staticmethod
+    def generate_code() -> str:
+        return f"{secrets.randbelow(10 ** settings.OTP_LENGTH):0{settings.OTP_LENGTH}d}"
+
+    async def send(self, phone: str) -> int:
+        """
+        توليد رمز وإرساله برسالة قصيرة
+
+        - يرفع 429 مع Retry-After إن طُلب رمز قبل انتهاء فترة الانتظار
+        - يعيد صلاحية الرمز بالثواني
+        """
+        code = self.generate_code()
+        ttl = settings.OTP_EXPIRE_MINUTES * 60
+        cooldown = settings.OTP_COOLDOWN_SECONDS
+        digest = _digest(phone, code)
+
+        redis = get_redis()
+        if redis is None:
+            retry_after = self._memory.send(phone, digest, ttl, cooldown, time.monotonic())
+        else:
+            send_script, _ = self._load_scripts(redis)
+            try:
+                retry_after = int(await send_script(keys=list(_keys(phone)), args=[digest, ttl, cooldown]))
+            except Exception as exc:  # noqa: BLE001
+                logger.error("OTP store unavailable on send: %s", exc)
+                raise _unavailable()
+
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="تم إرسال رمز مؤخراً. يرجى الانتظار قبل طلب رمز جديد.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        try:
+            await get_sms_provider().send(
+                phone, f"رمز التحقق الخاص بك في قصر: {code} (صالح {settings.OTP_EXPIRE_MINUTES} دقائق)"
+            )
+        except SMSError as exc:
+            logger.error("OTP SMS to %s failed: %s", phone, exc)
+            await self._discard(phone)  # لا نحسب فترة انتظار لرسالة لم تصل
+            raise _unavailable()
+
+        return ttl
+
+    async def verify(self, phone: str, code: str) -> None:
+        """التحقق من الرمز - يرفع 400/429 عند الفشل، والرمز الصحيح يُستهلك مرة واحدة"""
+        digest = _digest(phone, code)
+
+        redis = get_redis()
+        if redis is None:
+            result, remaining = self._memory.verify(phone, digest, settings.OTP_MAX_ATTEMPTS, time.monotonic())
+        else:
+            _, verify_script = self._load_scripts(redis)
+            try:
+                result, remaining = await verify_script(
+                    keys=list(_keys(phone)[:2]),
+                    args=[digest, settings.OTP_MAX_ATTEMPTS, settings.OTP_EXPIRE_MINUTES * 60],
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.error("OTP store unavailable on verify: %s", exc)
+                raise _unavailable()
+
+        if result == OTP_OK:
+            return
+        if result == OTP_MISSING:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="رمز التحقق منتهي الصلاحية أو غير موجود، يرجى طلب رمز جديد",
+            )
+        if result == OTP_EXHAUSTED:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="تم تجاوز عدد المحاولات المسموح، يرجى طلب رمز جديد",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"رمز التحقق غير صحيح (المحاولات المتبقية: {remaining})",
+        )
+
+    async def _discard(self, phone: str) -> None:
+        redis = get_redis()
+        if redis is None:
+            self._memory.discard(phone)
+            return
+        try:
+            await redis.delete(*_keys(phone))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("OTP discard for %s failed: %s", phone, exc)
+
+    def reset(self) -> None:
+        """تفريغ الرموز المحلية (للاختبارات)"""
+        self._memory.reset()
+
+
+otp_service = OTPService()
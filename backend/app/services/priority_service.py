@@ -0,0 +1,172 @@
+"""
+نقاط الأولوية (0-100) - مصدر واحد للحساب عند الإنشاء وفي إعادة الحساب الدورية
+
+- النقاط = 50 + وزن التصنيف + حجم الأسرة + الحالات الخاصة + الاستعجال + الانتظار
+- الانتظار: PRIORITY_AGING_POINTS_PER_DAY لكل يوم كامل حتى PRIORITY_AGING_MAX_POINTS،
+  فيصعد الطلب المنتظر تدريجياً في القوائم
+- rescore_open_requests: نفس المعادلة كتعبير SQL في UPDATE واحد - لا تُنقل أي صفوف
+  إلى التطبيق، ولا يُكتب إلا ما تغيرت نقاطه
+- النقاط التي ضبطها المدير يدوياً (priority_pinned) لا يعاد حسابها
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import (
+    CATEGORY_WEIGHTS,
+    FAMILY_SIZE_BANDS,
+    SPECIAL_CASE_WEIGHTS,
+    RequestCategory,
+    RequestStatus,
+)
+from app.models.request import Request
+
+BASE_SCORE = 50
+MAX_SCORE = 100
+
+# الطلبات التي ما زالت تنتظر (لم تنتهِ بالإتمام أو الإلغاء أو الرفض)
+OPEN_STATUSES = (
+    RequestStatus.PENDING,
+    RequestStatus.NEW,
+    RequestStatus.ASSIGNED,
+    RequestStatus.IN_PROGRESS,
+)
+
+
+@dataclass(frozen=True)
+class PriorityPolicy:
+    """أوزان حساب الأولوية"""
+    category_weights: Dict[RequestCategory, int]
+    family_bands: Tuple[Tuple[int, int], ...]
+    special_cases: Dict[str, int]
+    urgent_bonus: int
+    aging_per_day: int
+    aging_max: int
+
+    @classmethod
+    def from_settings(cls) -> "PriorityPolicy":
+        weights = dict(CATEGORY_WEIGHTS)
+        if settings.PRIORITY_CATEGORY_WEIGHTS:
+            for key, value in json.loads(settings.PRIORITY_CATEGORY_WEIGHTS).items():
+                weights[RequestCategory(key)] = int(value)
+        return cls(
+            category_weights=weights,
+            family_bands=FAMILY_SIZE_BANDS,
+            special_cases=dict(SPECIAL_CASE_WEIGHTS),
+            urgent_bonus=settings.PRIORITY_URGENT_BONUS,
+            aging_per_day=settings.PRIORITY_AGING_POINTS_PER_DAY,
+            aging_max=settings.PRIORITY_AGING_MAX_POINTS,
+        )
+
+    def family_points(self, size: int) -> int:
+        for minimum, points in self.family_bands:
+            if size >= minimum:
+                return points
+        return 0
+
+    def aging_points(self, created_at: Optional[datetime], now: datetime) -> int:
+        if created_at is None or self.aging_per_day <= 0:
+            return 0
+        if created_at.tzinfo is None:
+            # SQLite يعيد التواريخ بدون منطقة زمنية (مخزنة بتوقيت UTC)
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        days = max((now - created_at).days, 0)
+        return min(days * self.aging_per_day, self.aging_max)
+
+    @property
+    def aging_days(self) -> int:
+        """عدد الأيام حتى بلوغ الحد الأقصى لنقاط الانتظار"""
+        if self.aging_per_day <= 0:
+            return 0
+        return -(-self.aging_max // self.aging_per_day)
+
+
+_policy: Optional[PriorityPolicy] = None
+
+
+def get_policy() -> PriorityPolicy:
+    """أوزان الأولوية الحالية (تُقرأ من الإعدادات عند أول استخدام)"""
+    global _policy
+    if _policy is None:
+        _policy = PriorityPolicy.from_settings()
+    return _policy
+
+
+def calculate_priority(
+    request,
+    profile=None,
+    now: Optional[datetime] = None,
+    policy: Optional[PriorityPolicy] = None,
+) -> int:
+    """
+    نقاط أولوية طلب واحد
+
+    - profile (اختياري): بيانات الأسرة (family_size، special_cases)؛ بدونه يؤخذ
+      عدد الأفراد من الطلب نفسه
+    - الطلب الجديد (created_at فارغ) بلا نقاط انتظار
+    """
+    policy = policy or get_policy()
+    now = now or datetime.now(timezone.utc)
+
+    score = BASE_SCORE + policy.category_weights.get(request.category, 0)
+    if profile is not None:
+        family_size = profile.family_size
+        score += sum(policy.special_cases.get(case_, 0) for case_ in profile.special_cases or ())
+    else:
+        family_size = request.family_members or 1
+    score += policy.family_points(family_size)
+    if request.is_urgent == 1:
+        score += policy.urgent_bonus
+    score += policy.aging_points(request.created_at, now)
+    return min(score, MAX_SCORE)
+
+
+def score_expression(now: datetime, policy: Optional[PriorityPolicy] = None):
+    """
+    معادلة calculate_priority كتعبير SQL على جدول الطلبات
+
+    - الانتظار درجات يومية: مقارنة created_at بحدود محسوبة مسبقاً (تعمل على أي قاعدة)
+    """
+    policy = policy or get_policy()
+    # مقارنة بالعمود (وليس case(value=...)) لتُربط القيم بنوع Enum الخاص به
+    category = case(
+        *[(Request.category == c, w) for c, w in policy.category_weights.items() if w],
+        else_=0,
+    )
+    family_size = func.coalesce(Request.family_members, 1)
+    family = case(*[(family_size >= minimum, points) for minimum, points in policy.family_bands], else_=0)
+    urgent = case((Request.is_urgent == 1, policy.urgent_bonus), else_=0)
+
+    score = BASE_SCORE + category + family + urgent
+    if policy.aging_days:
+        aging = case(
+            *[
+                (Request.created_at <= now - timedelta(days=days), min(days * policy.aging_per_day, policy.aging_max))
+                for days in range(policy.aging_days, 0, -1)
+            ],
+            else_=0,
+        )
+        score = score + aging
+    return case((score > MAX_SCORE, MAX_SCORE), else_=score)
+
+
+async def rescore_open_requests(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """إعادة حساب نقاط جميع الطلبات المفتوحة بتحديث واحد - يعيد عدد الطلبات التي تغيرت"""
+    score = score_expression(now or datetime.now(timezone.utc))
+    result = await db.execute(
+        update(Request)
+        .where(
+            Request.status.in_(OPEN_STATUSES),
+            Request.priority_pinned.is_(False),
+            Request.priority_score != score,
+        )
+        # تغير النقاط مع الوقت ليس تعديلاً على الطلب - updated_at يبقى كما هو
+        .values(priority_score=score, updated_at=Request.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,140 @@
+"""
+سجل انتقالات الطلبات - يكتبه خطاف في workflow.py، ويُقرأ خطاً زمنياً لطلب وتحليلاً للمراحل
+
+- كل عملية انتقال إدراج واحد (VALUES متعددة) مهما تعددت الطلبات
+- entered_at لكل صف: آخر حدث للطلب (استعلام فرعي على فهرس request_id)؛ وللخروج من
+  PENDING بلا حدث سابق (طلبات ما قبل السجل) تاريخ إنشاء الطلب
+- stage_funnel: لكل مرحلة ومجموعة (منطقة أو تصنيف) عدد الداخلين والخارجين ومئينات المدة
+  - PostgreSQL: percentile_cont في القاعدة، وBRIN يحصر المدة الزمنية - صف واحد لكل مجموعة
+    يخرج من القاعدة مهما بلغ عدد الأحداث
+  - غيرها (الاختبارات): المدد تُقرأ وتُحسب بـ numpy بالاستيفاء الخطي نفسه
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import RequestStatus
+from app.models.request import Request
+from app.models.request_event import RequestEvent
+
+FUNNEL_DIMENSIONS = {"region": RequestEvent.region, "category": RequestEvent.category}
+FUNNEL_PERCENTILES = (50, 90, 99)
+
+_STAGE_ORDER = {status: index for index, status in enumerate(RequestStatus)}
+
+
+def _last_event_at(request_id: UUID):
+    return select(func.max(RequestEvent.created_at)).where(RequestEvent.request_id == request_id).scalar_subquery()
+
+
+async def record_transitions(db: AsyncSession, transitions: list, context) -> None:
+    """خطاف الطلبات في workflow.py: حدث لكل طلب انتقل"""
+    rows = []
+    for source, target, requests in transitions:
+        for request in requests:
+            entered_at = None
+            if source is not None:
+                entered_at = _last_event_at(request.id)
+                if source == RequestStatus.PENDING:
+                    entered_at = func.coalesce(entered_at, request.created_at)
+            rows.append({
+                "request_id": request.id,
+                "from_status": source,
+                "to_status": target,
+                "region": request.region,
+                "category": request.category,
+                "entered_at": entered_at,
+            })
+    await db.execute(insert(RequestEvent).values(rows))
+
+
+def _hours(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds / 3600, 2)
+
+
+async def request_timeline(db: AsyncSession, request_id: UUID) -> Optional[List[dict]]:
+    """أحداث الطلب بالترتيب مع مدة المرحلة التي انتهت بكل حدث - None إن لم يوجد الطلب ولا سجله"""
+    result = await db.execute(
+        select(RequestEvent).where(RequestEvent.request_id == request_id).order_by(RequestEvent.id)
+    )
+    events = result.scalars().all()
+    if not events:
+        exists = (await db.execute(select(Request.id).where(Request.id == request_id))).scalar_one_or_none()
+        return [] if exists else None
+    return [
+        {
+            "from_status": event.from_status.value if event.from_status else None,
+            "to_status": event.to_status.value,
+            "at": event.created_at,
+            "stage_hours": _hours(
+                (event.created_at - event.entered_at).total_seconds() if event.entered_at else None
+            ),
+        }
+        for event in events
+    ]
+
+
+async def stage_funnel(db: AsyncSession, dimension: str, since: datetime, *conditions) -> List[dict]:
+    """
+    مراحل الطلبات منذ since مجمعة حسب dimension (region أو category)
+
+    - entered: الأحداث التي دخلت المرحلة، exited: التي خرجت منها ومدتها معروفة
+    - p50/p90/p99 بالساعات لمدة المرحلة عند الخروج منها
+    """
+    group = FUNNEL_DIMENSIONS[dimension]
+    window = (RequestEvent.created_at >= since, *conditions)
+    stages: Dict[Tuple[RequestStatus, object], dict] = {}
+
+    def stage(status: RequestStatus, key) -> dict:
+        if (status, key) not in stages:
+            stages[(status, key)] = {
+                "stage": status.value,
+                dimension: key.value if hasattr(key, "value") else key,
+                "entered": 0,
+                "exited": 0,
+                **{f"p{p}_hours": None for p in FUNNEL_PERCENTILES},
+            }
+        return stages[(status, key)]
+
+    entered = await db.execute(
+        select(RequestEvent.to_status, group, func.count()).where(*window).group_by(RequestEvent.to_status, group)
+    )
+    for status, key, count in entered.all():
+        stage(status, key)["entered"] = count
+
+    duration = func.extract("epoch", RequestEvent.created_at) - func.extract("epoch", RequestEvent.entered_at)
+    exits = (*window, RequestEvent.from_status.is_not(None), RequestEvent.entered_at.is_not(None))
+    if (await db.connection()).dialect.name == "postgresql":
+        result = await db.execute(
+            select(
+                RequestEvent.from_status, group, func.count(),
+                *(func.percentile_cont(p / 100).within_group(duration) for p in FUNNEL_PERCENTILES),
+            )
+            .where(*exits)
+            .group_by(RequestEvent.from_status, group)
+        )
+        summaries = [(status, key, count, percentiles) for status, key, count, *percentiles in result.all()]
+    else:
+        durations = defaultdict(list)
+        result = await db.execute(select(RequestEvent.from_status, group, duration).where(*exits))
+        for status, key, seconds in result.all():
+            durations[(status, key)].append(seconds)
+        summaries = [
+            (status, key, len(values), np.percentile(np.asarray(values, dtype=float), FUNNEL_PERCENTILES))
+            for (status, key), values in durations.items()
+        ]
+    for status, key, count, percentiles in summaries:
+        item = stage(status, key)
+        item["exited"] = count
+        for p, seconds in zip(FUNNEL_PERCENTILES, percentiles):
+            item[f"p{p}_hours"] = _hours(float(seconds))
+
+    return sorted(
+        stages.values(),
+        key=lambda item: (_STAGE_ORDER[RequestStatus(item["stage"])], str(item[dimension] or "")),
+    )
@@ -0,0 +1,168 @@
+"""
+مهل الخدمة (SLA) - تصعيد الطلبات والتكفلات المتأخرة وإنهاء التعهدات المعلقة
+
+- المراحل والمهل في constants.py (SLA_DEADLINE_HOURS مع استثناءات حسب التصنيف)
+- كل مرحلة تحديثات على دفعات (id IN (SELECT ... LIMIT SLA_BATCH_SIZE)) عبر فهرس
+  (status, created_at)، وكل دفعة في معاملة قصيرة
+- التصنيفات ذات المهلة نفسها تُعالج معاً: الاستعلامات بعدد المهل المختلفة لا بعدد التصنيفات
+- الشرط يُعاد في التحديث الخارجي: تعهد اعتُمد أثناء الفحص لا يُنهى
+- التصعيد مرة واحدة لكل حالة: escalated_status يحفظ الحالة التي صُعّد فيها الطلب،
+  وescalated_at للتكفل
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import exists, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import (
+    SLA_CATEGORY_DEADLINE_HOURS,
+    SLA_DEADLINE_HOURS,
+    AssignmentStatus,
+    RequestCategory,
+    RequestStatus,
+    SLAStage,
+)
+from app.core.metrics import SLA_ACTIONS
+from app.models.assignment import Assignment
+from app.models.request import Request
+from app.services.workflow import transition_assignments
+
+logger = logging.getLogger(__name__)
+
+# مراحل الطلبات: المرحلة -> الحالة التي يتأخر فيها الطلب
+REQUEST_STAGES = {
+    SLAStage.REVIEW: RequestStatus.PENDING,
+    SLAStage.UNASSIGNED: RequestStatus.NEW,
+}
+
+PLEDGE_EXPIRED_REASON = "انتهت مهلة اعتماد التعهد"
+
+
+def deadline_hours(category: RequestCategory, stage: SLAStage) -> int:
+    """مهلة مرحلة لتصنيف معين بالساعات"""
+    return SLA_CATEGORY_DEADLINE_HOURS.get(category, {}).get(stage, SLA_DEADLINE_HOURS[stage])
+
+
+def _deadline_groups(stage: SLAStage) -> Dict[int, List[RequestCategory]]:
+    groups: Dict[int, List[RequestCategory]] = defaultdict(list)
+    for category in RequestCategory:
+        groups[deadline_hours(category, stage)].append(category)
+    return groups
+
+
+async def _in_batches(db: AsyncSession, run_batch) -> int:
+    """تنفيذ التحديث دفعة بعد دفعة حتى لا يبقى ما يطابقه (run_batch يعيد عدد صفوف الدفعة)"""
+    total = 0
+    while True:
+        count = await run_batch()
+        await db.commit()
+        total += count
+        if count < settings.SLA_BATCH_SIZE:
+            return total
+
+
+async def _execute(db: AsyncSession, statement) -> int:
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+async def _count(transition) -> int:
+    return len(await transition)
+
+
+def _request_in(status: RequestStatus):
+    """حالة طلب التكفل - مرتبط بصف التكفل في الاستعلام الخارجي"""
+    return (
+        exists()
+        .where(Request.id == Assignment.request_id, Request.status == status)
+        .correlate(Assignment)
+    )
+
+
+async def _escalate_requests(db: AsyncSession, stage: SLAStage, now: datetime) -> int:
+    status = REQUEST_STAGES[stage]
+    total = 0
+    for hours, categories in _deadline_groups(stage).items():
+        overdue = (
+            Request.status == status,
+            Request.created_at < now - timedelta(hours=hours),
+            Request.category.in_(categories),
+            Request.escalated_status.is_distinct_from(status),
+        )
+        due = select(Request.id).where(*overdue).limit(settings.SLA_BATCH_SIZE)
+        total += await _in_batches(
+            db,
+            lambda: _execute(
+                db,
+                update(Request)
+                .where(Request.id.in_(due), *overdue)
+                # التصعيد علامة للمتابعة وليس تعديلاً على الطلب - updated_at يبقى كما هو
+                .values(escalated_status=status, escalated_at=now, updated_at=Request.updated_at),
+            ),
+        )
+    return total
+
+
+async def _update_assignments(db: AsyncSession, stage: SLAStage, now: datetime, conditions, run_update) -> int:
+    """run_update(*where) يحدّث دفعة التكفلات المتأخرة ويعيد عددها"""
+    total = 0
+    for hours, categories in _deadline_groups(stage).items():
+        overdue = (*conditions, Assignment.created_at < now - timedelta(hours=hours))
+        due = (
+            select(Assignment.id)
+            .join(Request, Request.id == Assignment.request_id)
+            .where(*overdue, Request.category.in_(categories))
+            .limit(settings.SLA_BATCH_SIZE)
+        )
+        total += await _in_batches(db, lambda: run_update(Assignment.id.in_(due), *overdue))
+    return total
+
+
+async def run_sla_checks(db: AsyncSession, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    فحص جميع المراحل - يعيد عدد ما عولج في كل مرحلة
+
+    - الطلبات المتأخرة في المراجعة أو بلا تكفل: تصعيد
+    - التعهدات غير المعتمدة على طلب جديد (NEW): تنتهي (FAILED) ويبقى الطلب متاحاً لغيرها؛
+      تعهد ربطه المراقب (الطلب ASSIGNED) لا ينتهي، وإلا بقي الطلب مربوطاً بلا تكفل حي - يُصعَّد
+    - التكفلات المتأخرة في التنفيذ: تصعيد
+    """
+    now = now or datetime.now(timezone.utc)
+    counts = {stage.value: await _escalate_requests(db, stage, now) for stage in REQUEST_STAGES}
+    # انتهاء التعهدات انتقال حالة: يمر من workflow ليُطرح من العدادات
+    counts[SLAStage.PLEDGE.value] = await _update_assignments(
+        db, SLAStage.PLEDGE, now,
+        (Assignment.status == AssignmentStatus.PLEDGED, _request_in(RequestStatus.NEW)),
+        lambda *where: _count(transition_assignments(
+            db, AssignmentStatus.FAILED, *where,
+            sources=[AssignmentStatus.PLEDGED], failure_reason=PLEDGE_EXPIRED_REASON,
+        )),
+    )
+
+    def escalate(*where):
+        return _execute(
+            db, update(Assignment).where(*where).values(escalated_at=now, updated_at=Assignment.updated_at),
+        )
+
+    counts[SLAStage.ASSIGNED.value] = await _update_assignments(
+        db, SLAStage.ASSIGNED, now,
+        (
+            Assignment.status == AssignmentStatus.PLEDGED,
+            Assignment.escalated_at.is_(None),
+            _request_in(RequestStatus.ASSIGNED),
+        ),
+        escalate,
+    )
+    counts[SLAStage.DELIVERY.value] = await _update_assignments(
+        db, SLAStage.DELIVERY, now,
+        (Assignment.status == AssignmentStatus.IN_PROGRESS, Assignment.escalated_at.is_(None)),
+        escalate,
+    )
+    for stage, count in counts.items():
+        if count:
+            SLA_ACTIONS.labels(stage).inc(count)
+    return counts
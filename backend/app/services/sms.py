@@ -0,0 +1,79 @@
+"""
+مزودو الرسائل القصيرة (SMS_PROVIDER)
+
+- console: يطبع الرسالة في السجل ويحتفظ بآخر الرسائل في الذاكرة (التطوير والاختبارات)
+- twilio: واجهة Twilio REST عبر عميل httpx المشترك
+- لا مزود افتراضي: اسم فارغ أو غير معروف يوقف التشغيل (console يكتب رموز OTP في السجل)
+"""
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+from app.core.http import get_http_client
+
+logger = logging.getLogger(__name__)
+
+
+class SMSError(Exception):
+    """تعذر إرسال الرسالة"""
+
+
+class ConsoleSMSProvider:
+    """مزود وهمي - الرسائل في السجل فقط"""
+
+    _MAX_MESSAGES = 100
+
+    def __init__(self) -> None:
+        self.sent: Deque[Tuple[str, str]] = deque(maxlen=self._MAX_MESSAGES)
+
+    async def send(self, phone: str, message: str) -> None:
+        self.sent.append((phone, message))
+        logger.info("SMS to %s: %s", phone, message)
+
+    def last_message(self, phone: str) -> Optional[str]:
+        """آخر رسالة أُرسلت لرقم معين"""
+        for to, message in reversed(self.sent):
+            if to == phone:
+                return message
+        return None
+
+
+class TwilioSMSProvider:
+    """الإرسال عبر Twilio"""
+
+    _URL = "https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
+
+    async def send(self, phone: str, message: str) -> None:
+        try:
+            response = await get_http_client().post(
+                self._URL.format(sid=settings.TWILIO_ACCOUNT_SID),
+                auth=(settings.TWILIO_ACCOUNT_SID or "", settings.TWILIO_AUTH_TOKEN or ""),
+                data={"From": settings.TWILIO_PHONE_NUMBER, "To": phone, "Body": message},
+            )
+        except httpx.HTTPError as exc:
+            raise SMSError(str(exc)) from exc
+        if response.status_code >= 400:
+            raise SMSError(f"Twilio {response.status_code}: {response.text[:200]}")
+
+
+_providers = {
+    "console": ConsoleSMSProvider,
+    "twilio": TwilioSMSProvider,
+}
+_provider = None
+
+
+def get_sms_provider():
+    """مزود الرسائل حسب SMS_PROVIDER (يُنشأ عند بدء التشغيل أو أول استخدام)"""
+    global _provider
+    if _provider is None:
+        provider = _providers.get(settings.SMS_PROVIDER or "")
+        if provider is None:
+            raise ValueError(
+                f"Unknown SMS_PROVIDER {settings.SMS_PROVIDER!r} - expected one of: {', '.join(_providers)}"
+            )
+        _provider = provider()
+    return _provider
@@ -0,0 +1,156 @@
+"""
+خدمة التوكنات - إصدار توكن الوصول ورمز التحديث وتدويره وإبطاله
+
+- رمز التحديث قيمة عشوائية معتمة (ليس JWT) لا يُخزن منها إلا بصمة SHA-256
+- كل تحديث يُبطل الرمز المستعمل ويُصدر بديلاً في نفس العائلة (family_id)
+- استعمال رمز سبق إبطاله يعني تسريباً محتملاً: تُبطل العائلة كلها
+- الدوال تضيف التغييرات للجلسة فقط، والحفظ (COMMIT) على المستدعي
+"""
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import UserRole, UserStatus
+from app.core.security import create_access_token
+from app.models.refresh_token import RefreshToken
+from app.models.user import User
+from app.schemas.auth import TokenPair
+from app.services.org_directory import get_user_org
+
+
+def hash_refresh_token(raw: str) -> str:
+    """بصمة رمز التحديث كما تُخزن في قاعدة البيانات"""
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _invalid_refresh() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="رمز التحديث غير صالح أو منتهي الصلاحية",
+    )
+
+
+async def issue_tokens(
+    db: AsyncSession,
+    user: User,
+    org_id: Optional[str] = None,
+    family_id: Optional[uuid.UUID] = None,
+    token_id: Optional[uuid.UUID] = None,
+) -> TokenPair:
+    """إصدار توكن وصول ورمز تحديث جديد (جلسة جديدة ما لم تُمرر family_id)"""
+    if user.id is None:
+        await db.flush()  # مستخدم جديد - نحتاج معرفه
+
+    raw = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        id=token_id or uuid.uuid4(),
+        user_id=user.id,
+        family_id=family_id or uuid.uuid4(),
+        token_hash=hash_refresh_token(raw),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+
+    access_token = create_access_token(
+        data={
+            "sub": str(user.id),
+            "role": user.role.value,
+            "org_id": org_id,
+        }
+    )
+    return TokenPair(
+        access_token=access_token,
+        refresh_token=raw,
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, raw: str) -> TokenPair:
+    """
+    استبدال رمز التحديث بزوج جديد
+
+    - الإبطال والتحقق في UPDATE ... RETURNING واحد: طلبان متزامنان بنفس الرمز
+      لا ينجحان معاً، والثاني يُعامل كإعادة استعمال
+    """
+    now = datetime.now(timezone.utc)
+    token_hash = hash_refresh_token(raw)
+    new_id = uuid.uuid4()
+
+    row = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked_at=now, replaced_by=new_id)
+        .returning(RefreshToken.user_id, RefreshToken.family_id)
+        .execution_options(synchronize_session=False)
+    )).first()
+
+    if row is None:
+        reused_family = (await db.execute(
+            select(RefreshToken.family_id).where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_not(None),
+            )
+        )).scalar()
+        if reused_family is not None:
+            await revoke_family(db, reused_family)
+            await db.commit()  # قبل رفع الخطأ حتى لا يتراجع الإبطال
+        raise _invalid_refresh()
+
+    user = await db.get(User, row.user_id)
+    if not user or user.status == UserStatus.SUSPENDED:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="المستخدم غير موجود أو معطل",
+        )
+
+    org_id = None
+    if user.role == UserRole.ORGANIZATION:
+        org = await get_user_org(user.id)
+        org_id = str(org.id) if org else None
+
+    return await issue_tokens(db, user, org_id, family_id=row.family_id, token_id=new_id)
+
+
+async def revoke_family(db: AsyncSession, family_id: uuid.UUID) -> None:
+    """إبطال جميع رموز جلسة واحدة"""
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def revoke_session(db: AsyncSession, raw: str, user_id: uuid.UUID) -> None:
+    """إبطال الجلسة التي ينتمي إليها رمز التحديث (لصاحبه فقط)"""
+    family = (
+        select(RefreshToken.family_id)
+        .where(RefreshToken.token_hash == hash_refresh_token(raw), RefreshToken.user_id == user_id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: uuid.UUID) -> None:
+    """إبطال جميع رموز التحديث للمستخدم (تعطيل الحساب)"""
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,332 @@
+"""
+آلة حالات الطلبات والتكفلات - كل تغيير حالة يمر من هنا
+
+- REQUEST_TRANSITIONS / ASSIGNMENT_TRANSITIONS: الحالة -> الحالات المسموح الانتقال إليها
+- الانتقال تحديث محروس: UPDATE ... WHERE status = المصدر RETURNING، فالتحقق والتغيير
+  ذريان (طلبان متزامنان لا ينجحان معاً) بلا تحميل مسبق للصفوف
+  - تحديث لكل حالة مصدر مسموحة: RETURNING يعيد القيم الجديدة فقط، والمصدر المعروف
+    هو ما يخبر الخطافات بالحالة السابقة لكل صف (العدادات والأحداث)
+  - صف واحد (transition_request / transition_assignment): 404 إن لم يوجد، 400 إن
+    لم تسمح حالته - فحص الحالة لا يُقرأ إلا عند الفشل أو تعدد المصادر
+  - مجموعة (transition_requests / transition_assignments): بالشروط نفسها، يعيد ما انتقل
+- الإتمام يختم completed_at تلقائياً
+- الخطافات تُستدعى مرة واحدة لكل عملية بكل ما انتقل فيها (Transition لكل مصدر):
+  - الطلبات: إشعار صاحب الطلب (REQUEST_NOTIFICATIONS)، وخلايا الخريطة، وسجل الأحداث
+    (request_events.py)
+  - التكفلات: العدادات (assignment_service)، وفهرس المطابقة
+  - غيرها يُسجَّل بـ request_workflow.on_transition / assignment_workflow.on_transition
+- لا COMMIT هنا - المسار أو المهمة يلتزم
+"""
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, RequestStatus
+from app.models.assignment import Assignment
+from app.models.request import Request
+from app.services import map_clusters, matching
+from app.services.assignment_service import apply_changes
+from app.services.notifications import notify_request
+from app.services.request_events import record_transitions
+
+# الحالة -> ما يجوز الانتقال إليه (المنتهية بلا انتقالات)
+REQUEST_TRANSITIONS: Dict[RequestStatus, FrozenSet[RequestStatus]] = {
+    RequestStatus.PENDING: frozenset({
+        RequestStatus.NEW, RequestStatus.ASSIGNED, RequestStatus.REJECTED, RequestStatus.CANCELLED,
+    }),
+    RequestStatus.NEW: frozenset({RequestStatus.ASSIGNED, RequestStatus.REJECTED, RequestStatus.CANCELLED}),
+    RequestStatus.ASSIGNED: frozenset({
+        RequestStatus.IN_PROGRESS, RequestStatus.COMPLETED, RequestStatus.NEW, RequestStatus.CANCELLED,
+    }),
+    RequestStatus.IN_PROGRESS: frozenset({RequestStatus.COMPLETED, RequestStatus.NEW, RequestStatus.CANCELLED}),
+    RequestStatus.REJECTED: frozenset({RequestStatus.PENDING}),
+    RequestStatus.COMPLETED: frozenset(),
+    RequestStatus.CANCELLED: frozenset(),
+}
+
+ASSIGNMENT_TRANSITIONS: Dict[AssignmentStatus, FrozenSet[AssignmentStatus]] = {
+    AssignmentStatus.PLEDGED: frozenset({
+        AssignmentStatus.IN_PROGRESS, AssignmentStatus.COMPLETED, AssignmentStatus.FAILED,
+    }),
+    AssignmentStatus.IN_PROGRESS: frozenset({AssignmentStatus.COMPLETED, AssignmentStatus.FAILED}),
+    AssignmentStatus.COMPLETED: frozenset(),
+    AssignmentStatus.FAILED: frozenset(),
+}
+
+# تغيير يدوي يُخرج الطلب من ASSIGNED/IN_PROGRESS: الحالة الجديدة -> ما يصير إليه تكفله الحي
+RELEASED_ASSIGNMENTS: Dict[RequestStatus, AssignmentStatus] = {
+    RequestStatus.NEW: AssignmentStatus.FAILED,
+    RequestStatus.CANCELLED: AssignmentStatus.FAILED,
+    RequestStatus.COMPLETED: AssignmentStatus.COMPLETED,
+}
+RELEASED_REASON = "أُعيد الطلب أو أُلغي من الإدارة"
+
+# (الحالة السابقة، الجديدة) -> قالب إشعار صاحب الطلب (NOTIFICATION_TEMPLATES)
+REQUEST_NOTIFICATIONS: Dict[Tuple[RequestStatus, RequestStatus], str] = {
+    (RequestStatus.PENDING, RequestStatus.NEW): "request_activated",
+    (RequestStatus.PENDING, RequestStatus.REJECTED): "request_rejected",
+    (RequestStatus.NEW, RequestStatus.REJECTED): "request_rejected",
+    (RequestStatus.PENDING, RequestStatus.ASSIGNED): "request_approved",
+    (RequestStatus.NEW, RequestStatus.ASSIGNED): "request_approved",
+    (RequestStatus.ASSIGNED, RequestStatus.COMPLETED): "request_completed",
+    (RequestStatus.IN_PROGRESS, RequestStatus.COMPLETED): "request_completed",
+}
+
+
+class Transition(NamedTuple):
+    """صفوف انتقلت معاً من حالة إلى أخرى - source=None للإنشاء، والصفوف بقيمها الجديدة"""
+    source: Optional[Enum]
+    target: Enum
+    rows: List
+
+
+# سياق الإشعار: قاموس للجميع أو دالة لكل صف (مثلاً اسم جمعية مختلف لكل طلب)
+Context = Union[Dict, Callable[[object], Dict], None]
+Hook = Callable[[AsyncSession, List[Transition], Context], Awaitable[None]]
+
+
+class Workflow:
+    """انتقالات نموذج واحد (طلب أو تكفل) وخطافاته"""
+
+    def __init__(self, model, transitions: Dict[Enum, FrozenSet[Enum]], completed: Enum, not_found: str) -> None:
+        self.model = model
+        self.transitions = transitions
+        self.completed = completed
+        self.not_found = not_found
+        self._hooks: List[Hook] = []
+
+    def on_transition(self, hook: Hook) -> Hook:
+        """تسجيل خطاف يُستدعى بعد كل عملية انتقال (داخل المعاملة نفسها)"""
+        self._hooks.append(hook)
+        return hook
+
+    def sources(self, target: Enum, sources: Optional[Iterable[Enum]] = None) -> List[Enum]:
+        """الحالات التي يجوز منها الانتقال إلى target (ضمن sources إن حُددت) بترتيب الجدول"""
+        wanted = set(self.transitions) if sources is None else set(sources)
+        return [source for source, targets in self.transitions.items() if target in targets and source in wanted]
+
+    async def run_hooks(self, db: AsyncSession, transitions: List[Transition], context: Context = None) -> None:
+        transitions = [transition for transition in transitions if transition.rows]
+        if not transitions:
+            return
+        for hook in self._hooks:
+            await hook(db, transitions, context)
+
+    async def update_from(self, db: AsyncSession, source: Enum, target: Enum, conditions, values) -> Transition:
+        """تحديث محروس واحد من حالة معروفة - بلا خطافات (المستدعي يجمعها)"""
+        model = self.model
+        if target == self.completed:
+            values.setdefault("completed_at", datetime.now(timezone.utc))
+        result = await db.execute(
+            update(model)
+            .where(model.status == source, *conditions)
+            .values(status=target, **values)
+            .returning(model)
+        )
+        return Transition(source, target, list(result.scalars().all()))
+
+    async def transition(
+        self,
+        db: AsyncSession,
+        target: Enum,
+        *conditions,
+        sources: Optional[Iterable[Enum]] = None,
+        context: Context = None,
+        **values,
+    ) -> List:
+        """نقل كل الصفوف المطابقة التي تسمح حالتها - يعيد ما انتقل منها"""
+        transitions = [
+            await self.update_from(db, source, target, conditions, values)
+            for source in self.sources(target, sources)
+        ]
+        await self.run_hooks(db, transitions, context)
+        return [row for transition in transitions for row in transition.rows]
+
+    async def _status(self, db: AsyncSession, conditions) -> Enum:
+        current = (await db.execute(select(self.model.status).where(*conditions))).scalar_one_or_none()
+        if current is None:
+            raise HTTPException(status_code=404, detail=self.not_found)
+        return current
+
+    async def _set_values(self, db: AsyncSession, status: Enum, conditions, values):
+        """تحديث حقول صف ما زال في status دون تغيير حالته"""
+        model = self.model
+        if values:
+            query = update(model).where(model.status == status, *conditions).values(**values).returning(model)
+        else:
+            query = select(model).where(model.status == status, *conditions)
+        return (await db.execute(query)).scalar_one_or_none()
+
+    async def transition_one(
+        self,
+        db: AsyncSession,
+        row_id: UUID,
+        target: Enum,
+        *conditions,
+        sources: Optional[Iterable[Enum]] = None,
+        detail: Optional[str] = None,
+        context: Context = None,
+        keep_current: bool = False,
+        **values,
+    ):
+        """
+        نقل صف واحد - 404 إن لم يوجد (أو لم يطابق الشروط)، 400 إن لم تسمح حالته
+
+        - keep_current: صف في حالة target أصلاً ليس خطأ - تُحدَّث values فقط بلا خطافات
+        """
+        conditions = (self.model.id == row_id, *conditions)
+        allowed = self.sources(target, sources)
+        if len(allowed) > 1:
+            # تعدد المصادر: الحالة الحالية تحدد التحديث الوحيد (ومحروس بها)
+            current = await self._status(db, conditions)
+            allowed = [current] if current in allowed else []
+        transition = await self.update_from(db, allowed[0], target, conditions, values) if allowed else None
+        if not transition or not transition.rows:
+            current = await self._status(db, conditions)
+            if keep_current and current == target:
+                unchanged = await self._set_values(db, target, conditions, values)
+                if unchanged is not None:
+                    return unchanged
+            raise HTTPException(
+                status_code=400,
+                detail=detail or f"لا يمكن الانتقال من {current.value} إلى {target.value}",
+            )
+        await self.run_hooks(db, [transition], context)
+        return transition.rows[0]
+
+
+request_workflow = Workflow(Request, REQUEST_TRANSITIONS, RequestStatus.COMPLETED, "الطلب غير موجود")
+assignment_workflow = Workflow(Assignment, ASSIGNMENT_TRANSITIONS, AssignmentStatus.COMPLETED, "التكفل غير موجود")
+
+
+async def transition_request(db: AsyncSession, request_id: UUID, target: RequestStatus, *conditions, **kwargs) -> Request:
+    return await request_workflow.transition_one(db, request_id, target, *conditions, **kwargs)
+
+
+async def set_request_status(db: AsyncSession, request_id: UUID, target: RequestStatus, **values) -> Request:
+    """
+    تغيير يدوي للحالة (المراقب والإدارة) - الربط بجمعية له مساراته لأنه ينشئ التكفل
+
+    - إعادة إرسال الحالة الحالية مع حقول أخرى ليست انتقالاً: تُحدَّث الحقول فقط
+    - الخروج من ASSIGNED/IN_PROGRESS ينقل التكفل الحي في المعاملة نفسها
+      (RELEASED_ASSIGNMENTS) فتبقى العدادات ومهلة التنفيذ على تكفلات حية فقط
+    """
+    if target == RequestStatus.ASSIGNED:
+        # بلا مصادر: لا انتقال إلى ASSIGNED هنا، والطلب المرتبط أصلاً تُحدَّث حقوله
+        return await request_workflow.transition_one(
+            db, request_id, target, sources=(), keep_current=True,
+            detail="ربط الطلب بجمعية يتم من مسار الإسناد", **values,
+        )
+    # الحالة الحالية مصدر الانتقال الوحيد (المحروس بها) - وهي ما يحدد مصير التكفل
+    current = await request_workflow._status(db, (Request.id == request_id,))
+    request = await request_workflow.transition_one(
+        db, request_id, target, sources=[current], keep_current=True, **values,
+    )
+    released = RELEASED_ASSIGNMENTS.get(target)
+    if released is not None and current != target and current in (RequestStatus.ASSIGNED, RequestStatus.IN_PROGRESS):
+        fields = {"failure_reason": RELEASED_REASON} if released == AssignmentStatus.FAILED else {}
+        await assignment_workflow.transition(
+            db, released, Assignment.request_id == request_id,
+            sources=[AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS], **fields,
+        )
+    return request
+
+
+async def transition_requests(db: AsyncSession, target: RequestStatus, *conditions, **kwargs) -> List[Request]:
+    return await request_workflow.transition(db, target, *conditions, **kwargs)
+
+
+async def transition_assignment(
+    db: AsyncSession, assignment_id: UUID, target: AssignmentStatus, *conditions, **kwargs,
+) -> Assignment:
+    return await assignment_workflow.transition_one(db, assignment_id, target, *conditions, **kwargs)
+
+
+async def transition_assignments(db: AsyncSession, target: AssignmentStatus, *conditions, **kwargs) -> List[Assignment]:
+    return await assignment_workflow.transition(db, target, *conditions, **kwargs)
+
+
+async def add_request(db: AsyncSession, request: Request) -> Request:
+    """إنشاء طلب - يُدرج فوراً ليمر بخطافات الانتقال كأي تغيير حالة (سجل الأحداث)"""
+    db.add(request)
+    await db.flush()
+    await request_workflow.run_hooks(db, [Transition(None, request.status, [request])])
+    return request
+
+
+async def add_assignments(db: AsyncSession, pairs: Sequence[Tuple[UUID, UUID]], **fields) -> List[Assignment]:
+    """إنشاء تعهدات (PLEDGED) لأزواج (الطلب، الجمعية) - الخطافات مرة واحدة للدفعة"""
+    assignments = [
+        Assignment(request_id=request_id, org_id=org_id, status=AssignmentStatus.PLEDGED, **fields)
+        for request_id, org_id in pairs
+    ]
+    db.add_all(assignments)
+    await assignment_workflow.run_hooks(db, [Transition(None, AssignmentStatus.PLEDGED, assignments)])
+    return assignments
+
+
+async def add_assignment(db: AsyncSession, request_id: UUID, org_id: UUID, **fields) -> Assignment:
+    return (await add_assignments(db, [(request_id, org_id)], **fields))[0]
+
+
+async def approve_pledge(
+    db: AsyncSession, assignment_id: UUID, request_id: UUID, rejection_reason: str, **values,
+) -> Assignment:
+    """اعتماد تعهد (IN_PROGRESS) ورفض باقي تعهدات الطلب (FAILED) - الخطافات مرة واحدة للاثنين"""
+    approved = await assignment_workflow.update_from(
+        db, AssignmentStatus.PLEDGED, AssignmentStatus.IN_PROGRESS,
+        (Assignment.id == assignment_id, Assignment.request_id == request_id), values,
+    )
+    if not approved.rows:
+        raise HTTPException(status_code=404, detail="التعهد غير موجود أو تم معالجته مسبقاً")
+    rejected = await assignment_workflow.update_from(
+        db, AssignmentStatus.PLEDGED, AssignmentStatus.FAILED,
+        (Assignment.request_id == request_id, Assignment.id != assignment_id),
+        {"failure_reason": rejection_reason},
+    )
+    await assignment_workflow.run_hooks(db, [approved, rejected])
+    return approved.rows[0]
+
+
+def _context(context: Context, row) -> Dict:
+    if callable(context):
+        return context(row)
+    return context or {}
+
+
+# السجل أولاً: إدراجه يفرّغ الجلسة (autoflush)، فتبقى الإشعارات لإدراج واحد عند COMMIT
+request_workflow.on_transition(record_transitions)
+
+
+@request_workflow.on_transition
+async def _notify_requesters(db: AsyncSession, transitions: List[Transition], context: Context) -> None:
+    for source, target, rows in transitions:
+        event = REQUEST_NOTIFICATIONS.get((source, target))
+        if event:
+            for request in rows:
+                notify_request(db, request, event, **_context(context, request))
+
+
+@request_workflow.on_transition
+async def _invalidate_map_cells(db: AsyncSession, transitions: List[Transition], context: Context) -> None:
+    # التحديث الجماعي لا يراه after_flush
+    map_clusters.mark_changed(db, (request.geohash for transition in transitions for request in transition.rows))
+
+
+@assignment_workflow.on_transition
+async def _update_counters(db: AsyncSession, transitions: List[Transition], context: Context) -> None:
+    await apply_changes(db, [
+        (assignment.request_id, assignment.org_id, source, target)
+        for source, target, rows in transitions
+        for assignment in rows
+    ])
+
+
+@assignment_workflow.on_transition
+async def _mark_matching_orgs(db: AsyncSession, transitions: List[Transition], context: Context) -> None:
+    matching.mark_changed(db, (assignment.org_id for transition in transitions for assignment in transition.rows))
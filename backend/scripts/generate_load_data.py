@@ -0,0 +1,364 @@
+"""
+توليد بيانات اصطناعية بحجم الإنتاج وتحميلها عبر COPY (PostgreSQL فقط)
+
+    python scripts/generate_load_data.py --citizens 1000000 --requests 2000000 --orgs 500 --seed 42 --truncate
+
+- نفس البذرة => نفس البيانات (المعرفات، الأسماء، الهواتف، الإحداثيات، الحالات)
+- التحميل بدفعات COPY مباشرة عبر asyncpg بدون ORM (ملايين الصفوف في دقائق)
+- جميع الحسابات المولدة تستخدم كلمة المرور LOAD_TEST_PASSWORD (كود الدخول للمراقبين والمؤسسات)
+- الجداول يجب أن تكون موجودة (alembic upgrade head أو scripts/init_db.py)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Iterator, List, Sequence, Tuple
+
+# دعم التشغيل من Docker (/app) أو محلياً (backend/)
+_APP_ROOT = os.environ.get("APP_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _APP_ROOT not in sys.path:
+    sys.path.insert(0, _APP_ROOT)
+
+import asyncpg
+
+from app.config import settings
+from app.core.constants import (
+    AssignmentStatus,
+    OrganizationStatus,
+    RequestCategory,
+    RequestStatus,
+    UserRole,
+    UserStatus,
+)
+from app.core.geo import encode_geohash
+from app.core.text import normalize_name
+from app.core.security import hash_password
+from app.services.priority_service import calculate_priority
+
+LOAD_TEST_PASSWORD = "LoadTest#2024"
+BATCH_SIZE = 50_000
+
+# المدن والأحياء مع مراكز تقريبية (خط العرض، خط الطول)
+CITIES: List[Tuple[str, float, float, Sequence[str]]] = [
+    ("الدار البيضاء", 33.5731, -7.5898, ("سيدي مومن", "الحي المحمدي", "عين الشق", "المعاريف", "سيدي البرنوصي")),
+    ("الرباط", 34.0209, -6.8416, ("يعقوب المنصور", "التقدم", "حسان", "أكدال")),
+    ("فاس", 34.0181, -5.0078, ("فاس البالي", "المرينيين", "زواغة", "سايس")),
+    ("مراكش", 31.6295, -7.9811, ("المدينة", "سيدي يوسف بن علي", "المحاميد", "جليز")),
+    ("طنجة", 35.7595, -5.8340, ("بني مكادة", "مغوغة", "حي السلام", "المدينة القديمة")),
+    ("أكادير", 30.4278, -9.5981, ("الدشيرة", "أنزا", "تيكيوين", "الهدى")),
+    ("تطوان", 35.5889, -5.3626, ("الملاح", "سيدي المنظري", "طابولة")),
+    ("الحسيمة", 35.2517, -3.9372, ("إمزورن", "أجدير", "بني بوعياش")),
+    ("الحوز", 31.1372, -8.0059, ("أمزميز", "تحناوت", "أسني", "ويركان", "إغيل")),
+    ("تارودانت", 30.4703, -8.8770, ("تالوين", "أولاد برحيل", "إيغرم")),
+    ("شيشاوة", 31.5450, -8.7640, ("إمنتانوت", "مجاط", "سيدي المختار")),
+    ("وجدة", 34.6814, -1.9086, ("لازاري", "سيدي يحيى", "واد الناشف")),
+]
+
+FIRST_NAMES = (
+    "محمد", "أحمد", "يوسف", "عبد الله", "حسن", "إبراهيم", "مصطفى", "سعيد", "رشيد", "خالد",
+    "فاطمة", "خديجة", "زينب", "مريم", "عائشة", "حنان", "نادية", "سعاد", "ليلى", "أمينة",
+)
+LAST_NAMES = (
+    "العلوي", "الإدريسي", "بنعلي", "التازي", "الفاسي", "المراكشي", "السوسي", "بوزيد", "الحسني",
+    "الريفي", "أيت علي", "أوعلي", "بنمنصور", "الشرقاوي", "القادري", "الوزاني",
+)
+ORG_PREFIXES = ("جمعية", "مؤسسة", "تعاونية", "جمعية أصدقاء")
+ORG_NAMES = ("الخير", "الإحسان", "التضامن", "الأمل", "البر", "الرحمة", "العطاء", "النور", "الوفاء")
+
+# توزيع الحالات (نسب تقريبية لبيانات ما بعد أسبوع من الكارثة)
+REQUEST_STATUS_WEIGHTS = (
+    (RequestStatus.PENDING, 25),
+    (RequestStatus.NEW, 30),
+    (RequestStatus.ASSIGNED, 12),
+    (RequestStatus.IN_PROGRESS, 5),
+    (RequestStatus.COMPLETED, 22),
+    (RequestStatus.REJECTED, 4),
+    (RequestStatus.CANCELLED, 2),
+)
+CATEGORY_WEIGHTS = (
+    (RequestCategory.FOOD, 25), (RequestCategory.WATER, 15), (RequestCategory.SHELTER, 12),
+    (RequestCategory.MEDICINE, 10), (RequestCategory.BLANKETS, 10), (RequestCategory.CLOTHES, 8),
+    (RequestCategory.BABY_SUPPLIES, 7), (RequestCategory.HYGIENE, 6), (RequestCategory.FINANCIAL, 4),
+    (RequestCategory.OTHER, 3),
+)
+
+USER_COLUMNS = [
+    "id", "email", "password_hash", "access_code", "full_name", "phone", "address", "city", "region",
+    "role", "status", "created_at",
+]
+ORG_COLUMNS = [
+    "id", "user_id", "name", "description", "contact_phone", "service_types", "coverage_areas",
+    "status", "total_completed", "created_at",
+]
+REQUEST_COLUMNS = [
+    "id", "user_id", "requester_name", "name_key", "requester_phone", "category", "description", "quantity",
+    "family_members", "address", "city", "region", "latitude", "longitude", "geohash", "inspector_id", "status",
+    "priority_score", "is_urgent", "created_at", "updated_at", "completed_at",
+]
+ASSIGNMENT_COLUMNS = [
+    "id", "request_id", "org_id", "status", "allow_phone_access", "notes", "created_at", "completed_at",
+]
+
+
+def _db(member) -> str:
+    """قيمة التعداد كما يخزنها SQLAlchemy (اسم العضو وليس قيمته)"""
+    return member.name
+
+
+class Generator:
+    """مولد حتمي - كل المعرفات والقيم مشتقة من البذرة"""
+
+    def __init__(self, seed: int, days: int):
+        self.rng = random.Random(seed)
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=days)
+        self.days = days
+        self.password_hash = hash_password(LOAD_TEST_PASSWORD)
+        self._statuses, self._status_weights = zip(*REQUEST_STATUS_WEIGHTS)
+        self._categories, self._category_weights = zip(*CATEGORY_WEIGHTS)
+
+    def uuid(self) -> uuid.UUID:
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def priority(self, category: RequestCategory, family: int, urgent: bool, created: datetime) -> int:
+        request = SimpleNamespace(category=category, family_members=family, is_urgent=int(urgent), created_at=created)
+        return calculate_priority(request, now=self.now)
+
+    def name(self) -> str:
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def place(self) -> Tuple[str, str, float, float]:
+        city, lat, lon, regions = self.rng.choice(CITIES)
+        # انتشار حول مركز المدينة (~10 كم)
+        return (
+            city,
+            self.rng.choice(regions),
+            round(lat + self.rng.gauss(0, 0.05), 6),
+            round(lon + self.rng.gauss(0, 0.05), 6),
+        )
+
+    def timestamp(self) -> datetime:
+        # الطلبات تتركز في الأيام الأولى بعد الكارثة
+        offset = self.rng.expovariate(3.0 / self.days) if self.days else 0.0
+        return self.now - timedelta(days=min(offset, self.days), seconds=self.rng.randrange(86400))
+
+    def user(self, role: UserRole, index: int, phone_prefix: str, place=None) -> tuple:
+        phone = f"{phone_prefix}{index:08d}"
+        city, region, _, _ = place or self.place()
+        return (
+            self.uuid(),
+            f"{role.value}_{phone}@load.ksar.local",
+            self.password_hash,
+            LOAD_TEST_PASSWORD if role in (UserRole.INSPECTOR, UserRole.ORGANIZATION) else None,
+            self.name(),
+            phone,
+            f"{region}، زنقة {self.rng.randint(1, 120)}",
+            city,
+            region,
+            _db(role),
+            _db(UserStatus.ACTIVE),
+            self.timestamp(),
+        )
+
+    def request_status(self) -> RequestStatus:
+        return self.rng.choices(self._statuses, self._status_weights)[0]
+
+    def category(self) -> RequestCategory:
+        return self.rng.choices(self._categories, self._category_weights)[0]
+
+
+def _batches(rows: Iterator[tuple], size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _copy(conn: asyncpg.Connection, table: str, columns: List[str], rows: Iterator[tuple]) -> int:
+    total = 0
+    started = time.perf_counter()
+    for batch in _batches(rows):
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        total += len(batch)
+        print(f"   {table}: {total:,} ({total / (time.perf_counter() - started):,.0f} صف/ث)", end="\r")
+    print(f"   ✅ {table}: {total:,} صف في {time.perf_counter() - started:.1f} ث" + " " * 10)
+    return total
+
+
+async def generate(args) -> None:
+    gen = Generator(args.seed, args.days)
+    dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(dsn)
+
+    try:
+        if args.truncate:
+            print("🗑️  تفريغ الجداول...")
+            await conn.execute("TRUNCATE assignments, requests, organizations, users CASCADE")
+
+        print(f"🔄 توليد البيانات (seed={args.seed})...")
+
+        # المستخدمون: المواطنون، المراقبون، حسابات المؤسسات
+        citizens: List[Tuple[uuid.UUID, str, str, tuple]] = []
+        inspectors: List[uuid.UUID] = []
+        org_users: List[tuple] = []
+
+        def users() -> Iterator[tuple]:
+            for i in range(args.citizens):
+                place = gen.place()
+                row = gen.user(UserRole.CITIZEN, i, "06", place)
+                citizens.append((row[0], row[4], row[5], place))
+                yield row
+            for i in range(args.inspectors):
+                row = gen.user(UserRole.INSPECTOR, i, "07")
+                inspectors.append(row[0])
+                yield row
+            for i in range(args.orgs):
+                row = gen.user(UserRole.ORGANIZATION, i, "05")
+                org_users.append(row)
+                yield row
+
+        await _copy(conn, "users", USER_COLUMNS, users())
+
+        # المؤسسات - العدادات تُحسب من التكفلات بعد التحميل
+        org_ids = [gen.uuid() for _ in org_users]
+
+        def orgs() -> Iterator[tuple]:
+            for org_id, user_row in zip(org_ids, org_users):
+                prefix, name = gen.rng.choice(ORG_PREFIXES), gen.rng.choice(ORG_NAMES)
+                coverage = sorted({gen.rng.choice(CITIES)[0] for _ in range(gen.rng.randint(1, 3))})
+                services = sorted(c.value for c in gen.rng.sample(list(RequestCategory), k=3))
+                yield (
+                    org_id, user_row[0], f"{prefix} {name} - {user_row[7]}", None, user_row[5],
+                    json.dumps(services), json.dumps(coverage, ensure_ascii=False),
+                    _db(OrganizationStatus.ACTIVE), 0, user_row[11],
+                )
+
+        await _copy(conn, "organizations", ORG_COLUMNS, orgs())
+
+        # الطلبات والتكفلات تُولد معاً (التكفل يعتمد على حالة الطلب)
+        # وتُحمَّل دفعة بدفعة: طلبات الدفعة ثم تكفلاتها (المفتاح الأجنبي)
+        assignments: List[tuple] = []
+
+        def requests() -> Iterator[tuple]:
+            for _ in range(args.requests):
+                owner_id, owner_name, owner_phone, (city, region, lat, lon) = gen.rng.choice(citizens)
+                status = gen.request_status()
+                category = gen.category()
+                family = max(1, int(gen.rng.lognormvariate(1.3, 0.5)))
+                urgent = gen.rng.random() < 0.15
+                created = gen.timestamp()
+                completed = None
+                request_id = gen.uuid()
+                inspector_id = None if status == RequestStatus.PENDING else gen.rng.choice(inspectors)
+
+                if status == RequestStatus.NEW:
+                    for org_id in gen.rng.sample(org_ids, k=min(len(org_ids), gen.rng.choice((0, 0, 1, 2, 3)))):
+                        assignments.append((
+                            gen.uuid(), request_id, org_id, _db(AssignmentStatus.PLEDGED), False, None,
+                            created + timedelta(hours=gen.rng.uniform(1, 48)), None,
+                        ))
+                elif status in (RequestStatus.ASSIGNED, RequestStatus.IN_PROGRESS, RequestStatus.COMPLETED):
+                    a_status = AssignmentStatus.IN_PROGRESS
+                    if status == RequestStatus.COMPLETED:
+                        a_status = AssignmentStatus.COMPLETED
+                        completed = created + timedelta(hours=gen.rng.uniform(6, 120))
+                    assignments.append((
+                        gen.uuid(), request_id, gen.rng.choice(org_ids), _db(a_status),
+                        gen.rng.random() < 0.5, None, created + timedelta(hours=gen.rng.uniform(1, 24)), completed,
+                    ))
+                    # تعهد سابق لم يُعتمد
+                    if gen.rng.random() < 0.2:
+                        assignments.append((
+                            gen.uuid(), request_id, gen.rng.choice(org_ids), _db(AssignmentStatus.FAILED),
+                            False, None, created + timedelta(hours=1), None,
+                        ))
+
+                yield (
+                    request_id, owner_id, owner_name, normalize_name(owner_name) or None, owner_phone, _db(category), "",
+                    gen.rng.randint(1, 10), family, region, city, region, lat, lon, encode_geohash(lat, lon),
+                    inspector_id, _db(status), gen.priority(category, family, urgent, created), 1 if urgent else 0,
+                    created, None, completed,
+                )
+
+        started = time.perf_counter()
+        total_requests = total_assignments = 0
+        for batch in _batches(requests()):
+            await conn.copy_records_to_table("requests", records=batch, columns=REQUEST_COLUMNS)
+            if assignments:
+                await conn.copy_records_to_table("assignments", records=assignments, columns=ASSIGNMENT_COLUMNS)
+            total_requests += len(batch)
+            total_assignments += len(assignments)
+            assignments.clear()
+            rate = total_requests / (time.perf_counter() - started)
+            print(f"   requests: {total_requests:,} ({rate:,.0f} صف/ث)", end="\r")
+        print(
+            f"   ✅ requests: {total_requests:,} / assignments: {total_assignments:,} "
+            f"في {time.perf_counter() - started:.1f} ث" + " " * 10
+        )
+
+        # العدادات المشتقة (app/services/assignment_service.py) من التكفلات المحملة
+        await conn.execute(
+            """
+            UPDATE organizations o SET active_count = c.active, total_completed = c.completed, failed_count = c.failed
+            FROM (
+                SELECT org_id,
+                       count(*) FILTER (WHERE status IN ($1, $2)) AS active,
+                       count(*) FILTER (WHERE status = $3) AS completed,
+                       count(*) FILTER (WHERE status = $4) AS failed
+                FROM assignments GROUP BY org_id
+            ) c
+            WHERE o.id = c.org_id
+            """,
+            _db(AssignmentStatus.PLEDGED), _db(AssignmentStatus.IN_PROGRESS),
+            _db(AssignmentStatus.COMPLETED), _db(AssignmentStatus.FAILED),
+        )
+        await conn.execute(
+            """
+            UPDATE requests r SET pledge_count = c.n
+            FROM (
+                SELECT request_id, count(*) AS n FROM assignments
+                WHERE status = $1 GROUP BY request_id
+            ) c
+            WHERE r.id = c.request_id
+            """,
+            _db(AssignmentStatus.PLEDGED),
+        )
+
+        print("📊 ANALYZE...")
+        await conn.execute("ANALYZE users, organizations, requests, assignments")
+    finally:
+        await conn.close()
+
+    print("=" * 50)
+    print(f"   ✅ تم التحميل - كلمة المرور/الكود لجميع الحسابات: {LOAD_TEST_PASSWORD}")
+    print("=" * 50)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="توليد بيانات اختبار الحمل")
+    parser.add_argument("--citizens", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--orgs", type=int, default=300)
+    parser.add_argument("--inspectors", type=int, default=100)
+    parser.add_argument("--days", type=int, default=14, help="امتداد تواريخ الطلبات بالأيام")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="تفريغ الجداول قبل التحميل")
+    args = parser.parse_args()
+
+    if args.orgs < 1 or args.inspectors < 1 or args.citizens < 1:
+        parser.error("يجب توليد مواطن ومراقب ومؤسسة واحدة على الأقل")
+
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+اختبار حمل بسيناريو واقعي لمسار الطلب كاملاً
+
+    # داخل العملية ضد تطبيق ASGI (بدون شبكة - يقيس التطبيق وقاعدة البيانات فقط)
+    python scripts/load_test.py --duration 60 --concurrency 50 --output results/load-$(git rev-parse --short HEAD).json
+
+    # ضد خادم حي (نفس JWT_SECRET_KEY، ويُفضل RATE_LIMIT_ENABLED=false على الخادم)
+    python scripts/load_test.py --base-url http://localhost:8000 --duration 60
+
+    # مقارنة نتيجتين (مثلاً قبل وبعد تعديل)
+    python scripts/load_test.py --compare results/load-old.json results/load-new.json
+
+السيناريو (أوزان قابلة للتعديل في MIX):
+مواطن يقدم طلباً ← مراقب يراجع ويفعّل ← مؤسسة تتعهد ← مراقب يوافق ← مؤسسة تُتم التكفل
+مع قراءات اللوحات (قوائم المواطن والمراقب والمؤسسة وإحصائيات الإدارة)
+
+- الممثلون (مواطنون، مراقبون، مؤسسات) يُختارون من قاعدة البيانات - شغّل generate_load_data.py أولاً
+- التوكنات تُنشأ محلياً (لا bcrypt أثناء القياس)
+- النتائج: p50/p95/p99 لكل نقطة نهاية + الإنتاجية الإجمالية، بصيغة JSON قابلة للمقارنة بين commits
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# دعم التشغيل من Docker (/app) أو محلياً (backend/)
+_APP_ROOT = os.environ.get("APP_DIR", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _APP_ROOT not in sys.path:
+    sys.path.insert(0, _APP_ROOT)
+
+# داخل العملية: تعطيل rate limiting (المواطن الواحد يتجاوز 20 طلب/ساعة في ثوانٍ)
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from sqlalchemy import select, func
+
+from app.database import async_session
+from app.core.constants import OrganizationStatus, RequestCategory, UserRole, UserStatus
+from app.core.security import create_access_token
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+
+API = "/api/v1"
+
+# (اسم الخطوة، الوزن)
+MIX = (
+    ("citizen_submit", 20),
+    ("citizen_list", 15),
+    ("inspector_review", 15),
+    ("org_pledge", 15),
+    ("inspector_approve", 10),
+    ("org_complete", 10),
+    ("org_dashboard", 10),
+    ("admin_stats", 5),
+)
+
+CATEGORIES = [c.value for c in RequestCategory]
+
+
+@dataclass
+class Actors:
+    """الحسابات المستخدمة في الاختبار مع رؤوس المصادقة الجاهزة"""
+    citizens: List[dict] = field(default_factory=list)
+    inspectors: List[dict] = field(default_factory=list)
+    orgs: List[dict] = field(default_factory=list)
+    admins: List[dict] = field(default_factory=list)
+    dataset: Dict[str, int] = field(default_factory=dict)
+
+
+class Recorder:
+    """تجميع أزمنة الاستجابة لكل نقطة نهاية (قالب المسار وليس المسار الفعلي)"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.enabled = False
+
+    async def call(self, client: httpx.AsyncClient, method: str, template: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = time.perf_counter() - started
+        if self.enabled:
+            key = f"{method} {template}"
+            self.latencies[key].append(elapsed)
+            if response is None or response.status_code >= 500:
+                self.errors[key] += 1
+        return response
+
+
+def _headers(user_id, role: UserRole, org_id=None) -> dict:
+    token = create_access_token({"sub": str(user_id), "role": role.value, "org_id": str(org_id) if org_id else None})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def load_actors(rng: random.Random, per_role: int) -> Actors:
+    """اختيار عينة حتمية من الحسابات (مرتبة بالمعرف ثم عينة بالبذرة)"""
+    actors = Actors()
+    async with async_session() as session:
+        for role, target in (
+            (UserRole.CITIZEN, actors.citizens),
+            (UserRole.INSPECTOR, actors.inspectors),
+            (UserRole.ADMIN, actors.admins),
+            (UserRole.SUPERADMIN, actors.admins),
+        ):
+            ids = (await session.execute(
+                select(User.id)
+                .where(User.role == role, User.status == UserStatus.ACTIVE)
+                .order_by(User.id)
+                .limit(per_role * 20)
+            )).scalars().all()
+            for user_id in rng.sample(list(ids), k=min(per_role, len(ids))):
+                target.append({"id": user_id, "headers": _headers(user_id, role)})
+
+        rows = (await session.execute(
+            select(Organization.id, Organization.user_id)
+            .where(Organization.status == OrganizationStatus.ACTIVE)
+            .order_by(Organization.id)
+            .limit(per_role * 20)
+        )).all()
+        for org_id, user_id in rng.sample(list(rows), k=min(per_role, len(rows))):
+            actors.orgs.append({"id": org_id, "headers": _headers(user_id, UserRole.ORGANIZATION, org_id)})
+
+        actors.dataset = {
+            "users": (await session.execute(select(func.count(User.id)))).scalar(),
+            "requests": (await session.execute(select(func.count(Request.id)))).scalar(),
+        }
+
+    if not (actors.citizens and actors.inspectors and actors.orgs):
+        raise SystemExit("❌ لا توجد بيانات كافية - شغّل scripts/generate_load_data.py أولاً")
+    return actors
+
+
+# === خطوات السيناريو ===
+
+async def citizen_submit(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    citizen = rng.choice(actors.citizens)
+    await rec.call(
+        client, "POST", "/citizen/requests", f"{API}/citizen/requests",
+        headers=citizen["headers"],
+        json={
+            "category": rng.choice(CATEGORIES),
+            "description": "طلب من اختبار الحمل",
+            "quantity": rng.randint(1, 10),
+            "family_members": rng.randint(1, 8),
+            "is_urgent": rng.random() < 0.15,
+        },
+    )
+
+
+async def citizen_list(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    citizen = rng.choice(actors.citizens)
+    await rec.call(client, "GET", "/citizen/requests", f"{API}/citizen/requests", headers=citizen["headers"])
+    await rec.call(client, "GET", "/citizen/stats", f"{API}/citizen/stats", headers=citizen["headers"])
+
+
+async def inspector_review(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    inspector = rng.choice(actors.inspectors)
+    response = await rec.call(
+        client, "GET", "/inspector/requests", f"{API}/inspector/requests",
+        headers=inspector["headers"], params={"status": "pending", "limit": 20},
+    )
+    if response is None or response.status_code != 200:
+        return
+    items = response.json()["items"]
+    if not items:
+        return
+    target = rng.choice(items)
+    action = "activate" if rng.random() < 0.9 else "reject"
+    await rec.call(
+        client, "PATCH", f"/inspector/requests/{{request_id}}/{action}",
+        f"{API}/inspector/requests/{target['id']}/{action}",
+        headers=inspector["headers"],
+    )
+
+
+async def org_pledge(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    org = rng.choice(actors.orgs)
+    response = await rec.call(
+        client, "GET", "/org/requests/available", f"{API}/org/requests/available",
+        headers=org["headers"], params={"limit": 20},
+    )
+    if response is None or response.status_code != 200:
+        return
+    candidates = [r for r in response.json()["items"] if not r["already_pledged"]]
+    if not candidates:
+        return
+    await rec.call(
+        client, "POST", "/org/assignments", f"{API}/org/assignments",
+        headers=org["headers"], json={"request_id": rng.choice(candidates)["id"]},
+    )
+
+
+async def inspector_approve(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    inspector = rng.choice(actors.inspectors)
+    response = await rec.call(
+        client, "GET", "/inspector/requests", f"{API}/inspector/requests",
+        headers=inspector["headers"], params={"status": "new", "limit": 20},
+    )
+    if response is None or response.status_code != 200:
+        return
+    pledged = [r for r in response.json()["items"] if r.get("pledge_count")]
+    if not pledged:
+        return
+    request_id = rng.choice(pledged)["id"]
+    response = await rec.call(
+        client, "GET", "/inspector/requests/{request_id}/pledges",
+        f"{API}/inspector/requests/{request_id}/pledges", headers=inspector["headers"],
+    )
+    if response is None or response.status_code != 200 or not response.json()["pledges"]:
+        return
+    pledge = rng.choice(response.json()["pledges"])
+    await rec.call(
+        client, "POST", "/inspector/requests/{request_id}/approve-org",
+        f"{API}/inspector/requests/{request_id}/approve-org",
+        headers=inspector["headers"],
+        params={"assignment_id": pledge["assignment_id"], "show_citizen_phone": rng.random() < 0.5},
+    )
+
+
+async def org_complete(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    org = rng.choice(actors.orgs)
+    response = await rec.call(
+        client, "GET", "/org/assignments", f"{API}/org/assignments",
+        headers=org["headers"], params={"status": "in_progress", "limit": 20},
+    )
+    if response is None or response.status_code != 200:
+        return
+    items = response.json()["items"]
+    if not items:
+        return
+    assignment = rng.choice(items)
+    await rec.call(
+        client, "GET", "/org/assignments/{assignment_id}",
+        f"{API}/org/assignments/{assignment['id']}", headers=org["headers"],
+    )
+    status = "completed" if rng.random() < 0.9 else "failed"
+    await rec.call(
+        client, "PATCH", "/org/assignments/{assignment_id}",
+        f"{API}/org/assignments/{assignment['id']}",
+        headers=org["headers"],
+        json={"status": status, "completion_notes": "تم التسليم"} if status == "completed"
+        else {"status": status, "failure_reason": "تعذر الوصول"},
+    )
+
+
+async def org_dashboard(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    org = rng.choice(actors.orgs)
+    await rec.call(client, "GET", "/org/stats", f"{API}/org/stats", headers=org["headers"])
+    inspector = rng.choice(actors.inspectors)
+    await rec.call(client, "GET", "/inspector/stats", f"{API}/inspector/stats", headers=inspector["headers"])
+
+
+async def admin_stats(client, rec: Recorder, rng: random.Random, actors: Actors) -> None:
+    if not actors.admins:
+        return
+    admin = rng.choice(actors.admins)
+    await rec.call(client, "GET", "/admin/stats/overview", f"{API}/admin/stats/overview", headers=admin["headers"])
+    await rec.call(
+        client, "GET", "/admin/requests", f"{API}/admin/requests",
+        headers=admin["headers"], params={"limit": 20},
+    )
+
+
+STEPS = {
+    "citizen_submit": citizen_submit,
+    "citizen_list": citizen_list,
+    "inspector_review": inspector_review,
+    "org_pledge": org_pledge,
+    "inspector_approve": inspector_approve,
+    "org_complete": org_complete,
+    "org_dashboard": org_dashboard,
+    "admin_stats": admin_stats,
+}
+
+
+async def virtual_user(index: int, seed: int, client, rec: Recorder, actors: Actors, stop_at: float) -> None:
+    rng = random.Random(seed * 1000 + index)
+    names, weights = zip(*MIX)
+    while time.perf_counter() < stop_at:
+        step = rng.choices(names, weights)[0]
+        await STEPS[step](client, rec, rng, actors)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """نسبة مئوية بطريقة nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(rec: Recorder, elapsed: float) -> Dict[str, dict]:
+    endpoints = {}
+    for key in sorted(rec.latencies):
+        values = sorted(rec.latencies[key])
+        endpoints[key] = {
+            "count": len(values),
+            "errors": rec.errors.get(key, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return endpoints
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=_APP_ROOT, stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result: dict) -> None:
+    meta = result["meta"]
+    print("=" * 96)
+    print(
+        f"   commit={meta['commit']} seed={meta['seed']} concurrency={meta['concurrency']} "
+        f"duration={meta['duration_s']}s mode={meta['mode']}"
+    )
+    print("=" * 96)
+    print(f"{'endpoint':<56}{'count':>8}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for key, stats in result["endpoints"].items():
+        print(
+            f"{key:<56}{stats['count']:>8}{stats['errors']:>6}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+        )
+    print("-" * 96)
+    print(f"   الإجمالي: {result['total_requests']} طلب، {result['throughput_rps']} طلب/ث، أخطاء: {result['total_errors']}")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """مقارنة نتيجتين: الفرق في p50/p95/p99 لكل نقطة نهاية والإنتاجية"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def delta(a: float, b: float) -> str:
+        if not a:
+            return "    n/a"
+        return f"{(b - a) / a * 100:+6.1f}%"
+
+    print(f"   {old['meta']['commit']} → {new['meta']['commit']}")
+    print(f"{'endpoint':<56}{'p50':>16}{'p95':>16}{'p99':>16}")
+    for key in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        a, b = old["endpoints"].get(key), new["endpoints"].get(key)
+        if not a or not b:
+            print(f"{key:<56}{'(غير موجود في إحدى النتيجتين)':>48}")
+            continue
+        cells = "".join(
+            f"{b[p]:>8.1f}{delta(a[p], b[p]):>8}" for p in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"{key:<56}{cells}")
+    print(
+        f"   الإنتاجية: {old['throughput_rps']} → {new['throughput_rps']} طلب/ث "
+        f"({delta(old['throughput_rps'], new['throughput_rps']).strip()})"
+    )
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    actors = await load_actors(rng, args.actors)
+
+    if args.base_url:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=args.concurrency))
+        base_url, mode = args.base_url, "http"
+    else:
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url, mode = "http://loadtest", "asgi"
+
+    rec = Recorder()
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30.0) as client:
+        if args.warmup:
+            stop_at = time.perf_counter() + args.warmup
+            await asyncio.gather(*(
+                virtual_user(i, args.seed + 1, client, rec, actors, stop_at) for i in range(args.concurrency)
+            ))
+
+        rec.enabled = True
+        started = time.perf_counter()
+        stop_at = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(i, args.seed, client, rec, actors, stop_at) for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    endpoints = summarize(rec, elapsed)
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mode": mode,
+            "mix": dict(MIX),
+            "dataset": actors.dataset,
+        },
+        "endpoints": endpoints,
+        "total_requests": total,
+        "total_errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="اختبار حمل لمسار الطلب")
+    parser.add_argument("--base-url", default=None, help="عنوان خادم حي (الافتراضي: التطبيق داخل العملية)")
+    parser.add_argument("--duration", type=float, default=30.0, help="مدة القياس بالثواني")
+    parser.add_argument("--warmup", type=float, default=5.0, help="مدة الإحماء (لا تُحتسب)")
+    parser.add_argument("--concurrency", type=int, default=20, help="عدد المستخدمين الافتراضيين")
+    parser.add_argument("--actors", type=int, default=200, help="عدد الحسابات لكل دور")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="حفظ النتيجة بصيغة JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="مقارنة ملفي نتائج")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"   💾 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
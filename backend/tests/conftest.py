@@ -1,24 +1,48 @@
 import asyncio
+import os
+import re
 import uuid
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
+
+# إعدادات بيئة الاختبار - قبل استيراد التطبيق
+os.environ.setdefault("REDIS_URL", "")              # بدائل الذاكرة بدلاً من Redis
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("SMS_PROVIDER", "console")
 
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request as HTTPRequest
 
-from app.database import Base, get_db
+from app import database
+from app.database import Base, READ_ONLY_METHODS, WriteSession, get_db, has_pending_writes
 from app.main import app
-from app.core.constants import UserRole
+from app.core.constants import UserRole, UserStatus, OrganizationStatus
+from app.core.query_stats import instrument_engine
 from app.core.security import create_access_token
-from app.models.user import User, ResidentProfile
+from app.models.user import User
 from app.models.organization import Organization
+from app.services.map_clusters import map_cache
+from app.services.matching import org_index
+from app.services.org_directory import org_directory
+from app.services.otp_service import otp_service
+from app.services.sms import get_sms_provider
 
 # Use SQLite for testing
-TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+TEST_DATABASE_URL = "sqlite+aiosqlite://"
 
-engine = create_async_engine(TEST_DATABASE_URL, echo=False)
-TestSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+engine = create_async_engine(
+    TEST_DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+instrument_engine(engine)
+TestSessionLocal = async_sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=WriteSession, expire_on_commit=False
+)
 
 
 @pytest.fixture(scope="session")
@@ -37,6 +61,21 @@ async def setup_db():
         await conn.run_sync(Base.metadata.drop_all)
 
 
+@pytest.fixture(autouse=True)
+def primary_read_session(monkeypatch):
+    # الخدمات التي تقرأ من القاعدة الأساسية بجلساتها الخاصة (دليل الجمعيات)
+    monkeypatch.setattr(database, "read_session", database.read_sessionmaker(engine))
+
+
+@pytest.fixture(autouse=True)
+def reset_otp():
+    otp_service.reset()
+    map_cache.reset()
+    org_index.reset()
+    org_directory.reset()
+    yield
+
+
 @pytest_asyncio.fixture
 async def db_session() -> AsyncGenerator[AsyncSession, None]:
     async with TestSessionLocal() as session:
@@ -45,8 +84,18 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
 
 @pytest_asyncio.fixture
 async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
-    async def override_get_db():
-        yield db_session
+    # نفس سلوك get_db: طلبات القراءة لا تكتب، وطلبات الكتابة تلتزم مرة واحدة على الأكثر
+    async def override_get_db(request: HTTPRequest):
+        try:
+            yield db_session
+            if request.method in READ_ONLY_METHODS:
+                if has_pending_writes(db_session):
+                    raise RuntimeError(f"{request.method} {request.url.path} كتب في جلسة قراءة فقط")
+            elif has_pending_writes(db_session):
+                await db_session.commit()
+        except Exception:
+            await db_session.rollback()
+            raise
 
     app.dependency_overrides[get_db] = override_get_db
 
@@ -57,49 +106,47 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     app.dependency_overrides.clear()
 
 
-@pytest_asyncio.fixture
-async def resident_user(db_session: AsyncSession) -> User:
+async def _create_user(
+    db_session: AsyncSession,
+    role: UserRole,
+    phone: str,
+    full_name: str,
+    status: UserStatus = UserStatus.ACTIVE,
+) -> User:
     user = User(
         id=uuid.uuid4(),
-        phone="+212600000001",
-        phone_verified=True,
-        role=UserRole.RESIDENT,
-        full_name="ساكن تجريبي",
-        language="ar",
+        email=f"{role.value}_{phone}@test.ksar.local",
+        password_hash="not-used",
+        full_name=full_name,
+        phone=phone,
+        role=role,
+        status=status,
     )
     db_session.add(user)
-    await db_session.flush()
-
-    profile = ResidentProfile(
-        user_id=user.id,
-        family_size=4,
-        special_cases=["children"],
-        location_text="حي السلام",
-    )
-    db_session.add(profile)
     await db_session.commit()
+    return user
+
 
+@pytest_asyncio.fixture
+async def citizen_user(db_session: AsyncSession) -> User:
+    user = await _create_user(db_session, UserRole.CITIZEN, "0600000001", "مواطن تجريبي")
+    user.city = "طنجة"
+    user.region = "حي السلام"
+    await db_session.commit()
     return user
 
 
 @pytest_asyncio.fixture
 async def org_user(db_session: AsyncSession) -> User:
-    user = User(
-        id=uuid.uuid4(),
-        phone="+212600000002",
-        phone_verified=True,
-        role=UserRole.ORGANIZATION,
-        full_name="مسؤول جمعية",
-        language="ar",
-    )
-    db_session.add(user)
-    await db_session.flush()
+    user = await _create_user(db_session, UserRole.ORGANIZATION, "0600000002", "مسؤول جمعية")
 
     org = Organization(
         user_id=user.id,
         name="جمعية الخير",
+        contact_phone=user.phone,
         service_types=["food", "medicine"],
-        coverage_areas=["tanger"],
+        coverage_areas=["طنجة"],
+        status=OrganizationStatus.ACTIVE,
     )
     db_session.add(org)
     await db_session.commit()
@@ -108,21 +155,26 @@ async def org_user(db_session: AsyncSession) -> User:
 
 
 @pytest_asyncio.fixture
-async def coordinator_user(db_session: AsyncSession) -> User:
-    user = User(
-        id=uuid.uuid4(),
-        phone="+212600000003",
-        phone_verified=True,
-        role=UserRole.COORDINATOR,
-        full_name="منسق ميداني",
-        language="ar",
-    )
-    db_session.add(user)
-    await db_session.commit()
+async def inspector_user(db_session: AsyncSession) -> User:
+    return await _create_user(db_session, UserRole.INSPECTOR, "0600000003", "مراقب ميداني")
 
-    return user
 
+@pytest_asyncio.fixture
+async def admin_user(db_session: AsyncSession) -> User:
+    return await _create_user(db_session, UserRole.ADMIN, "0600000004", "مشرف")
+
+
+@pytest_asyncio.fixture
+async def superadmin_user(db_session: AsyncSession) -> User:
+    return await _create_user(db_session, UserRole.SUPERADMIN, "0600000005", "المدير العام")
 
-def get_auth_headers(user: User) -> dict:
-    token = create_access_token({"sub": str(user.id), "role": user.role.value})
+
+def get_auth_headers(user: User, org_id: Optional[str] = None) -> dict:
+    token = create_access_token({"sub": str(user.id), "role": user.role.value, "org_id": org_id})
     return {"Authorization": f"Bearer {token}"}
+
+
+async def issue_otp(phone: str) -> str:
+    """إرسال رمز تحقق وقراءته من مزود الرسائل الوهمي (console)"""
+    await otp_service.send(phone)
+    return re.search(r"\d{4,}", get_sms_provider().last_message(phone)).group()
@@ -0,0 +1,78 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import OrganizationStatus, RequestCategory, RequestStatus, UserRole
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from app.services.assignment_service import reconcile_counters
+from tests.conftest import _create_user, get_auth_headers
+
+
+async def _org_counters(db: AsyncSession) -> dict:
+    result = await db.execute(
+        select(Organization.name, Organization.active_count, Organization.total_completed, Organization.failed_count)
+    )
+    return {name: (active, completed, failed) for name, active, completed, failed in result.all()}
+
+
+async def _pledge_count(db: AsyncSession, request_id) -> int:
+    return (await db.execute(select(Request.pledge_count).where(Request.id == request_id))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_transitions_maintain_counters(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, org_user: User, inspector_user: User,
+):
+    first = (await db_session.execute(select(Organization))).scalar_one()
+    other_user = await _create_user(db_session, UserRole.ORGANIZATION, "0600000096", "مسؤول جمعية أخرى")
+    second = Organization(user_id=other_user.id, name="جمعية الأمل", status=OrganizationStatus.ACTIVE)
+    req = Request(
+        user_id=citizen_user.id, requester_name=citizen_user.full_name, requester_phone=citizen_user.phone,
+        category=RequestCategory.FOOD, description="", address="", status=RequestStatus.NEW,
+    )
+    db_session.add_all([second, req])
+    await db_session.commit()
+
+    pledges = {}
+    for user, org in ((org_user, first), (other_user, second)):
+        response = await client.post(
+            "/api/v1/org/assignments", headers=get_auth_headers(user, str(org.id)),
+            json={"request_id": str(req.id)},
+        )
+        assert response.status_code == 201
+        pledges[org.name] = response.json()["id"]
+    assert await _pledge_count(db_session, req.id) == 2
+    assert await _org_counters(db_session) == {"جمعية الخير": (1, 0, 0), "جمعية الأمل": (1, 0, 0)}
+
+    # العدادات تُحدَّث بلا مزامنة الجلسة - كل طلب HTTP حقيقي يفتح جلسة جديدة
+    await db_session.refresh(req)
+    response = await client.get("/api/v1/inspector/requests", headers=get_auth_headers(inspector_user))
+    assert [item["pledge_count"] for item in response.json()["items"]] == [2]
+
+    response = await client.post(
+        f"/api/v1/inspector/requests/{req.id}/approve-org", headers=get_auth_headers(inspector_user),
+        params={"assignment_id": pledges["جمعية الخير"]},
+    )
+    assert response.status_code == 200
+    assert await _pledge_count(db_session, req.id) == 0
+    assert await _org_counters(db_session) == {"جمعية الخير": (1, 0, 0), "جمعية الأمل": (0, 0, 1)}
+
+    response = await client.patch(
+        f"/api/v1/org/assignments/{pledges['جمعية الخير']}", headers=get_auth_headers(org_user, str(first.id)),
+        json={"status": "completed"},
+    )
+    assert response.status_code == 200
+    assert await _org_counters(db_session) == {"جمعية الخير": (0, 1, 0), "جمعية الأمل": (0, 0, 1)}
+
+    # الانحراف (تعديل يدوي مثلاً) يُكشف ويُصلح، والصحيح لا يُلمس
+    await db_session.execute(update(Request).values(pledge_count=5))
+    await db_session.execute(update(Organization).where(Organization.id == second.id).values(failed_count=0))
+    await db_session.commit()
+    assert await reconcile_counters(db_session) == {"requests": 1, "organizations": 1}
+    await db_session.commit()
+    assert await _pledge_count(db_session, req.id) == 0
+    assert await _org_counters(db_session) == {"جمعية الخير": (0, 1, 0), "جمعية الأمل": (0, 0, 1)}
+    assert await reconcile_counters(db_session) == {"requests": 0, "organizations": 0}
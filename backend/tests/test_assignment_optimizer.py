@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, OrganizationStatus, RequestCategory, RequestStatus, UserRole
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from app.services.assignment_optimizer import solve
+from tests.conftest import _create_user, get_auth_headers
+
+
+def test_solve_respects_capacity_priority_and_improves_greedy():
+    # الطلب الأول (الأعلى أولوية) يأخذ الجمعية 0 جشعاً، والتبادل يعيد الأفضل للمجموع
+    fit = np.array([
+        [0.9, 0.8],
+        [0.9, 0.1],
+        [0.5, -np.inf],
+    ])
+    assigned = solve(fit, np.array([50.0, 40.0, 0.0]), np.array([1, 1]))
+    assert assigned.tolist() == [1, 0, -1]
+
+    # بلا سعة لا يُسند شيء
+    assert solve(fit, np.zeros(3), np.array([0, 0])).tolist() == [-1, -1, -1]
+
+
+def _request(user: User, category: RequestCategory, city: str, priority: int) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=category,
+        description="",
+        address="",
+        city=city,
+        status=RequestStatus.NEW,
+        priority_score=priority,
+    )
+
+
+@pytest.mark.asyncio
+async def test_plan_and_commit(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User,
+):
+    orgs = {}
+    for index, (name, services, areas) in enumerate([
+        ("غذاء طنجة", ["food"], ["طنجة"]),
+        ("أدوية تطوان", ["medicine"], ["تطوان"]),
+    ]):
+        user = await _create_user(db_session, UserRole.ORGANIZATION, f"061200000{index}", name)
+        orgs[name] = Organization(
+            user_id=user.id, name=name, service_types=services, coverage_areas=areas,
+            status=OrganizationStatus.ACTIVE,
+        )
+    requests = [
+        _request(citizen_user, RequestCategory.FOOD, "طنجة", 80),
+        _request(citizen_user, RequestCategory.FOOD, "طنجة", 20),
+        _request(citizen_user, RequestCategory.MEDICINE, "تطوان", 50),
+        _request(citizen_user, RequestCategory.SHELTER, "طنجة", 90),
+    ]
+    db_session.add_all([*orgs.values(), *requests])
+    await db_session.commit()
+    food, medicine = orgs["غذاء طنجة"], orgs["أدوية تطوان"]
+    headers = get_auth_headers(inspector_user)
+
+    response = await client.post(
+        "/api/v1/inspector/assignments/plan", headers=headers,
+        json={"capacities": {str(food.id): 1}},
+    )
+    assert response.status_code == 200
+    plan = response.json()["data"]
+    pairs = {item["request_id"]: item["organization_id"] for item in plan["assignments"]}
+    # سعة جمعية الغذاء واحدة: الطلب الأعلى أولوية فقط، والإيواء لا يلائم أحداً
+    assert pairs == {str(requests[0].id): str(food.id), str(requests[2].id): str(medicine.id)}
+    assert set(plan["unassigned"]) == {str(requests[1].id), str(requests[3].id)}
+
+    # طلب رُبط يدوياً بعد الخطة يُتخطى عند الاعتماد
+    db_session.add(Assignment(request_id=requests[2].id, org_id=medicine.id, status=AssignmentStatus.PLEDGED))
+    await db_session.commit()
+
+    response = await client.post(
+        "/api/v1/inspector/assignments/plan/commit", headers=headers,
+        json={"assignments": plan["assignments"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["assigned"] == 1
+    assert response.json()["skipped"] == [str(requests[2].id)]
+
+    committed = (await db_session.execute(
+        select(Request).where(Request.id == requests[0].id).execution_options(populate_existing=True)
+    )).scalar_one()
+    assert committed.status == RequestStatus.ASSIGNED
+    assert committed.inspector_id == inspector_user.id
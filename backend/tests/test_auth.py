@@ -1,23 +1,72 @@
 import pytest
 from httpx import AsyncClient
 
+from tests.conftest import issue_otp
+
 
 @pytest.mark.asyncio
-async def test_start_otp(client: AsyncClient):
+async def test_register_and_login(client: AsyncClient):
     response = await client.post(
-        "/api/v1/auth/start",
-        json={"phone": "+212612345678"},
+        "/api/v1/auth/register",
+        json={
+            "email": "new@example.ma",
+            "password": "secret123",
+            "full_name": "مواطن جديد",
+            "phone": "0612345678",
+        },
     )
-    assert response.status_code == 200
+    assert response.status_code == 201
     data = response.json()
-    assert data["message"] == "تم إرسال رمز التحقق"
-    assert data["expires_in"] == 300
+    assert data["user"]["role"] == "citizen"
+    assert data["access_token"]
+
+    response = await client.post(
+        "/api/v1/auth/login",
+        json={"email": "new@example.ma", "password": "secret123"},
+    )
+    assert response.status_code == 200
+    assert response.json()["user"]["email"] == "new@example.ma"
+
+
+@pytest.mark.asyncio
+async def test_login_wrong_password(client: AsyncClient):
+    await client.post(
+        "/api/v1/auth/register",
+        json={
+            "email": "user@example.ma",
+            "password": "secret123",
+            "full_name": "مواطن",
+            "phone": "0612345679",
+        },
+    )
+    response = await client.post(
+        "/api/v1/auth/unified-login",
+        json={"identifier": "0612345679", "password": "wrong-pass"},
+    )
+    assert response.status_code == 401
 
 
 @pytest.mark.asyncio
-async def test_start_otp_invalid_phone(client: AsyncClient):
+async def test_register_invalid_phone(client: AsyncClient):
     response = await client.post(
-        "/api/v1/auth/start",
-        json={"phone": "123"},
+        "/api/v1/auth/register",
+        json={
+            "email": "bad@example.ma",
+            "password": "secret123",
+            "full_name": "مواطن",
+            "phone": "123",
+        },
     )
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_phone_register_creates_pending_citizen(client: AsyncClient):
+    response = await client.post(
+        "/api/v1/auth/phone-register",
+        json={"phone": "0698765432", "code": await issue_otp("0698765432"), "full_name": "مواطن بالهاتف"},
+    )
+    assert response.status_code == 201
+    data = response.json()
+    assert data["is_new_user"] is True
+    assert data["user"]["phone"] == "0698765432"
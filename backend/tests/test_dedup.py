@@ -0,0 +1,66 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import UserRole
+from app.core.text import name_similarity, normalize_name
+from app.models.user import User
+from tests.conftest import _create_user, get_auth_headers
+
+TANGIER = (35.7595, -5.8340)
+
+
+def test_normalize_name():
+    assert normalize_name("عَبْدُ الله  الإدريسي") == normalize_name("عبدالله الادريسى") == "عبدالله الادريسي"
+    assert normalize_name("فاطمة-الزهراء ٢") == "فاطمه الزهراء 2"
+    # أفراد الأسرة الواحدة يتشاركون اسم العائلة
+    assert name_similarity(normalize_name("محمد العلوي"), normalize_name("فاطمة العلوي")) > 0.5
+    assert name_similarity(normalize_name("أحمد بنعلي"), normalize_name("خديجة الراشدي")) < 0.3
+
+
+async def _submit(client: AsyncClient, user: User, **body) -> str:
+    response = await client.post(
+        "/api/v1/citizen/requests", headers=get_auth_headers(user), json={"category": "food", "quantity": 1, **body},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_household_resubmission_flagged(
+    client: AsyncClient, db_session: AsyncSession, inspector_user: User,
+):
+    citizen = await _create_user(db_session, UserRole.CITIZEN, "0600000097", "محمد العلوي")
+    first = await _submit(client, citizen, latitude=TANGIER[0], longitude=TANGIER[1])
+    # فرد آخر من الأسرة نفسها، بهاتف آخر وفي الموقع نفسه تقريباً
+    relative = await _create_user(db_session, UserRole.CITIZEN, "0600000099", "فاطمة العلوي")
+    second = await _submit(client, relative, latitude=TANGIER[0] + 0.0002, longitude=TANGIER[1])
+    # جار في حي آخر بتصنيف آخر
+    neighbour = await _create_user(db_session, UserRole.CITIZEN, "0600000098", "خديجة الراشدي")
+    await _submit(client, neighbour, category="medicine", latitude=TANGIER[0] + 0.01, longitude=TANGIER[1])
+
+    headers = get_auth_headers(inspector_user)
+    response = await client.get("/api/v1/inspector/requests", headers=headers, params={"suspected_duplicate": True})
+    assert response.status_code == 200
+    [item] = response.json()["items"]
+    assert item["id"] == second
+    assert item["duplicate_of_id"] == first
+    assert item["duplicate_score"] >= 50
+
+    response = await client.get(f"/api/v1/inspector/requests/{second}", headers=headers)
+    assert response.json()["duplicate_of_id"] == first
+
+
+@pytest.mark.asyncio
+async def test_own_request_in_other_category_not_flagged(
+    client: AsyncClient, db_session: AsyncSession, inspector_user: User,
+):
+    citizen = await _create_user(db_session, UserRole.CITIZEN, "0600000096", "محمد العلوي")
+    await _submit(client, citizen)
+    await _submit(client, citizen, category="medicine")
+
+    response = await client.get(
+        "/api/v1/inspector/requests", headers=get_auth_headers(inspector_user), params={"suspected_duplicate": True},
+    )
+    assert response.status_code == 200
+    assert response.json()["items"] == []
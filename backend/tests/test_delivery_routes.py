@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, RequestCategory, RequestStatus
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from app.services.delivery_routes import plan_batches
+from tests.conftest import get_auth_headers
+
+TANGIER = (35.7595, -5.8340)
+TETOUAN = (35.5785, -5.3684)
+
+
+def test_batches_split_by_area_and_respect_max_stops():
+    rng = random.Random(3)
+    points = [
+        (center[0] + rng.uniform(-0.01, 0.01), center[1] + rng.uniform(-0.01, 0.01))
+        for center in (TANGIER, TETOUAN)
+        for _ in range(6)
+    ]
+    batches = plan_batches(points, max_stops=6)
+    assert sorted(len(batch) for batch in batches) == [6, 6]
+    assert sorted(sorted(batch) for batch in batches) == [list(range(6)), list(range(6, 12))]
+
+    # الجار الأقرب: من نقطة الانطلاق إلى أقرب محطة
+    [batch] = plan_batches([(35.0, -5.0), (35.2, -5.0), (35.1, -5.0)], max_stops=5, start=(35.25, -5.0))
+    assert batch == [1, 2, 0]
+
+
+def _request(user: User, latitude, longitude, urgent: int = 0) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=RequestCategory.FOOD,
+        description="",
+        address="",
+        status=RequestStatus.IN_PROGRESS,
+        latitude=latitude,
+        longitude=longitude,
+        is_urgent=urgent,
+    )
+
+
+@pytest.mark.asyncio
+async def test_org_routes(client: AsyncClient, db_session: AsyncSession, citizen_user: User, org_user: User):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    requests = [
+        _request(citizen_user, *TANGIER),
+        _request(citizen_user, TANGIER[0] + 0.01, TANGIER[1]),
+        _request(citizen_user, *TETOUAN, urgent=1),
+        _request(citizen_user, None, None),
+    ]
+    db_session.add_all(requests)
+    await db_session.flush()
+    db_session.add_all([
+        Assignment(request_id=r.id, org_id=org.id, status=AssignmentStatus.IN_PROGRESS, allow_phone_access=i == 0)
+        for i, r in enumerate(requests)
+    ])
+    await db_session.commit()
+
+    response = await client.get(
+        "/api/v1/org/assignments/routes", headers=get_auth_headers(org_user, str(org.id)),
+        params={"max_stops": 2},
+    )
+    assert response.status_code == 200
+    data = response.json()["data"]
+    urgent, tangier = data["batches"]
+    assert [s["request_id"] for s in urgent["stops"]] == [str(requests[2].id)]
+    assert {s["request_id"] for s in tangier["stops"]} == {str(requests[0].id), str(requests[1].id)}
+    assert 1.0 < tangier["distance_km"] < 1.3
+    phones = {s["request_id"]: s["contact"]["phone"] for s in tangier["stops"]}
+    assert phones == {str(requests[0].id): citizen_user.phone, str(requests[1].id): None}
+    assert [s["request_id"] for s in data["unlocated"]] == [str(requests[3].id)]
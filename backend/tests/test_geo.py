@@ -0,0 +1,108 @@
+import random
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import RequestCategory, RequestStatus
+from app.core.geo import cover_bbox, distance_km, encode_geohash, radius_bbox
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from tests.conftest import get_auth_headers
+
+TANGIER = (35.7595, -5.8340)
+
+
+def test_encode_geohash():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert encode_geohash(57.64911, 10.40744, 5) == "u4pru"
+
+
+def test_cover_bbox_contains_every_point():
+    rng = random.Random(7)
+    for _ in range(50):
+        lat, lon = rng.uniform(-60, 60), rng.uniform(-170, 170)
+        bbox = radius_bbox(lat, lon, rng.uniform(0.5, 50))
+        cells = cover_bbox(bbox)
+        assert len(cells) <= 12
+        for _ in range(20):
+            point = encode_geohash(rng.uniform(bbox[0], bbox[2]), rng.uniform(bbox[1], bbox[3]))
+            assert any(point.startswith(cell) for cell in cells)
+
+
+def _request(user: User, latitude, longitude, urgent: int = 0) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=RequestCategory.FOOD,
+        description="",
+        address="",
+        status=RequestStatus.NEW,
+        latitude=latitude,
+        longitude=longitude,
+        is_urgent=urgent,
+    )
+
+
+@pytest.fixture
+async def located_requests(db_session: AsyncSession, citizen_user: User):
+    # المركز، ~5 كم شمالاً (مستعجل)، ~30 كم شرقاً، وطلب بلا إحداثيات
+    rows = [
+        _request(citizen_user, *TANGIER),
+        _request(citizen_user, TANGIER[0] + 0.045, TANGIER[1], urgent=1),
+        _request(citizen_user, TANGIER[0], TANGIER[1] + 0.33),
+        _request(citizen_user, None, None),
+    ]
+    db_session.add_all(rows)
+    await db_session.commit()
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_org_feed_radius_filter(
+    client: AsyncClient, db_session: AsyncSession, org_user: User, located_requests,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    headers = get_auth_headers(org_user, str(org.id))
+    near = f"{TANGIER[0]},{TANGIER[1]}"
+
+    response = await client.get("/api/v1/org/requests/available", headers=headers, params={"near": near})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+
+    response = await client.get(
+        "/api/v1/org/requests/available", headers=headers,
+        params={"near": near, "radius_km": 10, "is_urgent": True},
+    )
+    [item] = response.json()["items"]
+    assert item["id"] == str(located_requests[1].id)
+    assert distance_km(*TANGIER, item["latitude"], item["longitude"]) < 10
+
+    response = await client.get(
+        "/api/v1/org/requests/available", headers=headers, params={"near": near, "radius_km": 40},
+    )
+    assert response.json()["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_inspector_bbox_filter(client: AsyncClient, inspector_user: User, located_requests):
+    headers = get_auth_headers(inspector_user)
+    bbox = f"{TANGIER[1] - 0.01},{TANGIER[0] - 0.01},{TANGIER[1] + 0.01},{TANGIER[0] + 0.06}"
+    response = await client.get("/api/v1/inspector/requests", headers=headers, params={"bbox": bbox})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+
+    response = await client.get("/api/v1/inspector/requests", headers=headers, params={"near": "91,0"})
+    assert response.status_code == 400
+    response = await client.get("/api/v1/inspector/requests", headers=headers, params={"bbox": "1,2,3"})
+    assert response.status_code == 400
+
+
+def test_geohash_follows_coordinates():
+    request = Request(latitude=TANGIER[0], longitude=TANGIER[1])
+    assert request.geohash == encode_geohash(*TANGIER)
+    request.latitude = None
+    assert request.geohash is None
@@ -8,4 +8,4 @@ async def test_health_check(client: AsyncClient):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
-    assert data["service"] == "igatha-backend"
+    assert data["service"] == "ksar-backend"
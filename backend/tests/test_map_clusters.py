@@ -0,0 +1,91 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import RequestCategory, RequestStatus
+from app.core.geo import encode_geohash
+from app.models.request import Request
+from app.models.user import User
+from app.services.map_clusters import precision_for
+from tests.conftest import get_auth_headers
+
+TANGIER = (35.7595, -5.8340)
+# نافذة حول طنجة بترتيب GeoJSON
+BBOX = f"{TANGIER[1] - 0.2},{TANGIER[0] - 0.2},{TANGIER[1] + 0.2},{TANGIER[0] + 0.2}"
+
+
+def _request(user: User, latitude, longitude, category=RequestCategory.FOOD, urgent: int = 0) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=category,
+        description="",
+        address="",
+        status=RequestStatus.NEW,
+        latitude=latitude,
+        longitude=longitude,
+        is_urgent=urgent,
+    )
+
+
+async def _clusters(client: AsyncClient, headers: dict, zoom: int = 5) -> dict:
+    response = await client.get("/api/v1/admin/map/clusters", headers=headers, params={"bbox": BBOX, "zoom": zoom})
+    assert response.status_code == 200
+    return response.json()["data"]
+
+
+def test_precision_capped_by_window():
+    world = (-90.0, -180.0, 90.0, 180.0)
+    assert precision_for(20, world) == 1
+    assert precision_for(10, (35.7, -5.9, 35.8, -5.8)) == 5
+
+
+@pytest.mark.asyncio
+async def test_clusters_counts_and_invalidation(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, admin_user: User,
+):
+    rows = [
+        _request(citizen_user, *TANGIER),
+        _request(citizen_user, TANGIER[0] + 0.001, TANGIER[1], RequestCategory.MEDICINE, urgent=1),
+        _request(citizen_user, TANGIER[0] + 5, TANGIER[1]),
+        _request(citizen_user, None, None),
+    ]
+    db_session.add_all(rows)
+    await db_session.commit()
+    headers = get_auth_headers(admin_user)
+
+    data = await _clusters(client, headers)
+    [cluster] = data["clusters"]
+    assert cluster["cell"] == encode_geohash(*TANGIER, data["precision"])
+    assert cluster["count"] == 2
+    assert cluster["urgent"] == 1
+    assert cluster["by_status"] == {"new": 2}
+    assert cluster["by_category"] == {"food": 1, "medicine": 1}
+
+    # تغيير الحالة يحذف الخلية المخزنة
+    request = (await db_session.execute(select(Request).where(Request.id == rows[0].id))).scalar_one()
+    request.status = RequestStatus.ASSIGNED
+    await db_session.commit()
+    [cluster] = (await _clusters(client, headers))["clusters"]
+    assert cluster["by_status"] == {"new": 1, "assigned": 1}
+
+    # نقل طلب خارج النافذة يحذف الخلية القديمة
+    request.latitude = TANGIER[0] + 5
+    await db_session.commit()
+    [cluster] = (await _clusters(client, headers))["clusters"]
+    assert cluster["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_inspector_clusters(client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User):
+    db_session.add(_request(citizen_user, *TANGIER))
+    await db_session.commit()
+    headers = get_auth_headers(inspector_user)
+    response = await client.get("/api/v1/inspector/map/clusters", headers=headers, params={"bbox": BBOX, "zoom": 12})
+    assert response.status_code == 200
+    assert [c["count"] for c in response.json()["data"]["clusters"]] == [1]
+
+    response = await client.get("/api/v1/inspector/map/clusters", headers=headers, params={"bbox": "1,2,3", "zoom": 5})
+    assert response.status_code == 400
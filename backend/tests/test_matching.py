@@ -0,0 +1,101 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, OrganizationStatus, RequestCategory, RequestStatus, UserRole
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from tests.conftest import _create_user, get_auth_headers
+
+
+def _request(user: User, category=RequestCategory.FOOD, status=RequestStatus.NEW, city="طنجة", **kwargs) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=category,
+        description="",
+        address="",
+        city=city,
+        status=status,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+async def orgs(db_session: AsyncSession):
+    rows = {}
+    for index, (name, services, areas) in enumerate([
+        ("غذاء طنجة", ["food"], ["طنجة"]),
+        ("غذاء فاس", ["food"], ["فاس"]),
+        ("أدوية طنجة", ["medicine"], ["طنجة"]),
+        ("عامة", [], []),
+    ]):
+        user = await _create_user(db_session, UserRole.ORGANIZATION, f"061100000{index}", name)
+        rows[name] = Organization(
+            user_id=user.id, name=name, service_types=services, coverage_areas=areas,
+            status=OrganizationStatus.ACTIVE,
+        )
+    db_session.add_all(rows.values())
+    await db_session.commit()
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_request_matches_ranked_and_refreshed(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User, orgs,
+):
+    request = _request(citizen_user)
+    db_session.add(request)
+    await db_session.commit()
+    headers = get_auth_headers(inspector_user)
+    url = f"/api/v1/inspector/requests/{request.id}/matches"
+
+    response = await client.get(url, headers=headers)
+    assert response.status_code == 200
+    names = [m["name"] for m in response.json()["data"]["matches"]]
+    # جمعية الأدوية ليست مرشحة لطلب غذاء
+    assert names == ["غذاء طنجة", "غذاء فاس", "عامة"]
+
+    # جمعية فشلت في الطلب لا تُقترح له، وتعطيل جمعية يخرجها من الفهرس
+    db_session.add(Assignment(request_id=request.id, org_id=orgs["غذاء طنجة"].id, status=AssignmentStatus.FAILED))
+    general = (await db_session.execute(select(Organization).where(Organization.id == orgs["عامة"].id))).scalar_one()
+    general.status = OrganizationStatus.SUSPENDED
+    await db_session.commit()
+
+    response = await client.get(url, headers=headers)
+    assert [m["name"] for m in response.json()["data"]["matches"]] == ["غذاء فاس"]
+
+
+@pytest.mark.asyncio
+async def test_workload_and_queue_batch(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User, orgs,
+):
+    busy = orgs["غذاء طنجة"]
+    for _ in range(3):
+        other = _request(citizen_user, status=RequestStatus.IN_PROGRESS)
+        db_session.add(other)
+        await db_session.flush()
+        db_session.add(Assignment(request_id=other.id, org_id=busy.id, status=AssignmentStatus.IN_PROGRESS))
+    urgent = _request(citizen_user, RequestCategory.MEDICINE, RequestStatus.PENDING, priority_score=90)
+    normal = _request(citizen_user, priority_score=10)
+    closed = _request(citizen_user, status=RequestStatus.COMPLETED, priority_score=99)
+    db_session.add_all([urgent, normal, closed])
+    await db_session.commit()
+
+    response = await client.get("/api/v1/inspector/matches", headers=get_auth_headers(inspector_user), params={"top": 2})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["request_id"] for item in items] == [str(urgent.id), str(normal.id)]
+    assert items[0]["matches"][0]["name"] == "أدوية طنجة"
+    food = {m["name"]: m for m in items[1]["matches"]}
+    assert food["غذاء طنجة"]["active_assignments"] == 3
+    assert food["غذاء طنجة"]["components"]["workload"] < 1
+
+    response = await client.get(
+        f"/api/v1/inspector/requests/{closed.id}/matches", headers=get_auth_headers(inspector_user),
+    )
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+from httpx import AsyncClient, ASGITransport
+from fastapi import FastAPI
+
+from app.core.metrics import MetricsMiddleware, HTTP_LATENCY, metrics_response
+
+
+def _sample_count(method: str, route: str, status: str) -> float:
+    for metric in HTTP_LATENCY.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.labels == {
+                "method": method, "route": route, "status": status,
+            }:
+                return sample.value
+    return 0.0
+
+
+async def test_latency_is_recorded_by_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware)
+    before = _sample_count("GET", "/items/{item_id}", "200")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/items/1")
+        await client.get("/items/2")
+
+    assert _sample_count("GET", "/items/{item_id}", "200") == before + 2
+
+
+async def test_unmatched_paths_share_one_label():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    before = _sample_count("GET", "<unmatched>", "404")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/nope/1")
+        await client.get("/nope/2")
+
+    assert _sample_count("GET", "<unmatched>", "404") == before + 2
+
+
+def test_metrics_response_exposes_gauges():
+    body = metrics_response().body.decode()
+    assert "ksar_http_request_duration_seconds" in body
+    assert "ksar_db_pool_checked_out" in body
+    assert "ksar_event_loop_lag_seconds" in body
+    assert "ksar_bcrypt_queue_depth" in body
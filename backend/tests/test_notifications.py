@@ -0,0 +1,105 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.constants import NotificationStatus
+from app.models.notification import Notification
+from app.models.user import User
+from app.services import notifications
+from app.services.notifications import NotificationDispatcher
+from app.services.sms import get_sms_provider
+from tests.conftest import TestSessionLocal, get_auth_headers
+
+
+async def _pending_request(client: AsyncClient, citizen_user: User) -> str:
+    response = await client.post(
+        "/api/v1/citizen/requests",
+        headers=get_auth_headers(citizen_user),
+        json={"category": "food", "quantity": 1},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+async def _outbox(db_session: AsyncSession) -> list:
+    query = select(Notification).execution_options(populate_existing=True)
+    return (await db_session.execute(query)).scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_activation_writes_outbox_row(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User,
+):
+    request_id = await _pending_request(client, citizen_user)
+    response = await client.patch(
+        f"/api/v1/inspector/requests/{request_id}/activate", headers=get_auth_headers(inspector_user)
+    )
+    assert response.status_code == 200
+
+    [row] = await _outbox(db_session)
+    assert row.event == "request_activated"
+    assert row.recipient == citizen_user.phone
+    assert row.status == NotificationStatus.PENDING.value
+
+
+@pytest.mark.asyncio
+async def test_rejected_change_writes_nothing(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User,
+):
+    request_id = await _pending_request(client, citizen_user)
+    headers = get_auth_headers(inspector_user)
+    await client.patch(f"/api/v1/inspector/requests/{request_id}/reject", headers=headers)
+
+    # الطلب لم يعد معلقاً - التفعيل يفشل ولا يُضاف إشعار ثانٍ
+    response = await client.patch(f"/api/v1/inspector/requests/{request_id}/activate", headers=headers)
+    assert response.status_code == 400
+    assert [row.event for row in await _outbox(db_session)] == ["request_rejected"]
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_delivers_batch(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User,
+):
+    request_id = await _pending_request(client, citizen_user)
+    await client.patch(
+        f"/api/v1/inspector/requests/{request_id}/activate", headers=get_auth_headers(inspector_user)
+    )
+
+    dispatcher = NotificationDispatcher(session_factory=TestSessionLocal)
+    assert await dispatcher.drain_once() == 1
+    assert await dispatcher.drain_once() == 0
+
+    [row] = await _outbox(db_session)
+    assert row.status == NotificationStatus.SENT.value
+    assert row.attempts == 1
+    assert "تفعيله" in get_sms_provider().last_message(citizen_user.phone)
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_then_fails(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User, monkeypatch,
+):
+    class BrokenProvider:
+        async def send(self, phone: str, message: str) -> None:
+            raise RuntimeError("provider down")
+
+    monkeypatch.setattr(notifications, "get_sms_provider", lambda: BrokenProvider())
+    monkeypatch.setattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "NOTIFICATION_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(settings, "NOTIFICATION_LEASE_SECONDS", 0)
+
+    request_id = await _pending_request(client, citizen_user)
+    await client.patch(
+        f"/api/v1/inspector/requests/{request_id}/activate", headers=get_auth_headers(inspector_user)
+    )
+
+    dispatcher = NotificationDispatcher(session_factory=TestSessionLocal)
+    await dispatcher.drain_once()
+    [row] = await _outbox(db_session)
+    assert (row.status, row.attempts, row.last_error) == (NotificationStatus.PENDING.value, 1, "provider down")
+
+    await dispatcher.drain_once()
+    [row] = await _outbox(db_session)
+    assert (row.status, row.attempts) == (NotificationStatus.FAILED.value, 2)
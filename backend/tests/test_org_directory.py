@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.core.constants import AssignmentStatus
+from app.core.query_stats import track_queries
+from app.models.organization import Organization
+from app.models.user import User
+from app.services.assignment_service import apply_changes
+from app.services.org_directory import active_orgs, org_directory
+from tests.conftest import get_auth_headers
+
+
+async def _names(client: AsyncClient, inspector_user: User) -> list:
+    response = await client.get("/api/v1/inspector/organizations", headers=get_auth_headers(inspector_user))
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()["items"]]
+
+
+@pytest.mark.asyncio
+async def test_reads_served_from_directory(client: AsyncClient, inspector_user: User, org_user: User):
+    assert await _names(client, inspector_user) == ["جمعية الخير"]
+    # اللقطة محملة: استعلام عداد الإتمام وحده (لا يُخزَّن في الدليل)
+    with track_queries() as stats:
+        assert await _names(client, inspector_user) == ["جمعية الخير"]
+    assert stats.count == 1
+
+
+@pytest.mark.asyncio
+async def test_admin_changes_refresh_directory(
+    client: AsyncClient, db_session: AsyncSession, inspector_user: User, admin_user: User, org_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    assert await _names(client, inspector_user) == ["جمعية الخير"]
+
+    response = await client.patch(
+        f"/api/v1/admin/organizations/{org.id}/status", headers=get_auth_headers(admin_user),
+        params={"status": "suspended"},
+    )
+    assert response.status_code == 200
+    assert await _names(client, inspector_user) == []
+
+    response = await client.patch(
+        f"/api/v1/admin/organizations/{org.id}/status", headers=get_auth_headers(admin_user),
+        params={"status": "active"},
+    )
+    assert response.status_code == 200
+    assert await _names(client, inspector_user) == ["جمعية الخير"]
+
+
+@pytest.mark.asyncio
+async def test_completion_counter_keeps_snapshot(
+    client: AsyncClient, db_session: AsyncSession, inspector_user: User, org_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    assert await _names(client, inspector_user) == ["جمعية الخير"]
+
+    await apply_changes(db_session, [(uuid.uuid4(), org.id, AssignmentStatus.IN_PROGRESS, AssignmentStatus.COMPLETED)])
+    await db_session.commit()
+
+    # الإتمام لا يعيد تحميل الدليل، والعداد يُقرأ من الجدول
+    with track_queries() as stats:
+        assert await _names(client, inspector_user) == ["جمعية الخير"]
+    assert stats.count == 1
+    response = await client.get("/api/v1/org/stats", headers=get_auth_headers(org_user, str(org.id)))
+    assert response.json()["data"]["total_completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_reload_retried(org_user: User, monkeypatch):
+    primary = database.read_session
+
+    def unavailable():
+        raise ConnectionError("primary unavailable")
+
+    monkeypatch.setattr(database, "read_session", unavailable)
+    with pytest.raises(ConnectionError):
+        await active_orgs()
+
+    # اللقطة ما زالت قديمة: القراءة التالية تعيد المحاولة دون انتظار ORG_DIRECTORY_REFRESH_SECONDS
+    monkeypatch.setattr(database, "read_session", primary)
+    assert [org.name for org in await active_orgs()] == ["جمعية الخير"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reloads_share_one_query(org_user: User):
+    org_directory.mark_stale()
+    with track_queries() as stats:
+        results = await asyncio.gather(*(active_orgs() for _ in range(5)))
+    assert stats.count == 1
+    assert all([org.name for org in orgs] == ["جمعية الخير"] for orgs in results)
@@ -0,0 +1,67 @@
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.core.query_stats import track_queries
+from app.services import sms
+from tests.conftest import issue_otp
+
+PHONE = "0655555555"
+
+
+@pytest.mark.asyncio
+async def test_send_otp_cooldown(client: AsyncClient):
+    response = await client.post("/api/v1/auth/otp/send", json={"phone": PHONE})
+    assert response.status_code == 200
+    assert response.json()["expires_in"] == 5 * 60
+
+    response = await client.post("/api/v1/auth/otp/send", json={"phone": PHONE})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+@pytest.mark.asyncio
+async def test_wrong_code_never_touches_database(client: AsyncClient):
+    code = await issue_otp(PHONE)
+    wrong = "0" * len(code) if code != "0" * len(code) else "1" * len(code)
+
+    with track_queries() as stats:
+        response = await client.post("/api/v1/auth/phone-register", json={"phone": PHONE, "code": wrong})
+
+    assert response.status_code == 400
+    assert stats.count == 0
+
+
+@pytest.mark.asyncio
+async def test_attempts_exhausted_discards_code(client: AsyncClient):
+    code = await issue_otp(PHONE)
+    wrong = "0" * len(code) if code != "0" * len(code) else "1" * len(code)
+
+    statuses = [
+        (await client.post("/api/v1/auth/phone-register", json={"phone": PHONE, "code": wrong})).status_code
+        for _ in range(3)
+    ]
+    assert statuses == [400, 400, 429]
+
+    # حتى الرمز الصحيح لم يعد صالحاً
+    response = await client.post("/api/v1/auth/phone-register", json={"phone": PHONE, "code": code})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_code_is_single_use(client: AsyncClient):
+    code = await issue_otp(PHONE)
+
+    response = await client.post("/api/v1/auth/phone-register", json={"phone": PHONE, "code": code})
+    assert response.status_code == 201
+
+    response = await client.post("/api/v1/auth/phone-register", json={"phone": PHONE, "code": code})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("name", [None, "", "twillio"])
+def test_unknown_sms_provider_rejected(monkeypatch, name):
+    monkeypatch.setattr(settings, "SMS_PROVIDER", name)
+    monkeypatch.setattr(sms, "_provider", None)
+    with pytest.raises(ValueError):
+        sms.get_sms_provider()
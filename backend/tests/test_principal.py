@@ -0,0 +1,66 @@
+import pytest
+from httpx import AsyncClient
+
+from app.core.security import create_access_token
+from app.core.query_stats import track_queries
+from app.models.user import User
+from tests.conftest import get_auth_headers
+
+
+@pytest.mark.asyncio
+async def test_citizen_stats_needs_no_user_lookup(client: AsyncClient, citizen_user: User):
+    headers = get_auth_headers(citizen_user)
+    with track_queries() as stats:
+        response = await client.get("/api/v1/citizen/stats", headers=headers)
+
+    assert response.status_code == 200
+    assert stats.count == 1  # تجميع الطلبات فقط - الهوية والدور من التوكن
+
+
+@pytest.mark.asyncio
+async def test_suspension_revokes_tokens(client: AsyncClient, citizen_user: User, admin_user: User):
+    headers = get_auth_headers(citizen_user)
+    assert (await client.get("/api/v1/citizen/requests", headers=headers)).status_code == 200
+
+    response = await client.patch(
+        f"/api/v1/admin/citizens/{citizen_user.id}/status",
+        headers=get_auth_headers(admin_user),
+        params={"status": "suspended"},
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_reactivation_restores_access(client: AsyncClient, citizen_user: User, admin_user: User):
+    headers = get_auth_headers(citizen_user)
+    admin_headers = get_auth_headers(admin_user)
+    url = f"/api/v1/admin/citizens/{citizen_user.id}/status"
+
+    await client.patch(url, headers=admin_headers, params={"status": "suspended"})
+    await client.patch(url, headers=admin_headers, params={"status": "active"})
+
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_org_token_without_org_claim(client: AsyncClient, org_user: User):
+    headers = get_auth_headers(org_user)  # بلا org_id
+    response = await client.get("/api/v1/org/stats", headers=headers)
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_token_with_unknown_role(client: AsyncClient, citizen_user: User):
+    token = create_access_token({"sub": str(citizen_user.id), "role": "root", "org_id": None})
+    response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_role_checked_from_claims(client: AsyncClient, citizen_user: User):
+    response = await client.get("/api/v1/admin/stats/overview", headers=get_auth_headers(citizen_user))
+    assert response.status_code == 403
@@ -1,8 +1,15 @@
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock
 
-from app.core.constants import RequestCategory
-from app.services.priority_service import calculate_priority
+import pytest
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import RequestCategory, RequestStatus
+from app.models.request import Request
+from app.models.user import User
+from app.services.priority_service import calculate_priority, rescore_open_requests
 
 
 def _make_request(category: RequestCategory, created_at=None):
@@ -71,3 +78,42 @@ def test_max_score_cap():
     )
     score = calculate_priority(req, profile)
     assert score == 100  # Capped at 100
+
+
+@pytest.mark.asyncio
+async def test_bulk_rescore_matches_calculate_priority(db_session: AsyncSession, citizen_user: User):
+    now = datetime.now(timezone.utc)
+    rows = [
+        Request(category=category, family_members=family, is_urgent=urgent, status=status,
+                created_at=now - timedelta(days=days, hours=1))
+        for category, family, urgent, days, status in [
+            (RequestCategory.MEDICINE, 1, 0, 0, RequestStatus.PENDING),
+            (RequestCategory.FOOD, 3, 1, 2, RequestStatus.NEW),
+            (RequestCategory.OTHER, 6, 0, 40, RequestStatus.IN_PROGRESS),
+            (RequestCategory.WATER, 4, 1, 9, RequestStatus.ASSIGNED),
+        ]
+    ]
+    pinned = Request(category=RequestCategory.OTHER, status=RequestStatus.NEW, priority_pinned=True,
+                     created_at=now - timedelta(days=5))
+    closed = Request(category=RequestCategory.OTHER, status=RequestStatus.COMPLETED,
+                     created_at=now - timedelta(days=5))
+    for row in rows + [pinned, closed]:
+        row.user_id = citizen_user.id
+        row.requester_name = citizen_user.full_name
+        row.requester_phone = citizen_user.phone
+        row.priority_score = 1
+    db_session.add_all(rows + [pinned, closed])
+    await db_session.commit()
+
+    assert await rescore_open_requests(db_session, now) == len(rows)
+    await db_session.commit()
+
+    query = select(Request).execution_options(populate_existing=True)
+    refreshed = {r.id: r for r in (await db_session.execute(query)).scalars()}
+    for row in rows:
+        assert refreshed[row.id].priority_score == calculate_priority(refreshed[row.id], now=now)
+    assert refreshed[pinned.id].priority_score == 1
+    assert refreshed[closed.id].priority_score == 1
+
+    # لا تغيير = لا كتابة
+    assert await rescore_open_requests(db_session, now) == 0
@@ -0,0 +1,455 @@
+"""
+اختبارات عدد استعلامات SQL لكل نقطة نهاية في /api/v1
+
+- تُزرع بيانات واقعية (طلبات، مؤسسات، تعهدات) مرتين بحجمين مختلفين (5 ثم 25)
+- تُستدعى كل نقطة نهاية بعد كل زرع مع limit مساوٍ للحجم
+- عدد الاستعلامات يجب أن يبقى ثابتاً مهما كبر حجم البيانات أو الصفحة (لا N+1)
+- طلبات القراءة لا تُنفذ COMMIT، وطلبات الكتابة تُنفذه مرة واحدة على الأكثر
+- يُسجَّل عدد الاستعلامات والزمن كخط أساس في ذاكرة pytest (ksar/query_baselines)
+"""
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.main import app
+from app.api.v1.citizen import generate_tracking_code
+from app.core.constants import (
+    AssignmentStatus,
+    OrganizationStatus,
+    RequestCategory,
+    RequestStatus,
+    UserRole,
+    UserStatus,
+)
+from app.core.query_stats import track_queries
+from app.core.security import create_access_token, hash_password
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.refresh_token import RefreshToken
+from app.models.request import Request
+from app.models.user import User
+from app.services.token_service import hash_refresh_token
+from tests.conftest import get_auth_headers, issue_otp
+
+SIZES = (5, 25)
+PASSWORD = "Secret#123"
+PASSWORD_HASH = hash_password(PASSWORD)
+BASELINE_CACHE_KEY = "ksar/query_baselines"
+
+_STATUS_CYCLE = (
+    RequestStatus.PENDING,
+    RequestStatus.NEW,
+    RequestStatus.NEW,
+    RequestStatus.ASSIGNED,
+    RequestStatus.COMPLETED,
+)
+_CATEGORIES = list(RequestCategory)
+
+
+def _user(role: UserRole, phone: str, name: str, **kwargs) -> User:
+    return User(
+        id=uuid.uuid4(),
+        email=f"{role.value}_{phone}@example.ma",
+        password_hash=PASSWORD_HASH,
+        full_name=name,
+        phone=phone,
+        role=role,
+        status=kwargs.pop("status", UserStatus.ACTIVE),
+        **kwargs,
+    )
+
+
+def _org(user: User, name: str) -> Organization:
+    return Organization(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        name=name,
+        contact_phone=user.phone,
+        service_types=["food"],
+        coverage_areas=["طنجة"],
+        status=OrganizationStatus.ACTIVE,
+    )
+
+
+def _request(owner: User, index: int, status: RequestStatus, inspector: User) -> Request:
+    created = datetime.now(timezone.utc) - timedelta(hours=index + 1)
+    return Request(
+        id=uuid.uuid4(),
+        user_id=owner.id,
+        requester_name=owner.full_name,
+        requester_phone=owner.phone,
+        category=_CATEGORIES[index % len(_CATEGORIES)],
+        description="طلب تجريبي",
+        address="شارع تجريبي",
+        family_members=1 + index % 6,
+        city="طنجة",
+        region=f"حي {index % 4}",
+        # نقاط موزعة حول طنجة: كل زرع يغير خلايا الخريطة
+        latitude=35.76 + (index % 7) * 0.01,
+        longitude=-5.83 + (index % 5) * 0.01,
+        status=status,
+        is_urgent=1 if index % 3 == 0 else 0,
+        inspector_id=None if status == RequestStatus.PENDING else inspector.id,
+        created_at=created,
+        completed_at=created + timedelta(hours=5) if status == RequestStatus.COMPLETED else None,
+    )
+
+
+async def _seed(db: AsyncSession, size: int, round_no: int, citizen: User, my_org: Organization) -> dict:
+    """زرع مجموعة بيانات بحجم size وإرجاع معرفات الأهداف لنقاط النهاية"""
+    prefix = f"07{round_no}"
+    counter = iter(range(10 ** 6))
+
+    def phone() -> str:
+        return f"{prefix}{next(counter):07d}"
+
+    objects = []
+    inspector = _user(UserRole.INSPECTOR, phone(), "مراقب الزرع")
+    spare_inspector = _user(UserRole.INSPECTOR, phone(), "مراقب احتياطي")
+    spare_admin = _user(UserRole.ADMIN, phone(), "مشرف احتياطي")
+    login_citizen = _user(UserRole.CITIZEN, phone(), "مواطن الدخول")
+    objects += [inspector, spare_inspector, spare_admin, login_citizen]
+
+    # رموز تحديث للمواطن (تدوير وتسجيل خروج)
+    refresh_raw, logout_raw = (f"seed-{round_no}-{uuid.uuid4().hex}" for _ in range(2))
+    objects += [
+        RefreshToken(
+            user_id=login_citizen.id,
+            family_id=uuid.uuid4(),
+            token_hash=hash_refresh_token(raw),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        )
+        for raw in (refresh_raw, logout_raw)
+    ]
+
+    org_users = [_user(UserRole.ORGANIZATION, phone(), f"مسؤول {i}") for i in range(max(2, size // 5))]
+    orgs = [_org(u, f"جمعية {round_no}-{i}") for i, u in enumerate(org_users)]
+    objects += org_users + orgs
+
+    # طلبات المواطن الرئيسي + مواطنون آخرون بطلب واحد لكل منهم
+    owners = [citizen] * size + [
+        _user(UserRole.CITIZEN, phone(), f"مواطن {i}", city="طنجة") for i in range(size)
+    ]
+    objects += [o for o in owners if o is not citizen]
+
+    for index, owner in enumerate(owners):
+        status = _STATUS_CYCLE[index % len(_STATUS_CYCLE)]
+        req = _request(owner, index, status, inspector)
+        objects.append(req)
+        extra_org = orgs[index % len(orgs)]
+        slot = index % len(_STATUS_CYCLE)
+        if slot == 1:
+            objects.append(Assignment(request_id=req.id, org_id=my_org.id, status=AssignmentStatus.PLEDGED))
+            objects.append(Assignment(request_id=req.id, org_id=extra_org.id, status=AssignmentStatus.PLEDGED))
+        elif slot == 2:
+            objects.append(Assignment(request_id=req.id, org_id=extra_org.id, status=AssignmentStatus.FAILED))
+        elif slot == 3:
+            objects.append(Assignment(request_id=req.id, org_id=my_org.id, status=AssignmentStatus.IN_PROGRESS))
+        elif slot == 4:
+            objects.append(Assignment(
+                request_id=req.id, org_id=extra_org.id,
+                status=AssignmentStatus.COMPLETED, completed_at=req.completed_at,
+            ))
+
+    # أهداف نقاط النهاية المعدِّلة
+    pending = _request(citizen, 0, RequestStatus.PENDING, inspector)
+    new_free = _request(citizen, 1, RequestStatus.NEW, inspector)
+    new_pledged = _request(citizen, 2, RequestStatus.NEW, inspector)
+    assigned = _request(citizen, 3, RequestStatus.ASSIGNED, inspector)
+    objects += [pending, new_free, new_pledged, assigned]
+
+    pledge = Assignment(id=uuid.uuid4(), request_id=new_pledged.id, org_id=my_org.id, status=AssignmentStatus.PLEDGED)
+    objects.append(pledge)
+    objects += [
+        Assignment(request_id=new_pledged.id, org_id=org.id, status=AssignmentStatus.PLEDGED)
+        for org in orgs
+    ]
+    in_progress = Assignment(
+        id=uuid.uuid4(), request_id=assigned.id, org_id=my_org.id,
+        status=AssignmentStatus.IN_PROGRESS, allow_phone_access=True,
+    )
+    objects.append(in_progress)
+
+    # مواطن للحذف مع طلبات وتكفلات تتناسب مع الحجم
+    spare_citizen = _user(UserRole.CITIZEN, phone(), "مواطن للحذف")
+    objects.append(spare_citizen)
+    for index in range(size):
+        req = _request(spare_citizen, index, RequestStatus.NEW, inspector)
+        objects.append(req)
+        objects.append(Assignment(request_id=req.id, org_id=orgs[0].id, status=AssignmentStatus.FAILED))
+
+    db.add_all(objects)
+    await db.commit()
+    db.expunge_all()
+
+    new_phone = phone()
+    return {
+        "pending_id": pending.id,
+        "new_free_id": new_free.id,
+        "new_pledged_id": new_pledged.id,
+        "pledge_id": pledge.id,
+        "assigned_id": assigned.id,
+        "in_progress_id": in_progress.id,
+        "spare_citizen_id": spare_citizen.id,
+        "spare_org_id": orgs[0].id,
+        "spare_inspector_id": spare_inspector.id,
+        "spare_admin_id": spare_admin.id,
+        "my_org_id": my_org.id,
+        "inspector_phone": inspector.phone,
+        "org_phone": org_users[1].phone,
+        "login_user_id": login_citizen.id,
+        "login_email": login_citizen.email,
+        "login_phone": login_citizen.phone,
+        "refresh_token": refresh_raw,
+        "logout_token": logout_raw,
+        "citizen_phone": citizen.phone,
+        "tracking_code": generate_tracking_code(pending.id),
+        "new_phone": new_phone,
+        "otp_code": await issue_otp(new_phone),
+        "otp_phone": phone(),
+        "round": round_no,
+    }
+
+
+def _no_body(ctx: dict) -> dict:
+    return {}
+
+
+# (الطريقة، المسار، الدور، بناء الطلب، الحد الأقصى للاستعلامات)
+# الدور: public / citizen / org / inspector / admin / superadmin
+#        login = مواطن مزروع بكلمة مرور حقيقية ورموز تحديث (تغيير كلمة المرور، الخروج)
+ENDPOINTS = [
+    # عام
+    ("GET", "/api/v1/public/requests/track/{tracking_code}", "public",
+     lambda c: {"params": {"phone": c["citizen_phone"]}}, 3),
+    ("GET", "/api/v1/public/categories", "public", _no_body, 0),
+    ("POST", "/api/v1/public/org-register", "public",
+     lambda c: {"json": {"name": f"جمعية جديدة {c['round']}", "phone": c["new_phone"]}}, 3),
+
+    # المصادقة
+    ("POST", "/api/v1/auth/register", "public",
+     lambda c: {"json": {
+         "email": f"reg{c['round']}@example.ma", "password": PASSWORD,
+         "full_name": "مسجل جديد", "phone": c["new_phone"],
+     }}, 4),
+    ("POST", "/api/v1/auth/unified-login", "public",
+     lambda c: {"json": {"identifier": c["login_phone"], "password": PASSWORD}}, 3),
+    ("POST", "/api/v1/auth/login", "public",
+     lambda c: {"json": {"email": c["login_email"], "password": PASSWORD}}, 3),
+    ("POST", "/api/v1/auth/otp/send", "public", lambda c: {"json": {"phone": c["otp_phone"]}}, 0),
+    ("POST", "/api/v1/auth/phone-register", "public",
+     lambda c: {"json": {"phone": c["new_phone"], "code": c["otp_code"]}}, 3),
+    ("POST", "/api/v1/auth/refresh", "public", lambda c: {"json": {"refresh_token": c["refresh_token"]}}, 3),
+    ("POST", "/api/v1/auth/logout", "login", lambda c: {"json": {"refresh_token": c["logout_token"]}}, 1),
+    ("GET", "/api/v1/auth/me", "org", _no_body, 2),
+    ("PATCH", "/api/v1/auth/me", "citizen", lambda c: {"json": {"city": f"مدينة {c['round']}"}}, 2),
+    ("POST", "/api/v1/auth/inspector-login", "public",
+     lambda c: {"json": {"phone": c["inspector_phone"], "code": PASSWORD}}, 3),
+    ("POST", "/api/v1/auth/org-login", "public",
+     lambda c: {"json": {"phone": c["org_phone"], "code": PASSWORD}}, 4),
+    ("POST", "/api/v1/auth/change-password", "login",
+     lambda c: {"json": {"current_password": PASSWORD, "new_password": PASSWORD}}, 2),
+
+    # الإدارة - الطلبات والإحصائيات
+    ("GET", "/api/v1/admin/requests", "admin", _no_body, 2),
+    ("GET", "/api/v1/admin/requests/{new_pledged_id}", "admin", _no_body, 2),
+    ("PATCH", "/api/v1/admin/requests/{pending_id}", "admin", lambda c: {"json": {"admin_notes": "ملاحظة"}}, 2),
+    ("GET", "/api/v1/admin/requests/{pending_id}/timeline", "admin", _no_body, 2),
+    ("DELETE", "/api/v1/admin/requests/{pending_id}", "admin", _no_body, 3),
+    ("GET", "/api/v1/admin/stats/overview", "admin", _no_body, 6),
+    ("GET", "/api/v1/admin/stats/daily", "admin", _no_body, 1),
+    ("GET", "/api/v1/admin/stats/by-region", "admin", _no_body, 1),
+    ("GET", "/api/v1/admin/stats/organizations", "admin", _no_body, 1),
+    ("GET", "/api/v1/admin/stats/sla", "admin", _no_body, 2),
+    ("GET", "/api/v1/admin/stats/funnel", "admin", _no_body, 2),
+    ("GET", "/api/v1/admin/map/clusters", "admin",
+     lambda c: {"params": {"bbox": "-6,35.5,-5.5,36", "zoom": 10}}, 1),
+
+    # الإدارة - المؤسسات والمراقبون والمواطنون والمشرفون
+    ("GET", "/api/v1/admin/organizations", "admin", _no_body, 2),
+    ("POST", "/api/v1/admin/organizations", "admin",
+     lambda c: {"json": {"name": f"جمعية الإدارة {c['round']}", "phone": c["new_phone"]}}, 3),
+    ("POST", "/api/v1/admin/organizations/{spare_org_id}/regenerate-code", "admin", _no_body, 3),
+    ("DELETE", "/api/v1/admin/organizations/{spare_org_id}", "admin", _no_body, 11),
+    ("PATCH", "/api/v1/admin/organizations/{spare_org_id}/status", "admin",
+     lambda c: {"params": {"status": "suspended"}}, 5),
+    ("POST", "/api/v1/admin/inspectors", "admin",
+     lambda c: {"json": {"full_name": "مراقب جديد", "phone": c["new_phone"]}}, 2),
+    ("GET", "/api/v1/admin/inspectors", "admin", _no_body, 2),
+    ("PATCH", "/api/v1/admin/inspectors/{spare_inspector_id}/status", "admin",
+     lambda c: {"params": {"status": "suspended"}}, 3),
+    ("POST", "/api/v1/admin/inspectors/{spare_inspector_id}/regenerate-code", "admin", _no_body, 2),
+    ("DELETE", "/api/v1/admin/inspectors/{spare_inspector_id}", "admin", _no_body, 5),
+    ("GET", "/api/v1/admin/citizens", "admin", _no_body, 4),
+    ("PATCH", "/api/v1/admin/citizens/{spare_citizen_id}/status", "admin",
+     lambda c: {"params": {"status": "suspended"}}, 3),
+    ("DELETE", "/api/v1/admin/citizens/{spare_citizen_id}", "admin", _no_body, 8),
+    ("GET", "/api/v1/admin/admins", "superadmin", _no_body, 2),
+    ("POST", "/api/v1/admin/admins", "superadmin",
+     lambda c: {"params": {
+         "full_name": "مشرف جديد", "email": f"admin{c['round']}@example.ma",
+         "password": PASSWORD, "phone": c["new_phone"],
+     }}, 3),
+    ("PATCH", "/api/v1/admin/admins/{spare_admin_id}/status", "superadmin",
+     lambda c: {"params": {"status": "suspended"}}, 3),
+    ("DELETE", "/api/v1/admin/admins/{spare_admin_id}", "superadmin", _no_body, 5),
+    ("POST", "/api/v1/admin/org-access", "admin",
+     lambda c: {"json": {
+         "request_id": str(c["assigned_id"]), "organization_id": str(c["my_org_id"]),
+         "allow_phone_access": False,
+     }}, 2),
+
+    # المؤسسات
+    ("GET", "/api/v1/org/requests/available", "org", _no_body, 3),
+    ("GET", "/api/v1/org/requests/{new_free_id}", "org", _no_body, 1),
+    ("POST", "/api/v1/org/assignments", "org",
+     lambda c: {"json": {"request_id": str(c["new_free_id"])}}, 5),
+    ("GET", "/api/v1/org/assignments", "org", _no_body, 2),
+    ("GET", "/api/v1/org/assignments/routes", "org",
+     lambda c: {"params": {"start": "35.76,-5.83"}}, 1),
+    ("GET", "/api/v1/org/assignments/{in_progress_id}", "org", _no_body, 2),
+    ("PATCH", "/api/v1/org/assignments/{in_progress_id}", "org",
+     lambda c: {"json": {"status": "completed"}}, 7),
+    ("GET", "/api/v1/org/stats", "org", _no_body, 2),
+
+    # المواطنون
+    ("POST", "/api/v1/citizen/requests", "citizen",
+     lambda c: {"json": {"category": "food", "quantity": 2}}, 4),
+    ("GET", "/api/v1/citizen/requests", "citizen", _no_body, 3),
+    ("GET", "/api/v1/citizen/requests/{new_pledged_id}", "citizen", _no_body, 3),
+    ("PATCH", "/api/v1/citizen/requests/{pending_id}", "citizen",
+     lambda c: {"json": {"description": "وصف محدث", "is_urgent": True}}, 2),
+    ("DELETE", "/api/v1/citizen/requests/{pending_id}", "citizen", _no_body, 3),
+    ("GET", "/api/v1/citizen/stats", "citizen", _no_body, 1),
+
+    # المراقب
+    ("GET", "/api/v1/inspector/requests", "inspector", _no_body, 2),
+    ("GET", "/api/v1/inspector/requests/{pending_id}", "inspector", _no_body, 1),
+    ("GET", "/api/v1/inspector/requests/{pending_id}/timeline", "inspector", _no_body, 2),
+    ("PATCH", "/api/v1/inspector/requests/{pending_id}/activate", "inspector", _no_body, 3),
+    ("PATCH", "/api/v1/inspector/requests/{pending_id}/reject", "inspector",
+     lambda c: {"json": {"reason": "بيانات ناقصة"}}, 3),
+    ("PATCH", "/api/v1/inspector/requests/{new_free_id}/assign", "inspector",
+     lambda c: {"json": {"organization_id": str(c["my_org_id"])}}, 9),
+    ("PATCH", "/api/v1/inspector/requests/{pending_id}", "inspector",
+     lambda c: {"json": {"inspector_notes": "تمت الزيارة"}}, 2),
+    ("PATCH", "/api/v1/inspector/requests/{pending_id}/edit", "inspector",
+     lambda c: {"json": {"quantity": 3}}, 2),
+    ("PATCH", "/api/v1/inspector/requests/{pending_id}/status", "inspector",
+     lambda c: {"json": {"is_urgent": 1}}, 1),
+    ("DELETE", "/api/v1/inspector/requests/{pending_id}", "inspector", _no_body, 3),
+    ("POST", "/api/v1/inspector/requests/{new_free_id}/assign-org", "inspector",
+     lambda c: {"json": {"organization_id": str(c["my_org_id"]), "allow_phone_access": True}}, 9),
+    ("GET", "/api/v1/inspector/phone-count", "inspector",
+     lambda c: {"params": {"phone": c["citizen_phone"]}}, 1),
+    ("GET", "/api/v1/inspector/stats", "inspector", _no_body, 2),
+    ("GET", "/api/v1/inspector/map/clusters", "inspector",
+     lambda c: {"params": {"bbox": "-6,35.5,-5.5,36", "zoom": 10}}, 1),
+    ("GET", "/api/v1/inspector/requests/{new_pledged_id}/pledges", "inspector", _no_body, 3),
+    ("GET", "/api/v1/inspector/requests/{new_pledged_id}/matches", "inspector", _no_body, 4),
+    ("GET", "/api/v1/inspector/matches", "inspector", _no_body, 4),
+    ("POST", "/api/v1/inspector/assignments/plan", "inspector",
+     lambda c: {"json": {"limit": 100}}, 4),
+    ("POST", "/api/v1/inspector/assignments/plan/commit", "inspector",
+     lambda c: {"json": {"assignments": [
+         {"request_id": str(c["new_free_id"]), "organization_id": str(c["my_org_id"])},
+     ]}}, 8),
+    ("POST", "/api/v1/inspector/requests/{new_pledged_id}/approve-org", "inspector",
+     lambda c: {"params": {"assignment_id": str(c["pledge_id"])}}, 9),
+    ("GET", "/api/v1/inspector/organizations", "inspector", _no_body, 2),
+    ("GET", "/api/v1/inspector/organizations/details", "inspector", _no_body, 3),
+]
+
+
+def _route_key(method: str, path: str) -> tuple:
+    return method, re.sub(r"\{[^}]+\}", "{}", path)
+
+
+def test_every_api_route_is_covered():
+    """أي نقطة نهاية جديدة يجب إضافتها إلى جدول ENDPOINTS"""
+    covered = {_route_key(method, path) for method, path, *_ in ENDPOINTS}
+    registered = {
+        _route_key(method, route.path)
+        for route in app.routes
+        if getattr(route, "path", "").startswith("/api/v1")
+        for method in route.methods
+    }
+    assert registered - covered == set()
+    assert covered - registered == set()
+
+
+@pytest.mark.parametrize(
+    "method,path,role,build,budget",
+    ENDPOINTS,
+    ids=[f"{m} {p}" for m, p, *_ in ENDPOINTS],
+)
+async def test_query_count_does_not_grow(
+    request, client: AsyncClient, db_session: AsyncSession,
+    citizen_user, org_user, inspector_user, admin_user, superadmin_user,
+    method, path, role, build, budget,
+):
+    my_org = (await db_session.execute(
+        select(Organization).where(Organization.user_id == org_user.id)
+    )).scalar_one()
+    headers = {
+        "public": {},
+        "citizen": get_auth_headers(citizen_user),
+        "org": get_auth_headers(org_user, str(my_org.id)),
+        "inspector": get_auth_headers(inspector_user),
+        "admin": get_auth_headers(admin_user),
+        "superadmin": get_auth_headers(superadmin_user),
+    }.get(role, {})
+
+    counts = []
+    timings = []
+    for round_no, size in enumerate(SIZES, start=1):
+        ctx = await _seed(db_session, size, round_no, citizen_user, my_org)
+        if role == "login":
+            token = create_access_token({"sub": str(ctx["login_user_id"]), "role": "citizen", "org_id": None})
+            headers = {"Authorization": f"Bearer {token}"}
+        kwargs = build(ctx)
+        params = {"page": 1, "limit": size, **kwargs.pop("params", {})}
+
+        commits = []
+        on_commit = lambda session: commits.append(1)  # noqa: E731
+        event.listen(db_session.sync_session, "after_commit", on_commit)
+        started = time.perf_counter()
+        try:
+            with track_queries() as stats:
+                response = await client.request(
+                    method, path.format(**ctx), headers=headers, params=params, **kwargs,
+                )
+        finally:
+            event.remove(db_session.sync_session, "after_commit", on_commit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        assert response.status_code < 400, (size, response.status_code, response.text)
+        counts.append(stats.count)
+        if method == "GET":
+            assert not commits, f"{method} {path}: COMMIT in a read-only request"
+        else:
+            assert len(commits) <= 1, f"{method} {path}: {len(commits)} commits"
+
+    _record_baseline(request, f"{method} {path}", counts[-1], timings[-1])
+
+    assert counts[0] == counts[1], f"{method} {path}: {counts[0]} queries at {SIZES[0]}, {counts[1]} at {SIZES[1]}"
+    assert counts[-1] <= budget, f"{method} {path}: {counts[-1]} queries (budget {budget})"
+
+
+def _record_baseline(request, key: str, queries: int, elapsed_ms: float) -> None:
+    """حفظ خط الأساس (عدد الاستعلامات والزمن) لمقارنته بين التشغيلات"""
+    cache = getattr(request.config, "cache", None)
+    if cache is None:  # -p no:cacheprovider
+        return
+    baselines = cache.get(BASELINE_CACHE_KEY, {})
+    previous = baselines.get(key)
+    baselines[key] = {"queries": queries, "ms": round(elapsed_ms, 2)}
+    if previous:
+        baselines[key]["previous_ms"] = previous.get("ms")
+    cache.set(BASELINE_CACHE_KEY, baselines)
@@ -0,0 +1,58 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.query_stats import QueryStatsMiddleware, instrument_engine, track_queries, current_stats
+
+
+@pytest.fixture
+async def sqlite_engine():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+    yield engine
+    await engine.dispose()
+
+
+async def test_track_queries_counts_statements(sqlite_engine):
+    with track_queries() as stats:
+        async with sqlite_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+
+    assert stats.count == 2
+    assert stats.total_ms >= stats.slowest_ms > 0
+    assert stats.slowest_sql.startswith("SELECT")
+
+
+async def test_queries_outside_scope_are_ignored(sqlite_engine):
+    async with sqlite_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    assert current_stats() is None
+
+
+async def test_instrument_engine_is_idempotent(sqlite_engine):
+    instrument_engine(sqlite_engine)
+    with track_queries() as stats:
+        async with sqlite_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    assert stats.count == 1
+
+
+async def test_middleware_adds_timing_headers(sqlite_engine):
+    async def endpoint(request):
+        async with sqlite_engine.connect() as conn:
+            for _ in range(3):
+                await conn.execute(text("SELECT 1"))
+        return JSONResponse({"ok": True})
+
+    app = QueryStatsMiddleware(Starlette(routes=[Route("/", endpoint)]), add_headers=True)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/")
+
+    assert response.headers["x-db-queries"] == "3"
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert '"3 queries"' in response.headers["server-timing"]
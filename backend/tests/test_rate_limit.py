@@ -0,0 +1,63 @@
+import pytest
+from starlette.requests import Request as HTTPRequest
+
+from app.core.rate_limit import parse_rate, client_ip, _MemoryWindow
+
+
+def _make_request(headers=None, host="10.0.0.1"):
+    scope = {
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": (host, 1234),
+    }
+    return HTTPRequest(scope)
+
+
+def test_parse_rate():
+    assert parse_rate("20/hour") == (20, 3600)
+    assert parse_rate("100/minute") == (100, 60)
+    assert parse_rate("5/seconds") == (5, 1)
+
+
+def test_parse_rate_invalid_period():
+    with pytest.raises(ValueError):
+        parse_rate("5/fortnight")
+
+
+def test_client_ip_uses_last_forwarded_hop():
+    request = _make_request({"X-Forwarded-For": "1.2.3.4, 5.6.7.8"})
+    assert client_ip(request) == "5.6.7.8"
+
+
+def test_client_ip_without_proxy():
+    assert client_ip(_make_request()) == "10.0.0.1"
+
+
+def test_memory_window_blocks_after_limit():
+    window = _MemoryWindow()
+    keys = ["rl:login:ip:1.1.1.1", "rl:login:phone:0600000000"]
+
+    for i in range(3):
+        assert window.hit(keys, limit=3, window=60, now=100.0 + i) == 0
+
+    retry = window.hit(keys, limit=3, window=60, now=110.0)
+    assert retry == pytest.approx(50.0)  # أقدم محاولة (100) + 60 - 110
+
+
+def test_memory_window_rejected_hit_is_not_counted():
+    window = _MemoryWindow()
+    keys = ["rl:login:ip:1.1.1.1"]
+
+    window.hit(keys, limit=1, window=10, now=0.0)
+    assert window.hit(keys, limit=1, window=10, now=5.0) > 0
+    # بعد انتهاء النافذة تُقبل المحاولة لأن المرفوضة لم تُسجل
+    assert window.hit(keys, limit=1, window=10, now=10.5) == 0
+
+
+def test_memory_window_any_key_blocks():
+    window = _MemoryWindow()
+    window.hit(["rl:login:phone:0611111111"], limit=1, window=60, now=0.0)
+
+    # IP مختلف لكن نفس الهاتف
+    retry = window.hit(["rl:login:ip:9.9.9.9", "rl:login:phone:0611111111"], limit=1, window=60, now=1.0)
+    assert retry > 0
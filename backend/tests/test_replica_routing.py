@@ -0,0 +1,105 @@
+"""
+توجيه القراءة إلى النسخة المتماثلة - قاعدة SQLite ثانية تقوم مقام النسخة
+
+- النسخة تحتوي المستخدمين فقط (كأن النسخ متأخر) فيظهر من أي قاعدة قُرئ الطلب
+"""
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.config import settings
+from app.core.db_routing import recent_writes
+from app.main import app
+from app.models.user import User
+from tests.conftest import TestSessionLocal, engine as primary_engine, get_auth_headers
+
+replica_engine = create_async_engine(
+    "sqlite+aiosqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+@pytest_asyncio.fixture
+async def replica(client: AsyncClient, citizen_user: User, monkeypatch):
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    async with AsyncSession(replica_engine) as session:
+        await session.merge(citizen_user)
+        await session.commit()
+
+    monkeypatch.setattr(database, "async_session", TestSessionLocal)
+    monkeypatch.setattr(database, "read_session", database.read_sessionmaker(primary_engine))
+    monkeypatch.setattr(database, "replica_session", database.read_sessionmaker(replica_engine))
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 5)
+    app.dependency_overrides.pop(database.get_db, None)
+    recent_writes.reset()
+    yield
+    recent_writes.reset()
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.drop_all)
+
+
+async def _create_request(client: AsyncClient, headers: dict) -> str:
+    response = await client.post(
+        "/api/v1/citizen/requests",
+        headers=headers,
+        json={"category": "water", "quantity": 2},
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_list_reads_replica(client: AsyncClient, citizen_user: User, replica):
+    headers = get_auth_headers(citizen_user)
+    await _create_request(client, headers)
+    recent_writes.reset()  # انتهت نافذة read-your-writes
+
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == []  # النسخة لم تستلم الطلب بعد
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_uses_primary(client: AsyncClient, citizen_user: User, replica):
+    headers = get_auth_headers(citizen_user)
+    await _create_request(client, headers)
+
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+@pytest.mark.asyncio
+async def test_sticky_window_disabled(client: AsyncClient, citizen_user: User, replica, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_STICKY_SECONDS", 0)
+    headers = get_auth_headers(citizen_user)
+    await _create_request(client, headers)
+
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_detail_routes_stay_on_primary(client: AsyncClient, citizen_user: User, replica):
+    headers = get_auth_headers(citizen_user)
+    request_id = await _create_request(client, headers)
+    recent_writes.reset()
+
+    response = await client.get(f"/api/v1/citizen/requests/{request_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == request_id
+
+
+@pytest.mark.asyncio
+async def test_org_directory_loads_from_primary(
+    client: AsyncClient, citizen_user: User, inspector_user: User, org_user: User, replica,
+):
+    # القائمة تُقرأ من النسخة، لكن دليل الجمعيات يُحمَّل من القاعدة الأساسية
+    response = await client.get("/api/v1/inspector/organizations", headers=get_auth_headers(inspector_user))
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()["items"]] == ["جمعية الخير"]
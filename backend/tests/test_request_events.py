@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import RequestCategory, RequestStatus
+from app.models.organization import Organization
+from app.models.request_event import RequestEvent
+from app.models.user import User
+from tests.conftest import get_auth_headers
+
+
+@pytest.mark.asyncio
+async def test_every_transition_appends_to_timeline(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User, org_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    org_headers = get_auth_headers(org_user, str(org.id))
+    inspector = get_auth_headers(inspector_user)
+
+    response = await client.post(
+        "/api/v1/citizen/requests", headers=get_auth_headers(citizen_user),
+        json={"category": "food", "quantity": 1, "region": "الحي الحسني"},
+    )
+    request_id = response.json()["id"]
+    await client.patch(f"/api/v1/inspector/requests/{request_id}/activate", headers=inspector)
+    response = await client.post("/api/v1/org/assignments", headers=org_headers, json={"request_id": request_id})
+    assignment_id = response.json()["id"]
+    await client.post(
+        f"/api/v1/inspector/requests/{request_id}/approve-org", headers=inspector,
+        params={"assignment_id": assignment_id},
+    )
+    response = await client.patch(
+        f"/api/v1/org/assignments/{assignment_id}", headers=org_headers, json={"status": "completed"},
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/api/v1/inspector/requests/{request_id}/timeline", headers=inspector)
+    assert response.status_code == 200
+    events = response.json()["data"]["events"]
+    assert [(event["from_status"], event["to_status"]) for event in events] == [
+        (None, "pending"), ("pending", "new"), ("new", "assigned"), ("assigned", "completed"),
+    ]
+    # الإنشاء لا ينهي مرحلة؛ كل انتقال بعده يعرف بداية مرحلته
+    assert events[0]["stage_hours"] is None
+    assert all(event["stage_hours"] is not None for event in events[1:])
+
+    response = await client.get(
+        "/api/v1/inspector/requests/00000000-0000-0000-0000-000000000000/timeline", headers=inspector,
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_funnel_percentiles_by_dimension(client: AsyncClient, db_session: AsyncSession, admin_user: User):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    events = []
+    for hours in (1, 2, 3, 4, 10):
+        region = "أنفا" if hours < 10 else "سيدي مومن"
+        events.append(RequestEvent(
+            request_id=uuid4(),
+            from_status=RequestStatus.PENDING, to_status=RequestStatus.NEW,
+            region=region, category=RequestCategory.FOOD,
+            entered_at=now - timedelta(hours=hours), created_at=now,
+        ))
+    # خارج النافذة الزمنية: لا يُحتسب
+    events.append(RequestEvent(
+        request_id=uuid4(),
+        from_status=RequestStatus.PENDING, to_status=RequestStatus.NEW,
+        region="أنفا", category=RequestCategory.FOOD,
+        entered_at=now - timedelta(days=60, hours=100), created_at=now - timedelta(days=60),
+    ))
+    db_session.add_all(events)
+    await db_session.commit()
+
+    response = await client.get(
+        "/api/v1/admin/stats/funnel", headers=get_auth_headers(admin_user), params={"group_by": "region"},
+    )
+    assert response.status_code == 200
+    stages = {(item["stage"], item["region"]): item for item in response.json()["data"]["stages"]}
+    pending = stages[("pending", "أنفا")]
+    assert (pending["entered"], pending["exited"]) == (0, 4)
+    assert (pending["p50_hours"], pending["p90_hours"]) == (2.5, 3.7)
+    assert stages[("new", "أنفا")]["entered"] == 4
+    assert stages[("pending", "سيدي مومن")]["p99_hours"] == 10.0
+
+    response = await client.get(
+        "/api/v1/admin/stats/funnel", headers=get_auth_headers(admin_user),
+        params={"group_by": "category", "region": "أنفا"},
+    )
+    assert [(item["stage"], item["category"], item["exited"]) for item in response.json()["data"]["stages"]] == [
+        ("pending", "food", 4), ("new", "food", 0),
+    ]
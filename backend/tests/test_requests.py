@@ -6,84 +6,67 @@ from tests.conftest import get_auth_headers
 
 
 @pytest.mark.asyncio
-async def test_create_request(client: AsyncClient, resident_user: User):
-    headers = get_auth_headers(resident_user)
+async def test_create_request(client: AsyncClient, citizen_user: User):
+    headers = get_auth_headers(citizen_user)
     response = await client.post(
-        "/api/v1/requests",
+        "/api/v1/citizen/requests",
         headers=headers,
         json={
             "category": "food",
             "description": "نحتاج مواد غذائية لأسرة من 4 أفراد",
             "quantity": 4,
-            "location_text": "حي السلام، قرب المسجد الكبير",
-            "region_code": "tanger",
+            "family_members": 4,
         },
     )
 
     assert response.status_code == 201
     data = response.json()
-    assert data["category"] == "food"
-    assert data["status"] == "new"
-    assert data["priority_score"] > 0
+    assert len(data["tracking_code"]) == 8
 
 
 @pytest.mark.asyncio
-async def test_get_my_requests(client: AsyncClient, resident_user: User):
-    headers = get_auth_headers(resident_user)
+async def test_get_my_requests(client: AsyncClient, citizen_user: User):
+    headers = get_auth_headers(citizen_user)
 
-    # Create a request first
     await client.post(
-        "/api/v1/requests",
+        "/api/v1/citizen/requests",
         headers=headers,
-        json={
-            "category": "medicine",
-            "location_text": "حي النور، بجانب الصيدلية",
-            "quantity": 1,
-        },
+        json={"category": "medicine", "quantity": 1},
     )
 
-    response = await client.get("/api/v1/requests/mine", headers=headers)
+    response = await client.get("/api/v1/citizen/requests", headers=headers)
     assert response.status_code == 200
     data = response.json()
-    assert data["total"] >= 1
-    assert len(data["items"]) >= 1
+    assert len(data) == 1
+    assert data[0]["category"] == "medicine"
+    assert data[0]["status"] == "pending"
+    assert data[0]["region"] == "حي السلام"  # من عنوان المستخدم
 
 
 @pytest.mark.asyncio
-async def test_cancel_request(client: AsyncClient, resident_user: User):
-    headers = get_auth_headers(resident_user)
+async def test_cancel_request(client: AsyncClient, citizen_user: User):
+    headers = get_auth_headers(citizen_user)
 
-    # Create request
     create_resp = await client.post(
-        "/api/v1/requests",
+        "/api/v1/citizen/requests",
         headers=headers,
-        json={
-            "category": "water",
-            "location_text": "حي الأمل، شارع الماء",
-            "quantity": 2,
-        },
+        json={"category": "water", "quantity": 2},
     )
     request_id = create_resp.json()["id"]
 
-    # Cancel it
-    response = await client.post(
-        f"/api/v1/requests/{request_id}/cancel",
-        headers=headers,
-    )
+    response = await client.delete(f"/api/v1/citizen/requests/{request_id}", headers=headers)
     assert response.status_code == 200
-    assert response.json()["status"] == "cancelled"
+
+    detail = await client.get(f"/api/v1/citizen/requests/{request_id}", headers=headers)
+    assert detail.json()["status"] == "cancelled"
 
 
 @pytest.mark.asyncio
 async def test_org_cannot_create_request(client: AsyncClient, org_user: User):
     headers = get_auth_headers(org_user)
     response = await client.post(
-        "/api/v1/requests",
+        "/api/v1/citizen/requests",
         headers=headers,
-        json={
-            "category": "food",
-            "location_text": "مكان ما",
-            "quantity": 1,
-        },
+        json={"category": "food", "quantity": 1},
     )
     assert response.status_code == 403
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.metrics import JOB_RUNS
+from app.core.scheduler import Scheduler, cron, every
+from tests.conftest import engine
+
+
+def _at(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_cron_next_after():
+    assert cron("*/15 * * * *").next_after(_at(2026, 1, 1, 10, 7)) == _at(2026, 1, 1, 10, 15)
+    assert cron("30 3 * * *").next_after(_at(2026, 1, 1, 3, 30)) == _at(2026, 1, 2, 3, 30)
+    # 2026-01-31 سبت -> أول إثنين بعده
+    assert cron("0 8 * * 1").next_after(_at(2026, 1, 31)) == _at(2026, 2, 2, 8, 0)
+    assert cron("0 0 1 1 *").next_after(_at(2026, 6, 1)) == _at(2027, 1, 1)
+    # اليوم ويوم الأسبوع معاً: يكفي أحدهما (الأحد 4 يناير قبل يوم 15)
+    assert cron("0 0 15 * 0").next_after(_at(2026, 1, 1)) == _at(2026, 1, 4)
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"])
+def test_cron_rejects_invalid(expression):
+    with pytest.raises(ValueError):
+        cron(expression)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_runs_job_and_stops_gracefully():
+    scheduler = Scheduler(engine=engine)
+    runs = []
+    finished = asyncio.Event()
+
+    @scheduler.job("tick", every(0.05))
+    async def tick():
+        runs.append(1)
+        if len(runs) == 2:
+            await asyncio.sleep(0.1)
+            finished.set()
+
+    before = JOB_RUNS.labels("tick", "success")._value.get()
+    await scheduler.start()
+    await asyncio.wait_for(finished.wait(), timeout=2)
+    await scheduler.stop()
+
+    # التشغيل الثاني لم يُقطع عند الإيقاف، والمجدول تخلى عن القيادة
+    assert len(runs) >= 2
+    assert JOB_RUNS.labels("tick", "success")._value.get() - before >= 2
+    assert not scheduler.is_leader
+
+
+@pytest.mark.asyncio
+async def test_scheduler_skips_overlapping_runs():
+    scheduler = Scheduler(engine=engine)
+    release = asyncio.Event()
+
+    @scheduler.job("slow", every(0.02))
+    async def slow():
+        await release.wait()
+
+    before = JOB_RUNS.labels("slow", "skipped")._value.get()
+    await scheduler.start()
+    await asyncio.sleep(0.15)
+    release.set()
+    await scheduler.stop()
+
+    assert JOB_RUNS.labels("slow", "skipped")._value.get() > before
+    assert JOB_RUNS.labels("slow", "success")._value.get() == 1
+
+
+def test_duplicate_job_name_rejected():
+    async def noop():
+        pass
+
+    scheduler = Scheduler(engine=engine)
+    scheduler.add("once", every(60), noop)
+    with pytest.raises(ValueError):
+        scheduler.add("once", every(60), noop)
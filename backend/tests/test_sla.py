@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, RequestCategory, RequestStatus
+from app.models.assignment import Assignment
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from app.services.sla_service import PLEDGE_EXPIRED_REASON, run_sla_checks
+from tests.conftest import get_auth_headers
+
+NOW = datetime.now(timezone.utc)
+
+
+def _request(user: User, category: RequestCategory, status: RequestStatus, hours: float) -> Request:
+    return Request(
+        user_id=user.id,
+        requester_name=user.full_name,
+        requester_phone=user.phone,
+        category=category,
+        status=status,
+        created_at=NOW - timedelta(hours=hours),
+    )
+
+
+async def _reload(db_session: AsyncSession, model, row_id):
+    query = select(model).where(model.id == row_id).execution_options(populate_existing=True)
+    return (await db_session.execute(query)).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_overdue_requests_escalated_once(db_session: AsyncSession, citizen_user: User):
+    late_food = _request(citizen_user, RequestCategory.FOOD, RequestStatus.PENDING, 30)
+    late_medicine = _request(citizen_user, RequestCategory.MEDICINE, RequestStatus.PENDING, 7)
+    on_time_food = _request(citizen_user, RequestCategory.FOOD, RequestStatus.PENDING, 7)
+    late_new = _request(citizen_user, RequestCategory.OTHER, RequestStatus.NEW, 100)
+    db_session.add_all([late_food, late_medicine, on_time_food, late_new])
+    await db_session.commit()
+
+    counts = await run_sla_checks(db_session, NOW)
+    assert counts["review"] == 2
+    assert counts["unassigned"] == 1
+    assert (await _reload(db_session, Request, late_medicine.id)).escalated_status == RequestStatus.PENDING
+    assert (await _reload(db_session, Request, on_time_food.id)).escalated_status is None
+
+    # التصعيد مرة واحدة لكل حالة
+    counts = await run_sla_checks(db_session, NOW)
+    assert counts["review"] == counts["unassigned"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_pledge_expires_and_delivery_escalates(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, org_user: User, admin_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    request = _request(citizen_user, RequestCategory.FOOD, RequestStatus.NEW, 1)
+    db_session.add(request)
+    await db_session.flush()
+    pledge = Assignment(request_id=request.id, org_id=org.id, status=AssignmentStatus.PLEDGED,
+                        created_at=NOW - timedelta(hours=49))
+    fresh = Assignment(request_id=request.id, org_id=org.id, status=AssignmentStatus.PLEDGED,
+                       created_at=NOW - timedelta(hours=1))
+    delivery = Assignment(request_id=request.id, org_id=org.id, status=AssignmentStatus.IN_PROGRESS,
+                          created_at=NOW - timedelta(days=8))
+    db_session.add_all([pledge, fresh, delivery])
+    await db_session.commit()
+
+    counts = await run_sla_checks(db_session, NOW)
+    assert counts["pledge"] == 1
+    assert counts["delivery"] == 1
+
+    expired = await _reload(db_session, Assignment, pledge.id)
+    assert expired.status == AssignmentStatus.FAILED
+    assert expired.failure_reason == PLEDGE_EXPIRED_REASON
+    assert (await _reload(db_session, Assignment, fresh.id)).status == AssignmentStatus.PLEDGED
+
+    response = await client.get("/api/v1/admin/stats/sla", headers=get_auth_headers(admin_user))
+    assert response.status_code == 200
+    assert response.json()["data"] == {"review": 0, "unassigned": 0, "assigned": 0, "delivery": 1}
+
+
+@pytest.mark.asyncio
+async def test_inspector_assigned_pledge_escalated_not_expired(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, org_user: User, inspector_user: User,
+    admin_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    request = _request(citizen_user, RequestCategory.FOOD, RequestStatus.NEW, 1)
+    db_session.add(request)
+    await db_session.commit()
+
+    response = await client.patch(
+        f"/api/v1/inspector/requests/{request.id}/assign",
+        headers=get_auth_headers(inspector_user),
+        json={"organization_id": str(org.id)},
+    )
+    assert response.status_code == 200
+
+    assignment = (
+        await db_session.execute(select(Assignment).where(Assignment.request_id == request.id))
+    ).scalar_one()
+    assignment.created_at = NOW - timedelta(hours=49)
+    await db_session.commit()
+
+    counts = await run_sla_checks(db_session, NOW)
+    assert counts["pledge"] == 0
+    assert counts["assigned"] == 1
+    pledge = await _reload(db_session, Assignment, assignment.id)
+    assert pledge.status == AssignmentStatus.PLEDGED
+    assert pledge.escalated_at is not None
+    assert (await _reload(db_session, Request, request.id)).status == RequestStatus.ASSIGNED
+    assert (await run_sla_checks(db_session, NOW))["assigned"] == 0
+
+    response = await client.get("/api/v1/admin/stats/sla", headers=get_auth_headers(admin_user))
+    assert response.json()["data"]["assigned"] == 1
+
+    # إتمام الجمعية يخرجه من التصعيدات القائمة
+    response = await client.patch(
+        f"/api/v1/org/assignments/{assignment.id}", headers=get_auth_headers(org_user, str(org.id)),
+        json={"status": "completed"},
+    )
+    assert response.status_code == 200
+    response = await client.get("/api/v1/admin/stats/sla", headers=get_auth_headers(admin_user))
+    assert response.json()["data"]["assigned"] == 0
@@ -0,0 +1,116 @@
+import fakeredis
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.core import revocation
+from app.core.revocation import RevocationBloom, RevocationStore
+from app.models.user import User
+from tests.conftest import get_auth_headers, issue_otp
+
+
+async def _phone_login(client: AsyncClient, phone: str = "0611111111") -> dict:
+    response = await client.post(
+        "/api/v1/auth/phone-register", json={"phone": phone, "code": await issue_otp(phone)}
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_login_returns_refresh_token(client: AsyncClient):
+    data = await _phone_login(client)
+    assert data["refresh_token"]
+    assert data["expires_in"] == 15 * 60
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_token(client: AsyncClient):
+    data = await _phone_login(client)
+
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": data["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != data["refresh_token"]
+
+    response = await client.get(
+        "/api/v1/auth/me", headers={"Authorization": f"Bearer {rotated['access_token']}"}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_family(client: AsyncClient):
+    data = await _phone_login(client)
+    first = data["refresh_token"]
+
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    second = response.json()["refresh_token"]
+
+    # إعادة استعمال الرمز القديم = تسريب: تسقط الجلسة كلها
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == 401
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": second})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_unknown_refresh_token(client: AsyncClient):
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": "x" * 43})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_and_refresh(client: AsyncClient):
+    data = await _phone_login(client)
+    headers = {"Authorization": f"Bearer {data['access_token']}"}
+
+    response = await client.post(
+        "/api/v1/auth/logout", headers=headers, json={"refresh_token": data["refresh_token"]}
+    )
+    assert response.status_code == 200
+
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": data["refresh_token"]})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_suspension_revokes_refresh_tokens(client: AsyncClient, admin_user: User):
+    data = await _phone_login(client)
+
+    response = await client.patch(
+        f"/api/v1/admin/citizens/{data['user']['id']}/status",
+        headers=get_auth_headers(admin_user),
+        params={"status": "suspended"},
+    )
+    assert response.status_code == 200
+
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": data["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_bloom_bit_order_matches_redis_setbit():
+    bloom = RevocationBloom(64)
+    bloom._set_local(0, [0, 9])
+    # SETBIT key 0 1 / SETBIT key 9 1 -> البت الأعلى أولاً في كل بايت
+    assert bloom._local[0][:2] == bytearray([0x80, 0x40])
+    assert RevocationBloom._has(bloom._local[0], 9)
+    assert not RevocationBloom._has(bloom._local[0], 8)
+
+
+@pytest.mark.asyncio
+async def test_bloom_rejects_revoked_token_from_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    # نفس إعدادات العميلين في app.core.redis: نصي مشترك وآخر للبايتات
+    monkeypatch.setattr(revocation, "get_redis", lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(revocation, "get_redis_raw", lambda: fakeredis.FakeAsyncRedis(server=server))
+    monkeypatch.setattr(settings, "TOKEN_REVOCATION_BLOOM", True)
+
+    await RevocationStore().revoke_token("revoked-jti", 2**31 - 1)
+
+    # مخزن جديد (عامل آخر) يبني مرشحه من خرائط البتات في Redis
+    store = RevocationStore()
+    assert await store.is_revoked({"sub": "1", "iat": 0, "jti": "revoked-jti"})
+    assert not await store.is_revoked({"sub": "1", "iat": 0, "jti": "other-jti"})
+    assert store._bloom._synced_at > 0
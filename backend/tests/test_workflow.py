@@ -0,0 +1,160 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.constants import AssignmentStatus, RequestCategory, RequestStatus
+from app.models.assignment import Assignment
+from app.models.notification import Notification
+from app.models.organization import Organization
+from app.models.request import Request
+from app.models.user import User
+from app.services.workflow import RELEASED_REASON, request_workflow, transition_requests
+from tests.conftest import get_auth_headers
+
+
+def _request(user: User, status: RequestStatus) -> Request:
+    return Request(
+        user_id=user.id, requester_name=user.full_name, requester_phone=user.phone,
+        category=RequestCategory.FOOD, description="", address="", status=status,
+    )
+
+
+@pytest.mark.asyncio
+async def test_transition_table_enforced(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, admin_user: User, inspector_user: User,
+):
+    pending, assigned = _request(citizen_user, RequestStatus.PENDING), _request(citizen_user, RequestStatus.ASSIGNED)
+    db_session.add_all([pending, assigned])
+    await db_session.commit()
+    # الرفض يعيد الجلسة المشتركة (rollback) فتنتهي صلاحية كائناتها - المعرفات والترويسات تُقرأ قبله
+    pending, assigned = pending.id, assigned.id
+    citizen, admin, inspector = (get_auth_headers(user) for user in (citizen_user, admin_user, inspector_user))
+
+    response = await client.delete(f"/api/v1/citizen/requests/{assigned}", headers=citizen)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "لا يمكن إلغاء الطلب بعد التكفل به"
+
+    # الإدارة تمر من الجدول نفسه: لا إتمام لطلب معلق، ولا ربط بجمعية بلا تكفل
+    for status in ("completed", "assigned"):
+        response = await client.patch(
+            f"/api/v1/admin/requests/{pending}", headers=admin, json={"status": status},
+        )
+        assert response.status_code == 400
+
+    response = await client.patch(
+        f"/api/v1/inspector/requests/{pending}/activate", headers=inspector,
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["status"] == "new"
+    response = await client.patch(
+        f"/api/v1/inspector/requests/{pending}/activate", headers=inspector,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "يمكن تفعيل الطلبات المعلقة فقط"
+
+    response = await client.patch(
+        f"/api/v1/admin/requests/{assigned}", headers=admin, json={"status": "completed"},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["completed_at"] is not None
+
+    events = (await db_session.execute(select(Notification.event).order_by(Notification.created_at))).scalars().all()
+    assert sorted(events) == ["request_activated", "request_completed"]
+
+    response = await client.patch(
+        f"/api/v1/admin/requests/{pending}", headers=admin, json={"status": "pending"},
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_resending_current_status_updates_other_fields(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, admin_user: User,
+):
+    pending, assigned = _request(citizen_user, RequestStatus.PENDING), _request(citizen_user, RequestStatus.ASSIGNED)
+    db_session.add_all([pending, assigned])
+    await db_session.commit()
+    admin = get_auth_headers(admin_user)
+
+    for request, status in ((pending, "pending"), (assigned, "assigned")):
+        response = await client.patch(
+            f"/api/v1/admin/requests/{request.id}", headers=admin,
+            json={"status": status, "admin_notes": "ملاحظة", "priority_score": 90},
+        )
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["status"] == status
+        assert data["priority_score"] == 90
+
+    # ليس انتقالاً: لا إشعار لصاحب الطلب
+    assert (await db_session.execute(select(Notification))).scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_manual_reset_releases_live_assignment(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, org_user: User,
+    inspector_user: User, admin_user: User,
+):
+    org = (await db_session.execute(select(Organization))).scalar_one()
+    request = _request(citizen_user, RequestStatus.NEW)
+    db_session.add(request)
+    await db_session.commit()
+
+    response = await client.patch(
+        f"/api/v1/inspector/requests/{request.id}/assign", headers=get_auth_headers(inspector_user),
+        json={"organization_id": str(org.id)},
+    )
+    assert response.status_code == 200
+
+    response = await client.patch(
+        f"/api/v1/admin/requests/{request.id}", headers=get_auth_headers(admin_user), json={"status": "new"},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]["status"] == "new"
+
+    assignment = (await db_session.execute(
+        select(Assignment).where(Assignment.request_id == request.id).execution_options(populate_existing=True)
+    )).scalar_one()
+    assert assignment.status == AssignmentStatus.FAILED
+    assert assignment.failure_reason == RELEASED_REASON
+    assert (await db_session.execute(select(Request.pledge_count).where(Request.id == request.id))).scalar() == 0
+    assert (await db_session.execute(select(Organization.active_count).where(Organization.id == org.id))).scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_hooks_receive_previous_status(
+    client: AsyncClient, db_session: AsyncSession, citizen_user: User, inspector_user: User, org_user: User,
+):
+    seen = []
+
+    @request_workflow.on_transition
+    async def record(db, transitions, context):
+        seen.extend((transition.source, transition.target, len(transition.rows)) for transition in transitions)
+
+    try:
+        org = (await db_session.execute(select(Organization))).scalar_one()
+        requests = [_request(citizen_user, status) for status in (RequestStatus.PENDING, RequestStatus.NEW)]
+        db_session.add_all(requests)
+        await db_session.commit()
+
+        # من المعلق إلى المرتبط مباشرة: انتقال واحد (لا يمر بـ NEW)
+        response = await client.post(
+            f"/api/v1/inspector/requests/{requests[0].id}/assign-org", headers=get_auth_headers(inspector_user),
+            json={"organization_id": str(org.id)},
+        )
+        assert response.status_code == 200
+        assert seen == [(RequestStatus.PENDING, RequestStatus.ASSIGNED, 1)]
+
+        seen.clear()
+        moved = await transition_requests(
+            db_session, RequestStatus.CANCELLED, Request.user_id == citizen_user.id,
+            sources=[RequestStatus.NEW, RequestStatus.COMPLETED],
+        )
+        await db_session.commit()
+        # COMPLETED منتهية: لا تحديث لها أصلاً
+        assert [req.id for req in moved] == [requests[1].id]
+        assert requests[1].status == RequestStatus.CANCELLED
+        assert seen == [(RequestStatus.NEW, RequestStatus.CANCELLED, 1)]
+    finally:
+        request_workflow._hooks.remove(record)